@@ -0,0 +1,318 @@
+import re
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A local stand-in for the Anthropic Messages, OpenAI chat-completions and
+# Ollama /api/generate endpoints. Every request gets canned XML picked from
+# the prompt, so the whole dravid pipeline runs without a real provider.
+
+DO_RESPONSE = """<response>
+  <explanation>Adds a greeting module and a test for it.</explanation>
+  <steps>
+    <step>
+      <type>file</type>
+      <operation>CREATE</operation>
+      <filename>bench_output/greeting.py</filename>
+      <content><![CDATA[
+def greet(name):
+    return f"Hello, {name}!"
+]]></content>
+    </step>
+    <step>
+      <type>file</type>
+      <operation>CREATE</operation>
+      <filename>bench_output/test_greeting.py</filename>
+      <content><![CDATA[
+from greeting import greet
+
+
+def test_greet():
+    assert greet("bench") == "Hello, bench!"
+]]></content>
+    </step>
+  </steps>
+</response>"""
+
+PROJECT_INFO_RESPONSE = """<response>
+  <project_info>
+    <project_name>synthetic</project_name>
+    <primary_language>python</primary_language>
+    <primary_framework>none</primary_framework>
+    <dev_server>
+      <start_command>python -m app</start_command>
+    </dev_server>
+    <description>Synthetic benchmark project</description>
+    <directory_structure>
+      <directory>
+        <name>src</name>
+        <description>Generated modules</description>
+      </directory>
+    </directory_structure>
+  </project_info>
+</response>"""
+
+METADATA = """<type>python</type>
+    <summary>Generated module {name}</summary>
+    <exports>fun:{function}</exports>
+    <imports>None</imports>"""
+
+_BATCH_FILE = re.compile(r'<file path="([^"]+)">')
+_SINGLE_FILE = re.compile(r'^File: (.+)$', re.MULTILINE)
+
+
+def metadata_for(path):
+    name = path.rsplit('/', 1)[-1]
+    function = re.sub(r'\W', '_', name.rsplit('.', 1)[0])
+    return METADATA.format(name=name, function=function)
+
+
+def canned_response(prompt):
+    batch = _BATCH_FILE.findall(prompt)
+    if batch:
+        entries = "\n".join(
+            f'  <metadata path="{path}">\n    {metadata_for(path)}\n  </metadata>' for path in batch)
+        return f"<response>\n{entries}\n</response>"
+    single = _SINGLE_FILE.search(prompt)
+    if single and "Content:" in prompt:
+        path = single.group(1).strip()
+        return f"<response>\n  <metadata>\n    <path>{path}</path>\n    {metadata_for(path)}\n  </metadata>\n</response>"
+    if "Analyze the following folder structure" in prompt:
+        return PROJECT_INFO_RESPONSE
+    return DO_RESPONSE
+
+
+def prompt_text(content):
+    if isinstance(content, list):
+        return "".join(part.get('text', '') for part in content if isinstance(part, dict))
+    return content or ""
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.simulated_delay = 0.0
+
+    def add(self, delay):
+        with self.lock:
+            self.requests += 1
+            self.simulated_delay += delay
+
+    def snapshot(self):
+        with self.lock:
+            return {'requests': self.requests, 'simulated_delay_s': round(self.simulated_delay, 4)}
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.simulated_delay = 0.0
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self.send_json(self.server.stats.snapshot())
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if self.path == '/stats/reset':
+            self.server.stats.reset()
+            self.send_json({})
+            return
+
+        time.sleep(self.config['latency'])
+        if self.path.endswith('/messages'):
+            self.handle_anthropic(body)
+        elif self.path.endswith('/chat/completions'):
+            self.handle_openai(body)
+        elif self.path.endswith('/api/generate'):
+            self.handle_ollama(body)
+        else:
+            self.send_error(404)
+
+    def chunks(self, text):
+        size = self.config['chunk_size']
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+    def record(self, chunk_count):
+        self.server.stats.add(self.config['latency'] + chunk_count * self.config['chunk_delay'])
+
+    def send_json(self, data):
+        payload = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def start_stream(self, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def write_chunk(self, data):
+        payload = data.encode('utf-8')
+        self.wfile.write(f"{len(payload):x}\r\n".encode('ascii') + payload + b"\r\n")
+        self.wfile.flush()
+
+    def end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def stream_text(self, text, frame):
+        chunks = self.chunks(text)
+        for chunk in chunks:
+            time.sleep(self.config['chunk_delay'])
+            self.write_chunk(frame(chunk))
+        return len(chunks)
+
+    def handle_anthropic(self, body):
+        prompt = "".join(prompt_text(message.get('content')) for message in body.get('messages', [])
+                         if message.get('role') == 'user')
+        text = canned_response(prompt)
+        usage = {'input_tokens': len(prompt) // 4 + 1, 'output_tokens': len(text) // 4 + 1}
+        if not body.get('stream'):
+            self.record(0)
+            self.send_json({'id': 'msg_fake', 'type': 'message', 'role': 'assistant',
+                            'content': [{'type': 'text', 'text': text}],
+                            'stop_reason': 'end_turn', 'usage': usage})
+            return
+
+        def event(name, data):
+            return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+        self.start_stream('text/event-stream')
+        self.write_chunk(event('message_start', {'type': 'message_start', 'message': {
+            'id': 'msg_fake', 'usage': dict(usage, output_tokens=1)}}))
+        count = self.stream_text(text, lambda chunk: event('content_block_delta', {
+            'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': chunk}}))
+        self.write_chunk(event('message_delta', {'type': 'message_delta', 'delta': {
+            'stop_reason': 'end_turn'}, 'usage': {'output_tokens': usage['output_tokens']}}))
+        self.write_chunk(event('message_stop', {'type': 'message_stop'}))
+        self.end_stream()
+        self.record(count)
+
+    def handle_openai(self, body):
+        prompt = "".join(prompt_text(message.get('content')) for message in body.get('messages', [])
+                         if message.get('role') == 'user')
+        text = canned_response(prompt)
+        base = {'id': 'chatcmpl-fake', 'created': int(time.time()), 'model': body.get('model', 'fake')}
+        usage = {'prompt_tokens': len(prompt) // 4 + 1, 'completion_tokens': len(text) // 4 + 1}
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        if not body.get('stream'):
+            self.record(0)
+            self.send_json(dict(base, object='chat.completion', usage=usage, choices=[{
+                'index': 0, 'message': {'role': 'assistant', 'content': text},
+                'finish_reason': 'stop', 'logprobs': None}]))
+            return
+
+        def frame(delta, finish_reason=None):
+            return "data: " + json.dumps(dict(base, object='chat.completion.chunk', choices=[{
+                'index': 0, 'delta': delta, 'finish_reason': finish_reason, 'logprobs': None}])) + "\n\n"
+        self.start_stream('text/event-stream')
+        count = self.stream_text(text, lambda chunk: frame({'content': chunk}))
+        self.write_chunk(frame({}, 'stop'))
+        if (body.get('stream_options') or {}).get('include_usage'):
+            self.write_chunk("data: " + json.dumps(dict(
+                base, object='chat.completion.chunk', choices=[], usage=usage)) + "\n\n")
+        self.write_chunk("data: [DONE]\n\n")
+        self.end_stream()
+        self.record(count)
+
+    def handle_ollama(self, body):
+        text = canned_response(body.get('prompt', ''))
+        done = {'model': body.get('model'), 'done': True, 'done_reason': 'stop',
+                'prompt_eval_count': len(body.get('prompt', '')) // 4 + 1,
+                'eval_count': len(text) // 4 + 1}
+        if not body.get('stream', True):
+            self.record(0)
+            self.send_json(dict(done, response=text))
+            return
+
+        self.start_stream('application/x-ndjson')
+        count = self.stream_text(text, lambda chunk: json.dumps(
+            {'model': body.get('model'), 'response': chunk, 'done': False}) + "\n")
+        self.write_chunk(json.dumps(dict(done, response="")) + "\n")
+        self.end_stream()
+        self.record(count)
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, chunk_delay=0.0, chunk_size=64):
+        super().__init__((host, port), FakeLLMHandler)
+        self.config = {'latency': latency, 'chunk_delay': chunk_delay, 'chunk_size': chunk_size}
+        self.stats = Stats()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environment(self, provider):
+        # Environment variables that point dravid at this server
+        env = {'DRAVID_LLM': provider, 'DRAVID_RATE_LIMIT_RPM': '1000000'}
+        if provider == 'claude':
+            env.update({'CLAUDE_API_KEY': 'fake', 'CLAUDE_API_URL': f"{self.url}/v1/messages"})
+        elif provider == 'openai':
+            env.update({'OPENAI_API_KEY': 'fake', 'OPENAI_BASE_URL': f"{self.url}/v1",
+                        'OPENAI_MODEL': 'fake-model'})
+        elif provider == 'ollama':
+            env.update({'OLLAMA_ENDPOINT': f"{self.url}/api", 'DRAVID_LLM_MODEL': 'fake-model'})
+        else:
+            raise ValueError(f"Unsupported provider: {provider}")
+        return env
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake LLM server for dravid benchmarks")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="seconds before each response starts")
+    parser.add_argument('--chunk-delay', type=float, default=0.0,
+                        help="seconds between streamed chunks")
+    parser.add_argument('--chunk-size', type=int, default=64,
+                        help="characters per streamed chunk")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.host, args.port, args.latency, args.chunk_delay, args.chunk_size)
+    print(f"Fake LLM server listening on {server.url}")
+    for provider in ('claude', 'openai', 'ollama'):
+        print(f"  {provider}: " + " ".join(f"{key}={value}" for key, value in server.environment(provider).items()))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
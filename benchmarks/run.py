@@ -0,0 +1,295 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import contextlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+SRC = os.path.join(ROOT, 'src')
+sys.path.insert(0, SRC)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_llm_server import FakeLLMServer  # noqa: E402
+from synthetic_repo import make_repo  # noqa: E402
+
+DO_QUERY = "Add a greeting module to compute helpers"
+CLI = "from drd.cli.main import dravid_cli; dravid_cli()"
+COMPLETION_CLI = "from drd.cli.main import dravid_cli; dravid_cli(prog_name='drd')"
+STARTUP_COMMANDS = ('version', 'completion', 'ask', 'do', 'meta_init')
+# Answers every confirmation prompt of a --do run
+CONFIRMATIONS = "y\n" * 50
+
+
+def run_cli(args, cwd, env, stdin=""):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', CLI] + args, cwd=cwd, env=env,
+                            input=stdin, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"drd {' '.join(args)} failed:\n{result.stderr[-2000:]}")
+    return elapsed
+
+
+def cli_environment(server, provider, tmp_dir):
+    env = dict(os.environ)
+    env.update(server.environment(provider))
+    env.update({
+        'PYTHONPATH': SRC + os.pathsep + env.get('PYTHONPATH', ''),
+        'DRAVID_NO_CACHE': '1',
+        'DRAVID_CACHE_DIR': os.path.join(tmp_dir, 'cache'),
+    })
+    return env
+
+
+def measure(name, params, repeat, run_once, server=None):
+    timings = []
+    server_stats = None
+    for _ in range(repeat):
+        if server:
+            server.stats.reset()
+        timings.append(run_once())
+        if server:
+            server_stats = server.stats.snapshot()
+    result = {
+        'name': name,
+        'params': params,
+        'repeat': repeat,
+        'min_s': round(min(timings), 4),
+        'median_s': round(statistics.median(timings), 4),
+    }
+    if server_stats:
+        # Time dravid spent on its own, with the simulated provider latency removed
+        result['requests'] = server_stats['requests']
+        result['overhead_s'] = round(result['median_s'] - server_stats['simulated_delay_s'], 4)
+    return result
+
+
+def bench_do(server, provider, pipeline, repeat, tmp_dir):
+    repo = make_repo(os.path.join(tmp_dir, f"do-{provider}-{int(pipeline)}"), 100)
+    env = cli_environment(server, provider, tmp_dir)
+    run_cli(['--meta-init'], repo, env)
+    args = ['--do', DO_QUERY] + (['--pipeline'] if pipeline else [])
+
+    def run_once():
+        shutil.rmtree(os.path.join(repo, 'bench_output'), ignore_errors=True)
+        return run_cli(args, repo, env, CONFIRMATIONS)
+    return measure('do', {'provider': provider, 'pipeline': pipeline}, repeat, run_once, server)
+
+
+def bench_meta_init(server, provider, file_count, repeat, tmp_dir):
+    repo = make_repo(os.path.join(tmp_dir, f"meta-{provider}-{file_count}"), file_count)
+    env = cli_environment(server, provider, tmp_dir)
+
+    def run_once():
+        return run_cli(['--meta-init'], repo, env)
+    return measure('meta_init', {'provider': provider, 'files': file_count}, repeat, run_once, server)
+
+
+def parse_importtime(stderr):
+    # Lines look like "import time:  self [us] | cumulative | <indent>package"
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), depth, int(fields[0]), int(fields[1])))
+    return modules
+
+
+def bench_startup(server, provider, command, repeat, tmp_dir):
+    repo = make_repo(os.path.join(tmp_dir, f"startup-{command}"), 20)
+    env = cli_environment(server, provider, tmp_dir)
+    code = CLI
+    stdin = ""
+    if command == 'version':
+        args = ['--version']
+    elif command == 'completion':
+        code = COMPLETION_CLI
+        args = []
+        env.update({'_DRD_COMPLETE': 'bash_complete', 'COMP_WORDS': 'drd --', 'COMP_CWORD': '1'})
+    elif command == 'ask':
+        args = ['--ask', 'hello']
+    elif command == 'do':
+        args = ['--do', DO_QUERY]
+        stdin = CONFIRMATIONS
+    else:
+        args = [f'--{command.replace("_", "-")}']
+    imports = []
+
+    def run_once():
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code] + args, cwd=repo,
+                                env=env, input=stdin, capture_output=True, text=True)
+        elapsed = time.perf_counter() - started
+        if result.returncode != 0:
+            raise RuntimeError(f"drd {' '.join(args)} failed:\n{result.stderr[-2000:]}")
+        imports[:] = parse_importtime(result.stderr)
+        return elapsed
+    result = measure('startup', {'command': command}, repeat, run_once)
+    result['import_s'] = round(sum(self_us for _, _, self_us, _ in imports) / 1e6, 4)
+    result['modules'] = len(imports)
+    top_level = sorted((m for m in imports if m[1] == 0), key=lambda m: m[3], reverse=True)
+    result['top_imports'] = {name: round(cumulative / 1e6, 4) for name, _, _, cumulative in top_level[:5]}
+    return result
+
+
+def large_response(target_size):
+    steps = []
+    size = 0
+    i = 0
+    while size < target_size:
+        body = "\n".join(f"    line {j} of generated file {i}" for j in range(40))
+        step = (f"<step><type>file</type><operation>CREATE</operation><filename>gen/file_{i}.py</filename>"
+                f"<content><![CDATA[\n{body}\n]]></content></step>")
+        steps.append(step)
+        size += len(step)
+        i += 1
+    return f"<response><explanation>Generated</explanation><steps>{''.join(steps)}</steps></response>"
+
+
+def bench_stream_print(size_kb, chunk_size, repeat):
+    from drd.utils.pretty_print_stream import pretty_print_xml_stream, finish_xml_stream
+    response = large_response(size_kb * 1024)
+    chunks = [response[i:i + chunk_size] for i in range(0, len(response), chunk_size)]
+
+    def run_once():
+        state = {}
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for chunk in chunks:
+                pretty_print_xml_stream(chunk, state)
+            finish_xml_stream(state)
+        return time.perf_counter() - started
+    return measure('pretty_print_xml_stream', {'size_kb': size_kb, 'chunk_size': chunk_size}, repeat, run_once)
+
+
+def bench_apply_changes(line_count, edit_count, repeat):
+    from drd.utils.apply_file_changes import apply_changes
+    content = "\n".join(f"line {i} = compute({i})" for i in range(1, line_count + 1))
+    step = max(1, line_count // edit_count)
+    ops = []
+    for n, line in enumerate(range(1, line_count + 1, step)):
+        op = ('r', '-', '+')[n % 3]
+        ops.append(f"{op} {line}:edited line {line}" if op != '-' else f"- {line}:")
+    changes = "\n".join(ops)
+
+    def run_once():
+        started = time.perf_counter()
+        apply_changes(content, changes)
+        return time.perf_counter() - started
+    return measure('apply_changes', {'lines': line_count, 'edits': len(ops)}, repeat, run_once)
+
+
+def bench_apply_hunks(line_count, hunk_count, repeat):
+    from drd.utils.apply_file_changes import apply_changes
+    # Every other line is "}" so hunks have to be found by their rarer lines
+    lines = [f"line {i} = compute({i})" if i % 2 else "}" for i in range(1, line_count + 1)]
+    step = max(4, line_count // hunk_count)
+    hunks = []
+    for line in range(3, line_count - 2, step):
+        # Headers are off by a few lines, as in drifted LLM output
+        hunks.append(f"@@ -{line + 3} @@\n {lines[line - 1]}\n-{lines[line]}\n+edited {line + 1}\n {lines[line + 1]}")
+    content = "\n".join(lines)
+    changes = "\n".join(hunks)
+
+    def run_once():
+        started = time.perf_counter()
+        apply_changes(content, changes)
+        return time.perf_counter() - started
+    return measure('apply_changes_hunks', {'lines': line_count, 'hunks': len(hunks)}, repeat, run_once)
+
+
+def compare(results, baseline_file):
+    with open(baseline_file) as f:
+        baseline = {(r['name'], json.dumps(r['params'], sort_keys=True)): r
+                    for r in json.load(f)['results']}
+    for result in results:
+        previous = baseline.get((result['name'], json.dumps(result['params'], sort_keys=True)))
+        if previous:
+            result['baseline_median_s'] = previous['median_s']
+            result['change'] = round(result['median_s'] / previous['median_s'] - 1, 4) \
+                if previous['median_s'] else None
+
+
+def parse_list(value, cast=str):
+    return [cast(item) for item in value.split(',') if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dravid against a local fake LLM server")
+    parser.add_argument('--suites', default='startup,do,meta_init,stream,apply_changes',
+                        help="comma separated: startup, do, meta_init, stream, apply_changes")
+    parser.add_argument('--providers', default='claude,openai,ollama')
+    parser.add_argument('--sizes', default='100,1000,10000',
+                        help="file counts of the synthetic repos for meta_init")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="simulated seconds before each response starts")
+    parser.add_argument('--chunk-delay', type=float, default=0.0,
+                        help="simulated seconds between streamed chunks")
+    parser.add_argument('--output', help="write the JSON results to this file instead of stdout")
+    parser.add_argument('--baseline', help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    suites = parse_list(args.suites)
+    providers = parse_list(args.providers)
+    results = []
+    tmp_dir = tempfile.mkdtemp(prefix='drd-bench-')
+    server = FakeLLMServer(latency=args.latency, chunk_delay=args.chunk_delay).start()
+    try:
+        if 'startup' in suites:
+            for command in STARTUP_COMMANDS:
+                results.append(bench_startup(server, providers[0], command, args.repeat, tmp_dir))
+        if 'do' in suites:
+            for provider in providers:
+                for pipeline in (False, True):
+                    results.append(bench_do(server, provider, pipeline, args.repeat, tmp_dir))
+        if 'meta_init' in suites:
+            for provider in providers[:1]:
+                for size in parse_list(args.sizes, int):
+                    results.append(bench_meta_init(server, provider, size, args.repeat, tmp_dir))
+        if 'stream' in suites:
+            for size_kb in (64, 1024):
+                results.append(bench_stream_print(size_kb, 64, args.repeat))
+        if 'apply_changes' in suites:
+            for line_count, edit_count in ((10000, 100), (100000, 5000)):
+                results.append(bench_apply_changes(line_count, edit_count, args.repeat))
+                results.append(bench_apply_hunks(line_count, edit_count, args.repeat))
+    finally:
+        server.stop()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if args.baseline:
+        compare(results, args.baseline)
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'latency_s': args.latency,
+            'chunk_delay_s': args.chunk_delay,
+        },
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
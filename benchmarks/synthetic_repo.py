@@ -0,0 +1,58 @@
+import os
+
+FILES_PER_PACKAGE = 50
+MODULE_TEMPLATE = '''from .helpers import format_value
+
+
+def {name}(value):
+    """Generated function number {index}."""
+    total = 0
+    for i in range(value):
+        total += i * {index}
+    return format_value(total)
+
+
+class {cls}:
+    def __init__(self, value):
+        self.value = value
+
+    def run(self):
+        return {name}(self.value)
+'''
+HELPERS = '''def format_value(value):
+    return f"value={value}"
+'''
+
+
+def make_repo(path, file_count, ignored_count=200):
+    # A python project spread over packages of FILES_PER_PACKAGE modules, plus
+    # an ignored node_modules tree that walkers are expected to skip
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, '.gitignore'), 'w') as f:
+        f.write("node_modules/\n*.log\nbuild/\n")
+    with open(os.path.join(path, 'requirements.txt'), 'w') as f:
+        f.write("requests==2.32.3\nclick==8.1.7\n")
+
+    written = 1
+    index = 0
+    while written < file_count:
+        package = os.path.join(path, 'src', f"pkg_{index // FILES_PER_PACKAGE:04d}")
+        if index % FILES_PER_PACKAGE == 0:
+            os.makedirs(package, exist_ok=True)
+            with open(os.path.join(package, 'helpers.py'), 'w') as f:
+                f.write(HELPERS)
+            written += 1
+            if written >= file_count:
+                break
+        name = f"compute_{index}"
+        with open(os.path.join(package, f"module_{index}.py"), 'w') as f:
+            f.write(MODULE_TEMPLATE.format(name=name, cls=f"Worker{index}", index=index))
+        written += 1
+        index += 1
+
+    ignored = os.path.join(path, 'node_modules', 'left-pad')
+    os.makedirs(ignored, exist_ok=True)
+    for i in range(ignored_count):
+        with open(os.path.join(ignored, f"index_{i}.js"), 'w') as f:
+            f.write("module.exports = function leftPad(s) { return s; };\n")
+    return path
@@ -1,7 +1,14 @@
-from .cli.main import dravid_cli
-from .cli.query import execute_dravid_command
-from .metadata.initializer import initialize_project_metadata
-from .metadata.updater import update_metadata_with_dravid
+from .utils.lazy import lazy_exports
+
+# Resolved on first access, so importing one submodule does not load them all
+_EXPORTS = {
+    'dravid_cli': '.cli.main',
+    'execute_dravid_command': '.cli.query',
+    'initialize_project_metadata': '.metadata.initializer',
+    'update_metadata_with_dravid': '.metadata.updater',
+}
 
 __all__ = ['dravid_cli', 'execute_dravid_command',
            'initialize_project_metadata', 'update_metadata_with_dravid']
+
+__getattr__ = lazy_exports(__name__, _EXPORTS)
@@ -1,4 +1,18 @@
-from .main import call_dravid_api_with_pagination, call_dravid_vision_api_with_pagination, stream_dravid_api
+from ..utils.lazy import lazy_exports
+
+# api.main is only loaded when one of these is used; provider SDKs later still
+_EXPORTS = {
+    'call_dravid_api_with_pagination': '.main',
+    'call_dravid_vision_api_with_pagination': '.main',
+    'stream_dravid_api': '.main',
+    'acall_dravid_api_with_pagination': '.main',
+    'astream_dravid_api': '.main',
+    'forget_response': '.main',
+}
 
 __all__ = ['call_dravid_api_with_pagination',
-           'call_dravid_vision_api_with_pagination', 'stream_dravid_api']
+           'call_dravid_vision_api_with_pagination', 'stream_dravid_api',
+           'acall_dravid_api_with_pagination', 'astream_dravid_api',
+           'forget_response']
+
+__getattr__ = lazy_exports(__name__, _EXPORTS)
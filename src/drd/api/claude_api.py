@@ -1,14 +1,21 @@
 import requests
 import os
 import json
+import time
 from typing import Dict, Any, Optional, List
 from ..utils.parser import extract_and_parse_xml, parse_dravid_response
 from ..utils.file_utils import convert_to_base64
-from typing import Dict, Any, Optional, List, Generator
+from typing import Dict, Any, Optional, List, Generator, AsyncGenerator
 import xml.etree.ElementTree as ET
 import click
+import httpx
+from functools import partial
+from . import http_session, telemetry
+from .prompt_cache import claude_system, claude_user_content, strip_cache_break, record_claude_usage
+from .continuation import get_max_continuations, prefill_messages, stream_with_continuation, astream_with_continuation
+from .rate_limiter import get_rate_limiter, estimate_request_tokens, RATE_LIMIT_RETRIES
 
-API_URL = 'https://api.anthropic.com/v1/messages'
+API_URL = os.getenv('CLAUDE_API_URL', 'https://api.anthropic.com/v1/messages')
 MODEL = 'claude-3-5-sonnet-20240620'
 MAX_TOKENS = 8000
 
@@ -24,18 +31,57 @@ def get_headers(api_key: str) -> Dict[str, str]:
     return {
         'x-api-key': api_key,
         'Content-Type': 'application/json',
-        "Anthropic-Beta": "max-tokens-3-5-sonnet-2024-07-15",
+        "Anthropic-Beta": "max-tokens-3-5-sonnet-2024-07-15,prompt-caching-2024-07-31",
         'Anthropic-Version': '2023-06-01'
     }
 
 
 def make_api_call(data: Dict[str, Any], headers: Dict[str, str], stream: bool = False) -> requests.Response:
-    response = requests.post(
-        API_URL, json=data, headers=headers, stream=stream)
+    limiter = get_rate_limiter('claude')
+    estimated_tokens = estimate_request_tokens(data)
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        limiter.acquire(estimated_tokens)
+        sent = time.perf_counter()
+        response = http_session.post(
+            API_URL, json=data, headers=headers, stream=stream)
+        # elapsed runs until the headers were parsed, even when the body was read too
+        telemetry.mark_connected(sent + response.elapsed.total_seconds())
+        if response.status_code != 429 or attempt == RATE_LIMIT_RETRIES:
+            break
+        # A streamed 429 still holds its pooled connection
+        response.close()
+        telemetry.add_retry()
+        limiter.record_rate_limited(response.headers)
+    telemetry.add_round()
+    limiter.update_from_headers(response.headers)
     response.raise_for_status()
     return response
 
 
+async def amake_api_call(data: Dict[str, Any], headers: Dict[str, str], stream: bool = False) -> httpx.Response:
+    limiter = get_rate_limiter('claude')
+    estimated_tokens = estimate_request_tokens(data)
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        await limiter.aacquire(estimated_tokens)
+        response = await http_session.apost(API_URL, json=data, headers=headers, stream=stream)
+        if stream:
+            # Only a streamed response is returned before its body is read
+            telemetry.mark_connected()
+        if response.status_code != 429 or attempt == RATE_LIMIT_RETRIES:
+            break
+        await response.aclose()
+        telemetry.add_retry()
+        limiter.record_rate_limited(response.headers)
+    telemetry.add_round()
+    limiter.update_from_headers(response.headers)
+    try:
+        response.raise_for_status()
+    except httpx.HTTPStatusError:
+        await response.aclose()
+        raise
+    return response
+
+
 def parse_response(response: str) -> str:
     try:
         root = extract_and_parse_xml(response)
@@ -52,24 +98,53 @@ def call_claude_api_with_pagination(query: str, include_context: bool = False, i
 
     data = {
         'model': MODEL,
-        'system': instruction_prompt or "",
-        'messages': [{'role': 'user', 'content': query}],
+        'system': claude_system(instruction_prompt or ""),
+        'messages': [{'role': 'user', 'content': claude_user_content(query)}],
         'max_tokens': MAX_TOKENS
     }
 
-    while True:
+    messages = data['messages']
+    max_continuations = get_max_continuations()
+    for continuation in range(max_continuations + 1):
         response = make_api_call(data, headers)
         resp = response.json()
+        record_claude_usage(resp.get('usage'))
+        full_response += resp['content'][0]['text']
+
+        if resp.get('stop_reason') != 'max_tokens' or continuation == max_continuations:
+            break
+        # Resume the truncated answer in place instead of asking for more
+        full_response = full_response.rstrip()
+        data['messages'] = prefill_messages(messages, full_response)
+
+    return parse_response(full_response)
+
+
+async def acall_claude_api_with_pagination(query: str, include_context: bool = False, instruction_prompt: Optional[str] = None) -> str:
+    api_key = get_api_key()
+    headers = get_headers(api_key)
+    full_response = ""
+
+    data = {
+        'model': MODEL,
+        'system': claude_system(instruction_prompt or ""),
+        'messages': [{'role': 'user', 'content': claude_user_content(query)}],
+        'max_tokens': MAX_TOKENS
+    }
+
+    messages = data['messages']
+    max_continuations = get_max_continuations()
+    for continuation in range(max_continuations + 1):
+        response = await amake_api_call(data, headers)
+        resp = response.json()
+        record_claude_usage(resp.get('usage'))
         full_response += resp['content'][0]['text']
 
-        if 'stop_reason' in resp and resp['stop_reason'] == 'max_tokens':
-            # If the response was truncated, continue the conversation
-            data['messages'].append(
-                {'role': 'assistant', 'content': full_response})
-            data['messages'].append(
-                {'role': 'user', 'content': 'Please continue.'})
-        else:
+        if resp.get('stop_reason') != 'max_tokens' or continuation == max_continuations:
             break
+        # Resume the truncated answer in place instead of asking for more
+        full_response = full_response.rstrip()
+        data['messages'] = prefill_messages(messages, full_response)
 
     return parse_response(full_response)
 
@@ -83,7 +158,7 @@ def call_claude_vision_api_with_pagination(query: str, image_path: str, include_
     full_response = ""
     data = {
         'model': MODEL,
-        'system': instruction_prompt or "",
+        'system': claude_system(instruction_prompt or ""),
         'messages': [
             {
                 'role': 'user',
@@ -98,7 +173,7 @@ def call_claude_vision_api_with_pagination(query: str, image_path: str, include_
                     },
                     {
                         'type': 'text',
-                        'text': query
+                        'text': strip_cache_break(query)
                     }
                 ]
             }
@@ -106,23 +181,75 @@ def call_claude_vision_api_with_pagination(query: str, image_path: str, include_
         'max_tokens': MAX_TOKENS
     }
 
-    while True:
+    messages = data['messages']
+    max_continuations = get_max_continuations()
+    for continuation in range(max_continuations + 1):
         response = make_api_call(data, headers)
         resp = response.json()
+        record_claude_usage(resp.get('usage'))
         full_response += resp['content'][0]['text']
 
-        if 'stop_reason' in resp and resp['stop_reason'] == 'max_tokens':
-            # If the response was truncated, continue the conversation
-            data['messages'].append(
-                {'role': 'assistant', 'content': full_response})
-            data['messages'].append(
-                {'role': 'user', 'content': 'Please continue.'})
-        else:
+        if resp.get('stop_reason') != 'max_tokens' or continuation == max_continuations:
             break
+        # Resume the truncated answer in place instead of asking for more
+        full_response = full_response.rstrip()
+        data['messages'] = prefill_messages(messages, full_response)
 
     return parse_response(full_response)
 
 
+def _stream_message(data: Dict[str, Any], headers: Dict[str, str], previous: str, state: Dict[str, Any]) -> Generator[str, None, None]:
+    if previous:
+        data = dict(data, messages=prefill_messages(data['messages'], previous))
+    response = make_api_call(data, headers, stream=True)
+
+    try:
+        for line in response.iter_lines():
+            if line:
+                line = line.decode('utf-8')
+                if line.startswith('data: '):
+                    event = json.loads(line[6:])
+                    if event['type'] == 'message_start':
+                        record_claude_usage(
+                            event['message'].get('usage'), count_output=False)
+                    elif event['type'] == 'content_block_delta':
+                        yield event['delta']['text']
+                    elif event['type'] == 'message_delta':
+                        state['truncated'] = event['delta'].get(
+                            'stop_reason') == 'max_tokens'
+                        record_claude_usage(event.get('usage'))
+                    elif event['type'] == 'message_stop':
+                        break
+    finally:
+        # Releases the connection when the consumer stops reading early
+        response.close()
+
+
+async def _astream_message(data: Dict[str, Any], headers: Dict[str, str], previous: str, state: Dict[str, Any]) -> AsyncGenerator[str, None]:
+    if previous:
+        data = dict(data, messages=prefill_messages(data['messages'], previous))
+
+    response = await amake_api_call(data, headers, stream=True)
+
+    try:
+        async for line in response.aiter_lines():
+            if line and line.startswith('data: '):
+                event = json.loads(line[6:])
+                if event['type'] == 'message_start':
+                    record_claude_usage(
+                        event['message'].get('usage'), count_output=False)
+                elif event['type'] == 'content_block_delta':
+                    yield event['delta']['text']
+                elif event['type'] == 'message_delta':
+                    state['truncated'] = event['delta'].get(
+                        'stop_reason') == 'max_tokens'
+                    record_claude_usage(event.get('usage'))
+                elif event['type'] == 'message_stop':
+                    break
+    finally:
+        await response.aclose()
+
+
 def stream_claude_response(query: str, instruction_prompt: Optional[str] = None) -> Generator[str, None, None]:
     api_key = get_api_key()
     headers = get_headers(api_key)
@@ -130,21 +257,29 @@ def stream_claude_response(query: str, instruction_prompt: Optional[str] = None)
 
     data = {
         'model': MODEL,
-        'system': instruction_prompt or "",
-        'messages': [{'role': 'user', 'content': query}],
+        'system': claude_system(instruction_prompt or ""),
+        'messages': [{'role': 'user', 'content': claude_user_content(query)}],
         'max_tokens': MAX_TOKENS,
         'stream': True
     }
 
-    response = make_api_call(data, headers, stream=True)
+    yield from stream_with_continuation(
+        partial(_stream_message, data, headers), prefill=True)
 
-    for line in response.iter_lines():
-        if line:
-            line = line.decode('utf-8')
-            if line.startswith('data: '):
-                data = json.loads(line[6:])
-                if data['type'] == 'content_block_delta':
-                    chunk = data['delta']['text']
-                    yield chunk
-                elif data['type'] == 'message_stop':
-                    break
+
+async def astream_claude_response(query: str, instruction_prompt: Optional[str] = None) -> AsyncGenerator[str, None]:
+    api_key = get_api_key()
+    headers = get_headers(api_key)
+    headers['Accept'] = 'text/event-stream'
+
+    data = {
+        'model': MODEL,
+        'system': claude_system(instruction_prompt or ""),
+        'messages': [{'role': 'user', 'content': claude_user_content(query)}],
+        'max_tokens': MAX_TOKENS,
+        'stream': True
+    }
+
+    async for chunk in astream_with_continuation(
+            partial(_astream_message, data, headers), prefill=True):
+        yield chunk
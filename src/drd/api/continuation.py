@@ -0,0 +1,152 @@
+import os
+from ..utils import print_warning
+
+DEFAULT_MAX_CONTINUATIONS = 5
+CONTINUE_PROMPT = ("Your previous response was cut off. Continue exactly where it stopped, "
+                   "without repeating anything you already wrote and without any preamble.")
+# How much of the start of a continuation is checked for text the model repeated
+OVERLAP_WINDOW = 400
+# Shorter matches are too likely to be a coincidence, e.g. a closing tag
+MIN_OVERLAP = 10
+
+
+def get_max_continuations():
+    try:
+        return max(0, int(os.getenv('DRAVID_MAX_CONTINUATIONS', DEFAULT_MAX_CONTINUATIONS)))
+    except ValueError:
+        return DEFAULT_MAX_CONTINUATIONS
+
+
+def prefill_messages(messages, partial):
+    # Claude resumes a trailing assistant turn in place, so nothing is repeated.
+    # The API rejects an assistant turn that ends in whitespace.
+    return list(messages) + [{'role': 'assistant', 'content': partial.rstrip()}]
+
+
+def follow_up_messages(messages, partial):
+    return list(messages) + [
+        {'role': 'assistant', 'content': partial},
+        {'role': 'user', 'content': CONTINUE_PROMPT}
+    ]
+
+
+def trim_overlap(previous, text):
+    tail = previous[-OVERLAP_WINDOW:]
+    for size in range(min(len(tail), len(text)), MIN_OVERLAP - 1, -1):
+        if tail.endswith(text[:size]):
+            return text[size:]
+    return text
+
+
+def skip_repeated_text(previous, chunks):
+    chunks = iter(chunks)
+    head = []
+    size = 0
+    for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if size >= OVERLAP_WINDOW:
+            break
+    head = trim_overlap(previous, ''.join(head))
+    if head:
+        yield head
+    yield from chunks
+
+
+async def askip_repeated_text(previous, chunks):
+    head = []
+    size = 0
+    try:
+        async for chunk in chunks:
+            head.append(chunk)
+            size += len(chunk)
+            if size >= OVERLAP_WINDOW:
+                break
+        head = trim_overlap(previous, ''.join(head))
+        if head:
+            yield head
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        await chunks.aclose()
+
+
+class _Continuation:
+    # Shared bookkeeping for the sync and async generators below. open_stream is
+    # called with the text streamed so far ('' for the first request) and a state
+    # dict that persists across requests; it sets state['truncated'] when the
+    # response stopped at the token limit.
+    def __init__(self, prefill):
+        self.prefill = prefill
+        self.parts = []
+        self.held = ''
+        self.state = {}
+
+    def start(self):
+        self.held = ''
+        self.state['truncated'] = False
+        return ''.join(self.parts)
+
+    def accept(self, chunk):
+        if self.prefill:
+            # Trailing whitespace is held back until more text follows: if the
+            # response is cut off there, the prefill drops it and Claude writes it again.
+            chunk = self.held + chunk
+            text = chunk.rstrip()
+            self.held = chunk[len(text):]
+            chunk = text
+        if chunk:
+            self.parts.append(chunk)
+        return chunk
+
+    def finish(self):
+        # Returns the held whitespace once the response ended on its own
+        if self.state.get('truncated'):
+            return None
+        return self.held
+
+    def give_up(self):
+        print_warning(
+            f"Response was still truncated after {get_max_continuations()} continuations")
+
+
+def stream_with_continuation(open_stream, prefill=False):
+    continuation = _Continuation(prefill)
+    for _ in range(get_max_continuations() + 1):
+        previous = continuation.start()
+        chunks = open_stream(previous, continuation.state)
+        if previous and not prefill:
+            chunks = skip_repeated_text(previous, chunks)
+        for chunk in chunks:
+            chunk = continuation.accept(chunk)
+            if chunk:
+                yield chunk
+        rest = continuation.finish()
+        if rest is not None:
+            if rest:
+                yield rest
+            return
+    continuation.give_up()
+
+
+async def astream_with_continuation(open_stream, prefill=False):
+    continuation = _Continuation(prefill)
+    for _ in range(get_max_continuations() + 1):
+        previous = continuation.start()
+        chunks = open_stream(previous, continuation.state)
+        if previous and not prefill:
+            chunks = askip_repeated_text(previous, chunks)
+        try:
+            async for chunk in chunks:
+                chunk = continuation.accept(chunk)
+                if chunk:
+                    yield chunk
+        finally:
+            # Async generators are not closed promptly by garbage collection
+            await chunks.aclose()
+        rest = continuation.finish()
+        if rest is not None:
+            if rest:
+                yield rest
+            return
+    continuation.give_up()
@@ -0,0 +1,157 @@
+import os
+import asyncio
+import threading
+import weakref
+from typing import Any, Optional
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 20
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 600
+# 429 is left to the rate limiter so it can back off using the provider's headers
+RETRY_STATUS_CODES = (500, 502, 503, 504, 529)
+
+_lock = threading.Lock()
+_adapter: Optional[HTTPAdapter] = None
+_local = threading.local()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def get_pool_size() -> int:
+    return _int_env('DRAVID_HTTP_POOL_SIZE', DEFAULT_POOL_SIZE)
+
+
+def get_max_retries() -> int:
+    return _int_env('DRAVID_HTTP_MAX_RETRIES', DEFAULT_MAX_RETRIES)
+
+
+def get_timeout():
+    return (_float_env('DRAVID_HTTP_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT),
+            _float_env('DRAVID_HTTP_READ_TIMEOUT', DEFAULT_READ_TIMEOUT))
+
+
+def _build_adapter() -> HTTPAdapter:
+    pool_size = get_pool_size()
+    retry = Retry(
+        total=get_max_retries(),
+        backoff_factor=DEFAULT_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=None,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    return HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+
+def get_adapter() -> HTTPAdapter:
+    global _adapter
+    if _adapter is None:
+        with _lock:
+            if _adapter is None:
+                _adapter = _build_adapter()
+    return _adapter
+
+
+def get_session() -> requests.Session:
+    # Sessions keep per-thread state, so each thread gets its own Session while
+    # all of them share one adapter and therefore one connection pool.
+    adapter = get_adapter()
+    session = getattr(_local, 'session', None)
+    if session is None or session.get_adapter('https://') is not adapter:
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _local.session = session
+    return session
+
+
+def post(url: str, **kwargs: Any) -> requests.Response:
+    kwargs.setdefault('timeout', get_timeout())
+    return get_session().post(url, **kwargs)
+
+
+def reset_sessions() -> None:
+    global _adapter
+    with _lock:
+        if _adapter is not None:
+            _adapter.close()
+        _adapter = None
+
+
+def _build_async_client() -> httpx.AsyncClient:
+    pool_size = get_pool_size()
+    connect_timeout, read_timeout = get_timeout()
+    transport = httpx.AsyncHTTPTransport(
+        retries=get_max_retries(),
+        limits=httpx.Limits(max_connections=pool_size,
+                            max_keepalive_connections=pool_size)
+    )
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+    )
+
+
+def build_client() -> httpx.Client:
+    # For SDK clients, which keep it for their lifetime; like the async
+    # client, the transport retries failed connections only
+    pool_size = get_pool_size()
+    connect_timeout, read_timeout = get_timeout()
+    transport = httpx.HTTPTransport(
+        retries=get_max_retries(),
+        limits=httpx.Limits(max_connections=pool_size,
+                            max_keepalive_connections=pool_size)
+    )
+    return httpx.Client(
+        transport=transport,
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+    )
+
+
+def get_async_client() -> httpx.AsyncClient:
+    # httpx connection pools are bound to the event loop they were opened on,
+    # so async clients are cached per running loop rather than per process.
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = _build_async_client()
+        _async_clients[loop] = client
+    return client
+
+
+async def apost(url: str, stream: bool = False, **kwargs: Any) -> httpx.Response:
+    client = get_async_client()
+    if stream:
+        # Returns once the headers are in; the caller reads the body and
+        # must aclose() the response
+        return await client.send(client.build_request('POST', url, **kwargs), stream=True)
+    return await client.post(url, **kwargs)
+
+
+def astream_post(url: str, **kwargs: Any):
+    return get_async_client().stream('POST', url, **kwargs)
+
+
+async def aclose_async_client() -> None:
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
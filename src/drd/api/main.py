@@ -1,72 +1,221 @@
 import os
+import queue
+import threading
+import contextvars
 import click
-from .claude_api import call_claude_api_with_pagination, call_claude_vision_api_with_pagination, stream_claude_response
-from .openai_api import call_api_with_pagination, call_vision_api_with_pagination, stream_response
+from . import response_cache, telemetry
 from ..utils import print_debug, print_info
 from ..utils.loader import Loader
-from ..utils.pretty_print_stream import pretty_print_xml_stream
+from ..utils.pretty_print_stream import pretty_print_xml_stream, finish_xml_stream
 from ..utils.parser import parse_dravid_response
+from ..utils.stream_parser import StreamingResponseParser
 import xml.etree.ElementTree as ET
 
 
 def get_api_functions():
+    # Provider modules are imported on first use, so only the selected SDK loads
     llm_type = os.getenv('DRAVID_LLM', 'claude').lower()
     if llm_type == 'claude':
+        from .claude_api import call_claude_api_with_pagination, call_claude_vision_api_with_pagination, stream_claude_response
         return call_claude_api_with_pagination, call_claude_vision_api_with_pagination, stream_claude_response
     elif llm_type in ['openai', 'azure', 'custom', 'ollama']:
+        from .openai_api import call_api_with_pagination, call_vision_api_with_pagination, stream_response
         return call_api_with_pagination, call_vision_api_with_pagination, stream_response
     else:
         raise ValueError(f"Unsupported LLM type: {llm_type}")
 
 
-def stream_dravid_api(query, include_context=False, instruction_prompt=None, print_chunk=False):
-    _, _, stream_response = get_api_functions()
+def get_model_name():
+    llm_type = os.getenv('DRAVID_LLM', 'claude').lower()
+    if llm_type == 'claude':
+        from .claude_api import MODEL
+        return MODEL
+    from .openai_api import get_model
+    return get_model()
+
+
+def track_call(operation):
+    llm_type = os.getenv('DRAVID_LLM', 'claude').lower()
+    try:
+        model = get_model_name()
+    except ValueError:
+        model = None
+    return telemetry.track_call(operation, llm_type, model)
+
+
+def get_cache_key(query, instruction_prompt):
+    llm_type = os.getenv('DRAVID_LLM', 'claude').lower()
+    return response_cache.make_key(llm_type, get_model_name(), instruction_prompt, query)
 
-    if print_chunk:
-        print_info("DRAVID: ")
-        for chunk in stream_response(query, instruction_prompt):
-            click.echo(chunk, nl=False)
-        return None
+
+def forget_response(query, instruction_prompt=None):
+    # For callers that could not use a response: without this a truncated or
+    # malformed answer would be replayed from the cache for the whole TTL
+    if response_cache.is_enabled():
+        response_cache.delete(get_cache_key(query, instruction_prompt))
+
+
+def get_async_api_functions():
+    llm_type = os.getenv('DRAVID_LLM', 'claude').lower()
+    if llm_type == 'claude':
+        from .claude_api import acall_claude_api_with_pagination, astream_claude_response
+        return acall_claude_api_with_pagination, astream_claude_response
+    elif llm_type in ['openai', 'azure', 'custom', 'ollama']:
+        from .openai_api import acall_api_with_pagination, astream_response
+        return acall_api_with_pagination, astream_response
     else:
-        xml_buffer = ""
-        loader = Loader("Gathering responses from API...")
-        state = {
-            'buffer': '',
-            'in_step': False,
-        }
-        try:
+        raise ValueError(f"Unsupported LLM type: {llm_type}")
+
+
+def stream_dravid_api(query, include_context=False, instruction_prompt=None, print_chunk=False, on_command=None):
+    _, _, stream_response = get_api_functions()
+
+    with track_call('stream') as call:
+        if print_chunk:
+            print_info("DRAVID: ")
             for chunk in stream_response(query, instruction_prompt):
-                if print_chunk:
-                    click.echo(chunk, nl=False)
+                call.mark_first_token()
+                click.echo(chunk, nl=False)
+            return None
+        else:
+            chunks = []
+            loader = Loader("Gathering responses from API...")
+            state = {}
+            try:
+                for chunk in stream_response(query, instruction_prompt):
+                    call.mark_first_token()
+                    chunks.append(chunk)
+                    for command in pretty_print_xml_stream(chunk, state):
+                        if on_command:
+                            on_command(command)
+                for command in finish_xml_stream(state):
+                    if on_command:
+                        on_command(command)
+            finally:
+                loader.stop()
+            return "".join(chunks)
+
+
+def stream_dravid_commands(query, include_context=False, instruction_prompt=None):
+    # The response is read on a background thread so the caller can execute
+    # each command while later ones are still being generated. Closing this
+    # generator early cancels the stream.
+    _, _, stream_response = get_api_functions()
+    received = queue.Queue()
+    cancelled = threading.Event()
+    finished = object()
+
+    def read_stream():
+        parser = StreamingResponseParser()
+        chunks = stream_response(query, instruction_prompt)
+        try:
+            with track_call('stream') as call:
+                for chunk in chunks:
+                    if cancelled.is_set():
+                        break
+                    call.mark_first_token()
+                    for command in parser.feed(chunk):
+                        received.put(command)
                 else:
-                    pretty_print_xml_stream(chunk, state)
-                xml_buffer += chunk
+                    for command in parser.close():
+                        received.put(command)
+        except Exception as e:
+            received.put(e)
         finally:
-            loader.stop()
-        return xml_buffer
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            received.put(finished)
+
+    # The copied context carries the caller's telemetry phase into the thread
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(read_stream,), daemon=True).start()
+    try:
+        while True:
+            item = received.get()
+            if item is finished:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+
+
+async def astream_dravid_api(query, include_context=False, instruction_prompt=None, print_chunk=False, on_command=None):
+    _, astream_response = get_async_api_functions()
+
+    with track_call('stream') as call:
+        if print_chunk:
+            print_info("DRAVID: ")
+            async for chunk in astream_response(query, instruction_prompt):
+                call.mark_first_token()
+                click.echo(chunk, nl=False)
+            return None
+
+        chunks = []
+        state = {}
+        async for chunk in astream_response(query, instruction_prompt):
+            call.mark_first_token()
+            chunks.append(chunk)
+            for command in pretty_print_xml_stream(chunk, state):
+                if on_command:
+                    on_command(command)
+        for command in finish_xml_stream(state):
+            if on_command:
+                on_command(command)
+        return "".join(chunks)
 
 
 def call_dravid_api(query, include_context=False, instruction_prompt=None):
     call_api, _, _ = get_api_functions()
-    response = call_api(query, include_context, instruction_prompt)
+    with track_call('call'):
+        response = call_api(query, include_context, instruction_prompt)
     return parse_dravid_response(response)
 
 
 def call_dravid_vision_api(query, image_path, include_context=False, instruction_prompt=None):
     _, call_vision_api, _ = get_api_functions()
-    response = call_vision_api(
-        query, image_path, include_context, instruction_prompt)
+    with track_call('vision'):
+        response = call_vision_api(
+            query, image_path, include_context, instruction_prompt)
     return parse_dravid_response(response)
 
 
 def call_dravid_api_with_pagination(query, include_context=False, instruction_prompt=None):
     call_api, _, _ = get_api_functions()
-    response = call_api(query, include_context, instruction_prompt)
-    return response
+    with track_call('call') as call:
+        if not response_cache.is_enabled():
+            return call_api(query, include_context, instruction_prompt)
+
+        cache_key = get_cache_key(query, instruction_prompt)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            call.data['response_cache_hit'] = True
+            return cached
+        response = call_api(query, include_context, instruction_prompt)
+        response_cache.put(cache_key, response)
+        return response
 
 
 def call_dravid_vision_api_with_pagination(query, image_path, include_context=False, instruction_prompt=None):
     _, call_vision_api, _ = get_api_functions()
-    response = call_vision_api(
-        query, image_path, include_context, instruction_prompt)
+    with track_call('vision'):
+        response = call_vision_api(
+            query, image_path, include_context, instruction_prompt)
     return response
+
+
+async def acall_dravid_api_with_pagination(query, include_context=False, instruction_prompt=None):
+    acall_api, _ = get_async_api_functions()
+    with track_call('call') as call:
+        if not response_cache.is_enabled():
+            return await acall_api(query, include_context, instruction_prompt)
+
+        cache_key = get_cache_key(query, instruction_prompt)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            call.data['response_cache_hit'] = True
+            return cached
+        response = await acall_api(query, include_context, instruction_prompt)
+        response_cache.put(cache_key, response)
+        return response
@@ -1,8 +1,13 @@
+import os
+import time
 import requests
-from typing import Dict, Any, Generator, Optional
+from typing import Dict, Any, Generator, AsyncGenerator, Optional
 import json
+from functools import partial
+from . import http_session, telemetry
+from .continuation import CONTINUE_PROMPT, stream_with_continuation, astream_with_continuation
 
-OLLAMA_ENDPOINT = "http://localhost:11434/api"
+OLLAMA_ENDPOINT = os.getenv("OLLAMA_ENDPOINT", "http://localhost:11434/api")
 
 
 def get_ollama_client():
@@ -18,9 +23,64 @@ def call_ollama_api(model: str, prompt: str, system_prompt: str = "") -> str:
         "system": system_prompt,
         "stream": False
     }
-    response = requests.post(f"{OLLAMA_ENDPOINT}/generate", json=data)
+    sent = time.perf_counter()
+    response = http_session.post(f"{OLLAMA_ENDPOINT}/generate", json=data)
+    record_response(sent + response.elapsed.total_seconds())
     response.raise_for_status()
-    return response.json()["response"]
+    result = response.json()
+    record_usage(result)
+    return result["response"]
+
+
+def _continuation_request(data: Dict[str, Any], previous: str, state: Dict[str, Any]) -> Dict[str, Any]:
+    if not previous:
+        return data
+    # The token context returned with the truncated answer lets the model
+    # pick up from where it stopped without resending it.
+    return dict(data, prompt=CONTINUE_PROMPT, context=state['context'])
+
+
+def record_response(connected_at: Optional[float]) -> None:
+    # connected_at is when the response headers arrived, None if not known
+    if connected_at is not None:
+        telemetry.mark_connected(connected_at)
+    telemetry.add_round()
+
+
+def record_usage(result: Dict[str, Any]) -> None:
+    if isinstance(result, dict):
+        telemetry.add_usage(_count(result.get("prompt_eval_count")),
+                            _count(result.get("eval_count")))
+
+
+def _count(value) -> int:
+    return value if isinstance(value, int) else 0
+
+
+def _finish_chunk(chunk: Dict[str, Any], state: Dict[str, Any]) -> None:
+    if chunk.get("done"):
+        record_usage(chunk)
+        state['truncated'] = (chunk.get("done_reason") == "length"
+                              and bool(chunk.get("context")))
+        state['context'] = chunk.get("context")
+
+
+def _stream_generate(data: Dict[str, Any], previous: str, state: Dict[str, Any]) -> Generator[str, None, None]:
+    sent = time.perf_counter()
+    response = http_session.post(
+        f"{OLLAMA_ENDPOINT}/generate", json=_continuation_request(data, previous, state), stream=True)
+    record_response(sent + response.elapsed.total_seconds())
+    response.raise_for_status()
+
+    try:
+        for line in response.iter_lines():
+            if line:
+                chunk = json.loads(line)
+                if chunk.get("response"):
+                    yield chunk["response"]
+                _finish_chunk(chunk, state)
+    finally:
+        response.close()
 
 
 def stream_ollama_response(model: str, prompt: str, system_prompt: str = "") -> Generator[str, None, None]:
@@ -30,21 +90,56 @@ def stream_ollama_response(model: str, prompt: str, system_prompt: str = "") ->
         "system": system_prompt,
         "stream": True
     }
-    response = requests.post(
-        f"{OLLAMA_ENDPOINT}/generate", json=data, stream=True)
+    yield from stream_with_continuation(partial(_stream_generate, data))
+
+
+async def acall_ollama_api(model: str, prompt: str, system_prompt: str = "") -> str:
+    data = {
+        "model": model,
+        "prompt": prompt,
+        "system": system_prompt,
+        "stream": False
+    }
+    response = await http_session.apost(f"{OLLAMA_ENDPOINT}/generate", json=data)
+    # httpx only times the whole response
+    record_response(None)
     response.raise_for_status()
+    result = response.json()
+    record_usage(result)
+    return result["response"]
+
+
+async def _astream_generate(data: Dict[str, Any], previous: str, state: Dict[str, Any]) -> AsyncGenerator[str, None]:
+    async with http_session.astream_post(f"{OLLAMA_ENDPOINT}/generate", json=_continuation_request(data, previous, state)) as response:
+        record_response(time.perf_counter())
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line:
+                chunk = json.loads(line)
+                if chunk.get("response"):
+                    yield chunk["response"]
+                _finish_chunk(chunk, state)
+
 
-    for line in response.iter_lines():
-        if line:
-            chunk = json.loads(line)
-            if chunk.get("response"):
-                yield chunk["response"]
+async def astream_ollama_response(model: str, prompt: str, system_prompt: str = "") -> AsyncGenerator[str, None]:
+    data = {
+        "model": model,
+        "prompt": prompt,
+        "system": system_prompt,
+        "stream": True
+    }
+    async for chunk in astream_with_continuation(partial(_astream_generate, data)):
+        yield chunk
 
 
 def call_ollama_api_with_pagination(query: str, model: str, include_context: bool = False, instruction_prompt: Optional[str] = None) -> str:
     full_response = call_ollama_api(model, query, instruction_prompt or "")
     return full_response
 
+
+async def acall_ollama_api_with_pagination(query: str, model: str, include_context: bool = False, instruction_prompt: Optional[str] = None) -> str:
+    return await acall_ollama_api(model, query, instruction_prompt or "")
+
 # Note: Ollama doesn't have built-in support for image input like OpenAI.
 # For vision-related tasks, we'd need to use a different approach or model.
 
@@ -1,13 +1,19 @@
 import os
 import json
 import base64
-from typing import Dict, Any, Optional, List, Generator
-from openai import OpenAI, AzureOpenAI
+import threading
+from typing import Dict, Any, Optional, List, Generator, AsyncGenerator
+from openai import OpenAI, AzureOpenAI, AsyncOpenAI, AsyncAzureOpenAI, RateLimitError
 from ..utils.parser import extract_and_parse_xml, parse_dravid_response
 from ..utils.file_utils import convert_to_base64
 import xml.etree.ElementTree as ET
 import click
-from .ollama_api import get_ollama_client, call_ollama_api_with_pagination, stream_ollama_response
+from functools import partial
+from . import http_session, telemetry
+from .prompt_cache import strip_cache_break, record_openai_usage
+from .continuation import get_max_continuations, follow_up_messages, trim_overlap, stream_with_continuation, astream_with_continuation
+from .rate_limiter import get_rate_limiter, estimate_request_tokens, RATE_LIMIT_RETRIES
+from .ollama_api import get_ollama_client, call_ollama_api_with_pagination, stream_ollama_response, acall_ollama_api_with_pagination, astream_ollama_response
 
 DEFAULT_MODEL = "gpt-4o-2024-05-13"
 MAX_TOKENS = 4000
@@ -20,27 +26,75 @@ def get_env_variable(name: str, default: Optional[str] = None) -> str:
     return value
 
 
-def get_client():
-    llm_type = get_env_variable('DRAVID_LLM', 'openai').lower()
+CLIENT_CLASSES = {
+    'azure': (AzureOpenAI, AsyncAzureOpenAI),
+    'openai': (OpenAI, AsyncOpenAI),
+    'custom': (OpenAI, AsyncOpenAI),
+}
+
+_clients = {}
+_clients_lock = threading.Lock()
 
+
+def _get_client_config(llm_type: str) -> Dict[str, Any]:
     if llm_type == 'azure':
-        return AzureOpenAI(
-            api_key=get_env_variable("AZURE_OPENAI_API_KEY"),
-            api_version=get_env_variable("AZURE_OPENAI_API_VERSION"),
-            azure_endpoint=get_env_variable("AZURE_OPENAI_ENDPOINT")
-        )
+        return {
+            'api_key': get_env_variable("AZURE_OPENAI_API_KEY"),
+            'api_version': get_env_variable("AZURE_OPENAI_API_VERSION"),
+            'azure_endpoint': get_env_variable("AZURE_OPENAI_ENDPOINT")
+        }
     elif llm_type == 'openai':
-        return OpenAI()
+        return {'api_key': os.getenv('OPENAI_API_KEY'), 'base_url': os.getenv('OPENAI_BASE_URL')}
     elif llm_type == 'custom':
-        api_key = get_env_variable("DRAVID_LLM_API_KEY")
-        api_base = get_env_variable("DRAVID_LLM_ENDPOINT")
-        return OpenAI(api_key=api_key, base_url=api_base)
-    elif llm_type == 'ollama':
-        return get_ollama_client()
+        return {
+            'api_key': get_env_variable("DRAVID_LLM_API_KEY"),
+            'base_url': get_env_variable("DRAVID_LLM_ENDPOINT")
+        }
     else:
         raise ValueError(f"Unsupported LLM type: {llm_type}")
 
 
+def get_client():
+    llm_type = get_env_variable('DRAVID_LLM', 'openai').lower()
+    if llm_type == 'ollama':
+        return get_ollama_client()
+
+    # Clients own their connection pool, so reuse one per configuration
+    # instead of paying a new handshake on every call.
+    config = _get_client_config(llm_type)
+    client_class = CLIENT_CLASSES[llm_type][0]
+    key = (llm_type, tuple(sorted(config.items())))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            _, read_timeout = http_session.get_timeout()
+            # The SDK would retry 429s itself, before the rate limiter ever
+            # saw them; only the limiter retries, and the transport
+            # retries failed connections
+            client = client_class(
+                **config,
+                max_retries=0,
+                timeout=read_timeout,
+                http_client=http_session.build_client()
+            )
+            _clients[key] = client
+    return client
+
+
+def get_async_client():
+    llm_type = get_env_variable('DRAVID_LLM', 'openai').lower()
+    if llm_type == 'ollama':
+        return get_ollama_client()
+
+    config = _get_client_config(llm_type)
+    client_class = CLIENT_CLASSES[llm_type][1]
+    return client_class(
+        **config,
+        max_retries=0,
+        http_client=http_session.get_async_client()
+    )
+
+
 def get_model():
     llm_type = get_env_variable('DRAVID_LLM', 'openai').lower()
     if llm_type == 'azure':
@@ -51,6 +105,43 @@ def get_model():
         return get_env_variable("OPENAI_MODEL", DEFAULT_MODEL)
 
 
+def create_chat_completion(client, **kwargs):
+    limiter = get_rate_limiter(get_env_variable('DRAVID_LLM', 'openai').lower())
+    estimated_tokens = estimate_request_tokens(kwargs)
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        limiter.acquire(estimated_tokens)
+        try:
+            raw_response = client.chat.completions.with_raw_response.create(
+                **kwargs)
+        except RateLimitError as e:
+            if attempt == RATE_LIMIT_RETRIES:
+                raise
+            telemetry.add_retry()
+            limiter.record_rate_limited(e.response.headers)
+            continue
+        telemetry.add_round()
+        limiter.update_from_headers(raw_response.headers)
+        return raw_response.parse()
+
+
+async def acreate_chat_completion(client, **kwargs):
+    limiter = get_rate_limiter(get_env_variable('DRAVID_LLM', 'openai').lower())
+    estimated_tokens = estimate_request_tokens(kwargs)
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        await limiter.aacquire(estimated_tokens)
+        try:
+            raw_response = await client.chat.completions.with_raw_response.create(**kwargs)
+        except RateLimitError as e:
+            if attempt == RATE_LIMIT_RETRIES:
+                raise
+            telemetry.add_retry()
+            limiter.record_rate_limited(e.response.headers)
+            continue
+        telemetry.add_round()
+        limiter.update_from_headers(raw_response.headers)
+        return raw_response.parse()
+
+
 def parse_response(response: str) -> str:
     try:
         root = extract_and_parse_xml(response)
@@ -65,28 +156,31 @@ def call_api_with_pagination(query: str, include_context: bool = False, instruct
     model = get_model()
 
     if llm_type == 'ollama':
-        return call_ollama_api_with_pagination(query, model, include_context, instruction_prompt)
+        return call_ollama_api_with_pagination(strip_cache_break(query), model, include_context, instruction_prompt)
 
     client = get_client()
     full_response = ""
     messages = [
         {"role": "system", "content": instruction_prompt or ""},
-        {"role": "user", "content": query}
+        {"role": "user", "content": strip_cache_break(query)}
     ]
 
-    while True:
-        response = client.chat.completions.create(
+    request_messages = messages
+    max_continuations = get_max_continuations()
+    for continuation in range(max_continuations + 1):
+        response = create_chat_completion(
+            client,
             model=model,
-            messages=messages,
+            messages=request_messages,
             max_tokens=MAX_TOKENS
         )
-        full_response += response.choices[0].message.content
+        record_openai_usage(getattr(response, 'usage', None))
+        full_response += trim_overlap(full_response,
+                                      response.choices[0].message.content)
 
-        if response.choices[0].finish_reason != 'length':
+        if response.choices[0].finish_reason != 'length' or continuation == max_continuations:
             break
-
-        messages.append({"role": "assistant", "content": full_response})
-        messages.append({"role": "user", "content": "Please continue."})
+        request_messages = follow_up_messages(messages, full_response)
 
     return parse_response(full_response)
 
@@ -107,51 +201,158 @@ def call_vision_api_with_pagination(query: str, image_path: str, include_context
         {
             "role": "user",
             "content": [
-                {"type": "text", "text": query},
+                {"type": "text", "text": strip_cache_break(query)},
                 {"type": "image_url", "image_url": {
                     "url": f"data:image/{mime_type};base64,{image_data}"}}
             ]
         }
     ]
 
-    while True:
-        response = client.chat.completions.create(
+    request_messages = messages
+    max_continuations = get_max_continuations()
+    for continuation in range(max_continuations + 1):
+        response = create_chat_completion(
+            client,
             model=model,
-            messages=messages,
+            messages=request_messages,
             max_tokens=MAX_TOKENS
         )
-        full_response += response.choices[0].message.content
+        record_openai_usage(getattr(response, 'usage', None))
+        full_response += trim_overlap(full_response,
+                                      response.choices[0].message.content)
 
-        if response.choices[0].finish_reason != 'length':
+        if response.choices[0].finish_reason != 'length' or continuation == max_continuations:
             break
-
-        messages.append({"role": "assistant", "content": full_response})
-        messages.append({"role": "user", "content": "Please continue."})
+        request_messages = follow_up_messages(messages, full_response)
 
     return parse_response(full_response)
 
 
+def get_stream_options() -> Dict[str, Any]:
+    # Only OpenAI itself is known to accept stream_options; it adds a final
+    # chunk with the token usage, including cached prompt tokens.
+    if get_env_variable('DRAVID_LLM', 'openai').lower() == 'openai':
+        return {'stream_options': {'include_usage': True}}
+    return {}
+
+
+def _stream_chat(client, model: str, messages: List[Dict[str, Any]], previous: str, state: Dict[str, Any]) -> Generator[str, None, None]:
+    if previous:
+        messages = follow_up_messages(messages, previous)
+    response = create_chat_completion(
+        client,
+        model=model,
+        messages=messages,
+        max_tokens=MAX_TOKENS,
+        stream=True,
+        **get_stream_options()
+    )
+
+    try:
+        for chunk in response:
+            if getattr(chunk, 'usage', None):
+                record_openai_usage(chunk.usage)
+            if chunk.choices:
+                choice = chunk.choices[0]
+                if choice.delta.content is not None:
+                    yield choice.delta.content
+                if choice.finish_reason == 'length':
+                    state['truncated'] = True
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+
+
+async def _astream_chat(client, model: str, messages: List[Dict[str, Any]], previous: str, state: Dict[str, Any]) -> AsyncGenerator[str, None]:
+    if previous:
+        messages = follow_up_messages(messages, previous)
+    response = await acreate_chat_completion(
+        client,
+        model=model,
+        messages=messages,
+        max_tokens=MAX_TOKENS,
+        stream=True,
+        **get_stream_options()
+    )
+
+    async for chunk in response:
+        if getattr(chunk, 'usage', None):
+            record_openai_usage(chunk.usage)
+        if chunk.choices:
+            choice = chunk.choices[0]
+            if choice.delta.content is not None:
+                yield choice.delta.content
+            if choice.finish_reason == 'length':
+                state['truncated'] = True
+
+
 def stream_response(query: str, instruction_prompt: Optional[str] = None) -> Generator[str, None, None]:
     llm_type = get_env_variable('DRAVID_LLM', 'openai').lower()
     model = get_model()
 
     if llm_type == 'ollama':
-        yield from stream_ollama_response(model, query, instruction_prompt or "")
+        yield from stream_ollama_response(model, strip_cache_break(query), instruction_prompt or "")
         return
 
     client = get_client()
     messages = [
         {"role": "system", "content": instruction_prompt or ""},
-        {"role": "user", "content": query}
+        {"role": "user", "content": strip_cache_break(query)}
     ]
 
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        max_tokens=MAX_TOKENS,
-        stream=True
-    )
+    yield from stream_with_continuation(
+        partial(_stream_chat, client, model, messages))
+
+
+async def acall_api_with_pagination(query: str, include_context: bool = False, instruction_prompt: Optional[str] = None) -> str:
+    llm_type = get_env_variable('DRAVID_LLM', 'openai').lower()
+    model = get_model()
+
+    if llm_type == 'ollama':
+        return await acall_ollama_api_with_pagination(strip_cache_break(query), model, include_context, instruction_prompt)
+
+    client = get_async_client()
+    full_response = ""
+    messages = [
+        {"role": "system", "content": instruction_prompt or ""},
+        {"role": "user", "content": strip_cache_break(query)}
+    ]
+
+    request_messages = messages
+    max_continuations = get_max_continuations()
+    for continuation in range(max_continuations + 1):
+        response = await acreate_chat_completion(
+            client,
+            model=model,
+            messages=request_messages,
+            max_tokens=MAX_TOKENS
+        )
+        record_openai_usage(getattr(response, 'usage', None))
+        full_response += trim_overlap(full_response,
+                                      response.choices[0].message.content)
+
+        if response.choices[0].finish_reason != 'length' or continuation == max_continuations:
+            break
+        request_messages = follow_up_messages(messages, full_response)
+
+    return parse_response(full_response)
+
+
+async def astream_response(query: str, instruction_prompt: Optional[str] = None) -> AsyncGenerator[str, None]:
+    llm_type = get_env_variable('DRAVID_LLM', 'openai').lower()
+    model = get_model()
+
+    if llm_type == 'ollama':
+        async for chunk in astream_ollama_response(model, strip_cache_break(query), instruction_prompt or ""):
+            yield chunk
+        return
+
+    client = get_async_client()
+    messages = [
+        {"role": "system", "content": instruction_prompt or ""},
+        {"role": "user", "content": strip_cache_break(query)}
+    ]
 
-    for chunk in response:
-        if chunk.choices and chunk.choices[0].delta.content is not None:
-            yield chunk.choices[0].delta.content
+    async for chunk in astream_with_continuation(
+            partial(_astream_chat, client, model, messages)):
+        yield chunk
@@ -0,0 +1,82 @@
+import os
+import threading
+from typing import Any, Dict, List, Union
+from . import telemetry
+
+# Separates the sections of a query, most stable first. Claude gets a cache
+# breakpoint after each one; for every other provider the marker is replaced
+# by a blank line and their automatic prefix caching does the rest.
+CACHE_BREAK = "\n\n<!-- drd:cache-break -->\n\n"
+EPHEMERAL = {'type': 'ephemeral'}
+MAX_BREAKPOINTS = 4
+
+_lock = threading.Lock()
+_stats = {'input_tokens': 0, 'cached_tokens': 0, 'cache_write_tokens': 0}
+
+
+def is_enabled() -> bool:
+    return os.getenv('DRAVID_PROMPT_CACHE', '1').lower() not in ('0', 'false', 'no')
+
+
+def strip_cache_break(query: str) -> str:
+    return query.replace(CACHE_BREAK, "\n\n")
+
+
+def claude_system(instruction_prompt: str) -> Union[str, List[Dict[str, Any]]]:
+    if not instruction_prompt or not is_enabled():
+        return instruction_prompt
+    return [{'type': 'text', 'text': instruction_prompt, 'cache_control': EPHEMERAL}]
+
+
+def claude_user_content(query: str) -> Union[str, List[Dict[str, Any]]]:
+    sections = query.split(CACHE_BREAK)
+    if len(sections) == 1 or not is_enabled():
+        return strip_cache_break(query)
+    blocks = [{'type': 'text', 'text': section + "\n\n"} for section in sections[:-1]]
+    # The system prompt takes one of the four breakpoints Anthropic allows
+    for block in blocks[-(MAX_BREAKPOINTS - 1):]:
+        block['cache_control'] = EPHEMERAL
+    blocks.append({'type': 'text', 'text': sections[-1]})
+    return blocks
+
+
+def _count(value) -> int:
+    return value if isinstance(value, int) else 0
+
+
+def record_claude_usage(usage: Dict[str, Any], count_output: bool = True) -> None:
+    # Anthropic reports cached tokens separately from the uncached input_tokens
+    if not isinstance(usage, dict):
+        return
+    cached = _count(usage.get('cache_read_input_tokens'))
+    written = _count(usage.get('cache_creation_input_tokens'))
+    output = _count(usage.get('output_tokens')) if count_output else 0
+    _add(_count(usage.get('input_tokens')) + cached + written, output, cached, written)
+
+
+def record_openai_usage(usage) -> None:
+    # OpenAI counts cached tokens as part of prompt_tokens
+    details = getattr(usage, 'prompt_tokens_details', None)
+    _add(_count(getattr(usage, 'prompt_tokens', None)),
+         _count(getattr(usage, 'completion_tokens', None)),
+         _count(getattr(details, 'cached_tokens', None)), 0)
+
+
+def _add(input_tokens: int, output_tokens: int, cached_tokens: int, cache_write_tokens: int) -> None:
+    with _lock:
+        _stats['input_tokens'] += input_tokens
+        _stats['cached_tokens'] += cached_tokens
+        _stats['cache_write_tokens'] += cache_write_tokens
+    telemetry.add_usage(input_tokens, output_tokens,
+                        cached_tokens, cache_write_tokens)
+
+
+def get_stats() -> dict:
+    with _lock:
+        return dict(_stats)
+
+
+def reset_stats() -> None:
+    with _lock:
+        for stat in _stats:
+            _stats[stat] = 0
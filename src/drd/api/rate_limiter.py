@@ -0,0 +1,240 @@
+import os
+import re
+import time
+import asyncio
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Mapping, Optional
+
+DEFAULT_REQUESTS_PER_MINUTE = 100
+MAX_BACKOFF = 60  # seconds
+RATE_LIMIT_RETRIES = 3
+CHARS_PER_TOKEN = 4
+
+REQUEST_LIMIT_HEADERS = ('anthropic-ratelimit-requests-limit',
+                         'x-ratelimit-limit-requests')
+REQUEST_REMAINING_HEADERS = ('anthropic-ratelimit-requests-remaining',
+                             'x-ratelimit-remaining-requests')
+REQUEST_RESET_HEADERS = ('anthropic-ratelimit-requests-reset',
+                         'x-ratelimit-reset-requests')
+TOKEN_LIMIT_HEADERS = ('anthropic-ratelimit-tokens-limit',
+                       'anthropic-ratelimit-input-tokens-limit',
+                       'x-ratelimit-limit-tokens')
+TOKEN_REMAINING_HEADERS = ('anthropic-ratelimit-tokens-remaining',
+                           'anthropic-ratelimit-input-tokens-remaining',
+                           'x-ratelimit-remaining-tokens')
+TOKEN_RESET_HEADERS = ('anthropic-ratelimit-tokens-reset',
+                       'anthropic-ratelimit-input-tokens-reset',
+                       'x-ratelimit-reset-tokens')
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+
+
+def _header(headers: Mapping[str, Any], names) -> Optional[str]:
+    for name in names:
+        try:
+            value = headers.get(name)
+        except Exception:
+            return None
+        if isinstance(value, str) and value:
+            return value
+    return None
+
+
+def _parse_number(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_reset(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    # Anthropic sends an RFC 3339 timestamp, OpenAI a duration such as "6m0s"
+    # or "20ms", and retry-after may be plain seconds or an HTTP date.
+    if value is None:
+        return None
+    value = value.strip()
+    now = time.time() if now is None else now
+
+    seconds = _parse_number(value)
+    if seconds is not None:
+        return max(seconds, 0.0)
+
+    parts = _DURATION_PART.findall(value)
+    if parts and ''.join(n + u for n, u in parts) == value:
+        return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+
+    for parse in (lambda v: datetime.fromisoformat(v.replace('Z', '+00:00')), parsedate_to_datetime):
+        try:
+            reset_at = parse(value)
+        except (TypeError, ValueError):
+            continue
+        if reset_at.tzinfo is None:
+            reset_at = reset_at.replace(tzinfo=timezone.utc)
+        return max(reset_at.timestamp() - now, 0.0)
+    return None
+
+
+def get_retry_after(headers: Mapping[str, Any]) -> Optional[float]:
+    retry_after_ms = _parse_number(_header(headers, ('retry-after-ms',)))
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000
+    return parse_reset(_header(headers, ('retry-after',)))
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _content_texts(content) -> List[str]:
+    if isinstance(content, str):
+        return [content]
+    if isinstance(content, list):
+        return [part.get('text', '') for part in content if isinstance(part, dict)]
+    return []
+
+
+def estimate_request_tokens(data: Dict[str, Any]) -> int:
+    texts = _content_texts(data.get('system'))
+    for message in data.get('messages', []):
+        texts.extend(_content_texts(message.get('content')))
+    return estimate_tokens(''.join(texts))
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / 60
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level +
+                         (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        # Take the amount now and let the level go negative; the caller waits
+        # until the debt has been refilled. This keeps reservations in order.
+        self.refill(now)
+        self.level -= amount
+        if self.level >= 0:
+            return 0.0
+        return -self.level / self.rate
+
+    def set_capacity(self, per_minute: float, now: float) -> None:
+        self.refill(now)
+        self.capacity = float(per_minute)
+        self.level = min(self.level, self.capacity)
+
+    def cap_level(self, remaining: float, now: float) -> None:
+        self.refill(now)
+        self.level = min(self.level, remaining)
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, requests_per_minute: float, tokens_per_minute: Optional[float] = None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(
+            tokens_per_minute) if tokens_per_minute else None
+        self.blocked_until = 0.0
+        self.consecutive_limited = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int = 0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            delay = max(self.blocked_until - now, 0.0)
+            delay = max(delay, self.requests.reserve(1, now))
+            if self.tokens is not None and tokens:
+                delay = max(delay, self.tokens.reserve(tokens, now))
+            return delay
+
+    def acquire(self, tokens: int = 0) -> None:
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, tokens: int = 0) -> None:
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _apply_headers(self, headers: Mapping[str, Any], now: float) -> None:
+        request_limit = _parse_number(_header(headers, REQUEST_LIMIT_HEADERS))
+        if request_limit:
+            self.requests.set_capacity(request_limit, now)
+        token_limit = _parse_number(_header(headers, TOKEN_LIMIT_HEADERS))
+        if token_limit:
+            if self.tokens is None:
+                self.tokens = TokenBucket(token_limit)
+            else:
+                self.tokens.set_capacity(token_limit, now)
+
+        for bucket, remaining_headers, reset_headers in (
+                (self.requests, REQUEST_REMAINING_HEADERS, REQUEST_RESET_HEADERS),
+                (self.tokens, TOKEN_REMAINING_HEADERS, TOKEN_RESET_HEADERS)):
+            remaining = _parse_number(_header(headers, remaining_headers))
+            if bucket is None or remaining is None:
+                continue
+            # The provider's view of the window is authoritative
+            bucket.cap_level(remaining, now)
+            if remaining <= 0:
+                reset = parse_reset(_header(headers, reset_headers))
+                if reset:
+                    self.blocked_until = max(self.blocked_until, now + reset)
+
+    def update_from_headers(self, headers: Mapping[str, Any]) -> None:
+        with self._lock:
+            self.consecutive_limited = 0
+            self._apply_headers(headers, time.monotonic())
+
+    def record_rate_limited(self, headers: Mapping[str, Any]) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.consecutive_limited += 1
+            self._apply_headers(headers, now)
+            delay = get_retry_after(headers)
+            if delay is None:
+                delay = min(2 ** self.consecutive_limited, MAX_BACKOFF)
+            self.blocked_until = max(self.blocked_until, now + delay)
+            return delay
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _float_env(name: str, default: Optional[float]) -> Optional[float]:
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+def get_rate_limiter(provider: str) -> AdaptiveRateLimiter:
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(
+                _float_env('DRAVID_RATE_LIMIT_RPM',
+                           DEFAULT_REQUESTS_PER_MINUTE),
+                _float_env('DRAVID_RATE_LIMIT_TPM', None)
+            )
+            _limiters[provider] = limiter
+        return limiter
+
+
+def reset_rate_limiters() -> None:
+    with _limiters_lock:
+        _limiters.clear()
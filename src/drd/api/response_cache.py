@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Optional
+
+DEFAULT_TTL = 7 * 24 * 60 * 60  # seconds
+DEFAULT_MAX_SIZE_MB = 100
+
+_lock = threading.Lock()
+_enabled = True
+_stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+_size_estimate = None
+
+
+def get_cache_dir() -> str:
+    cache_dir = os.getenv('DRAVID_CACHE_DIR')
+    if cache_dir:
+        return cache_dir
+    base = os.getenv('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'dravid', 'responses')
+
+
+def get_ttl() -> float:
+    try:
+        return float(os.getenv('DRAVID_CACHE_TTL', DEFAULT_TTL))
+    except ValueError:
+        return DEFAULT_TTL
+
+
+def get_max_size() -> int:
+    try:
+        max_size_mb = float(
+            os.getenv('DRAVID_CACHE_MAX_SIZE_MB', DEFAULT_MAX_SIZE_MB))
+    except ValueError:
+        max_size_mb = DEFAULT_MAX_SIZE_MB
+    return int(max_size_mb * 1024 * 1024)
+
+
+def set_enabled(enabled: bool) -> None:
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled and os.getenv('DRAVID_NO_CACHE', '') == ''
+
+
+def make_key(provider: str, model: str, instruction_prompt: Optional[str], query: str) -> str:
+    digest = hashlib.sha256()
+    for part in (provider, model, instruction_prompt or "", query):
+        encoded = part.encode('utf-8')
+        # Length-prefix each part so ("ab", "c") and ("a", "bc") never collide
+        digest.update(str(len(encoded)).encode('ascii') + b':' + encoded)
+    return digest.hexdigest()
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(get_cache_dir(), key[:2], f"{key}.json")
+
+
+def _count(stat: str, amount: int = 1) -> None:
+    with _lock:
+        _stats[stat] += amount
+
+
+def get(key: str) -> Optional[str]:
+    path = _entry_path(key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        _count('misses')
+        return None
+
+    if time.time() - entry.get('created', 0) > get_ttl():
+        _remove(path)
+        _count('misses')
+        return None
+
+    _count('hits')
+    return entry.get('response')
+
+
+def put(key: str, response: str) -> None:
+    global _size_estimate
+    path = _entry_path(key)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'created': time.time(), 'response': response}, f)
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+    except OSError:
+        _remove(tmp_path)
+        return
+
+    _count('writes')
+    with _lock:
+        if _size_estimate is not None:
+            _size_estimate += size
+        needs_prune = _size_estimate is None or _size_estimate > get_max_size()
+    if needs_prune:
+        prune()
+
+
+def delete(key: str) -> None:
+    global _size_estimate
+    size = _remove(_entry_path(key))
+    with _lock:
+        if _size_estimate is not None:
+            _size_estimate -= size
+
+
+def _remove(path: str) -> int:
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except OSError:
+        return 0
+
+
+def _list_entries():
+    entries = []
+    for root, _, files in os.walk(get_cache_dir()):
+        for name in files:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def prune() -> None:
+    global _size_estimate
+    now = time.time()
+    ttl = get_ttl()
+    max_size = get_max_size()
+    evicted = 0
+    live = []
+    for mtime, size, path in _list_entries():
+        if now - mtime > ttl:
+            _remove(path)
+            evicted += 1
+        else:
+            live.append((mtime, size, path))
+
+    total = sum(size for _, size, _ in live)
+    # Drop oldest entries first until we are back under the size limit
+    for mtime, size, path in sorted(live):
+        if total <= max_size:
+            break
+        total -= size
+        _remove(path)
+        evicted += 1
+
+    with _lock:
+        _size_estimate = total
+        _stats['evictions'] += evicted
+
+
+def clear() -> None:
+    global _size_estimate
+    for _, _, path in _list_entries():
+        _remove(path)
+    with _lock:
+        _size_estimate = 0
+
+
+def get_stats() -> dict:
+    with _lock:
+        return dict(_stats)
+
+
+def reset_stats() -> None:
+    with _lock:
+        for stat in _stats:
+            _stats[stat] = 0
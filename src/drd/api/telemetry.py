@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+# Records kept in memory for the end-of-run summary
+MAX_RECORDS = 1000
+
+_phase = contextvars.ContextVar('drd_telemetry_phase', default=None)
+_call = contextvars.ContextVar('drd_telemetry_call', default=None)
+_lock = threading.Lock()
+_records = deque(maxlen=MAX_RECORDS)
+
+
+def get_telemetry_file() -> Optional[str]:
+    telemetry_file = os.getenv('DRAVID_TELEMETRY_FILE')
+    return os.path.expanduser(telemetry_file) if telemetry_file else None
+
+
+@contextmanager
+def phase(name: str):
+    # Labels every call made inside the block, e.g. "file_selection"
+    token = _phase.set(name)
+    try:
+        yield
+    finally:
+        _phase.reset(token)
+
+
+class CallRecord:
+    def __init__(self, operation: str, provider: str, model: Optional[str]):
+        self.started = time.perf_counter()
+        self.data: Dict[str, Any] = {
+            'timestamp': round(time.time(), 3),
+            'phase': _phase.get(),
+            'operation': operation,
+            'provider': provider,
+            'model': model,
+            'connect_ms': None,
+            'ttft_ms': None,
+            'total_ms': None,
+            'rounds': 0,
+            'retries': 0,
+            'input_tokens': 0,
+            'output_tokens': 0,
+            'cached_tokens': 0,
+            'cache_write_tokens': 0,
+            'response_cache_hit': False,
+            'error': None
+        }
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+    def mark_connected(self, at: Optional[float] = None) -> None:
+        # at is the perf_counter() time the response headers arrived, for
+        # callers that only get the response once the body is read too
+        if self.data['connect_ms'] is None:
+            self.data['connect_ms'] = self.elapsed_ms() if at is None else \
+                round((at - self.started) * 1000, 1)
+
+    def mark_first_token(self) -> None:
+        if self.data['ttft_ms'] is None:
+            self.data['ttft_ms'] = self.elapsed_ms()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.data['total_ms'] = self.elapsed_ms()
+        if error is not None:
+            self.data['error'] = type(error).__name__
+        record(self.data)
+
+
+@contextmanager
+def track_call(operation: str, provider: str, model: Optional[str] = None):
+    call = CallRecord(operation, provider, model)
+    token = _call.set(call)
+    try:
+        yield call
+    except Exception as e:
+        call.finish(e)
+        raise
+    else:
+        call.finish()
+    finally:
+        _call.reset(token)
+
+
+def current_call() -> Optional[CallRecord]:
+    return _call.get()
+
+
+# The hooks below are called from the provider modules and do nothing
+# outside of a tracked call.
+def mark_connected(at: Optional[float] = None) -> None:
+    call = _call.get()
+    if call is not None:
+        call.mark_connected(at)
+
+
+def add_round() -> None:
+    call = _call.get()
+    if call is not None:
+        call.data['rounds'] += 1
+
+
+def add_retry() -> None:
+    call = _call.get()
+    if call is not None:
+        call.data['retries'] += 1
+
+
+def add_usage(input_tokens: int = 0, output_tokens: int = 0, cached_tokens: int = 0, cache_write_tokens: int = 0) -> None:
+    call = _call.get()
+    if call is not None:
+        call.data['input_tokens'] += input_tokens
+        call.data['output_tokens'] += output_tokens
+        call.data['cached_tokens'] += cached_tokens
+        call.data['cache_write_tokens'] += cache_write_tokens
+
+
+def record(data: Dict[str, Any]) -> None:
+    telemetry_file = get_telemetry_file()
+    with _lock:
+        _records.append(dict(data))
+        if telemetry_file:
+            try:
+                with open(telemetry_file, 'a') as f:
+                    f.write(json.dumps(data) + "\n")
+            except OSError:
+                pass
+
+
+def get_records() -> List[Dict[str, Any]]:
+    with _lock:
+        return list(_records)
+
+
+def reset() -> None:
+    with _lock:
+        _records.clear()
+
+
+def summarize(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    phases: Dict[Any, Dict[str, Any]] = {}
+    for data in records:
+        totals = phases.setdefault(data.get('phase') or 'other', {
+            'phase': data.get('phase') or 'other', 'calls': 0, 'total_ms': 0.0,
+            'rounds': 0, 'retries': 0, 'input_tokens': 0, 'output_tokens': 0,
+            'cached_tokens': 0, 'response_cache_hits': 0})
+        totals['calls'] += 1
+        totals['total_ms'] += data.get('total_ms') or 0.0
+        for key in ('rounds', 'retries', 'input_tokens', 'output_tokens', 'cached_tokens'):
+            totals[key] += data.get(key) or 0
+        totals['response_cache_hits'] += 1 if data.get('response_cache_hit') else 0
+    return sorted(phases.values(), key=lambda totals: -totals['total_ms'])
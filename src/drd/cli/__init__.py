@@ -1,4 +1,10 @@
-from .main import dravid_cli
-from .monitor import run_dev_server_with_monitoring
+from ..utils.lazy import lazy_exports
+
+_EXPORTS = {
+    'dravid_cli': '.main',
+    'run_dev_server_with_monitoring': '.monitor',
+}
 
 __all__ = ['dravid_cli', 'run_dev_server_with_monitoring']
+
+__getattr__ = lazy_exports(__name__, _EXPORTS)
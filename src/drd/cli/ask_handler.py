@@ -23,7 +23,8 @@ def suggest_file_alternative(file_path, project_metadata):
 def handle_ask_command(ask, file, debug):
     context = ""
     metadata_manager = ProjectMetadataManager(os.getcwd())
-    project_metadata = metadata_manager.get_project_context()
+    project_metadata = metadata_manager.get_project_context(
+        ' '.join([ask or ''] + list(file)))
 
     for file_path in file:
         content = read_file_content(file_path)
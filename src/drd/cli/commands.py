@@ -2,15 +2,10 @@ import click
 import sys
 import ast
 import os
-import asyncio
-from dotenv import load_dotenv
-from .query import execute_dravid_command
-from ..prompts.instructions import get_instruction_prompt
-from .monitor import run_dev_server_with_monitoring
-from ..metadata.initializer import initialize_project_metadata
-from ..metadata.updater import update_metadata_with_dravid
-from ..utils.utils import print_error
-from .ask_handler import handle_ask_command
+from ..utils.utils import print_error, print_info
+
+# Subcommands import their own subsystems when they run, so startup and
+# --version do not pay for provider SDKs, metadata or the monitor
 
 VERSION = "0.13.9"  # Update this as you release new versions
 
@@ -26,32 +21,67 @@ def parse_multiline_input(input_string):
     return input_string  # Return the original string if parsing fails
 
 
-def handle_query_command(query, image, debug):
+def handle_query_command(query, image, debug, pipeline=False, review=False):
     if not query and not sys.stdin.isatty():
         query = sys.stdin.read().strip()
     if not query:
         click.echo("Please provide a query using the --do option.")
         return
 
+    from .query import execute_dravid_command
+    from ..prompts.instructions import get_instruction_prompt
+
     query = parse_multiline_input(query)
     instruction_prompt = get_instruction_prompt()
-    execute_dravid_command(query, image, debug, instruction_prompt, warn=True)
+    execute_dravid_command(query, image, debug, instruction_prompt,
+                           warn=True, pipeline=pipeline or None, review=review or None)
+
 
+def print_cache_stats():
+    from ..api import response_cache, prompt_cache
+    stats = response_cache.get_stats()
+    if stats['hits'] or stats['misses']:
+        print_info(
+            f"LLM response cache: {stats['hits']} hit(s), {stats['misses']} miss(es)")
+    usage = prompt_cache.get_stats()
+    if usage['cached_tokens'] or usage['cache_write_tokens']:
+        print_info(
+            f"Prompt cache: {usage['cached_tokens']} of {usage['input_tokens']} input tokens read from cache, "
+            f"{usage['cache_write_tokens']} written")
 
-def dravid_cli_logic(command, do, image, debug, meta_add, meta_init, ask, file, version):
+
+def dravid_cli_logic(command, do, image, debug, meta_add, meta_init, ask, file, version, no_cache=False, meta_refresh=False, pipeline=False, review=False):
     if version:
         click.echo(f"Dravid CLI version {VERSION}")
         return
 
+    if no_cache:
+        from ..api import response_cache
+        response_cache.set_enabled(False)
+
     if meta_add:
+        from ..metadata.updater import update_metadata_with_dravid
         update_metadata_with_dravid(meta_add, os.getcwd())
+        print_cache_stats()
     elif meta_init:
+        import asyncio
+        from ..metadata.initializer import initialize_project_metadata
         asyncio.run(initialize_project_metadata(os.getcwd()))
+        print_cache_stats()
+    elif meta_refresh:
+        import asyncio
+        from ..metadata.refresher import refresh_project_metadata
+        asyncio.run(refresh_project_metadata(os.getcwd()))
+        print_cache_stats()
     elif ask or file:
+        from .ask_handler import handle_ask_command
         handle_ask_command(ask, file, debug)
     elif do is not None:
-        handle_query_command(do, image, debug)
+        handle_query_command(do, image, debug, pipeline, review)
+        if debug:
+            print_cache_stats()
     elif command:
+        from .monitor import run_dev_server_with_monitoring
         run_dev_server_with_monitoring(command)
     else:
         click.echo("Please provide a command to run or use --do for queries.")
@@ -1,14 +1,10 @@
 import click
-from dotenv import load_dotenv
 from colorama import init
 from .commands import dravid_cli_logic
 
 # Initialize colorama
 init(autoreset=True)
 
-# Load environment variables
-load_dotenv()
-
 
 @click.command()
 @click.argument('command', required=False)
@@ -17,12 +13,20 @@ load_dotenv()
 @click.option('--debug', is_flag=True, help='Print more information on how this coding assistant executes your instruction')
 @click.option('--meta-add', '--a', help='Update metadata based on the provided description')
 @click.option('--meta-init', '--i', is_flag=True, help='Initialize project metadata')
+@click.option('--meta-refresh', is_flag=True, help='Re-analyze only new or changed files and drop deleted ones from project metadata')
 @click.option('--ask', help='Ask an open-ended question and get a streamed response from Claude')
 @click.option('--file', type=click.Path(), multiple=True, help='Read content from specified file(s) and include in the context')
 @click.option('--version', is_flag=True, help='Show the version of the tool')
-def dravid_cli(command, do, image, debug, meta_add, meta_init, ask, file, version):
+@click.option('--no-cache', is_flag=True, help='Bypass the on-disk LLM response cache')
+@click.option('--pipeline', is_flag=True, help='Run each step of the plan as soon as it has streamed in instead of waiting for the full response')
+@click.option('--review', is_flag=True, help='Show the whole plan with its diffs and approve it once, or choose which steps to run')
+def dravid_cli(command, do, image, debug, meta_add, meta_init, meta_refresh, ask, file, version, no_cache, pipeline, review):
+    if not version:
+        # Load environment variables; not at import, shell completion never needs them
+        from dotenv import load_dotenv
+        load_dotenv()
     dravid_cli_logic(command, do, image, debug, meta_add,
-                     meta_init, ask, file, version)
+                     meta_init, ask, file, version, no_cache, meta_refresh, pipeline, review)
 
 
 if __name__ == '__main__':
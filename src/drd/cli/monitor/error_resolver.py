@@ -17,12 +17,13 @@ def monitoring_handle_error_with_dravid(error, line, monitor):
     error_trace = ''.join(traceback.format_exception(
         type(error), error, error.__traceback__))
 
-    project_context = monitor.metadata_manager.get_project_context()
-
     print_info("Identifying relevant files for error context...")
     error_details = f"error_msg: {error_message}, error_type: {error_type}, error_trace: {error_trace}"
+    project_context = monitor.metadata_manager.get_project_context(
+        f"{error_details}\n{line}")
     files_to_check = run_with_loader(
-        lambda: get_files_to_modify(error_details, project_context),
+        lambda: get_files_to_modify(
+            error_details, project_context, monitor.metadata_manager),
         "Analyzing project files"
     )
 
@@ -69,6 +70,7 @@ def monitoring_handle_error_with_dravid(error, line, monitor):
         elif cmd['type'] == 'file':
             executor.perform_file_operation(
                 cmd['operation'], cmd['filename'], cmd.get('content'))
+    executor.close()
 
     print_success("Fix applied.")
 
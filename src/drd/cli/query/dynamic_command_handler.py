@@ -1,52 +1,153 @@
+import os
+import asyncio
 import traceback
 import click
+from contextlib import nullcontext
 from ...api.main import call_dravid_api
 import xml.etree.ElementTree as ET
 from ...utils import print_error, print_success, print_info, print_step, print_debug
 from ...metadata.common_utils import generate_file_description
 from ...prompts.error_resolution_prompt import get_error_resolution_prompt
+from .step_planner import plan_steps, run_steps
+from . import plan_review
 
 
-def execute_commands(commands, executor, metadata_manager, is_fix=False, debug=False):
-    all_outputs = []
-    total_steps = len(commands)
+def get_parallel_steps():
+    try:
+        return max(0, int(os.getenv('DRAVID_PARALLEL_STEPS', '0')))
+    except ValueError:
+        return 0
 
-    for i, cmd in enumerate(commands, 1):
-        step_description = "fix" if is_fix else "command"
 
-        if cmd['type'] == 'explanation':
-            all_outputs.append(
-                f"Step {i}/{total_steps}: Explanation - {cmd['content']}")
-        else:
-            try:
-                if cmd['type'] == 'shell':
-                    output = handle_shell_command(cmd, executor)
-                elif cmd['type'] == 'file':
-                    output = handle_file_operation(
-                        cmd, executor, metadata_manager)
-                elif cmd['type'] == 'metadata':
-                    output = handle_metadata_operation(cmd, metadata_manager)
-                elif cmd['type'] == 'requires_restart':
-                    output = 'requires restart if the server is running'
-                else:
-                    raise ValueError(f"Unknown command type: {cmd['type']}")
+def execute_commands(commands, executor, metadata_manager, is_fix=False, debug=False, review=None):
+    # commands may also be a generator of steps that are still streaming in,
+    # in which case the total is not known up front and there is no review.
+    max_workers = get_parallel_steps()
+    if max_workers > 1 and hasattr(commands, '__len__') and len(commands) > 1:
+        return execute_commands_in_parallel(
+            commands, executor, metadata_manager, max_workers, is_fix=is_fix, debug=debug)
 
-                if isinstance(output, str) and output.startswith("Skipping"):
-                    print_info(f"Step {i}/{total_steps}: {output}")
-                    all_outputs.append(f"Step {i}/{total_steps}: {output}")
+    all_outputs = []
+    total_steps = len(commands) if hasattr(commands, '__len__') else None
+    i = 0
+
+    if review is None:
+        review = plan_review.is_enabled()
+    approved = None
+    if review and total_steps is not None:
+        pending = [index for index, cmd in enumerate(commands) if not cmd.get('completed')]
+        approved = plan_review.review_plan(commands, pending, executor)
+        if approved is None:
+            return cancel_plan(total_steps)
+
+    # drd.json is exported once, after the last step
+    with metadata_manager.batch(), (executor.approved() if approved is not None else nullcontext()):
+        for i, cmd in enumerate(commands, 1):
+            step_description = "fix" if is_fix else "command"
+            step = f"{i}/{total_steps}" if total_steps is not None else str(i)
+
+            if cmd.get('completed'):
+                all_outputs.append(f"Step {step}: Already completed")
+                continue
+            try:
+                if approved is not None and i - 1 not in approved:
+                    output = "Skipping this step"
                 else:
-                    all_outputs.append(
-                        f"Step {i}/{total_steps}: {cmd['type'].capitalize()} command - {cmd.get('command', '')} {cmd.get('operation', '')}\nOutput: {output}")
-
+                    output = run_step(cmd, executor, metadata_manager)
+                all_outputs.append(format_step_output(step, cmd, output))
             except Exception as e:
-                error_message = f"Step {i}/{total_steps}: Error executing {step_description}: {cmd}\nError details: {str(e)}"
+                error_message = f"Step {step}: Error executing {step_description}: {cmd}\nError details: {str(e)}"
                 print_error(error_message)
                 all_outputs.append(error_message)
                 return False, i, str(e), "\n".join(all_outputs)
 
-        if debug:
-            print_debug(f"Completed step {i}/{total_steps}")
+            if debug:
+                print_debug(f"Completed step {step}")
+
+    return True, i, None, "\n".join(all_outputs)
+
+
+def run_step(cmd, executor, metadata_manager, update_metadata=None):
+    if cmd['type'] == 'explanation':
+        return cmd['content']
+    if cmd['type'] == 'shell':
+        return handle_shell_command(cmd, executor)
+    if cmd['type'] == 'file':
+        return handle_file_operation(cmd, executor, metadata_manager, update_metadata)
+    if cmd['type'] == 'metadata':
+        return handle_metadata_operation(cmd, metadata_manager)
+    if cmd['type'] == 'requires_restart':
+        return 'requires restart if the server is running'
+    raise ValueError(f"Unknown command type: {cmd['type']}")
 
+
+def format_step_output(step, cmd, output):
+    if cmd['type'] == 'explanation':
+        return f"Step {step}: Explanation - {cmd['content']}"
+    if isinstance(output, str) and output.startswith("Skipping"):
+        print_info(f"Step {step}: {output}")
+        return f"Step {step}: {output}"
+    return f"Step {step}: {cmd['type'].capitalize()} command - {cmd.get('command', '')} {cmd.get('operation', '')}\nOutput: {output}"
+
+
+def cancel_plan(total_steps):
+    print_info("Plan cancelled by user.")
+    return True, total_steps, None, "\n".join(
+        f"Step {i}/{total_steps}: Skipping this step" for i in range(1, total_steps + 1))
+
+
+def execute_commands_in_parallel(commands, executor, metadata_manager, max_workers, is_fix=False, debug=False):
+    # Independent steps run side by side after one review of the whole
+    # plan. Results, errors and metadata are handled in the original order.
+    total_steps = len(commands)
+    step_description = "fix" if is_fix else "command"
+    pending = [i for i, cmd in enumerate(commands) if not cmd.get('completed')]
+    dependencies, barriers = plan_steps([commands[i] for i in pending], executor.current_dir)
+
+    approved = plan_review.review_plan(
+        commands, pending, executor, dependencies, barriers, max_workers)
+    if approved is None:
+        return cancel_plan(total_steps)
+
+    analyzed = {}
+
+    def run(position):
+        if pending[position] not in approved:
+            return "Skipping this step"
+        cmd = commands[pending[position]]
+        file_infos = analyzed.setdefault(position, [])
+
+        def analyze(cmd, metadata_manager, executor):
+            # Only the LLM analysis runs here; it is recorded on this thread later
+            file_infos.append(asyncio.run(metadata_manager.analyze_file(cmd['filename'])))
+        return run_step(cmd, executor, metadata_manager, update_metadata=analyze)
+
+    with metadata_manager.batch(), executor.approved():
+        # Barriers (cd, builds, metadata updates) run alone, on this thread
+        results, errors = run_steps(dependencies, run, max_workers, inline=barriers)
+
+        all_outputs = []
+        failed_step = failure = None
+        for position, i in enumerate(pending):
+            cmd = commands[i]
+            step = f"{i + 1}/{total_steps}"
+            if position in results:
+                for file_info in analyzed.get(position, []):
+                    record_file_metadata(cmd, file_info, metadata_manager)
+                if i in approved:
+                    cmd['completed'] = True
+                all_outputs.append(format_step_output(step, cmd, results[position]))
+                if debug:
+                    print_debug(f"Completed step {step}")
+            elif position in errors and failed_step is None:
+                failed_step = i + 1
+                failure = errors[position]
+                error_message = f"Step {step}: Error executing {step_description}: {cmd}\nError details: {str(failure)}"
+                print_error(error_message)
+                all_outputs.append(error_message)
+
+    if failed_step is not None:
+        return False, failed_step, str(failure), "\n".join(all_outputs)
     return True, total_steps, None, "\n".join(all_outputs)
 
 
@@ -63,7 +164,7 @@ def handle_shell_command(cmd, executor):
     return output
 
 
-def handle_file_operation(cmd, executor, metadata_manager):
+def handle_file_operation(cmd, executor, metadata_manager, update_metadata=None):
     operation_performed = executor.perform_file_operation(
         cmd['operation'],
         cmd['filename'],
@@ -77,7 +178,7 @@ def handle_file_operation(cmd, executor, metadata_manager):
         print_success(
             f"Successfully performed {cmd['operation']} on file: {cmd['filename']}")
         if cmd['operation'] in ['CREATE', 'UPDATE']:
-            update_file_metadata(cmd, metadata_manager, executor)
+            (update_metadata or update_file_metadata)(cmd, metadata_manager, executor)
         return "Success"
     else:
         raise Exception(
@@ -97,7 +198,11 @@ def handle_metadata_operation(cmd, metadata_manager):
 
 
 def update_file_metadata(cmd, metadata_manager, executor):
-    file_info = metadata_manager.analyze_file(cmd['filename'])
+    file_info = asyncio.run(metadata_manager.analyze_file(cmd['filename']))
+    record_file_metadata(cmd, file_info, metadata_manager)
+
+
+def record_file_metadata(cmd, file_info, metadata_manager):
     if file_info:
         metadata_manager.update_file_metadata(
             file_info['path'],
@@ -163,7 +268,8 @@ def handle_error_with_dravid(error, cmd, executor, metadata_manager, depth=0, pr
     error_trace = ''.join(traceback.format_exception(
         type(error), error, error.__traceback__))
 
-    project_context = metadata_manager.get_project_context()
+    project_context = metadata_manager.get_project_context(
+        f"{cmd}\n{error_message}\n{error_trace}")
     error_query = get_error_resolution_prompt(
         previous_context, cmd, error_type, error_message, error_trace, project_context
     )
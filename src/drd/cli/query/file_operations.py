@@ -6,7 +6,17 @@ from ...prompts.file_operations import get_files_to_modify_prompt, find_file_pro
 from ...utils.parser import parse_file_list_response,  parse_find_file_response
 
 
-def get_files_to_modify(query, project_context):
+def use_llm_file_selection_fallback():
+    return os.getenv('DRAVID_FILE_SELECTION_LLM_FALLBACK', '1').lower() not in ('0', 'false', 'no')
+
+
+def get_files_to_modify(query, project_context, metadata_manager=None):
+    if metadata_manager is None:
+        metadata_manager = ProjectMetadataManager(os.getcwd())
+    files = metadata_manager.get_file_index().select_files(query)
+    if files or not use_llm_file_selection_fallback():
+        return files
+
     file_query = get_files_to_modify_prompt(query, project_context)
     response = call_dravid_api_with_pagination(
         file_query, include_context=True)
@@ -21,7 +31,7 @@ def find_file_with_dravid(filename, project_context, max_retries=2, current_retr
         return None
 
     metadata_manager = ProjectMetadataManager(os.getcwd())
-    project_metadata = metadata_manager.get_project_context()
+    project_metadata = metadata_manager.get_project_context(filename)
     query = find_file_prompt(filename, project_context, project_metadata)
 
     response = call_dravid_api_with_pagination(query, include_context=True)
@@ -1,38 +1,59 @@
+import os
 import click
-from ...api.main import stream_dravid_api, call_dravid_vision_api
+from ...api.main import stream_dravid_api, stream_dravid_commands, call_dravid_vision_api
 from ...utils.step_executor import Executor
 from ...metadata.project_metadata import ProjectMetadataManager
 from .dynamic_command_handler import handle_error_with_dravid, execute_commands
 from ...utils import print_error, print_success, print_info, print_debug, print_warning, print_step, print_header, run_with_loader
 from ...utils.file_utils import get_file_content, fetch_project_guidelines, is_directory_empty
+from ...utils.pretty_print_stream import print_command
 from .file_operations import get_files_to_modify
-from ...utils.parser import parse_dravid_response
+from . import plan_review
+from ...api.prompt_cache import CACHE_BREAK
+from ...api import telemetry
 
 
-def execute_dravid_command(query, image_path, debug, instruction_prompt, warn=None, reference_files=None):
+def use_pipeline():
+    return os.getenv('DRAVID_PIPELINE', '').lower() in ('1', 'true', 'yes')
+
+
+def execute_dravid_command(query, image_path, debug, instruction_prompt, warn=None, reference_files=None, pipeline=None, review=None):
     print_header("Starting Dravid AI ...")
+    if review is None:
+        review = plan_review.is_enabled()
+    if pipeline is None:
+        pipeline = use_pipeline()
+    # Reviewing needs the whole plan before the first step runs
+    pipeline = pipeline and not review
 
     if warn:
         print_warning("Please ensure you review and commit(git) changes")
         print("\n")
 
+    telemetry.reset()
     executor = Executor()
 
     metadata_manager = ProjectMetadataManager(executor.current_dir)
 
     try:
-        project_context = metadata_manager.get_project_context()
+        project_context = metadata_manager.get_project_context(query)
 
         files_info = None
         if project_context:
             print_info("🔍 Identifying related files to the query...", indent=2)
-            print_info("(1 LLM call)", indent=4)
-            files_info = run_with_loader(
-                lambda: get_files_to_modify(query, project_context),
-                "Analyzing project files"
-            )
-
-            if debug:
+            print_info("(local index, 1 LLM call only if nothing matches)", indent=4)
+            with telemetry.phase('file_selection'):
+                files_info = run_with_loader(
+                    lambda: get_files_to_modify(
+                        query, project_context, metadata_manager),
+                    "Analyzing project files"
+                )
+
+            if debug and isinstance(files_info, list):
+                print_info("Related files:", indent=4)
+                for file in files_info:
+                    print_info(f"- {file}", indent=6)
+            elif debug and files_info:
                 print_info("Files and dependencies analysis:", indent=4)
                 if files_info['main_file']:
                     print_info(
@@ -53,22 +74,32 @@ def execute_dravid_command(query, image_path, debug, instruction_prompt, warn=No
             query, executor, project_context, files_info, reference_files)
 
         print_info("💡 Preparing to send query to LLM...", indent=2)
-        if image_path:
-            print_info(f"Processing image: {image_path}", indent=4)
-            print_info("(1 LLM call)", indent=4)
-            commands = run_with_loader(
-                lambda: call_dravid_vision_api(
-                    full_query, image_path, include_context=True, instruction_prompt=instruction_prompt),
-                "Analyzing image and generating response"
-            )
-        else:
-            print_info("💬 Streaming response from LLM...", indent=2)
-            print_info("(1 LLM call)", indent=4)
-            xml_result = stream_dravid_api(
-                full_query, include_context=True, instruction_prompt=instruction_prompt, print_chunk=False)
-            commands = parse_dravid_response(xml_result)
-            if debug:
-                print_debug(f"Received {len(commands)} new command(s)")
+        xml_result = None
+        result = None
+        with telemetry.phase('generation'):
+            if image_path:
+                print_info(f"Processing image: {image_path}", indent=4)
+                print_info("(1 LLM call)", indent=4)
+                commands = run_with_loader(
+                    lambda: call_dravid_vision_api(
+                        full_query, image_path, include_context=True, instruction_prompt=instruction_prompt),
+                    "Analyzing image and generating response"
+                )
+            elif pipeline:
+                print_info(
+                    "💬 Streaming response from LLM, running each step as it arrives...", indent=2)
+                print_info("(1 LLM call)", indent=4)
+                commands = []
+                result = execute_pipelined_commands(
+                    full_query, instruction_prompt, commands, executor, metadata_manager, debug=debug)
+            else:
+                print_info("💬 Streaming response from LLM...", indent=2)
+                print_info("(1 LLM call)", indent=4)
+                commands = []
+                xml_result = stream_dravid_api(
+                    full_query, include_context=True, instruction_prompt=instruction_prompt, print_chunk=False, on_command=commands.append)
+                if debug:
+                    print_debug(f"Received {len(commands)} new command(s)")
 
         if not commands:
             print_error(
@@ -76,20 +107,25 @@ def execute_dravid_command(query, image_path, debug, instruction_prompt, warn=No
             print_debug("Actual result: " + str(xml_result))
             return
 
-        success, step_completed, error_message, all_outputs = execute_commands(
-            commands, executor, metadata_manager, debug=debug)
+        if result is None:
+            result = execute_commands(
+                commands, executor, metadata_manager, debug=debug, review=review)
+        success, step_completed, error_message, all_outputs = result
 
         if not success:
             print_error(
                 f"Failed to execute command at step {step_completed}.")
             print_error(f"Error message: {error_message}")
             print_info("Attempting to fix the error...")
-            if handle_error_with_dravid(Exception(error_message), commands[step_completed-1], executor, metadata_manager, debug=debug):
+            with telemetry.phase('error_fixing'):
+                fixed = handle_error_with_dravid(
+                    Exception(error_message), commands[step_completed-1], executor, metadata_manager, debug=debug)
+            if fixed:
                 print_info(
                     "Fix applied successfully. Continuing with the remaining commands.", indent=2)
                 remaining_commands = commands[step_completed:]
                 success, _, error_message, additional_outputs = execute_commands(
-                    remaining_commands, executor, metadata_manager, debug=debug)
+                    remaining_commands, executor, metadata_manager, debug=debug, review=review)
                 all_outputs += "\n" + additional_outputs
             else:
                 print_error(
@@ -104,24 +140,76 @@ def execute_dravid_command(query, image_path, debug, instruction_prompt, warn=No
         if debug:
             import traceback
             traceback.print_exc()
+    finally:
+        executor.close()
+        print_telemetry_summary()
+
+
+def print_telemetry_summary():
+    phases = telemetry.summarize(telemetry.get_records())
+    if not phases:
+        return
+    print_info("LLM calls by phase:", indent=2)
+    for totals in phases:
+        line = (f"{totals['phase']}: {totals['calls']} call(s), {totals['total_ms'] / 1000:.1f}s, "
+                f"{totals['input_tokens']} in / {totals['output_tokens']} out tokens")
+        if totals['cached_tokens']:
+            line += f", {totals['cached_tokens']} cached"
+        if totals['retries']:
+            line += f", {totals['retries']} retries"
+        if totals['response_cache_hits']:
+            line += f", {totals['response_cache_hits']} response cache hit(s)"
+        print_info(line, indent=4)
+
+
+def execute_pipelined_commands(full_query, instruction_prompt, commands, executor, metadata_manager, debug=False):
+    command_stream = stream_dravid_commands(
+        full_query, include_context=True, instruction_prompt=instruction_prompt)
+
+    def received():
+        for command in command_stream:
+            commands.append(command)
+            print_command(command)
+            yield command
+
+    steps = received()
+    try:
+        try:
+            result = execute_commands(steps, executor, metadata_manager, debug=debug)
+        finally:
+            # If a step failed, stop running the ones after it
+            steps.close()
+        if not result[0]:
+            # A fix continues with the rest of the plan, so it is still read in full
+            for command in command_stream:
+                commands.append(command)
+                print_command(command)
+        return result
+    finally:
+        command_stream.close()
 
 
 def construct_full_query(query, executor, project_context, files_info=None, reference_files=None):
+    # Sections run from the most to the least stable and are separated by
+    # CACHE_BREAK, so providers can reuse the cached prefix on repeated runs.
+    # The user query always comes last.
+    sections = []
     is_empty = is_directory_empty(executor.current_dir)
     if is_empty:
         print_info(
             "Current directory is empty. Will create a new project.", indent=2)
-        full_query = f"Current directory is empty.\n\nUser query: {query}"
+        status = "Current directory is empty."
     elif not project_context:
         print_info(
             "No current project context found, but directory is not empty.", indent=2)
-        full_query = f"Current directory is not empty, but no project context is available.\n\nUser query: {query}"
+        status = "Current directory is not empty, but no project context is available."
     else:
         print_info(
             "Constructing query with project context and file information.", indent=2)
         project_guidelines = fetch_project_guidelines(executor.current_dir)
-        full_query = f"{project_context}\n\n"
-        full_query += f"Project Guidelines:\n{project_guidelines}\n\n"
+        sections.append(
+            f"Project Guidelines:\n{project_guidelines}\n\n{project_context}")
+        file_sections = []
         if files_info and isinstance(files_info, dict):
             if 'file_contents_to_load' in files_info:
                 file_contents = {}
@@ -132,19 +220,19 @@ def construct_full_query(query, executor, project_context, files_info=None, refe
                         print_info(f"  - Read content of {file}", indent=4)
                 file_context = "\n".join(
                     [f"Current content of {file}:\n{content}" for file, content in file_contents.items()])
-                full_query += f"Current file contents:\n{file_context}\n\n"
+                file_sections.append(f"Current file contents:\n{file_context}")
             if 'dependencies' in files_info:
                 dependency_context = "\n".join(
                     [f"Dependency {dep['file']} exports: {', '.join(dep['imports'])}" for dep in files_info['dependencies']])
-                full_query += f"Dependencies:\n{dependency_context}\n\n"
+                file_sections.append(f"Dependencies:\n{dependency_context}")
             if 'new_files' in files_info:
                 new_files_context = "\n".join(
                     [f"New file to create: {new_file['file']}" for new_file in files_info['new_files']])
-                full_query += f"New files to create:\n{new_files_context}\n\n"
+                file_sections.append(f"New files to create:\n{new_files_context}")
             if 'main_file' in files_info:
-                full_query += f"Main file to modify: {files_info['main_file']}\n\n"
-        full_query += "Current directory is not empty.\n\n"
-        full_query += f"User query: {query}"
+                file_sections.append(f"Main file to modify: {files_info['main_file']}")
+        sections.append("\n\n".join(file_sections))
+        status = "Current directory is not empty."
     if reference_files:
         print_info("📄 Reading reference file contents...", indent=2)
         reference_contents = {}
@@ -155,5 +243,6 @@ def construct_full_query(query, executor, project_context, files_info=None, refe
                 print_info(f"  - Read content of {file}", indent=4)
         reference_context = "\n\n".join(
             [f"Reference file {file}:\n{content}" for file, content in reference_contents.items()])
-        full_query += f"\n\nReference files:\n{reference_context}"
-    return full_query
+        sections.append(f"Reference files:\n{reference_context}")
+    sections.append(f"{status}\n\nUser query: {query}")
+    return CACHE_BREAK.join(section for section in sections if section)
@@ -0,0 +1,131 @@
+import os
+import click
+from typing import Any, Dict, List, Optional, Set
+from ...utils import print_info, print_warning
+from ...utils.diff import preview_file_changes
+from ...utils.apply_file_changes import apply_changes
+from .step_planner import describe_step
+
+Step = Dict[str, Any]
+
+# Steps that change nothing and so are never asked about
+SILENT_STEPS = ('explanation', 'requires_restart')
+
+
+def is_enabled() -> bool:
+    return os.getenv('DRAVID_PLAN_REVIEW', '').lower() in ('1', 'true', 'yes')
+
+
+def read_file(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def preview_step(cmd: Step, cwd: str, planned: Dict[str, Optional[str]]) -> Optional[str]:
+    # planned holds the content each file will have after the earlier steps
+    # of the plan, so an update of a file created by the plan diffs correctly
+    if cmd['type'] != 'file':
+        return None
+    operation, filename = cmd['operation'], cmd['filename']
+    path = os.path.abspath(os.path.join(cwd, filename))
+    original = planned[path] if path in planned else read_file(path)
+
+    if operation == 'CREATE':
+        planned[path] = cmd.get('content') or ''
+        return preview_file_changes(operation, filename, new_content=planned[path])
+    if operation == 'UPDATE':
+        if original is None or not cmd.get('content'):
+            return None
+        try:
+            updated = apply_changes(original, cmd['content'])
+        except Exception:
+            return None
+        planned[path] = updated
+        return preview_file_changes(operation, filename, new_content=updated, original_content=original)
+    if operation == 'DELETE':
+        planned[path] = None
+        return preview_file_changes(operation, filename)
+    return None
+
+
+def parse_selection(text: str, choices: List[int]) -> Set[int]:
+    # "1,3-5" -> {1, 3, 4, 5}; raises ValueError for anything not in choices
+    selected = set()
+    for part in text.replace(' ', '').split(','):
+        if not part:
+            continue
+        first, dash, last = part.partition('-')
+        try:
+            start = int(first)
+            end = int(last) if dash else start
+        except ValueError:
+            raise ValueError(f"Not a step number: {part}")
+        if start > end:
+            raise ValueError(f"Invalid range: {part}")
+        selected.update(range(start, end + 1))
+    unknown = selected - set(choices)
+    if unknown:
+        raise ValueError(f"No such step: {', '.join(str(n) for n in sorted(unknown))}")
+    return selected
+
+
+def review_plan(commands: List[Step], pending: List[int], executor,
+                dependencies: Optional[List[Set[int]]] = None, barriers: Set[int] = frozenset(),
+                max_workers: Optional[int] = None) -> Optional[Set[int]]:
+    # Shows every pending step once, with file diffs, and asks a single time.
+    # Returns the indices into commands that may run, or None when the plan
+    # is cancelled; dependencies and barriers are by position in pending.
+    steps = [(position, i) for position, i in enumerate(pending)
+             if commands[i]['type'] not in SILENT_STEPS]
+    approved = {i for i in pending if commands[i]['type'] in SILENT_STEPS}
+    if not steps:
+        return approved
+    if all(commands[i]['type'] == 'shell' and executor.is_safe_command(commands[i]['command'])
+           and executor.is_allowed_command(commands[i]['command']) for _, i in steps):
+        return approved | {i for _, i in steps}
+
+    summary = f"Plan: {len(steps)} step(s)"
+    if max_workers:
+        summary += f", up to {max_workers} at a time"
+    print_info(summary, indent=2)
+    planned: Dict[str, Optional[str]] = {}
+    for position, i in steps:
+        cmd = commands[i]
+        line = f"{i + 1}. {describe_step(cmd)}"
+        after = dependencies[position] if dependencies is not None else None
+        if position in barriers and after:
+            line += " (after all previous steps)"
+        elif after:
+            line += f" (after {', '.join(str(pending[p] + 1) for p in sorted(after))})"
+        if cmd['type'] == 'shell':
+            if not executor.is_safe_command(cmd['command']):
+                line += " [verify this command]"
+            elif executor.is_allowed_command(cmd['command']):
+                line += " [pre-approved]"
+        if cmd['type'] == 'file' and not executor.is_safe_path(
+                os.path.join(executor.current_dir, cmd['filename'])):
+            line += " [outside the project directory]"
+        print_info(line, indent=4)
+        preview = preview_step(cmd, executor.current_dir, planned)
+        if preview:
+            click.echo(preview)
+
+    choice = click.prompt("Run all steps (a), choose steps (c) or cancel (n)",
+                          type=click.Choice(['a', 'c', 'n']), default='a', show_choices=False)
+    if choice == 'a':
+        return approved | {i for _, i in steps}
+    if choice == 'n':
+        return None
+
+    numbers = [i + 1 for _, i in steps]
+    while True:
+        text = click.prompt("Steps to run (e.g. 1,3-5)", default='', show_default=False)
+        try:
+            selected = parse_selection(text, numbers)
+        except ValueError as e:
+            print_warning(f"{e}. Choose from: {', '.join(str(n) for n in numbers)}")
+            continue
+        return approved | {n - 1 for n in selected}
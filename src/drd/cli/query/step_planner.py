@@ -0,0 +1,204 @@
+import os
+import shlex
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+Step = Dict[str, Any]
+
+# Shell builtins whose effect is on the shell itself; everything after waits
+STATE_COMMANDS = {'cd', 'chdir', 'pushd', 'popd', 'source', '.', 'export', 'set', 'unset', 'alias', 'exit'}
+# Commands that only touch the paths they are given
+PATH_COMMANDS = {'mkdir', 'touch', 'cp', 'mv', 'rm', 'ln'}
+# Dependency installs only read and write their manifests (and their own
+# package folders), so they can run beside edits to source files
+INSTALL_SUBCOMMANDS = {
+    'npm': {'install', 'i', 'add', 'ci'},
+    'yarn': {'install', 'add'},
+    'pnpm': {'install', 'i', 'add'},
+    'pip': {'install'},
+    'pip3': {'install'},
+    'poetry': {'install', 'add'},
+    'bundle': {'install'},
+    'gem': {'install'},
+    'cargo': {'add', 'fetch'},
+    'go': {'get'},
+    'composer': {'install', 'require'},
+}
+MANIFESTS = {
+    'npm': ['package.json', 'package-lock.json'],
+    'yarn': ['package.json', 'yarn.lock'],
+    'pnpm': ['package.json', 'pnpm-lock.yaml'],
+    'pip': ['requirements.txt', 'setup.py', 'setup.cfg', 'pyproject.toml'],
+    'pip3': ['requirements.txt', 'setup.py', 'setup.cfg', 'pyproject.toml'],
+    'poetry': ['pyproject.toml', 'poetry.lock'],
+    'bundle': ['Gemfile', 'Gemfile.lock'],
+    'gem': [],
+    'cargo': ['Cargo.toml', 'Cargo.lock'],
+    'go': ['go.mod', 'go.sum'],
+    'composer': ['composer.json', 'composer.lock'],
+}
+SEPARATORS = {'&&', '||', ';', '|', '&', '(', ')'}
+REDIRECTS = {'>', '>>', '<', '>&', '<&', '&>'}
+# Normalised path that stands for the whole tree, e.g. "cp -r . ../backup"
+WHOLE_TREE = ''
+
+
+class StepScope:
+    def __init__(self, barrier: bool = False, shell: bool = False, paths: Optional[Set[str]] = None):
+        # A barrier waits for every earlier step and every later step waits for it
+        self.barrier = barrier
+        self.shell = shell
+        self.paths = paths or set()
+
+
+def normalize_path(path: str, cwd: str) -> str:
+    full_path = os.path.abspath(os.path.join(cwd, os.path.expanduser(path)))
+    rel_path = os.path.relpath(full_path, cwd)
+    return WHOLE_TREE if rel_path == '.' else rel_path.replace(os.sep, '/')
+
+
+def paths_overlap(first: str, second: str) -> bool:
+    if first == WHOLE_TREE or second == WHOLE_TREE or first == second:
+        return True
+    return first.startswith(second + '/') or second.startswith(first + '/')
+
+
+def split_shell_command(command: str) -> Optional[List[List[str]]]:
+    # Simple commands of a shell line, or None when it cannot be read safely
+    if '$(' in command or '`' in command:
+        return None
+    try:
+        lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+        lexer.whitespace_split = True
+        tokens = list(lexer)
+    except ValueError:
+        return None
+    segments, current = [], []
+    for token in tokens:
+        if token in SEPARATORS:
+            if current:
+                segments.append(current)
+            current = []
+        else:
+            current.append(token)
+    if current:
+        segments.append(current)
+    return segments
+
+
+def shell_scope(command: str, cwd: str) -> StepScope:
+    segments = split_shell_command(command)
+    if not segments:
+        return StepScope(barrier=True, shell=True)
+    paths = set()
+    for tokens in segments:
+        # Leading VAR=value assignments only set the environment of the command
+        while tokens and '=' in tokens[0] and not tokens[0].startswith('='):
+            tokens = tokens[1:]
+        if not tokens:
+            return StepScope(barrier=True, shell=True)
+        program = os.path.basename(tokens[0])
+        args = []
+        redirect = False
+        for token in tokens[1:]:
+            if token in REDIRECTS:
+                redirect = True
+            elif redirect:
+                paths.add(normalize_path(token, cwd))
+                redirect = False
+            elif not token.startswith('-'):
+                args.append(token)
+
+        if program in STATE_COMMANDS:
+            return StepScope(barrier=True, shell=True)
+        if program in PATH_COMMANDS:
+            paths.update(normalize_path(arg, cwd) for arg in args)
+        elif program in INSTALL_SUBCOMMANDS and (
+                (args and args[0] in INSTALL_SUBCOMMANDS[program]) or (program == 'yarn' and not args)):
+            # Package names are harmless here: they only match a path of the same name
+            paths.update(normalize_path(arg, cwd) for arg in args[1:])
+            paths.update(MANIFESTS[program])
+        else:
+            # Builds, tests and scripts may read or write anything
+            return StepScope(barrier=True, shell=True)
+    return StepScope(shell=True, paths=paths)
+
+
+def step_scope(cmd: Step, cwd: str) -> Optional[StepScope]:
+    # None for steps that do nothing and so never have to wait
+    if cmd['type'] == 'shell':
+        return shell_scope(cmd['command'], cwd)
+    if cmd['type'] == 'file':
+        return StepScope(paths={normalize_path(cmd['filename'], cwd)})
+    if cmd['type'] in ('explanation', 'requires_restart'):
+        return None
+    return StepScope(barrier=True)
+
+
+def plan_steps(commands: List[Step], cwd: str) -> Tuple[List[Set[int]], Set[int]]:
+    # For each step, the earlier steps it has to wait for, and which steps are barriers
+    scopes = [step_scope(cmd, cwd) for cmd in commands]
+    dependencies = []
+    for index, scope in enumerate(scopes):
+        after = set()
+        if scope is not None:
+            for earlier in range(index):
+                other = scopes[earlier]
+                if other is None:
+                    continue
+                if scope.barrier or other.barrier or (scope.shell and other.shell) or any(
+                        paths_overlap(path, other_path) for path in scope.paths for other_path in other.paths):
+                    after.add(earlier)
+        dependencies.append(after)
+    barriers = {index for index, scope in enumerate(scopes) if scope is not None and scope.barrier}
+    return dependencies, barriers
+
+
+def describe_step(cmd: Step) -> str:
+    if cmd['type'] == 'shell':
+        return f"Run: {cmd['command']}"
+    if cmd['type'] == 'file':
+        return f"{cmd['operation'].capitalize()} file: {cmd['filename']}"
+    if cmd['type'] == 'metadata':
+        return f"Update metadata: {cmd.get('filename', '')}"
+    return cmd['type'].replace('_', ' ').capitalize()
+
+
+def run_steps(dependencies: List[Set[int]], run_step: Callable[[int], Any], max_workers: int,
+              inline: Set[int] = frozenset()) -> Tuple[Dict[int, Any], Dict[int, Exception]]:
+    # Starts each step once the steps it waits for have succeeded. After a
+    # failure only steps before the first failed one are still started, so
+    # every step up to it has run. Steps in `inline` run on the calling thread.
+    results: Dict[int, Any] = {}
+    errors: Dict[int, Exception] = {}
+    remaining = list(range(len(dependencies)))
+    running = {}
+
+    def finish(index, call):
+        try:
+            results[index] = call()
+        except Exception as e:
+            errors[index] = e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            limit = min(errors, default=len(dependencies))
+            ready = [index for index in remaining
+                     if index < limit and dependencies[index].issubset(results)]
+            for index in ready:
+                if index in inline:
+                    if running:
+                        continue
+                    remaining.remove(index)
+                    finish(index, lambda: run_step(index))
+                    break
+                remaining.remove(index)
+                running[pool.submit(run_step, index)] = index
+            else:
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index = running.pop(future)
+                    finish(index, future.result)
+    return results, errors
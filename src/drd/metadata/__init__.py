@@ -1,6 +1,13 @@
-from .initializer import initialize_project_metadata
-from .updater import update_metadata_with_dravid
-from .project_metadata import ProjectMetadataManager
+from ..utils.lazy import lazy_exports
 
-__all__ = ['initialize_project_metadata',
+_EXPORTS = {
+    'initialize_project_metadata': '.initializer',
+    'refresh_project_metadata': '.refresher',
+    'update_metadata_with_dravid': '.updater',
+    'ProjectMetadataManager': '.project_metadata',
+}
+
+__all__ = ['initialize_project_metadata', 'refresh_project_metadata',
            'update_metadata_with_dravid', 'ProjectMetadataManager']
+
+__getattr__ = lazy_exports(__name__, _EXPORTS)
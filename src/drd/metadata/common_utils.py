@@ -1,75 +1,26 @@
 import os
-import re
-from ..api.main import call_dravid_api_with_pagination
+from ..api.main import call_dravid_api_with_pagination, forget_response
 from ..utils.parser import extract_and_parse_xml
 from ..prompts.file_metada_desc_prompts import get_file_metadata_prompt
 from ..prompts.metadata_update_prompts import get_file_suggestion_prompt
 from ..utils import print_info, print_error
-
-
-def parse_gitignore(gitignore_path):
-    ignore_patterns = []
-    if os.path.exists(gitignore_path):
-        with open(gitignore_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    pattern = line.replace('.', r'\.').replace(
-                        '*', '.*').replace('?', '.')
-                    if pattern.startswith('/'):
-                        pattern = '^' + pattern[1:]
-                    elif pattern.endswith('/'):
-                        pattern += '.*'
-                    else:
-                        pattern = '.*' + pattern
-                    try:
-                        ignore_patterns.append(re.compile(pattern))
-                        # Debug print
-                        print(
-                            f"ignoring file pattern part of gitignore: {pattern}")
-                    except re.error as e:
-                        # Debug print
-                        print(f"Error compiling pattern '{pattern}': {e}")
-    print(f"Total patterns: {len(ignore_patterns)}")  # Debug print
-    return ignore_patterns
+from .scanner import parse_gitignore, load_ignore_matcher
+from .tree_snapshot import FileTreeSnapshot
 
 
 def should_ignore(path, ignore_patterns):
-    return any(pattern.search(path) for pattern in ignore_patterns)
+    return ignore_patterns.is_ignored(path)
 
 
 def get_folder_structure(start_path, ignore_patterns):
-    structure = []
-    for root, dirs, files in os.walk(start_path):
-        level = root.replace(start_path, '').count(os.sep)
-        indent = ' ' * 4 * level
-        folder_name = os.path.basename(root)
-        rel_path = os.path.relpath(root, start_path)
-        rel_path = '' if rel_path == '.' else rel_path
-        if not should_ignore(rel_path, ignore_patterns):
-            structure.append(f"{indent}{folder_name}/")
-            sub_indent = ' ' * 4 * (level + 1)
-            for file in files:
-                file_path = os.path.join(rel_path, file)
-                if not should_ignore(file_path, ignore_patterns):
-                    structure.append(f"{sub_indent}{file}")
-        dirs[:] = [d for d in dirs if not should_ignore(
-            os.path.join(rel_path, d), ignore_patterns)]
-    return '\n'.join(structure)
+    return FileTreeSnapshot(start_path, ignore_patterns).get_tree().format_tree()
 
 
 def get_ignore_patterns(current_dir):
-    gitignore_path = os.path.join(current_dir, '.gitignore')
-    if os.path.exists(gitignore_path):
-        ignore_patterns = parse_gitignore(gitignore_path)
-        ignore_patterns.append(re.compile('.git'))
+    ignore_patterns = load_ignore_matcher(current_dir)
+    if os.path.exists(os.path.join(current_dir, '.gitignore')):
         return ignore_patterns, "Using .gitignore patterns for file exclusion."
-    else:
-        default_patterns = ['node_modules', 'dist',
-                            'build', 'venv', '.git', '__pycache__']
-        ignore_patterns = [re.compile(f'.*{pattern}.*')
-                           for pattern in default_patterns]
-        return ignore_patterns, "No .gitignore found. Using default ignore patterns."
+    return ignore_patterns, "No .gitignore found. Using default ignore patterns."
 
 
 def generate_file_description(filename, content, project_context, folder_structure):
@@ -104,6 +55,7 @@ def generate_file_description(filename, content, project_context, folder_structu
     except Exception as e:
         print_error(f"Error parsing metadata response for {filename}: {e}")
         print_error(f"Raw response: {response}")
+        forget_response(metadata_query)
         return "unknown", f"Error generating description: {str(e)}", ""
 
 
@@ -131,4 +83,5 @@ def find_file_with_dravid(filename, project_context, folder_structure, max_retri
             return None
     except Exception as e:
         print_error(f"Error parsing dravid's response: {str(e)}")
+        forget_response(query)
         return None
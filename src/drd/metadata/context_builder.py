@@ -0,0 +1,100 @@
+import os
+import re
+import json
+from ..api.rate_limiter import estimate_tokens
+
+DEFAULT_CONTEXT_TOKEN_BUDGET = 8000
+
+# How much a query term counts depending on which field of a key_files entry it matches
+FIELD_WEIGHTS = (('path', 3.0), ('exports', 2.0), ('summary', 1.0), ('imports', 1.0))
+FILENAME_MENTION_BOOST = 10.0
+# Kept in drd.json for incremental refreshes, meaningless to the LLM
+BOOKKEEPING_FIELDS = ('hash', 'mtime')
+STOP_WORDS = {'the', 'and', 'for', 'with', 'that', 'this', 'from', 'into', 'add', 'use',
+              'make', 'file', 'files', 'new', 'all', 'are', 'not', 'can', 'should', 'please'}
+
+_WORD = re.compile(r'[A-Za-z][a-z]+|[A-Z]+(?![a-z])|\d+')
+
+
+def get_context_token_budget():
+    try:
+        return int(os.getenv('DRAVID_CONTEXT_TOKENS', DEFAULT_CONTEXT_TOKEN_BUDGET))
+    except ValueError:
+        return DEFAULT_CONTEXT_TOKEN_BUDGET
+
+
+def compact_json(data):
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+
+def prompt_entry(entry):
+    return {key: value for key, value in entry.items() if key not in BOOKKEEPING_FIELDS}
+
+
+def split_words(text):
+    # Splits snake_case, camelCase and paths into lowercase words
+    words = (word.lower() for word in _WORD.findall(text or ""))
+    return [word for word in words if len(word) > 2 and word not in STOP_WORDS]
+
+
+def tokenize(text):
+    return set(split_words(text))
+
+
+def field_text(value):
+    if isinstance(value, list):
+        return ' '.join(str(item) for item in value)
+    return str(value or "")
+
+
+def score_file(entry, query_terms, query_text=""):
+    score = 0.0
+    for field, weight in FIELD_WEIGHTS:
+        score += weight * len(query_terms & tokenize(field_text(entry.get(field))))
+    path = entry.get('path') or ""
+    if path and os.path.basename(path).lower() in query_text:
+        score += FILENAME_MENTION_BOOST
+    return score
+
+
+def rank_key_files(key_files, query):
+    if not query:
+        return list(key_files)
+    query_terms = tokenize(query)
+    query_text = query.lower()
+    scored = [(score_file(entry, query_terms, query_text), i, entry)
+              for i, entry in enumerate(key_files)]
+    # Stable on ties so files keep their drd.json order
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [entry for _, _, entry in scored]
+
+
+def build_project_context(metadata, query=None, token_budget=None):
+    if token_budget is None:
+        token_budget = get_context_token_budget()
+    context = {key: value for key, value in metadata.items() if key != 'key_files'}
+    all_key_files = [prompt_entry(entry) for entry in metadata.get('key_files', [])]
+
+    if token_budget <= 0:
+        context['key_files'] = all_key_files
+        return compact_json(context)
+
+    # Project info, environment and layout are always sent; key_files fill
+    # whatever budget is left, most relevant first.
+    used = estimate_tokens(compact_json(context))
+    selected = set()
+    for entry in rank_key_files(all_key_files, query):
+        tokens = estimate_tokens(compact_json(entry))
+        if used + tokens > token_budget:
+            # A smaller, less relevant file may still fit
+            continue
+        selected.add(id(entry))
+        used += tokens
+
+    # Selected files keep their drd.json order, so queries that pick the same
+    # files produce the same context and can share the provider's prompt cache.
+    context['key_files'] = [entry for entry in all_key_files if id(entry) in selected]
+    omitted = len(all_key_files) - len(selected)
+    if omitted:
+        context['omitted_key_files'] = omitted
+    return compact_json(context)
@@ -5,7 +5,7 @@ from datetime import datetime
 from .project_metadata import ProjectMetadataManager
 from ..utils.utils import print_info, print_success, print_error, print_warning
 from ..utils.loader import Loader
-from ..api.main import call_dravid_api_with_pagination
+from ..api.main import acall_dravid_api_with_pagination, forget_response
 from ..utils.parser import extract_and_parse_xml
 from ..prompts.get_project_info_prompts import get_project_info_prompt
 
@@ -25,12 +25,13 @@ async def initialize_project_metadata(project_dir):
     loader = Loader("Analyzing project structure")
     loader.start()
     try:
-        response = call_dravid_api_with_pagination(query, include_context=True)
+        response = await acall_dravid_api_with_pagination(query, include_context=True)
         root = extract_and_parse_xml(response)
         project_info = root.find('.//project_info')
         if project_info is None:
             print_warning(
                 "Could not extract project information from the API response. Using default values.")
+            forget_response(query)
         else:
             builder.metadata['project_info']['name'] = project_info.find('project_name').text.strip(
             ) if project_info.find('project_name') is not None else builder.metadata['project_info']['name']
@@ -55,6 +56,7 @@ async def initialize_project_metadata(project_dir):
 
     except Exception as e:
         print_warning(f"Error fetching project information: {str(e)}")
+        forget_response(query)
         print_warning("Continuing with default values.")
     finally:
         loader.stop()
@@ -69,9 +71,8 @@ async def initialize_project_metadata(project_dir):
         loader.stop()
 
     # Save metadata to drd.json
-    drd_path = os.path.join(project_dir, 'drd.json')
-    with open(drd_path, 'w') as f:
-        json.dump(metadata, f, indent=2)
+    drd_path = builder.metadata_file
+    builder.save_metadata()
 
     print_success(
         f"Project metadata initialized successfully. Saved to {drd_path}")
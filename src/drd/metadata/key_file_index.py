@@ -0,0 +1,128 @@
+import bisect
+from typing import Any, Dict, List, Optional
+
+Entry = Dict[str, Any]
+
+
+def export_symbols(entry: Entry) -> List[str]:
+    # Exports look like "fun:greet" or "class:Greeter"; index the bare name
+    exports = entry.get('exports') or []
+    if isinstance(exports, str):
+        exports = exports.split(',')
+    symbols = []
+    for export in exports:
+        symbol = str(export).rsplit(':', 1)[-1].strip()
+        if symbol and symbol != 'None':
+            symbols.append(symbol)
+    return symbols
+
+
+class KeyFileIndex:
+    # Indexes the key_files list of drd.json by path, type and exported
+    # symbol. The list itself stays the stored format: entries are the same
+    # dicts, so it serialises exactly as before. Change entries through
+    # update() and remove() so the secondary indexes follow.
+    def __init__(self, key_files: Optional[List[Entry]] = None):
+        self.bind(key_files if key_files is not None else [])
+
+    def bind(self, key_files: List[Entry]) -> None:
+        self.key_files = key_files
+        self.by_path: Dict[str, Entry] = {}
+        self.by_type: Dict[str, Dict[str, Entry]] = {}
+        self.by_export: Dict[str, Dict[str, Entry]] = {}
+        # Increasing numbers parallel to key_files; an entry's position is
+        # found by bisecting for its number, so removal never scans the list
+        self._seqs: List[int] = list(range(len(key_files)))
+        self._seq_by_path: Dict[str, int] = {}
+        self._next_seq = len(key_files)
+        for seq, entry in enumerate(key_files):
+            previous = self.by_path.get(entry.get('path'))
+            if previous is not None:
+                self._unindex(previous)
+            self._index(entry)
+            self._seq_by_path[entry.get('path')] = seq
+        self._length = len(key_files)
+
+    def sync(self, key_files: List[Entry]) -> 'KeyFileIndex':
+        # Catches the list being replaced, grown or shrunk behind the index's
+        # back. An entry replaced in place, with the length unchanged, is not
+        # noticed: change entries through update() instead.
+        if key_files is not self.key_files or len(key_files) != self._length:
+            self.bind(key_files)
+        return self
+
+    def _index(self, entry: Entry) -> None:
+        path = entry.get('path')
+        self.by_path[path] = entry
+        self.by_type.setdefault(entry.get('type'), {})[path] = entry
+        for symbol in export_symbols(entry):
+            self.by_export.setdefault(symbol, {})[path] = entry
+
+    def _unindex(self, entry: Entry) -> None:
+        path = entry.get('path')
+        self.by_path.pop(path, None)
+        _discard(self.by_type, entry.get('type'), path)
+        for symbol in export_symbols(entry):
+            _discard(self.by_export, symbol, path)
+
+    def __len__(self) -> int:
+        return len(self.by_path)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.by_path
+
+    def get(self, path: str) -> Optional[Entry]:
+        return self.by_path.get(path)
+
+    def update(self, path: str, fields: Entry) -> Entry:
+        # Updates the entry in place, or appends a new one for an unknown path
+        entry = self.by_path.get(path)
+        if entry is None:
+            entry = {'path': path}
+            self.key_files.append(entry)
+            self._seqs.append(self._next_seq)
+            self._seq_by_path[path] = self._next_seq
+            self._next_seq += 1
+            self._length += 1
+        else:
+            self._unindex(entry)
+        entry.update(fields)
+        self._index(entry)
+        return entry
+
+    def remove(self, path: str) -> Optional[Entry]:
+        entry = self.by_path.get(path)
+        if entry is None:
+            return None
+        self._unindex(entry)
+        seq = self._seq_by_path.pop(path)
+        position = bisect.bisect_left(self._seqs, seq)
+        if position < len(self.key_files) and self.key_files[position] is entry:
+            del self.key_files[position]
+            del self._seqs[position]
+            self._length -= 1
+        else:
+            # The list was reordered in place; fall back to finding it by identity
+            for position, other in enumerate(self.key_files):
+                if other is entry:
+                    del self.key_files[position]
+                    break
+            self.bind(self.key_files)
+        return entry
+
+    def find_by_type(self, file_type: str) -> List[Entry]:
+        return list(self.by_type.get(file_type, {}).values())
+
+    def find_by_export(self, symbol: str) -> List[Entry]:
+        return list(self.by_export.get(symbol.rsplit(':', 1)[-1].strip(), {}).values())
+
+    def type_counts(self) -> Dict[str, int]:
+        return {file_type: len(entries) for file_type, entries in self.by_type.items() if entries}
+
+
+def _discard(index: Dict[str, Dict[str, Entry]], key: Any, path: str) -> None:
+    entries = index.get(key)
+    if entries is not None:
+        entries.pop(path, None)
+        if not entries:
+            del index[key]
@@ -0,0 +1,109 @@
+import os
+import json
+import math
+import hashlib
+from collections import Counter
+from .context_builder import FIELD_WEIGHTS, compact_json, field_text, split_words
+
+INDEX_VERSION = 1
+INDEX_FILENAME = 'drd.index.json'
+BM25_K1 = 1.5
+BM25_B = 0.75
+DEFAULT_MAX_RESULTS = 10
+# Results scoring below this fraction of the best match are treated as noise
+MIN_RELATIVE_SCORE = 0.3
+
+
+def get_signature(key_files):
+    return hashlib.sha256(compact_json(key_files).encode('utf-8')).hexdigest()
+
+
+def document_terms(entry):
+    terms = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        for word in split_words(field_text(entry.get(field))):
+            terms[word] += weight
+    return terms
+
+
+class LexicalIndex:
+    def __init__(self, paths, lengths, postings, signature=None):
+        self.paths = paths
+        self.lengths = lengths
+        self.postings = postings
+        self.signature = signature
+        self.avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+    @classmethod
+    def build(cls, key_files):
+        paths = []
+        lengths = []
+        postings = {}
+        for doc_id, entry in enumerate(key_files):
+            terms = document_terms(entry)
+            paths.append(entry.get('path'))
+            lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                postings.setdefault(term, []).append([doc_id, frequency])
+        return cls(paths, lengths, postings, get_signature(key_files))
+
+    def idf(self, term):
+        doc_frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.paths) - doc_frequency + 0.5) / (doc_frequency + 0.5))
+
+    def search(self, query, limit=DEFAULT_MAX_RESULTS):
+        scores = {}
+        for term in set(split_words(query)):
+            idf = self.idf(term)
+            for doc_id, frequency in self.postings.get(term, ()):
+                norm = 1 - BM25_B + BM25_B * \
+                    self.lengths[doc_id] / (self.avg_length or 1)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * \
+                    frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.paths[doc_id], score) for doc_id, score in ranked[:limit]]
+
+    def select_files(self, query, limit=DEFAULT_MAX_RESULTS):
+        results = self.search(query, limit)
+        if not results:
+            return []
+        threshold = results[0][1] * MIN_RELATIVE_SCORE
+        return [path for path, score in results if score >= threshold]
+
+    def to_dict(self):
+        return {
+            "version": INDEX_VERSION,
+            "signature": self.signature,
+            "paths": self.paths,
+            "lengths": self.lengths,
+            "postings": self.postings
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version: {data.get('version')}")
+        return cls(data['paths'], data['lengths'], data['postings'], data.get('signature'))
+
+    def save(self, index_file):
+        tmp_path = f"{index_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(compact_json(self.to_dict()))
+        os.replace(tmp_path, index_file)
+
+    @classmethod
+    def load(cls, index_file):
+        with open(index_file, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+
+def load_or_build_index(key_files, index_file):
+    # A stale or missing index is rebuilt in memory only; the file is written
+    # alongside drd.json, so a query never leaves one behind on its own
+    try:
+        index = LexicalIndex.load(index_file)
+        if index.signature == get_signature(key_files):
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+    return LexicalIndex.build(key_files)
@@ -0,0 +1,139 @@
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from .state_dir import get_state_dir, ensure_state_dir
+
+STORE_VERSION = 1
+STORE_FILENAME = 'metadata.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sections (name TEXT PRIMARY KEY, seq INTEGER NOT NULL, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, seq INTEGER NOT NULL, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def is_enabled() -> bool:
+    return os.getenv('DRAVID_METADATA_STORE', '1').lower() not in ('0', 'false', 'no')
+
+
+def get_fingerprint(path: str) -> Optional[str]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(',', ':'))
+
+
+class MetadataStore:
+    # Keyed copy of drd.json in SQLite. Every change is one row written in a
+    # transaction, so drd.json itself only has to be exported once per batch.
+    # The store remembers which drd.json it is in sync with; an edited or
+    # replaced drd.json is imported again on load.
+    def __init__(self, project_dir: str):
+        self.project_dir = project_dir
+        self.db_file = os.path.join(get_state_dir(project_dir), STORE_FILENAME)
+        self._conn = None
+        self._lock = threading.RLock()
+        self._depth = 0
+
+    def connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            ensure_state_dir(self.project_dir)
+            conn = sqlite3.connect(self.db_file, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            version = conn.execute("SELECT value FROM state WHERE key = 'version'").fetchone()
+            if version is None or int(version[0]) != STORE_VERSION:
+                conn.executescript("DELETE FROM sections; DELETE FROM files; DELETE FROM state;")
+                conn.execute("INSERT INTO state VALUES ('version', ?)", (str(STORE_VERSION),))
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @contextmanager
+    def transaction(self):
+        # Nested blocks join the outermost transaction
+        with self._lock:
+            conn = self.connect()
+            if self._depth == 0:
+                conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield conn
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    conn.execute("ROLLBACK")
+                raise
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    conn.execute("COMMIT")
+
+    def get_state(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self.connect().execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key: str, value: Optional[str]) -> None:
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, value))
+
+    def load(self, json_fingerprint: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.db_file) or self.get_state('json_fingerprint') != json_fingerprint:
+            return None
+        with self._lock:
+            conn = self.connect()
+            files = [json.loads(data) for data, in conn.execute(
+                "SELECT data FROM files ORDER BY seq")]
+            metadata = {}
+            for name, data in conn.execute("SELECT name, data FROM sections ORDER BY seq"):
+                metadata[name] = files if name == 'key_files' else json.loads(data)
+        return metadata
+
+    def replace_all(self, metadata: Dict[str, Any]) -> None:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM sections")
+            conn.execute("DELETE FROM files")
+            conn.executemany("INSERT INTO sections VALUES (?, ?, ?)", [
+                (name, seq, 'null' if name == 'key_files' else _dumps(value))
+                for seq, (name, value) in enumerate(metadata.items())])
+            conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", [
+                (entry['path'], seq, _dumps(entry))
+                for seq, entry in enumerate(metadata.get('key_files', []))])
+
+    def put_section(self, name: str, value: Any) -> None:
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO sections VALUES (?, (SELECT COALESCE(MAX(seq), -1) + 1 FROM sections), ?) "
+                "ON CONFLICT(name) DO UPDATE SET data = excluded.data", (name, _dumps(value)))
+
+    def get_file(self, path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.connect().execute("SELECT data FROM files WHERE path = ?", (path,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_file(self, entry: Dict[str, Any]) -> None:
+        # An existing path keeps its position, a new one goes last
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO files VALUES (?, (SELECT COALESCE(MAX(seq), -1) + 1 FROM files), ?) "
+                "ON CONFLICT(path) DO UPDATE SET data = excluded.data", (entry['path'], _dumps(entry)))
+
+    def delete_file(self, path: str) -> None:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM files WHERE path = ?", (path,))
@@ -1,11 +1,23 @@
 import os
 import json
+import asyncio
+import sqlite3
+import hashlib
+from contextlib import contextmanager
 from datetime import datetime
-import fnmatch
 import xml.etree.ElementTree as ET
 import mimetypes
-from ..prompts.file_metada_desc_prompts import get_file_metadata_prompt
-from ..api import call_dravid_api_with_pagination
+from ..prompts.file_metada_desc_prompts import get_file_metadata_prompt, get_batch_file_metadata_prompt
+from ..api import acall_dravid_api_with_pagination, forget_response
+from ..api.rate_limiter import CHARS_PER_TOKEN
+from ..utils.parser import parse_batch_metadata_response
+from .context_builder import build_project_context
+from .lexical_index import INDEX_FILENAME, LexicalIndex, load_or_build_index
+from .scanner import load_ignore_matcher, scan_directory
+from .tree_snapshot import FileTreeSnapshot
+from .key_file_index import KeyFileIndex
+from .metadata_store import MetadataStore, get_fingerprint, is_enabled as store_enabled
+from .rate_limit_handler import rate_limiter, plan_metadata_batches, get_batch_token_budget
 from ..utils.utils import print_info, print_warning
 
 
@@ -14,15 +26,37 @@ class ProjectMetadataManager:
         self.project_dir = os.path.abspath(project_dir)
 
         self.metadata_file = os.path.join(self.project_dir, 'drd.json')
+        self.index_file = os.path.join(self.project_dir, INDEX_FILENAME)
+        self.store = MetadataStore(self.project_dir) if store_enabled() else None
+        # Whether the store holds the same metadata as self.metadata
+        self.store_synced = False
+        self.batch_depth = 0
+        # Store writes queued until the outermost batch ends; None is a full write
+        self.batch_writes = []
+        self.export_pending = False
         self.metadata = self.load_metadata()
+        self.key_file_index = KeyFileIndex(self.metadata.get('key_files', []))
         self.ignore_patterns = self.get_ignore_patterns()
+        self.tree_snapshot = FileTreeSnapshot(
+            self.project_dir, self.ignore_patterns)
+        self.file_tree = None
         self.binary_extensions = {
             '.pyc', '.pyo', '.so', '.dll', '.exe', '.bin'}
         self.image_extensions = {'.jpg', '.jpeg',
                                  '.png', '.gif', '.bmp', '.svg', '.ico'}
+        self.batch_token_budget = get_batch_token_budget()
 
     def load_metadata(self):
         if os.path.exists(self.metadata_file):
+            if self.store is not None:
+                try:
+                    metadata = self.store.load(
+                        get_fingerprint(self.metadata_file))
+                    if metadata is not None:
+                        self.store_synced = True
+                        return metadata
+                except (sqlite3.Error, ValueError) as e:
+                    self.disable_store(e)
             with open(self.metadata_file, 'r') as f:
                 return json.load(f)
 
@@ -49,76 +83,121 @@ class ProjectMetadataManager:
         return new_metadata
 
     def save_metadata(self):
-        with open(self.metadata_file, 'w') as f:
+        self.store_synced = False
+        self.store_write(None)
+        self.export_metadata()
+
+    def export_metadata(self):
+        if self.batch_depth:
+            self.export_pending = True
+            return
+        self.export_pending = False
+        tmp_path = f"{self.metadata_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
             json.dump(self.metadata, f, indent=2)
+        os.replace(tmp_path, self.metadata_file)
+        self.save_file_index()
+        if self.store is not None and self.store_synced:
+            try:
+                self.store.set_state(
+                    'json_fingerprint', get_fingerprint(self.metadata_file))
+            except sqlite3.Error as e:
+                self.disable_store(e)
+
+    def disable_store(self, error):
+        print_warning(
+            f"Metadata store unavailable, using drd.json only: {str(error)}")
+        self.store = None
+        self.store_synced = False
+
+    def store_write(self, write):
+        if self.store is None:
+            return
+        if self.batch_depth:
+            self.batch_writes.append(write)
+            return
+        try:
+            with self.store.transaction():
+                if self.store_synced and write is not None:
+                    write(self.store)
+                else:
+                    self.store.replace_all(self.metadata)
+                    self.store_synced = True
+        except sqlite3.Error as e:
+            self.disable_store(e)
+
+    def record_change(self, sections=(), files=(), removed=()):
+        def write(store):
+            for name in sections:
+                store.put_section(name, self.metadata[name])
+            for entry in files:
+                store.put_file(entry)
+            for path in removed:
+                store.delete_file(path)
+        self.store_write(write)
+        self.export_metadata()
+
+    @contextmanager
+    def batch(self):
+        # Changes made inside the block are committed to the store in one
+        # transaction and drd.json is exported once, when the outermost block
+        # ends. The transaction only spans the writes, so the block can wait on
+        # the LLM without locking the store.
+        self.batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            if self.batch_depth == 1:
+                # self.metadata keeps the changes the store never gets, so
+                # the next write replaces everything
+                self.batch_writes = []
+                self.store_synced = False
+            raise
+        finally:
+            self.batch_depth -= 1
+        if self.batch_depth == 0:
+            writes, self.batch_writes = self.batch_writes, []
+            if writes:
+                def write_all(store):
+                    for write in writes:
+                        write(store)
+                self.store_write(None if None in writes else write_all)
+            if self.export_pending:
+                self.export_metadata()
+
+    def get_file_index(self):
+        return load_or_build_index(self.metadata.get('key_files', []), self.index_file)
+
+    def save_file_index(self):
+        if not os.path.exists(self.metadata_file):
+            return
+        try:
+            LexicalIndex.build(self.metadata.get('key_files', [])).save(
+                self.index_file)
+        except OSError as e:
+            print_warning(f"Could not save file index: {str(e)}")
 
     def get_ignore_patterns(self):
-        patterns = [
-            '**/.git/**', '**/node_modules/**', '**/dist/**', '**/build/**',
-            '**/__pycache__/**', '**/.venv/**', '**/.idea/**', '**/.vscode/**'
-        ]
-
-        for root, _, files in os.walk(self.project_dir):
-            if '.gitignore' in files:
-                gitignore_path = os.path.join(root, '.gitignore')
-                rel_root = os.path.relpath(root, self.project_dir)
-                with open(gitignore_path, 'r') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line and not line.startswith('#'):
-                            if rel_root == '.':
-                                patterns.append(line)
-                            else:
-                                patterns.append(os.path.join(rel_root, line))
-
-        return patterns
+        return load_ignore_matcher(self.project_dir)
 
     def should_ignore(self, path):
-        try:
-            path_str = str(path)
-            abs_path = os.path.abspath(path_str)
-            rel_path = os.path.relpath(abs_path, self.project_dir)
-
-            if rel_path.startswith('..'):
-                return True
-
-            for pattern in self.ignore_patterns:
-                if pattern.endswith('/'):
-                    # It's a directory pattern
-                    if rel_path.startswith(pattern) or rel_path.startswith(pattern[:-1]):
-                        return True
-                elif fnmatch.fnmatch(rel_path, pattern):
-                    return True
-            return False
-        except Exception as e:
-            print_warning(f"Error in should_ignore for path {path}: {str(e)}")
+        abs_path = os.path.abspath(str(path))
+        rel_path = os.path.relpath(abs_path, self.project_dir)
+        if rel_path.startswith('..'):
             return True
+        if rel_path == '.':
+            return False
+        return self.ignore_patterns.is_ignored(rel_path, os.path.isdir(abs_path))
+
+    def get_file_tree(self, refresh=False):
+        if refresh or self.file_tree is None:
+            self.file_tree = self.tree_snapshot.get_tree()
+        return self.file_tree
 
     def get_directory_structure(self, start_path):
-        structure = {}
-        for root, dirs, files in os.walk(start_path):
-            if self.should_ignore(root):
-                continue
-            path = os.path.relpath(root, start_path)
-            if path == '.':
-                structure['files'] = [
-                    f for f in files if not self.should_ignore(os.path.join(root, f))]
-                structure['directories'] = []
-            else:
-                parts = path.split(os.sep)
-                current = structure
-                for part in parts[:-1]:
-                    if 'directories' not in current:
-                        current['directories'] = []
-                    if part not in current['directories']:
-                        current['directories'].append(part)
-                    current = current.setdefault(part, {})
-                if parts[-1] not in current:
-                    current['directories'] = current.get('directories', [])
-                    current['directories'].append(parts[-1])
-                    current[parts[-1]] = {
-                        'files': [f for f in files if not self.should_ignore(os.path.join(root, f))]}
-        return structure
+        if os.path.abspath(start_path) == self.project_dir:
+            return self.get_file_tree(refresh=True).to_dict()
+        return scan_directory(start_path).to_dict()
 
     def is_binary_file(self, file_path):
         _, extension = os.path.splitext(file_path)
@@ -128,48 +207,59 @@ class ProjectMetadataManager:
         mime_type, _ = mimetypes.guess_type(file_path)
         return mime_type and not mime_type.startswith('text') and not mime_type.endswith('json')
 
+    def get_file_fingerprint(self, file_path):
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(65536), b''):
+                digest.update(block)
+        return digest.hexdigest(), os.path.getmtime(file_path)
+
+    def iter_project_files(self, tree=None):
+        tree = tree or self.get_file_tree(refresh=True)
+        for rel_path in tree.iter_files():
+            yield os.path.join(self.project_dir, rel_path)
+
     async def analyze_file(self, file_path):
         rel_path = os.path.relpath(file_path, self.project_dir)
 
+        if file_path.endswith('.md'):
+            return None  # Skip markdown files
+
+        try:
+            file_hash, mtime = self.get_file_fingerprint(file_path)
+        except OSError:
+            file_hash, mtime = None, None
+
         if self.is_binary_file(file_path):
             return {
                 "path": rel_path,
                 "type": "binary",
                 "summary": "Binary or non-text file",
                 "exports": [],
-                "imports": []
+                "imports": [],
+                "hash": file_hash,
+                "mtime": mtime
             }
 
-        if file_path.endswith('.md'):
-            return None  # Skip markdown files
-
+        response = None
         try:
             with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
                 content = f.read()
 
-            prompt = get_file_metadata_prompt(rel_path, content, json.dumps(
-                self.metadata), json.dumps(self.metadata['directory_structure']))
-            response = call_dravid_api_with_pagination(
+            prompt = get_file_metadata_prompt(rel_path, content, self.get_file_analysis_context(
+            ), json.dumps(self.metadata['directory_structure']))
+            response = await acall_dravid_api_with_pagination(
                 prompt, include_context=True)
 
             root = ET.fromstring(response)
             metadata = root.find('metadata')
-
-            file_info = {
-                "path": rel_path,
-                "type": metadata.find('type').text,
-                "summary": metadata.find('summary').text,
-                "exports": metadata.find('exports').text.split(',') if metadata.find('exports').text != 'None' else [],
-                "imports": metadata.find('imports').text.split(',') if metadata.find('imports').text != 'None' else []
-            }
-
-            dependencies = metadata.find('external_dependencies')
-            if dependencies is not None:
-                for dep in dependencies.findall('dependency'):
-                    self.metadata['external_dependencies'].append(dep.text)
+            file_info = self.build_file_info(
+                rel_path, metadata, file_hash, mtime)
 
         except Exception as e:
             print_warning(f"Error analyzing file {file_path}: {str(e)}")
+            if response is not None:
+                forget_response(prompt)
             file_info = {
                 "path": rel_path,
                 "type": "unknown",
@@ -180,52 +270,226 @@ class ProjectMetadataManager:
 
         return file_info
 
-    async def build_metadata(self, loader):
-        total_files = sum([len(files) for root, _, files in os.walk(
-            self.project_dir) if not self.should_ignore(root)])
-        processed_files = 0
+    def build_file_info(self, rel_path, metadata, file_hash, mtime):
+        file_info = {
+            "path": rel_path,
+            "type": metadata.find('type').text,
+            "summary": metadata.find('summary').text,
+            "exports": metadata.find('exports').text.split(',') if metadata.find('exports').text != 'None' else [],
+            "imports": metadata.find('imports').text.split(',') if metadata.find('imports').text != 'None' else [],
+            "hash": file_hash,
+            "mtime": mtime
+        }
 
-        for root, _, files in os.walk(self.project_dir):
-            if self.should_ignore(root):
+        dependencies = metadata.find('external_dependencies')
+        if dependencies is not None:
+            for dep in dependencies.findall('dependency'):
+                self.metadata['external_dependencies'].append(dep.text)
+
+        return file_info
+
+    async def analyze_file_batch(self, file_paths):
+        files = []
+        fingerprints = {}
+        for file_path in file_paths:
+            rel_path = os.path.relpath(file_path, self.project_dir)
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                files.append((rel_path, f.read()))
+            fingerprints[rel_path] = (file_path,) + \
+                self.get_file_fingerprint(file_path)
+
+        prompt = get_batch_file_metadata_prompt(files, self.get_file_analysis_context(
+        ), json.dumps(self.metadata['directory_structure']))
+        response = await acall_dravid_api_with_pagination(
+            prompt, include_context=True)
+
+        results = {}
+        for rel_path, metadata in parse_batch_metadata_response(response).items():
+            if rel_path not in fingerprints:
                 continue
-            for file in files:
-                file_path = os.path.join(root, file)
-                if not self.should_ignore(file_path):
-                    file_info = await self.analyze_file(file_path)
-                    if file_info:
-                        self.metadata['key_files'].append(file_info)
-                    processed_files += 1
-                    loader.message = f"Analyzing files ({processed_files}/{total_files})"
-
-        # Determine languages
-        all_languages = set(file['type'] for file in self.metadata['key_files']
-                            if file['type'] not in ['binary', 'unknown'])
-        if all_languages:
-            self.metadata['environment']['primary_language'] = max(all_languages, key=lambda x: sum(
-                1 for file in self.metadata['key_files'] if file['type'] == x))
-            self.metadata['environment']['other_languages'] = list(
-                all_languages - {self.metadata['environment']['primary_language']})
+            file_path, file_hash, mtime = fingerprints[rel_path]
+            try:
+                results[file_path] = self.build_file_info(
+                    rel_path, metadata, file_hash, mtime)
+            except AttributeError as e:
+                print_warning(
+                    f"Incomplete metadata for {rel_path} in batch response: {str(e)}")
+        if len(results) < len(file_paths):
+            # The skipped files are asked about again, so should the batch be
+            forget_response(prompt)
+        return results
+
+    def needs_llm_analysis(self, file_path):
+        return not (self.is_binary_file(file_path) or file_path.endswith('.md'))
+
+    def plan_batches(self, file_paths):
+        items = []
+        for file_path in file_paths:
+            try:
+                tokens = os.path.getsize(file_path) // CHARS_PER_TOKEN + 1
+            except OSError:
+                tokens = self.batch_token_budget + 1
+            items.append((file_path, tokens))
+        return plan_metadata_batches(items, self.batch_token_budget)
+
+    async def analyze_files(self, file_paths, loader, label="Analyzing files"):
+        total_files = len(file_paths)
+        processed_files = 0
+        loader.message = f"{label} (0/{total_files})"
+        results = {}
+
+        def mark_done(count=1):
+            nonlocal processed_files
+            processed_files += count
+            loader.message = f"{label} ({processed_files}/{total_files})"
+
+        async def analyze(file_path):
+            if self.needs_llm_analysis(file_path):
+                # Hold the semaphore for the whole analysis so file contents are
+                # only read once a request slot is free.
+                async with rate_limiter.semaphore:
+                    results[file_path] = await self.analyze_file(file_path)
+            else:
+                results[file_path] = await self.analyze_file(file_path)
+            mark_done()
+
+        async def analyze_batch(batch):
+            async with rate_limiter.semaphore:
+                try:
+                    answered = await self.analyze_file_batch(batch)
+                except Exception as e:
+                    print_warning(
+                        f"Error analyzing batch of {len(batch)} files: {str(e)}")
+                    answered = {}
+            results.update(answered)
+            mark_done(len(answered))
+            # Anything the model skipped gets its own request
+            await asyncio.gather(*(analyze(file_path) for file_path in batch
+                                   if file_path not in answered))
+
+        llm_files = [p for p in file_paths if self.needs_llm_analysis(p)]
+        batches, singles = self.plan_batches(llm_files)
+        singles = set(singles)
+        await asyncio.gather(
+            *(analyze(file_path) for file_path in file_paths
+              if file_path in singles or not self.needs_llm_analysis(file_path)),
+            *(analyze_batch(batch) for batch in batches))
+
+        return [results.get(file_path) for file_path in file_paths]
 
+    async def build_metadata(self, loader):
+        # Reuses the tree get_directory_structure just scanned, if any
+        file_paths = list(self.iter_project_files(self.get_file_tree()))
+        results = await self.analyze_files(file_paths, loader)
+        self.metadata['key_files'] = [
+            file_info for file_info in results if file_info]
+
+        self.update_languages()
         self.metadata['project_info']['last_updated'] = datetime.now().isoformat()
 
         return self.metadata
 
+    async def refresh_metadata(self, loader):
+        existing = {f['path']: f for f in self.metadata['key_files']}
+        seen = set()
+        changed = []
+        added = []
+        mtimes_updated = False
+
+        for file_path in self.iter_project_files():
+            rel_path = os.path.relpath(file_path, self.project_dir)
+            seen.add(rel_path)
+            entry = existing.get(rel_path)
+            if entry is None:
+                added.append(file_path)
+                continue
+            try:
+                if entry.get('mtime') == os.path.getmtime(file_path):
+                    continue
+                file_hash, mtime = self.get_file_fingerprint(file_path)
+            except OSError:
+                continue
+            if entry.get('hash') == file_hash:
+                # Touched but not modified, just remember the new mtime
+                entry['mtime'] = mtime
+                mtimes_updated = True
+            else:
+                changed.append(file_path)
+
+        removed = [path for path in existing if path not in seen]
+        results = await self.analyze_files(
+            added + changed, loader, "Analyzing changed files")
+        for file_info in results:
+            if file_info:
+                existing[file_info['path']] = file_info
+
+        for path in removed:
+            existing.pop(path, None)
+
+        self.metadata['key_files'] = list(existing.values())
+        self.update_languages()
+        self.metadata['project_info']['last_updated'] = datetime.now().isoformat()
+
+        def tracked(paths):
+            rel_paths = [os.path.relpath(p, self.project_dir) for p in paths]
+            return [p for p in rel_paths if p in existing]
+
+        return {
+            'added': tracked(added),
+            'changed': tracked(changed),
+            'removed': removed,
+            # Touched files only need their new mtime saved
+            'mtimes_updated': mtimes_updated
+        }
+
+    def get_key_files(self):
+        return self.key_file_index.sync(self.metadata.setdefault('key_files', []))
+
+    def update_languages(self):
+        counts = {file_type: count for file_type, count in self.get_key_files().type_counts().items()
+                  if file_type not in ['binary', 'unknown']}
+        if counts:
+            primary_language = max(counts, key=counts.get)
+            self.metadata['environment']['primary_language'] = primary_language
+            self.metadata['environment']['other_languages'] = [
+                file_type for file_type in counts if file_type != primary_language]
+
     def remove_file_metadata(self, filename):
         self.metadata['project_info']['last_updated'] = datetime.now().isoformat()
-        self.metadata['key_files'] = [
-            f for f in self.metadata['key_files'] if f['path'] != filename]
-        self.save_metadata()
+        self.get_key_files().remove(filename)
+        self.record_change(['project_info'], removed=[filename])
 
     def get_file_metadata(self, filename):
-        return next((f for f in self.metadata['key_files'] if f['path'] == filename), None)
-
-    def get_project_context(self):
-        return json.dumps(self.metadata, indent=2)
+        return self.get_key_files().get(filename)
+
+    def find_files_by_type(self, file_type):
+        return self.get_key_files().find_by_type(file_type)
+
+    def find_files_by_export(self, symbol):
+        return self.get_key_files().find_by_export(symbol)
+
+    def get_project_context(self, query=None, token_budget=None):
+        return build_project_context(self.metadata, query, token_budget)
+
+    def get_file_analysis_context(self):
+        # Leave out fields that change between runs (timestamps, per-file entries,
+        # derived languages) so an unchanged file always yields the same prompt
+        # and can be served from the response cache.
+        project_info = {k: v for k, v in self.metadata['project_info'].items()
+                        if k != 'last_updated'}
+        environment = {k: v for k, v in self.metadata['environment'].items()
+                       if k != 'other_languages'}
+        return json.dumps({
+            'project_info': project_info,
+            'environment': environment,
+            'directory_structure': self.metadata['directory_structure'],
+            'dev_server': self.metadata['dev_server']
+        })
 
     def add_external_dependency(self, dependency):
         if dependency not in self.metadata['external_dependencies']:
             self.metadata['external_dependencies'].append(dependency)
-            self.save_metadata()
+            self.record_change(['external_dependencies'])
 
     def update_environment_info(self, primary_language, other_languages, primary_framework, runtime_version):
         self.metadata['environment'].update({
@@ -234,22 +498,24 @@ class ProjectMetadataManager:
             "primary_framework": primary_framework,
             "runtime_version": runtime_version
         })
-        self.save_metadata()
+        self.record_change(['environment'])
 
     def update_file_metadata(self, filename, file_type, content, description=None, exports=None, imports=None):
         self.metadata['project_info']['last_updated'] = datetime.now().isoformat()
-        file_entry = next(
-            (f for f in self.metadata['key_files'] if f['path'] == filename), None)
-        if file_entry is None:
-            file_entry = {'path': filename}
-            self.metadata['key_files'].append(file_entry)
-        file_entry.update({
+        key_files = self.get_key_files()
+        current = key_files.get(filename) or {}
+        fields = {
             'type': file_type,
-            'summary': description or file_entry.get('summary', ''),
+            'summary': description or current.get('summary', ''),
             'exports': exports or [],
             'imports': imports or []
-        })
-        self.save_metadata()
+        }
+        file_path = os.path.join(self.project_dir, filename)
+        if os.path.isfile(file_path):
+            fields['hash'], fields['mtime'] = self.get_file_fingerprint(
+                file_path)
+        file_entry = key_files.update(filename, fields)
+        self.record_change(['project_info'], files=[file_entry])
 
     def update_metadata_from_file(self):
         if os.path.exists(self.metadata_file):
@@ -257,6 +523,10 @@ class ProjectMetadataManager:
                 content = f.read()
             try:
                 new_metadata = json.loads(content)
+            except json.JSONDecodeError:
+                print(f"Error: Invalid JSON content in {self.metadata_file}")
+                return False
+            with self.batch():
                 # Update dev server info if present
                 if 'dev_server' in new_metadata:
                     self.metadata['dev_server'] = new_metadata['dev_server']
@@ -277,8 +547,5 @@ class ProjectMetadataManager:
                         self.update_file_metadata(
                             filename, file_type, file_content, description, exports, imports)
                 self.save_metadata()
-                return True
-            except json.JSONDecodeError:
-                print(f"Error: Invalid JSON content in {self.metadata_file}")
-                return False
+            return True
         return False
@@ -1,79 +1,132 @@
-import functools
-import sys
+import os
 import asyncio
-import time
-from ..api.main import call_dravid_api_with_pagination
-from ..utils.parser import extract_and_parse_xml
-from ..prompts.file_metada_desc_prompts import get_file_metadata_prompt
+import weakref
+from ..api.main import acall_dravid_api_with_pagination, forget_response
+from ..api.rate_limiter import estimate_tokens
+from ..utils.parser import extract_and_parse_xml, parse_batch_metadata_response
+from ..prompts.file_metada_desc_prompts import get_file_metadata_prompt, get_batch_file_metadata_prompt
 from ..utils.utils import print_info, print_error, print_success, print_warning
 
 MAX_CONCURRENT_REQUESTS = 10
-MAX_CALLS_PER_MINUTE = 100
-RATE_LIMIT_PERIOD = 60  # seconds
+DEFAULT_BATCH_TOKEN_BUDGET = 6000  # tokens of file content per batched prompt
+MAX_BATCH_FILES = 20
 
 
 class RateLimiter:
-    def __init__(self, max_calls, period):
-        self.max_calls = max_calls
-        self.period = period
-        self.calls = asyncio.Queue(maxsize=max_calls)
-        self.semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    # Requests/min and tokens/min budgets are enforced per call inside drd.api
+    # (see api/rate_limiter.py); this only bounds how many files are in flight.
+    def __init__(self, max_concurrent=MAX_CONCURRENT_REQUESTS):
+        self.max_concurrent = max_concurrent
+        self._semaphores = weakref.WeakKeyDictionary()
 
-    async def acquire(self):
-        while True:
-            if self.calls.full():
-                oldest_call = await self.calls.get()
-                time_since_oldest_call = time.time() - oldest_call
-                if time_since_oldest_call < self.period:
-                    await asyncio.sleep(self.period - time_since_oldest_call)
-            await self.calls.put(time.time())
-            return
+    @property
+    def semaphore(self):
+        # asyncio primitives belong to one event loop, and every asyncio.run
+        # starts a new one, so keep a semaphore per running loop.
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._semaphores[loop] = semaphore
+        return semaphore
 
 
-rate_limiter = RateLimiter(MAX_CALLS_PER_MINUTE, RATE_LIMIT_PERIOD)
+rate_limiter = RateLimiter()
 
 
-def to_thread(func, *args, **kwargs):
-    if sys.version_info >= (3, 9):
-        return asyncio.to_thread(func, *args, **kwargs)
-    else:
-        loop = asyncio.get_event_loop()
-        return loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+def get_batch_token_budget():
+    try:
+        return int(os.getenv('DRAVID_METADATA_BATCH_TOKENS', DEFAULT_BATCH_TOKEN_BUDGET))
+    except ValueError:
+        return DEFAULT_BATCH_TOKEN_BUDGET
+
+
+def plan_metadata_batches(items, token_budget, max_files=MAX_BATCH_FILES):
+    # items are (key, estimated_tokens) pairs. Files that would take up more
+    # than half a batch on their own are still analyzed one per request.
+    batches = []
+    singles = []
+    current = []
+    current_tokens = 0
+    for key, tokens in items:
+        if token_budget <= 0 or tokens > token_budget // 2:
+            singles.append(key)
+            continue
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_files):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(key)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+
+    singles.extend(batch[0] for batch in batches if len(batch) == 1)
+    return [batch for batch in batches if len(batch) > 1], singles
+
+
+def parse_metadata_fields(root):
+    type_elem = root.find('.//type')
+    summary_elem = root.find('.//summary')
+    exports_elem = root.find('.//exports')
+    imports_elem = root.find('.//imports')
+    file_type = type_elem.text.strip(
+    ) if type_elem is not None and type_elem.text else "unknown"
+    summary = summary_elem.text.strip(
+    ) if summary_elem is not None and summary_elem.text else "No summary available"
+    exports = exports_elem.text.strip(
+    ) if exports_elem is not None and exports_elem.text else ""
+    imports = imports_elem.text.strip(
+    ) if imports_elem is not None and imports_elem.text else ""
+    return file_type, summary, exports, imports
 
 
 async def process_single_file(filename, content, project_context, folder_structure):
     metadata_query = get_file_metadata_prompt(
         filename, content, project_context, folder_structure)
+    response = None
     try:
         async with rate_limiter.semaphore:
-            await rate_limiter.acquire()
-            response = await to_thread(call_dravid_api_with_pagination, metadata_query, include_context=True)
+            response = await acall_dravid_api_with_pagination(metadata_query, include_context=True)
         root = extract_and_parse_xml(response)
-        type_elem = root.find('.//type')
-        summary_elem = root.find('.//summary')
-        exports_elem = root.find('.//exports')
-        imports_elem = root.find('.//imports')  # Added imports_elem
-        file_type = type_elem.text.strip(
-        ) if type_elem is not None and type_elem.text else "unknown"
-        summary = summary_elem.text.strip(
-        ) if summary_elem is not None and summary_elem.text else "No summary available"
-        exports = exports_elem.text.strip(
-        ) if exports_elem is not None and exports_elem.text else ""
-        imports = imports_elem.text.strip(
-        ) if imports_elem is not None and imports_elem.text else ""  # Added imports
+        file_type, summary, exports, imports = parse_metadata_fields(root)
         print_success(f"Processed: {filename}")
-        # Added imports to return tuple
         return filename, file_type, summary, exports, imports
     except Exception as e:
         print_error(f"Error processing {filename}: {e}")
-        # Added empty string for imports in error case
+        if response is not None:
+            forget_response(metadata_query)
         return filename, "unknown", f"Error: {e}", "", ""
 
 
-async def process_files(files, project_context, folder_structure):
+async def process_file_batch(files, project_context, folder_structure):
+    metadata_query = get_batch_file_metadata_prompt(
+        files, project_context, folder_structure)
+    try:
+        async with rate_limiter.semaphore:
+            response = await acall_dravid_api_with_pagination(metadata_query, include_context=True)
+    except Exception as e:
+        print_error(
+            f"Error processing batch of {len(files)} files: {e}")
+        return {}
+    results = {}
+    for filename, metadata in parse_batch_metadata_response(response).items():
+        file_type, summary, exports, imports = parse_metadata_fields(metadata)
+        results[filename] = (filename, file_type, summary, exports, imports)
+        print_success(f"Processed: {filename}")
+    if any(filename not in results for filename, _ in files):
+        # The skipped files are asked about again, so should the batch be
+        forget_response(metadata_query)
+    return results
+
+
+async def process_files(files, project_context, folder_structure, batch_token_budget=0):
     total_files = len(files)
     print_info(
         f"Processing {total_files} files to construct metadata per file")
+
+    if batch_token_budget > 0:
+        return await _process_files_batched(files, project_context, folder_structure, batch_token_budget)
+
     print_info(f"LLM calls to be made: {total_files}")
 
     async def process_batch(batch):
@@ -90,3 +143,30 @@ async def process_files(files, project_context, folder_structure):
         print_info(f"Progress: {len(results)}/{total_files} files processed")
 
     return results
+
+
+async def _process_files_batched(files, project_context, folder_structure, batch_token_budget):
+    batches, singles = plan_metadata_batches(
+        [(i, estimate_tokens(content)) for i, (_, content) in enumerate(files)], batch_token_budget)
+    print_info(f"LLM calls to be made: {len(batches) + len(singles)}")
+    results = [None] * len(files)
+
+    async def run_single(i):
+        filename, content = files[i]
+        results[i] = await process_single_file(filename, content, project_context, folder_structure)
+
+    async def run_batch(indices):
+        answered = await process_file_batch(
+            [files[i] for i in indices], project_context, folder_structure)
+        missing = []
+        for i in indices:
+            if files[i][0] in answered:
+                results[i] = answered[files[i][0]]
+            else:
+                missing.append(i)
+        # Anything the model skipped gets its own request
+        await asyncio.gather(*(run_single(i) for i in missing))
+
+    await asyncio.gather(*(run_single(i) for i in singles),
+                         *(run_batch(batch) for batch in batches))
+    return results
@@ -0,0 +1,41 @@
+import os
+import asyncio
+from .project_metadata import ProjectMetadataManager
+from ..utils.utils import print_info, print_success, print_warning
+from ..utils.loader import Loader
+
+
+async def refresh_project_metadata(project_dir):
+    builder = ProjectMetadataManager(project_dir)
+    if not os.path.exists(builder.metadata_file):
+        print_warning(
+            "No drd.json found. Run 'drd --meta-init' to initialize project metadata first.")
+        return None
+
+    print_info("Refreshing project metadata for new, changed and deleted files...")
+    loader = Loader("Checking files")
+    loader.start()
+    try:
+        changes = await builder.refresh_metadata(loader)
+    finally:
+        loader.stop()
+
+    for label in ['added', 'changed', 'removed']:
+        for path in changes[label]:
+            print_info(f"{label.capitalize()}: {path}", indent=2)
+
+    if not any(changes[label] for label in ['added', 'changed', 'removed']):
+        if changes.get('mtimes_updated'):
+            builder.save_metadata()
+        print_success("Project metadata is already up to date.")
+        return changes
+
+    builder.save_metadata()
+
+    print_success(
+        f"Project metadata refreshed: {len(changes['added'])} added, {len(changes['changed'])} changed, {len(changes['removed'])} removed.")
+    return changes
+
+
+def refresh_project_metadata_sync(current_dir):
+    return asyncio.run(refresh_project_metadata(current_dir))
@@ -0,0 +1,260 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Always skipped, below any .gitignore so a negation can still bring them back
+DEFAULT_IGNORE_PATTERNS = [
+    '.git', 'node_modules/', 'dist/', 'build/', 'venv/', '.venv/',
+    '__pycache__/', '.idea/', '.vscode/'
+]
+# dravid's own files, never part of the project tree
+DRAVID_IGNORE_PATTERNS = ['/drd.json', '/drd.index.json', '/.drd/']
+
+
+class IgnoreRule:
+    def __init__(self, pattern: str, base: str = ''):
+        self.pattern = pattern
+        self.negated = pattern.startswith('!')
+        if self.negated:
+            pattern = pattern[1:]
+        elif pattern.startswith('\\!') or pattern.startswith('\\#'):
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        # A slash anywhere but at the end ties the pattern to its .gitignore
+        anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+
+        prefix = re.escape(base.strip('/') + '/') if base.strip('/') else ''
+        if not anchored:
+            prefix += '(?:.*/)?'
+        self.regex = prefix + _translate(pattern) + ('/' if self.dir_only else '/?')
+
+
+def _translate(pattern: str) -> str:
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**', i) and (i == 0 or pattern[i - 1] == '/'):
+                after = i + 2
+                if after == n:
+                    # "dir/**" matches everything inside dir but not dir itself
+                    out.append('.+' if i else '.*')
+                    i = after
+                    continue
+                if pattern[after] == '/':
+                    out.append('(?:.*/)?')
+                    i = after + 1
+                    continue
+            while i < n and pattern[i] == '*':
+                i += 1
+            out.append('[^/]*')
+            continue
+        if c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            j = i + 1
+            if j < n and pattern[j] in '!^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            j = pattern.find(']', j)
+            if j == -1:
+                out.append('\\[')
+            else:
+                stuff = pattern[i + 1:j].replace('\\', '\\\\')
+                if stuff[0] in '!^':
+                    stuff = '^' + stuff[1:]
+                out.append(f'[{stuff}]')
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+
+def parse_gitignore_lines(lines: Iterable[str], base: str = '') -> List[IgnoreRule]:
+    rules = []
+    for line in lines:
+        line = line.rstrip('\n\r')
+        stripped = line.rstrip()
+        if stripped.endswith('\\') and len(stripped) < len(line):
+            stripped += ' '
+        if not stripped or stripped.startswith('#'):
+            continue
+        rules.append(IgnoreRule(stripped, base))
+    return rules
+
+
+def parse_gitignore(gitignore_path: str, base: str = '') -> List[IgnoreRule]:
+    try:
+        with open(gitignore_path, 'r', encoding='utf-8', errors='ignore') as f:
+            return parse_gitignore_lines(f, base)
+    except OSError:
+        return []
+
+
+class IgnoreMatcher:
+    def __init__(self, rules: List[IgnoreRule]):
+        self.rules = list(rules)
+        self._regex = None
+
+    @property
+    def regex(self):
+        # One alternation, last rule first: the first alternative that matches
+        # is the rule git would apply, and its group says whether it negates.
+        if self._regex is None and self.rules:
+            self._regex = re.compile('|'.join(
+                f'(?P<r{index}>{self.rules[index].regex})'
+                for index in reversed(range(len(self.rules)))))
+        return self._regex
+
+    def extend(self, rules: List[IgnoreRule]) -> 'IgnoreMatcher':
+        return IgnoreMatcher(self.rules + rules) if rules else self
+
+    def match(self, rel_path: str, is_dir: bool = False) -> bool:
+        if not self.rules:
+            return False
+        path = rel_path.replace(os.sep, '/').strip('/')
+        m = self.regex.fullmatch(path + '/' if is_dir else path)
+        return m is not None and not self.rules[int(m.lastgroup[1:])].negated
+
+    def is_ignored(self, rel_path: str, is_dir: bool = False) -> bool:
+        # Nothing below an ignored directory can be re-included
+        parts = rel_path.replace(os.sep, '/').strip('/').split('/')
+        for depth in range(1, len(parts)):
+            if self.match('/'.join(parts[:depth]), True):
+                return True
+        return self.match(rel_path, is_dir)
+
+
+def load_ignore_matcher(root_dir: str, extra_patterns: Iterable[str] = ()) -> IgnoreMatcher:
+    rules = parse_gitignore_lines(DEFAULT_IGNORE_PATTERNS)
+    rules += parse_gitignore(os.path.join(root_dir, '.gitignore'))
+    rules += parse_gitignore_lines(DRAVID_IGNORE_PATTERNS)
+    rules += parse_gitignore_lines(extra_patterns)
+    return IgnoreMatcher(rules)
+
+
+class DirNode:
+    __slots__ = ('name', 'path', 'files', 'dirs', 'mtime', 'ignore_mtime')
+
+    def __init__(self, name: str, path: str = ''):
+        self.name = name
+        self.path = path
+        self.files: List[str] = []
+        self.dirs: List['DirNode'] = []
+        # st_mtime_ns of the directory and of its own .gitignore when listed
+        self.mtime: Optional[int] = None
+        self.ignore_mtime: Optional[int] = None
+
+    def iter_dirs(self) -> Iterator['DirNode']:
+        yield self
+        for child in self.dirs:
+            yield from child.iter_dirs()
+
+    def iter_files(self) -> Iterator[str]:
+        for node in self.iter_dirs():
+            for name in node.files:
+                yield os.path.join(node.path, name)
+
+    def to_dict(self) -> dict:
+        structure = {'files': list(self.files)}
+        if self.dirs or not self.path:
+            structure['directories'] = [child.name for child in self.dirs]
+        for child in self.dirs:
+            structure[child.name] = child.to_dict()
+        return structure
+
+    def to_snapshot(self) -> dict:
+        return {'n': self.name, 'm': self.mtime, 'g': self.ignore_mtime, 'f': self.files,
+                'd': [child.to_snapshot() for child in self.dirs]}
+
+    @classmethod
+    def from_snapshot(cls, data: dict, path: str = '') -> 'DirNode':
+        node = cls(data['n'], path)
+        node.mtime = data.get('m')
+        node.ignore_mtime = data.get('g')
+        node.files = list(data.get('f', []))
+        node.dirs = [cls.from_snapshot(child, os.path.join(path, child['n']))
+                     for child in data.get('d', [])]
+        return node
+
+    def format_tree(self, level: int = 0) -> str:
+        lines = []
+        self._format(level, lines)
+        return '\n'.join(lines)
+
+    def _format(self, level: int, lines: List[str]) -> None:
+        lines.append(f"{' ' * 4 * level}{self.name}/")
+        lines.extend(f"{' ' * 4 * (level + 1)}{name}" for name in self.files)
+        for child in self.dirs:
+            child._format(level + 1, lines)
+
+
+def scan_dir(root_dir: str, node: DirNode, matcher: IgnoreMatcher) -> List[Tuple[DirNode, IgnoreMatcher]]:
+    full_path = os.path.join(root_dir, node.path)
+    try:
+        # Taken before listing, so a change made meanwhile still shows up later
+        node.mtime = os.stat(full_path).st_mtime_ns
+        with os.scandir(full_path) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except OSError:
+        return []
+
+    gitignore = next((entry for entry in entries if entry.name == '.gitignore'), None)
+    if node.path and gitignore is not None:
+        try:
+            node.ignore_mtime = gitignore.stat().st_mtime_ns
+        except OSError:
+            pass
+        matcher = matcher.extend(parse_gitignore(gitignore.path, node.path))
+
+    children = []
+    for entry in entries:
+        rel_path = os.path.join(node.path, entry.name)
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if not is_dir and entry.is_symlink() and entry.is_dir():
+                # Symlinked directories are listed by nobody and never followed
+                continue
+        except OSError:
+            continue
+        if matcher.match(rel_path, is_dir):
+            continue
+        if is_dir:
+            child = DirNode(entry.name, rel_path)
+            node.dirs.append(child)
+            children.append((child, matcher))
+        else:
+            node.files.append(entry.name)
+    return children
+
+
+def scan_subtrees(root_dir: str, level: List[Tuple[DirNode, IgnoreMatcher]],
+                  max_workers: Optional[int] = None) -> None:
+    # Ignored directories are dropped before anyone lists them; the surviving
+    # subtrees of each level are listed in parallel.
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while level:
+            if len(level) == 1:
+                results = [scan_dir(root_dir, *level[0])]
+            else:
+                results = pool.map(lambda item: scan_dir(root_dir, *item), level)
+            level = [child for children in results for child in children]
+
+
+def scan_directory(root_dir: str, matcher: Optional[IgnoreMatcher] = None,
+                   max_workers: Optional[int] = None) -> DirNode:
+    root_dir = os.path.abspath(root_dir)
+    if matcher is None:
+        matcher = load_ignore_matcher(root_dir)
+    root = DirNode(os.path.basename(root_dir))
+    scan_subtrees(root_dir, [(root, matcher)], max_workers)
+    return root
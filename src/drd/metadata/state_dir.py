@@ -0,0 +1,18 @@
+import os
+
+# Per-project working files (tree snapshot, metadata store) live here
+STATE_DIR = '.drd'
+
+
+def get_state_dir(project_dir: str) -> str:
+    return os.path.join(project_dir, STATE_DIR)
+
+
+def ensure_state_dir(project_dir: str) -> str:
+    state_dir = get_state_dir(project_dir)
+    if not os.path.isdir(state_dir):
+        os.makedirs(state_dir, exist_ok=True)
+        # Keeps the folder out of the project's own version control
+        with open(os.path.join(state_dir, '.gitignore'), 'w') as f:
+            f.write("*\n")
+    return state_dir
@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+from .state_dir import get_state_dir, ensure_state_dir
+from .scanner import DirNode, IgnoreMatcher, IgnoreRule, load_ignore_matcher, parse_gitignore, scan_subtrees, scan_dir
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_FILENAME = 'tree.json'
+# A directory modified this close to the scan that listed it may change again
+# within the same mtime tick, so it is listed again on the next refresh
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def is_enabled() -> bool:
+    return os.getenv('DRAVID_TREE_SNAPSHOT', '1').lower() not in ('0', 'false', 'no')
+
+
+def get_signature(matcher: IgnoreMatcher) -> str:
+    digest = hashlib.sha256(f"v{SNAPSHOT_VERSION}".encode('utf-8'))
+    for rule in matcher.rules:
+        digest.update(b'\0' + rule.regex.encode('utf-8') + (b'!' if rule.negated else b''))
+    return digest.hexdigest()
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class FileTreeSnapshot:
+    def __init__(self, root_dir: str, matcher: Optional[IgnoreMatcher] = None):
+        self.root_dir = os.path.abspath(root_dir)
+        self.matcher = matcher or load_ignore_matcher(self.root_dir)
+        self.snapshot_file = os.path.join(get_state_dir(self.root_dir), SNAPSHOT_FILENAME)
+        self.signature = get_signature(self.matcher)
+        self.tree: Optional[DirNode] = None
+        self.scanned_ns = 0
+        self._lock = threading.Lock()
+        self._rules: Dict[Tuple[str, int], List[IgnoreRule]] = {}
+
+    def get_tree(self) -> DirNode:
+        return self.refresh()
+
+    def refresh(self) -> DirNode:
+        with self._lock:
+            if self.tree is None:
+                self.load()
+            if self.tree is None:
+                # Before listing, so creating it does not date the root
+                self.ensure_snapshot_dir()
+            started = time.time_ns()
+            pending = []
+            if self.tree is None:
+                tree = DirNode(os.path.basename(self.root_dir))
+                pending.append((tree, self.matcher))
+            else:
+                tree = self._refresh_node(self.tree, self.matcher, pending)
+            scan_subtrees(self.root_dir, pending)
+
+            # Unchanged subtrees are shared, never modified, so readers of the
+            # previous tree are unaffected
+            if tree is not self.tree:
+                self.tree = tree
+                self.scanned_ns = started
+                self.save()
+            return self.tree
+
+    def _gitignore_rules(self, path: str, mtime: int) -> List[IgnoreRule]:
+        key = (path, mtime)
+        if key not in self._rules:
+            self._rules[key] = parse_gitignore(
+                os.path.join(self.root_dir, path, '.gitignore'), path)
+        return self._rules[key]
+
+    def _refresh_node(self, node: DirNode, matcher: IgnoreMatcher, pending: list) -> DirNode:
+        full_path = os.path.join(self.root_dir, node.path)
+        mtime = _mtime(full_path)
+        if mtime is None:
+            return DirNode(node.name, node.path)
+
+        ignore_mtime = _mtime(os.path.join(full_path, '.gitignore')) if node.path else None
+        if ignore_mtime != node.ignore_mtime:
+            # Its rules changed, so everything below has to be matched again
+            fresh = DirNode(node.name, node.path)
+            pending.append((fresh, matcher))
+            return fresh
+
+        if mtime != node.mtime or node.mtime >= self.scanned_ns - RACY_WINDOW_NS:
+            fresh = DirNode(node.name, node.path)
+            children = scan_dir(self.root_dir, fresh, matcher)
+            previous = {child.name: child for child in node.dirs}
+            fresh.dirs = []
+            for child, child_matcher in children:
+                old = previous.get(child.name)
+                if old is None or fresh.ignore_mtime != node.ignore_mtime:
+                    pending.append((child, child_matcher))
+                    fresh.dirs.append(child)
+                else:
+                    fresh.dirs.append(self._refresh_node(old, child_matcher, pending))
+            return fresh
+
+        if ignore_mtime is not None:
+            matcher = matcher.extend(self._gitignore_rules(node.path, ignore_mtime))
+        dirs = [self._refresh_node(child, matcher, pending) for child in node.dirs]
+        if all(new is old for new, old in zip(dirs, node.dirs)):
+            return node
+        copy = DirNode(node.name, node.path)
+        copy.files = node.files
+        copy.dirs = dirs
+        copy.mtime = node.mtime
+        copy.ignore_mtime = node.ignore_mtime
+        return copy
+
+    def load(self) -> None:
+        if not is_enabled():
+            return
+        try:
+            with open(self.snapshot_file, 'r') as f:
+                data = json.load(f)
+            if data.get('version') != SNAPSHOT_VERSION or data.get('signature') != self.signature:
+                return
+            tree = DirNode.from_snapshot(data['tree'])
+            tree.name = os.path.basename(self.root_dir)
+            self.tree = tree
+            self.scanned_ns = data.get('scanned_ns', 0)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def ensure_snapshot_dir(self) -> None:
+        if not is_enabled():
+            return
+        try:
+            ensure_state_dir(self.root_dir)
+        except OSError:
+            pass
+
+    def save(self) -> None:
+        if not is_enabled():
+            return
+        try:
+            data = {
+                'version': SNAPSHOT_VERSION,
+                'signature': self.signature,
+                'scanned_ns': self.scanned_ns,
+                'tree': self.tree.to_snapshot()
+            }
+            tmp_path = f"{self.snapshot_file}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, self.snapshot_file)
+        except OSError:
+            pass
+
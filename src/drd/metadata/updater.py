@@ -1,5 +1,5 @@
 import asyncio
-from ..api.main import call_dravid_api_with_pagination
+from ..api.main import call_dravid_api_with_pagination, forget_response
 from ..utils.parser import extract_and_parse_xml
 from .project_metadata import ProjectMetadataManager
 from ..utils import print_error, print_success, print_info, print_warning
@@ -10,7 +10,7 @@ from ..prompts.metadata_update_prompts import get_files_to_update_prompt
 async def update_metadata_with_dravid_async(meta_description, current_dir):
     print_info("Updating metadata based on the provided description...")
     metadata_manager = ProjectMetadataManager(current_dir)
-    project_context = metadata_manager.get_project_context()
+    project_context = metadata_manager.get_project_context(meta_description)
 
     ignore_patterns, ignore_message = get_ignore_patterns(current_dir)
     print_info(ignore_message)
@@ -35,6 +35,9 @@ async def update_metadata_with_dravid_async(meta_description, current_dir):
         print_info(
             f"Files identified for processing: {', '.join([file.find('path').text.strip() for file in files_to_process if file.find('path') is not None])}")
 
+        # The LLM calls come first, so the batch below only spans the writes
+        removals = []
+        updates = []
         for file in files_to_process:
             path = file.find('path').text.strip() if file.find(
                 'path') is not None else ""
@@ -46,8 +49,7 @@ async def update_metadata_with_dravid_async(meta_description, current_dir):
                 continue
 
             if action == 'remove':
-                metadata_manager.remove_file_metadata(path)
-                print_success(f"Removed metadata for file: {path}")
+                removals.append(path)
                 continue
 
             found_filename = find_file_with_dravid(
@@ -59,8 +61,21 @@ async def update_metadata_with_dravid_async(meta_description, current_dir):
             try:
                 # Analyze the file
                 file_info = await metadata_manager.analyze_file(found_filename)
+            except Exception as e:
+                print_error(f"Error processing {found_filename}: {str(e)}")
+                continue
+            if file_info:
+                updates.append((file, found_filename, file_info))
+            else:
+                print_warning(f"Could not analyze file: {found_filename}")
 
-                if file_info:
+        with metadata_manager.batch():
+            for path in removals:
+                metadata_manager.remove_file_metadata(path)
+                print_success(f"Removed metadata for file: {path}")
+
+            for file, found_filename, file_info in updates:
+                try:
                     metadata_manager.update_file_metadata(
                         file_info['path'],
                         file_info['type'],
@@ -79,16 +94,15 @@ async def update_metadata_with_dravid_async(meta_description, current_dir):
                             for dep in external_deps.findall('dependency'):
                                 metadata_manager.add_external_dependency(
                                     dep.text.strip())
-                else:
-                    print_warning(f"Could not analyze file: {found_filename}")
 
-            except Exception as e:
-                print_error(f"Error processing {found_filename}: {str(e)}")
+                except Exception as e:
+                    print_error(f"Error processing {found_filename}: {str(e)}")
 
         print_success("Metadata update completed.")
     except Exception as e:
         print_error(f"Error parsing dravid's response: {str(e)}")
         print_error(f"Raw response: {files_response}")
+        forget_response(files_query)
 
 
 def update_metadata_with_dravid(meta_description, current_dir):
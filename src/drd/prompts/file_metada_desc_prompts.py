@@ -73,3 +73,57 @@ examples:
 
 Respond strictly only with the XML response as it will be used for parsing, no other extra words. 
 """
+
+
+def get_batch_file_metadata_prompt(files, project_context, folder_structure):
+    file_sections = "\n".join(
+        f'<file path="{filename}">\n{content}\n</file>' for filename, content in files)
+    return f"""
+{project_context}
+Current folder structure:
+{folder_structure}
+Files:
+{file_sections}
+
+You're the project context maintainer. Your role is to keep relevant meta info about the entire project 
+so it can be used by an AI coding assistant in future for reference.
+
+Based on each file's content, project context, and the current folder structure, 
+please generate appropriate metadata for every file listed above.
+
+Guidelines:
+1. Respond with exactly one <metadata> element per file, with its 'path' attribute set to the file's path exactly as given.
+2. 'type' should be the programming language or file type (e.g., "typescript", "python", "json").
+3. 'summary' should be a concise description of the file's main purpose.
+4. 'exports' should list the exported items with their types (fun: for functions, class: for classes, var: for variables etc).
+5. 'imports' should list imports from other project files, including the path and imported item.
+6. 'external_dependencies' should list external dependencies for dependency management files if the file appears to
+be deps management file (package.json, requirements.txt, Cargo.toml etc).
+7. If there are no exports, use <exports>None</exports> instead of an empty tag.
+8. If there are no imports, use <imports>None</imports> instead of an empty tag.
+9. If there are no external dependencies, omit the <external_dependencies> tag entirely.
+10. Ensure that all other tags (type, summary, exports, imports) are always present and non-empty.
+
+Respond with an XML structure containing the metadata:
+
+<response>
+  <metadata path="src/components/Layout.tsx">
+    <type>typescript</type>
+    <summary>Main layout component</summary>
+    <exports>fun:Layout</exports>
+    <imports>src/components/Footer</imports>
+  </metadata>
+  <metadata path="package.json">
+    <type>json</type>
+    <summary>Node.js project configuration and dependencies</summary>
+    <exports>None</exports>
+    <imports>None</imports>
+    <external_dependencies>
+      <dependency>react@18.2.0</dependency>
+      <dependency>next@13.4.1</dependency>
+    </external_dependencies>
+  </metadata>
+</response>
+
+Respond strictly only with the XML response as it will be used for parsing, no other extra words. 
+"""
@@ -1,39 +1,148 @@
 import re
+import bisect
+import textwrap
+from typing import Dict, List, Optional, Tuple
+
+LINE_CHANGE = re.compile(r'([r\-+])\s*(\d+):(.*)')
+HUNK_HEADER = re.compile(r'@@\s*(?:-?(\d+))?')
+
+Edits = Dict[int, Tuple[str, str]]
+Additions = Dict[int, List[str]]
+
+
+class LineEdits:
+    # Edits keyed by line number of the original file. "r" and "-" act on a
+    # line, additions go before a line (len + 1 is the end of the file), so
+    # every change lands where it was meant however many others come first.
+    def __init__(self, line_count: int):
+        self.line_count = line_count
+        self.edits: Edits = {}
+        self.additions: Additions = {}
+
+    def change(self, line_num: int, action: str, content: str = '') -> None:
+        if not 1 <= line_num <= self.line_count:
+            raise ValueError(f"Line {line_num} is out of range, the file has {self.line_count} lines")
+        edit = (action, content if action == 'r' else '')
+        previous = self.edits.setdefault(line_num, edit)
+        if previous != edit:
+            raise ValueError(f"Conflicting changes to line {line_num}")
+
+    def add(self, line_num: int, content: str) -> None:
+        anchor = min(max(line_num, 1), self.line_count + 1)
+        self.additions.setdefault(anchor, []).append(content)
+
+    def apply(self, lines: List[str]) -> List[str]:
+        result = []
+        for line_num, line in enumerate(lines, start=1):
+            added = self.additions.get(line_num)
+            if added:
+                result.extend(added)
+            edit = self.edits.get(line_num)
+            if edit is None:
+                result.append(line)
+            elif edit[0] == 'r':
+                result.append(edit[1])
+        result.extend(self.additions.get(len(lines) + 1, ()))
+        return result
 
 
 def apply_changes(original_content, changes_str):
+    # Changes are numbered lines ("r 4:text", "- 5:", "+ 6:text") and/or
+    # unified diff hunks ("@@ -12,3 +12,4 @@" followed by " ", "-" and "+"
+    # lines), all applied to the original in one pass.
     original_lines = original_content.split('\n')
-    changes = changes_str.strip().split('\n')
-    deletions = set()
-    replacements = {}
-    additions = []
+    edits = LineEdits(len(original_lines))
+    numbered, hunks = split_hunks(textwrap.dedent(changes_str.rstrip().lstrip('\n')).split('\n'))
 
-    for change in changes:
-        change = change.strip()  # Strip unnecessary spaces
-        match = re.match(r'([r\-+])\s*(\d+):(.*)', change)
-        if match:
-            action = match.group(1)
-            line_num = int(match.group(2))
-            content = match.group(3)  # Do not strip leading spaces here
-            if action == 'r':
-                replacements[line_num] = content
-            elif action == '-':
-                deletions.add(line_num)
-            elif action == '+':
-                additions.append((line_num, content))
-
-    # Apply changes
-    result_lines = []
-    for i, line in enumerate(original_lines, start=1):
-        if i in deletions:
+    anchor = previous = None
+    for change in numbered:
+        match = LINE_CHANGE.match(change.strip())
+        if not match:
             continue
-        if i in replacements:
-            result_lines.append(replacements[i])
+        action, line_num, content = match.group(1), int(match.group(2)), match.group(3)
+        if action == '+':
+            # "+ 4:a" then "+ 5:b" number the new lines themselves: one block before line 4
+            if previous is None or line_num != previous + 1:
+                anchor = line_num
+            previous = line_num
+            edits.add(anchor, content)
+        else:
+            edits.change(line_num, action, content)
+
+    if hunks:
+        apply_hunks(hunks, original_lines, edits)
+    return '\n'.join(edits.apply(original_lines))
+
+
+def split_hunks(changes: List[str]) -> Tuple[List[str], List[Tuple[Optional[int], List[str]]]]:
+    # Numbered changes come first; everything from the first "@@" on is hunks
+    numbered = []
+    hunks = []
+    for change in changes:
+        if change.lstrip().startswith('@@'):
+            match = HUNK_HEADER.match(change.lstrip())
+            hint = int(match.group(1)) if match.group(1) else None
+            hunks.append((hint, []))
+        elif hunks:
+            # Skip "\\ No newline at end of file"
+            if not change.startswith('\\'):
+                hunks[-1][1].append(change)
+        else:
+            numbered.append(change)
+    return numbered, hunks
+
+
+def apply_hunks(hunks: List[Tuple[Optional[int], List[str]]], lines: List[str], edits: LineEdits) -> None:
+    # Each hunk is placed where its context and removed lines match the
+    # original, nearest to the line number in its header. Hunks follow file
+    # order, so the search for each starts after the previous one.
+    positions: Dict[str, List[int]] = {}
+    for line_num, line in enumerate(lines, start=1):
+        positions.setdefault(line.strip(), []).append(line_num)
+
+    start_at = 1
+    for hint, body in hunks:
+        old = [line[1:] for line in body if not line.startswith('+')]
+        if old:
+            line_num = find_hunk(old, lines, positions, hint, start_at)
+        elif hint is not None:
+            line_num = hint
         else:
-            result_lines.append(line)
+            raise ValueError("A hunk without context needs a line number")
+
+        for line in body:
+            if line.startswith('+'):
+                edits.add(line_num, line[1:])
+            else:
+                if line.startswith('-'):
+                    edits.change(line_num, '-')
+                line_num += 1
+        start_at = line_num
 
-    # Apply additions
-    for line_num, content in sorted(additions):
-        result_lines.insert(line_num - 1, content)
 
-    return '\n'.join(result_lines)
+def find_hunk(old: List[str], lines: List[str], positions: Dict[str, List[int]],
+              hint: Optional[int], start_at: int) -> int:
+    # Lines are compared without surrounding whitespace
+    def matches(line_num):
+        return start_at <= line_num and line_num + len(old) - 1 <= len(lines) and all(
+            lines[line_num - 1 + i].strip() == text.strip() for i, text in enumerate(old))
+
+    target = max(hint if hint is not None else start_at, start_at)
+    if matches(target):
+        return target
+    # Look the hunk up by its rarest line, then try the nearest places first
+    offset = min(range(len(old)), key=lambda i: len(positions.get(old[i].strip(), ())))
+    found = positions.get(old[offset].strip(), [])
+    after = bisect.bisect_left(found, target + offset)
+    before = after - 1
+    while before >= 0 or after < len(found):
+        if after < len(found) and (before < 0 or found[after] - target - offset <= target + offset - found[before]):
+            line_num = found[after] - offset
+            after += 1
+        else:
+            line_num = found[before] - offset
+            # Nothing before the previous hunk can match
+            before = before - 1 if line_num > start_at else -1
+        if matches(line_num):
+            return line_num
+    raise ValueError(f"Hunk does not match the file: {old[0].strip()!r}")
@@ -0,0 +1,41 @@
+import os
+import json
+import fnmatch
+from typing import Any, Dict, Iterable, List
+from ..metadata.state_dir import get_state_dir
+
+CONFIG_FILENAME = 'config.json'
+# Anything that could chain, redirect or substitute a second command; a
+# pattern like "npm test*" must never approve "npm test && rm -r src"
+UNSAFE_CHARACTERS = set(';&|<>`$(){}\\\n')
+
+
+def get_config_file(project_dir: str) -> str:
+    # Kept in .drd/, which is not committed, so a cloned project cannot
+    # pre-approve commands for whoever runs dravid in it
+    return os.path.join(get_state_dir(project_dir), CONFIG_FILENAME)
+
+
+def load_project_config(project_dir: str) -> Dict[str, Any]:
+    try:
+        with open(get_config_file(project_dir), 'r') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return config if isinstance(config, dict) else {}
+
+
+def load_allowed_commands(project_dir: str) -> List[str]:
+    patterns = load_project_config(project_dir).get('allowed_commands') or []
+    if not isinstance(patterns, list):
+        return []
+    return [pattern for pattern in patterns if isinstance(pattern, str) and pattern.strip()]
+
+
+def is_allowed_command(command: str, patterns: Iterable[str]) -> bool:
+    if any(c in UNSAFE_CHARACTERS for c in command):
+        return False
+    command = ' '.join(command.split())
+    if not command:
+        return False
+    return any(fnmatch.fnmatchcase(command, ' '.join(pattern.split())) for pattern in patterns)
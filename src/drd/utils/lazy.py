@@ -0,0 +1,16 @@
+import sys
+import importlib
+from typing import Any, Callable, Dict
+
+
+def lazy_exports(module_name: str, exports: Dict[str, str]) -> Callable[[str], Any]:
+    # Returns a module __getattr__ that imports each name from its submodule
+    # (relative to module_name) on first access and caches it on the module,
+    # so importing one submodule of a package does not load them all
+    def __getattr__(name: str) -> Any:
+        if name not in exports:
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(exports[name], module_name), name)
+        setattr(sys.modules[module_name], name, value)
+        return value
+    return __getattr__
@@ -3,6 +3,7 @@ from lxml import etree
 from typing import List, Dict, Any
 import re
 from .utils import print_error
+from .stream_parser import StreamingResponseParser
 
 
 def extract_outermost_xml(response: str) -> str:
@@ -29,39 +30,10 @@ def extract_and_parse_xml(response: str) -> etree.Element:
 
 def parse_dravid_response(response: str) -> List[Dict[str, Any]]:
     try:
-        root = extract_and_parse_xml(response)
-        commands = []
-
-        # Extract explanation
-        explanation = root.find('explanation')
-        if explanation is not None and explanation.text:
-            commands.append({
-                'type': 'explanation',
-                'content': explanation.text.strip()
-            })
-
-        requires_restart = root.find('requires_restart')
-        if requires_restart is not None and requires_restart.text:
-            commands.append({
-                'type': 'requires_restart',
-                'content': requires_restart.text.strip()
-            })
-        # Extract steps
-        for step in root.findall('.//step'):
-            command = {}
-            for tag in ['type', 'operation', 'filename', 'content', 'changes', 'command']:
-                element = step.find(tag)
-                if element is not None:
-                    if tag in ['content', 'changes']:
-                        # Use tostring to preserve CDATA and nested elements
-                        command[tag] = etree.tostring(
-                            element, encoding='unicode', method='text').strip()
-                    else:
-                        command[tag] = element.text.strip(
-                        ) if element.text else ''
-            if command:
-                commands.append(command)
-
+        parser = StreamingResponseParser()
+        commands = parser.feed(response) + parser.close()
+        if not parser.seen_root:
+            raise ValueError("No valid XML response found")
         return commands
     except Exception as e:
         print_error(f"Error parsing dravid response: {e}")
@@ -88,3 +60,13 @@ def parse_find_file_response(response: str):
     except Exception as e:
         print_error(f"Error parsing dravid's response: {str(e)}")
         return None
+
+
+def parse_batch_metadata_response(response: str):
+    try:
+        root = extract_and_parse_xml(response)
+        return {metadata.get('path').strip(): metadata
+                for metadata in root.findall('metadata') if metadata.get('path')}
+    except Exception as e:
+        print_error(f"Error parsing batch metadata response: {e}")
+        return {}
@@ -1,97 +1,57 @@
-import re
 import click
+from .stream_parser import StreamingResponseParser
+
+
+def print_command(command):
+    cmd_type = command.get('type', '').lower()
+    if cmd_type == 'explanation':
+        click.echo(click.style("\nExplanation:",
+                   fg="green", bold=True), nl=False)
+        click.echo(f" {command['content']}")
+    elif cmd_type == 'file':
+        if command.get('operation') and command.get('filename'):
+            click.echo(click.style("\n📂 File Operation:",
+                       fg="yellow", bold=True), nl=False)
+            click.echo(f" {command['operation']} {command['filename']}")
+        content = command.get('content') or command.get('changes')
+        if content:
+            click.echo(click.style(
+                "\n📄 File Content:", fg="cyan", bold=True))
+            click.echo(content)
+    elif cmd_type == 'shell':
+        if command.get('command'):
+            click.echo(click.style("\nShell Command:",
+                       fg="blue", bold=True), nl=False)
+            click.echo(f" {command['command']}")
 
 
 def pretty_print_xml_stream(chunk, state):
-    state['buffer'] += chunk
+    # Prints every command completed by this chunk and returns them so the
+    # caller can use the same parse instead of re-parsing the full response.
+    parser = state.setdefault('parser', StreamingResponseParser())
+    commands = parser.feed(chunk)
+    for command in commands:
+        print_command(command)
+    return commands
 
-    max_iterations = 1000
-    iteration_count = 0
 
-    while iteration_count < max_iterations:
-        iteration_count += 1
-
-        if not state.get('in_step'):
-            # Process explanation tags
-            match = re.search(r'<\s*explanation\s*>(.*?)<\s*/\s*explanation\s*>',
-                              state['buffer'], re.DOTALL | re.IGNORECASE)
-            if match:
-                explanation = match.group(1).strip()
-                click.echo(click.style("\nExplanation:",
-                           fg="green", bold=True), nl=False)
-                click.echo(f" {explanation}")
-                state['buffer'] = state['buffer'][match.end():]
-                continue
-
-            # Look for step start
-            step_start = re.search(
-                r'<\s*step\s*>', state['buffer'], re.IGNORECASE)
-            if step_start:
-                state['in_step'] = True
-                state['buffer'] = state['buffer'][step_start.end():]
-                continue
-
-        if state['in_step']:
-            step_end = re.search(r'<\s*/\s*step\s*>',
-                                 state['buffer'], re.IGNORECASE)
-            if step_end:
-                step_content = state['buffer'][:step_end.start()]
-                state['buffer'] = state['buffer'][step_end.end():]
-                state['in_step'] = False
-
-                # Process step content
-                type_match = re.search(
-                    r'<\s*type\s*>(.*?)<\s*/\s*type\s*>', step_content, re.DOTALL | re.IGNORECASE)
-                if type_match:
-                    step_type = type_match.group(1).strip().lower()
-                    if step_type == 'file':
-                        operation_match = re.search(
-                            r'<\s*operation\s*>(.*?)<\s*/\s*operation\s*>', step_content, re.DOTALL | re.IGNORECASE)
-                        filename_match = re.search(
-                            r'<\s*filename\s*>(.*?)<\s*/\s*filename\s*>', step_content, re.DOTALL | re.IGNORECASE)
-                        if operation_match and filename_match:
-                            operation = operation_match.group(1).strip()
-                            filename = filename_match.group(1).strip()
-                            click.echo(click.style("\n📂 File Operation:",
-                                       fg="yellow", bold=True), nl=False)
-                            click.echo(f" {operation} {filename}")
-
-                        # Process CDATA content
-                        cdata_start = step_content.find("<![CDATA[")
-                        if cdata_start != -1:
-                            cdata_end = step_content.rfind("]]>")
-                            if cdata_end != -1:
-                                cdata_content = step_content[cdata_start+9:cdata_end]
-                                click.echo(click.style(
-                                    "\n📄 File Content:", fg="cyan", bold=True))
-                                click.echo(cdata_content)
-                    elif step_type == 'shell':
-                        command_match = re.search(
-                            r'<\s*command\s*>(.*?)<\s*/\s*command\s*>', step_content, re.DOTALL | re.IGNORECASE)
-                        if command_match:
-                            command = command_match.group(1).strip()
-                            click.echo(click.style("\nShell Command:",
-                                       fg="blue", bold=True), nl=False)
-                            click.echo(f" {command}")
-                continue
-
-        # If we've reached this point, we couldn't process anything in this iteration
-        break
-
-    if iteration_count == max_iterations:
-        print("Debug: Max iterations reached, possible infinite loop detected")
+def finish_xml_stream(state):
+    parser = state.setdefault('parser', StreamingResponseParser())
+    commands = parser.close()
+    for command in commands:
+        print_command(command)
+    return commands
 
 
 def stream_and_print_commands(chunks):
-    state = {
-        'buffer': '',
-        'in_step': False,
-    }
+    state = {}
 
     for chunk in chunks:
         pretty_print_xml_stream(chunk, state)
+    finish_xml_stream(state)
 
-    if state['buffer'].strip():
-        click.echo(f"\nRemaining Content: {state['buffer'].strip()}")
+    remaining = state['parser'].trailing.strip()
+    if remaining:
+        click.echo(f"\nRemaining Content: {remaining}")
 
     click.echo()  # Final newline
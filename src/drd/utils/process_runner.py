@@ -0,0 +1,136 @@
+import os
+import time
+import codecs
+import signal
+import selectors
+import subprocess
+from typing import Callable, Dict, List, Optional, Tuple
+
+READ_SIZE = 65536
+# Idle wake-up used only to notice that the shell exited while a background
+# child it started still holds the pipes open
+EXIT_CHECK_INTERVAL = 0.1
+ORPHAN_DRAIN_SECONDS = 0.5
+KILL_GRACE_SECONDS = 2.0
+
+OutputCallback = Callable[[str, str], None]
+
+
+class CommandResult:
+    def __init__(self, returncode: Optional[int], stdout: str, stderr: str, timed_out: bool = False):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.timed_out = timed_out
+
+
+def start_process(command: str, cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    # Its own process group, so a timeout takes down everything it spawned
+    if os.name == 'posix':
+        group = {'start_new_session': True}
+    else:
+        group = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            env=env, cwd=cwd, **group)
+
+
+def _signal_group(process: subprocess.Popen, force: bool) -> None:
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGKILL if force else signal.SIGTERM)
+        elif force:
+            process.kill()
+        else:
+            process.terminate()
+    except OSError:
+        pass
+
+
+def kill_process_group(process: subprocess.Popen) -> None:
+    _signal_group(process, force=False)
+    try:
+        process.wait(KILL_GRACE_SECONDS)
+    except subprocess.TimeoutExpired:
+        pass
+    # Whatever is left of the group, including children of an exited shell
+    _signal_group(process, force=True)
+    process.wait()
+
+
+def run_command(command: str, cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+                timeout: Optional[float] = None, on_output: Optional[OutputCallback] = None) -> CommandResult:
+    # on_output(stream, text) is called with 'stdout' or 'stderr' as output arrives
+    process = start_process(command, cwd, env)
+    try:
+        if os.name == 'posix':
+            stdout, stderr, timed_out = _drain(process, timeout, on_output)
+        else:
+            stdout, stderr, timed_out = _communicate(process, timeout, on_output)
+    except BaseException:
+        # Ctrl-C does not reach a child in its own session
+        kill_process_group(process)
+        raise
+    finally:
+        process.stdout.close()
+        process.stderr.close()
+    if timed_out:
+        kill_process_group(process)
+    return CommandResult(process.returncode, stdout, stderr, timed_out)
+
+
+def _drain(process: subprocess.Popen, timeout: Optional[float],
+           on_output: Optional[OutputCallback]) -> Tuple[str, str, bool]:
+    deadline = None if timeout is None else time.monotonic() + timeout
+    chunks: Dict[str, List[str]] = {'stdout': [], 'stderr': []}
+    decoders = {name: codecs.getincrementaldecoder('utf-8')(errors='replace') for name in chunks}
+
+    def emit(name, text):
+        if text:
+            chunks[name].append(text)
+            if on_output:
+                on_output(name, text)
+
+    exited_at = None
+    with selectors.DefaultSelector() as selector:
+        selector.register(process.stdout, selectors.EVENT_READ, 'stdout')
+        selector.register(process.stderr, selectors.EVENT_READ, 'stderr')
+        while selector.get_map():
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                return ''.join(chunks['stdout']), ''.join(chunks['stderr']), True
+            if exited_at is not None and now >= exited_at + ORPHAN_DRAIN_SECONDS:
+                break
+            wait = EXIT_CHECK_INTERVAL if deadline is None else min(EXIT_CHECK_INTERVAL, deadline - now)
+            events = selector.select(wait)
+            for key, _ in events:
+                data = os.read(key.fd, READ_SIZE)
+                if data:
+                    emit(key.data, decoders[key.data].decode(data))
+                else:
+                    selector.unregister(key.fileobj)
+            if not events and exited_at is None and process.poll() is not None:
+                exited_at = time.monotonic()
+
+    for name, decoder in decoders.items():
+        emit(name, decoder.decode(b'', final=True))
+    try:
+        process.wait(None if deadline is None else max(0, deadline - time.monotonic()))
+    except subprocess.TimeoutExpired:
+        return ''.join(chunks['stdout']), ''.join(chunks['stderr']), True
+    return ''.join(chunks['stdout']), ''.join(chunks['stderr']), False
+
+
+def _communicate(process: subprocess.Popen, timeout: Optional[float],
+                 on_output: Optional[OutputCallback]) -> Tuple[str, str, bool]:
+    # Pipes cannot be polled here; communicate() still drains both at once
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return '', '', True
+    stdout = stdout.decode('utf-8', errors='replace')
+    stderr = stderr.decode('utf-8', errors='replace')
+    if on_output:
+        for name, text in (('stdout', stdout), ('stderr', stderr)):
+            if text:
+                on_output(name, text)
+    return stdout, stderr, False
@@ -0,0 +1,166 @@
+import os
+import time
+import uuid
+import codecs
+import shutil
+import selectors
+import subprocess
+from typing import Dict, List, Optional
+from .process_runner import CommandResult, OutputCallback, READ_SIZE, kill_process_group
+
+
+def is_enabled() -> bool:
+    return os.getenv('DRAVID_PERSISTENT_SHELL', '').lower() in ('1', 'true', 'yes')
+
+
+def find_shell() -> Optional[str]:
+    if os.name != 'posix':
+        return None
+    return shutil.which('bash') or shutil.which('sh')
+
+
+def quote(text: str) -> str:
+    return "'" + text.replace("'", "'\\''") + "'"
+
+
+class ShellSession:
+    # One long-lived shell for the shell steps of an Executor, so cd, source,
+    # export and shell functions carry over natively. Commands are fed on a
+    # pipe of their own, leaving stdin to the steps, and each one is followed
+    # by a marker line that carries its exit code and working directory.
+    def __init__(self, env: Optional[Dict[str, str]] = None, shell: Optional[str] = None):
+        self.env = env
+        self.shell = shell or find_shell()
+        self.marker = f"__DRD_{uuid.uuid4().hex}__"
+        self.cwd: Optional[str] = None
+        self.process: Optional[subprocess.Popen] = None
+        self._commands = None
+        self._pending: Dict[str, str] = {}
+        self._decoders: Dict[str, codecs.IncrementalDecoder] = {}
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self, cwd: str) -> None:
+        read_fd, write_fd = os.pipe()
+        args = [self.shell, f'/dev/fd/{read_fd}']
+        if os.path.basename(self.shell) == 'bash':
+            args[1:1] = ['--noprofile', '--norc']
+        try:
+            self.process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                            cwd=cwd, env=self.env, pass_fds=(read_fd,),
+                                            start_new_session=True)
+        finally:
+            os.close(read_fd)
+        self._commands = os.fdopen(write_fd, 'w', encoding='utf-8')
+        # The shell reads its script through a copy; keep the original from its children
+        self._commands.write(f"exec {read_fd}<&-\n")
+        self._pending = {'stdout': '', 'stderr': ''}
+        self._decoders = {name: codecs.getincrementaldecoder('utf-8')(errors='replace')
+                          for name in self._pending}
+        self.cwd = cwd
+
+    def run(self, command: str, cwd: str, timeout: Optional[float] = None,
+            on_output: Optional[OutputCallback] = None) -> CommandResult:
+        if not self.alive:
+            self.start(cwd)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        output: Dict[str, List[str]] = {'stdout': [], 'stderr': []}
+
+        def emit(name, text):
+            if text:
+                output[name].append(text)
+                if on_output:
+                    on_output(name, text)
+
+        try:
+            self._commands.write(
+                f"cd -- {quote(cwd)}\n"
+                f"eval {quote(command)}\n"
+                f"printf '%s %s %s\\n' {self.marker} \"$?\" \"$PWD\"\n"
+                f"printf '%s\\n' {self.marker} >&2\n")
+            self._commands.flush()
+            returncode = self._read_until_marker(deadline, emit)
+        except BaseException:
+            self.close()
+            raise
+
+        stdout, stderr = ''.join(output['stdout']), ''.join(output['stderr'])
+        if returncode is None:
+            self.close()
+            return CommandResult(None, stdout, stderr, timed_out=True)
+        if not self.alive:
+            # The step ended the shell itself, e.g. with exit
+            self.close()
+        return CommandResult(returncode, stdout, stderr)
+
+    def _read_until_marker(self, deadline: Optional[float], emit) -> Optional[int]:
+        returncode = None
+        waiting = {'stdout', 'stderr'}
+        streams = {'stdout': self.process.stdout, 'stderr': self.process.stderr}
+        with selectors.DefaultSelector() as selector:
+            for name in waiting:
+                selector.register(streams[name], selectors.EVENT_READ, name)
+            while waiting:
+                wait = None
+                if deadline is not None:
+                    wait = deadline - time.monotonic()
+                    if wait <= 0:
+                        return None
+                for key, _ in selector.select(wait):
+                    name = key.data
+                    data = os.read(key.fd, READ_SIZE)
+                    if not data:
+                        # The shell exited before finishing the step
+                        emit(name, self._pending[name] + self._decoders[name].decode(b'', final=True))
+                        self._pending[name] = ''
+                        selector.unregister(key.fileobj)
+                        waiting.discard(name)
+                        if name == 'stdout':
+                            returncode = self.process.wait()
+                        continue
+                    pending = self._pending[name] + self._decoders[name].decode(data)
+                    index = pending.find(self.marker)
+                    end = pending.find('\n', index) if index != -1 else -1
+                    if end == -1:
+                        # Hold back anything that may be the start of the marker
+                        keep = self._partial_marker(pending) if index == -1 else len(pending) - index
+                        emit(name, pending[:len(pending) - keep])
+                        self._pending[name] = pending[len(pending) - keep:]
+                        continue
+                    emit(name, pending[:index])
+                    # Output left behind by background jobs goes to the next step
+                    self._pending[name] = pending[end + 1:]
+                    selector.unregister(key.fileobj)
+                    waiting.discard(name)
+                    if name == 'stdout':
+                        status, _, cwd = pending[index + len(self.marker):end].strip().partition(' ')
+                        returncode = int(status)
+                        self.cwd = cwd
+        return returncode
+
+    def _partial_marker(self, text: str) -> int:
+        # Length of the longest end of text that the marker starts with
+        for size in range(min(len(text), len(self.marker) - 1), 0, -1):
+            if self.marker.startswith(text[-size:]):
+                return size
+        return 0
+
+    def close(self) -> None:
+        if self._commands is not None:
+            try:
+                self._commands.close()
+            except OSError:
+                pass
+            self._commands = None
+        if self.process is not None:
+            if self.process.poll() is None:
+                try:
+                    self.process.wait(0.5)
+                except subprocess.TimeoutExpired:
+                    pass
+            kill_process_group(self.process)
+            self.process.stdout.close()
+            self.process.stderr.close()
+            self.process = None
@@ -2,15 +2,18 @@ import subprocess
 import click
 import os
 import json
-import time
+from contextlib import contextmanager
 from .utils import print_error, print_success, print_info, print_warning, create_confirmation_box
 from .diff import preview_file_changes
 from .apply_file_changes import apply_changes
+from .process_runner import run_command
+from .command_allowlist import is_allowed_command, load_allowed_commands
+from . import shell_session
 from ..metadata.common_utils import get_ignore_patterns, get_folder_structure
 
 
 class Executor:
-    def __init__(self):
+    def __init__(self, persistent_shell=None):
         self.current_dir = os.getcwd()
         self.allowed_directories = [self.current_dir, '/fake/path']
 
@@ -21,6 +24,26 @@ class Executor:
             'sudo', 'su', 'chown', 'chmod'
         ]
         self.env = os.environ.copy()
+        self.preapproved = False
+        self.allowed_commands = load_allowed_commands(self.initial_dir)
+        if persistent_shell is None:
+            persistent_shell = shell_session.is_enabled()
+        self.shell_session = None
+        if persistent_shell and shell_session.find_shell():
+            self.shell_session = shell_session.ShellSession(self.env)
+
+    def confirm(self, message):
+        # Steps approved up front as part of a plan run without asking again
+        return self.preapproved or click.confirm(message)
+
+    @contextmanager
+    def approved(self):
+        previous = self.preapproved
+        self.preapproved = True
+        try:
+            yield self
+        finally:
+            self.preapproved = previous
 
     def is_safe_path(self, path):
         full_path = os.path.abspath(path)
@@ -49,14 +72,17 @@ class Executor:
             return self.is_safe_rm_command(command)
         return not any(cmd in self.disallowed_commands for cmd in command_parts)
 
+    def is_allowed_command(self, command):
+        return is_allowed_command(command, self.allowed_commands)
+
     def perform_file_operation(self, operation, filename, content=None, force=False):
         full_path = os.path.abspath(os.path.join(self.current_dir, filename))
 
         if not self.is_safe_path(full_path):
-            confirmation_box = create_confirmation_box(
-                filename, f"File operation is being carried out outside of the project directory. {operation.lower()} this file")
-            print(confirmation_box)
-            if not click.confirm(f"Confirm {operation.lower()}"):
+            if not self.preapproved:
+                print(create_confirmation_box(
+                    filename, f"File operation is being carried out outside of the project directory. {operation.lower()} this file"))
+            if not self.confirm(f"Confirm {operation.lower()}"):
                 print_info(f"File {operation.lower()} cancelled by user.")
                 return "Skipping this step"
 
@@ -68,10 +94,10 @@ class Executor:
                 return False
             try:
                 os.makedirs(os.path.dirname(full_path), exist_ok=True)
-                preview = preview_file_changes(
-                    operation, filename, new_content=content)
-                print(preview)
-                if click.confirm("Confirm creation"):
+                if not self.preapproved:
+                    print(preview_file_changes(
+                        operation, filename, new_content=content))
+                if self.confirm("Confirm creation"):
                     with open(full_path, 'w') as f:
                         f.write(content)
                     print_success(f"File created successfully: {filename}")
@@ -93,14 +119,13 @@ class Executor:
 
                 if content:
                     updated_content = apply_changes(original_content, content)
-                    preview = preview_file_changes(
-                        operation, filename, new_content=updated_content, original_content=original_content)
-                    print(preview)
-                    confirmation_box = create_confirmation_box(
-                        filename, f"{operation.lower()} this file")
-                    print(confirmation_box)
-
-                    if click.confirm("Confirm update"):
+                    if not self.preapproved:
+                        print(preview_file_changes(
+                            operation, filename, new_content=updated_content, original_content=original_content))
+                        print(create_confirmation_box(
+                            filename, f"{operation.lower()} this file"))
+
+                    if self.confirm("Confirm update"):
                         with open(full_path, 'w') as f:
                             f.write(updated_content)
                         print_success(f"File updated successfully: {filename}")
@@ -121,10 +146,10 @@ class Executor:
                 print_info(
                     f"Delete operation is only allowed for files: {filename}")
                 return False
-            confirmation_box = create_confirmation_box(
-                filename, f"{operation.lower()} this file")
-            print(confirmation_box)
-            if click.confirm("Confirm deletion"):
+            if not self.preapproved:
+                print(create_confirmation_box(
+                    filename, f"{operation.lower()} this file"))
+            if self.confirm("Confirm deletion"):
                 try:
                     os.remove(full_path)
                     print_success(f"File deleted successfully: {filename}")
@@ -162,17 +187,24 @@ class Executor:
         return get_folder_structure(self.current_dir, ignore_patterns)
 
     def execute_shell_command(self, command, timeout=300):  # 5 minutes timeout
-        if not self.is_safe_command(command):
+        safe = self.is_safe_command(command)
+        if not safe:
             print_warning(f"Please verify the command once: {command}")
 
-        confirmation_box = create_confirmation_box(
-            command, "execute this command")
-        print(confirmation_box)
+        if not self.preapproved:
+            if safe and self.is_allowed_command(command):
+                print_info(f"Running pre-approved command: {command}")
+            else:
+                confirmation_box = create_confirmation_box(
+                    command, "execute this command")
+                print(confirmation_box)
 
-        if not click.confirm("Confirm execution"):
-            print_info("Command execution cancelled by user.")
-            return 'Skipping this step...'
+                if not self.confirm("Confirm execution"):
+                    print_info("Command execution cancelled by user.")
+                    return 'Skipping this step...'
 
+        if self.shell_session is not None:
+            return self._execute_in_session(command, timeout)
         if command.strip().startswith(('cd', 'chdir')):
             return self._handle_cd_command(command)
         elif command.strip().startswith(('source', '.')):
@@ -181,54 +213,64 @@ class Executor:
             return self._execute_single_command(command, timeout)
 
     def _execute_single_command(self, command, timeout):
-        output = []
         try:
-            process = subprocess.Popen(
-                command,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                env=self.env,
-                cwd=self.current_dir
-            )
-
-            start_time = time.time()
-            while True:
-                return_code = process.poll()
-                if return_code is not None:
-                    break
-                if time.time() - start_time > timeout:
-                    process.terminate()
-                    error_message = f"Command timed out after {timeout} seconds: {command}"
-                    print_error(error_message)
-                    raise Exception(error_message)
-
-                line = process.stdout.readline()
-                if line:
-                    print(line.strip())
-                    output.append(line)
-
-                time.sleep(0.1)
+            result = run_command(command, cwd=self.current_dir, env=self.env,
+                                 timeout=timeout, on_output=self._print_output)
+            self._check_result(command, result, timeout)
+            self._update_env_from_command(command)
 
-            stdout, stderr = process.communicate()
-            output.append(stdout)
+            print_success("Command executed successfully.")
+            return result.stdout
 
-            if return_code != 0:
-                error_message = f"Command failed with return code {return_code}\nError output: {stderr}"
-                print_error(error_message)
-                raise Exception(error_message)
+        except Exception as e:
+            error_message = f"Error executing command '{command}': {str(e)}"
+            print_error(error_message)
+            raise Exception(error_message)
 
-            self._update_env_from_command(command)
+    def _execute_in_session(self, command, timeout):
+        try:
+            result = self.shell_session.run(command, self.current_dir, timeout=timeout,
+                                            on_output=self._print_output)
+            if result.timed_out:
+                print_warning("The shell session was restarted; its environment is reset.")
+            else:
+                self._follow_session_dir()
+            self._check_result(command, result, timeout)
 
             print_success("Command executed successfully.")
-            return ''.join(output)
+            return result.stdout
 
         except Exception as e:
             error_message = f"Error executing command '{command}': {str(e)}"
             print_error(error_message)
             raise Exception(error_message)
 
+    def _check_result(self, command, result, timeout):
+        if result.timed_out:
+            error_message = f"Command timed out after {timeout} seconds: {command}"
+            print_error(error_message)
+            raise Exception(error_message)
+
+        if result.returncode != 0:
+            error_message = f"Command failed with return code {result.returncode}\nError output: {result.stderr}"
+            print_error(error_message)
+            raise Exception(error_message)
+
+    def _follow_session_dir(self):
+        # The session is moved back to current_dir before its next command
+        new_dir = self.shell_session.cwd
+        if not new_dir or new_dir == self.current_dir:
+            return
+        if self.is_safe_path(new_dir):
+            os.chdir(new_dir)
+            self.current_dir = new_dir
+            print_info(f"Changed directory to: {self.current_dir}")
+        else:
+            print_error(f"Cannot change to directory: {new_dir}")
+
+    def _print_output(self, stream, text):
+        click.echo(text, nl=False, err=stream == 'stderr')
+
     def _handle_source_command(self, command):
         # Extract the file path from the source command
         _, file_path = command.split(None, 1)
@@ -292,6 +334,10 @@ class Executor:
             print_error(f"Cannot change to directory: {new_dir}")
             return f"Failed to change directory to: {new_dir}"
 
+    def close(self):
+        if self.shell_session is not None:
+            self.shell_session.close()
+
     def reset_directory(self):
         os.chdir(self.initial_dir)
         project_dir = self.current_dir
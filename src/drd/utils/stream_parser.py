@@ -0,0 +1,275 @@
+import re
+from typing import Any, Dict, List, Optional
+from xml.sax.saxutils import unescape
+
+ROOT_TAG = 'response'
+STEP_TAG = 'step'
+STEP_FIELDS = ('type', 'operation', 'filename', 'content', 'changes', 'command')
+TOP_LEVEL_FIELDS = ('explanation', 'requires_restart')
+# File bodies often embed XML or CDATA of their own, so their CDATA section only
+# ends at a "]]>" that is directly followed by the closing tag.
+RAW_FIELDS = ('content', 'changes')
+
+CDATA_START = '<![CDATA['
+CDATA_END = ']]>'
+# How long an unterminated "<..." may get before we stop waiting for its ">"
+MAX_PENDING_TAG = 256
+
+_TAG = re.compile(
+    r'<\s*(/)?\s*([A-Za-z_][\w.:-]*)((?:\s+[\w.:-]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*)\s*(/)?\s*>')
+_CDATA_MARKER = re.compile(r'<!\[CDATA\[|\]\]>')
+_ENTITIES = {'&quot;': '"', '&apos;': "'"}
+
+_CLOSING_TAGS = {name: re.compile(r'\s*<\s*/\s*' + name + r'\s*>', re.IGNORECASE)
+                 for name in RAW_FIELDS}
+
+_STRUCTURE, _FIELD, _CDATA = range(3)
+
+
+# Chunks are fed as they arrive and each command is returned as soon as its
+# element closes, in the shape parse_dravid_response uses. Consumed input is
+# dropped on every feed, so the cost stays linear in the response size.
+class StreamingResponseParser:
+    def __init__(self):
+        self._buf = ''
+        self._pos = 0
+        self._mode = _STRUCTURE
+        self._stack: List[str] = []
+        self._root_closed = False
+        self._step: Optional[Dict[str, Any]] = None
+        self._field: Optional[str] = None
+        self._parts: List[tuple] = []
+        self._cdata_depth = 0
+        self._trailing: List[str] = []
+        self.seen_root = False
+
+    @property
+    def trailing(self) -> str:
+        return ''.join(self._trailing)
+
+    @property
+    def in_step(self) -> bool:
+        return self._step is not None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return self._parse(final=False)
+
+    def close(self) -> List[Dict[str, Any]]:
+        events = self._parse(final=True)
+        self._skip_text(len(self._buf))
+        self._buf, self._pos = '', 0
+        return events
+
+    def _parse(self, final: bool) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        while self._pos < len(self._buf):
+            if self._mode == _CDATA:
+                progressed = self._parse_cdata(final)
+            elif self._mode == _FIELD:
+                progressed = self._parse_field(final, events)
+            else:
+                progressed = self._parse_structure(final, events)
+            if not progressed:
+                break
+        return events
+
+    def _wait_for_more(self, start: int, final: bool) -> bool:
+        return (not final and len(self._buf) - start < MAX_PENDING_TAG
+                and self._buf.find('>', start) == -1)
+
+    def _parse_structure(self, final: bool, events) -> bool:
+        lt = self._buf.find('<', self._pos)
+        if lt == -1:
+            self._skip_text(len(self._buf))
+            return False
+        self._skip_text(lt)
+
+        rest = self._buf[lt:lt + len(CDATA_START)]
+        if CDATA_START.startswith(rest) or rest.startswith('<!') or rest.startswith('<?'):
+            return self._skip_markup(lt, final)
+
+        match = _TAG.match(self._buf, lt)
+        if match is None:
+            if self._wait_for_more(lt, final):
+                return False
+            self._skip_text(lt + 1)
+            return True
+
+        self._pos = match.end()
+        closing, name, self_closing = match.group(1), match.group(2).lower(), match.group(4)
+        if self._root_closed:
+            self._trailing.append(match.group(0))
+        elif closing:
+            self._close_element(name, events)
+        elif not self.seen_root:
+            if name == ROOT_TAG:
+                self.seen_root = True
+                if self_closing:
+                    self._root_closed = True
+                else:
+                    self._stack.append(name)
+        elif self._is_field(name):
+            if self_closing:
+                self._finish_field(name, '', events)
+            else:
+                self._field = name
+                self._parts = []
+                self._mode = _FIELD
+        elif not self_closing:
+            if name == STEP_TAG and self._step is None:
+                self._step = {}
+            self._stack.append(name)
+        return True
+
+    def _skip_text(self, end: int) -> None:
+        if self._root_closed:
+            self._trailing.append(self._buf[self._pos:end])
+        self._pos = end
+
+    def _skip_markup(self, start: int, final: bool) -> bool:
+        # CDATA, comments, processing instructions and doctypes outside fields carry nothing we need
+        if self._buf.startswith(CDATA_START, start):
+            terminator = CDATA_END
+        elif self._buf.startswith('<!--', start):
+            terminator = '-->'
+        elif self._buf.startswith('<?', start):
+            terminator = '?>'
+        elif len(self._buf) - start < len(CDATA_START) and not final:
+            return False
+        else:
+            terminator = '>'
+        end = self._buf.find(terminator, start)
+        if end == -1:
+            if not final:
+                return False
+            end = len(self._buf) - len(terminator)
+        self._skip_text(end + len(terminator))
+        return True
+
+    def _is_field(self, name: str) -> bool:
+        if self._step is not None:
+            return name in STEP_FIELDS and self._stack[-1] == STEP_TAG
+        return name in TOP_LEVEL_FIELDS
+
+    def _close_element(self, name: str, events) -> None:
+        if name not in self._stack:
+            return
+        while self._stack:
+            popped = self._stack.pop()
+            if popped == STEP_TAG and self._step is not None and STEP_TAG not in self._stack:
+                if self._step:
+                    events.append(self._step)
+                self._step = None
+            if popped == name:
+                break
+        if name == ROOT_TAG and not self._stack:
+            self._root_closed = True
+
+    def _parse_field(self, final: bool, events) -> bool:
+        lt = self._buf.find('<', self._pos)
+        if lt == -1:
+            self._parts.append((self._buf[self._pos:], False))
+            self._pos = len(self._buf)
+            return False
+        if lt > self._pos:
+            self._parts.append((self._buf[self._pos:lt], False))
+            self._pos = lt
+
+        rest = self._buf[lt:lt + len(CDATA_START)]
+        if rest == CDATA_START:
+            self._pos = lt + len(CDATA_START)
+            self._cdata_depth = 1
+            self._mode = _CDATA
+            return True
+        if CDATA_START.startswith(rest) and not final:
+            return False
+
+        match = _TAG.match(self._buf, lt)
+        if match and match.group(1):
+            name = match.group(2).lower()
+            # A closing tag of an enclosing element means the field was never closed
+            if name == self._field or name in self._stack:
+                if name == self._field:
+                    self._pos = match.end()
+                self._mode = _STRUCTURE
+                self._finish_field(self._field, self._field_value(), events)
+                return True
+        if match is None and self._wait_for_more(lt, final):
+            return False
+        # Anything else inside a field is literal text, e.g. "a < b" in a command
+        self._parts.append(('<', False))
+        self._pos = lt + 1
+        return True
+
+    def _field_value(self) -> str:
+        value = []
+        text = []
+        for part, is_cdata in self._parts:
+            if is_cdata:
+                value.append(unescape(''.join(text), _ENTITIES))
+                text = []
+                value.append(part)
+            else:
+                text.append(part)
+        value.append(unescape(''.join(text), _ENTITIES))
+        self._parts = []
+        return ''.join(value).strip()
+
+    def _finish_field(self, name: str, value: str, events) -> None:
+        self._field = None
+        if self._step is not None:
+            self._step[name] = value
+        elif value:
+            events.append({'type': name, 'content': value})
+
+    def _parse_cdata(self, final: bool) -> bool:
+        nested = self._field in RAW_FIELDS
+        match = _CDATA_MARKER.search(self._buf, self._pos)
+        if match is None:
+            # Hold back a possible partial marker at the end of the buffer
+            end = len(self._buf) if final else max(
+                self._pos, len(self._buf) - len(CDATA_START))
+            self._parts.append((self._buf[self._pos:end], True))
+            self._pos = end
+            if final:
+                self._mode = _FIELD
+            return False
+
+        self._parts.append((self._buf[self._pos:match.start()], True))
+        marker = match.group(0)
+        if marker == CDATA_START:
+            if nested:
+                self._cdata_depth += 1
+            self._parts.append((marker, True))
+            self._pos = match.end()
+            return True
+
+        if not nested:
+            self._pos = match.end()
+            self._mode = _FIELD
+            return True
+
+        after = match.end()
+        closes = _CLOSING_TAGS[self._field].match(self._buf, after)
+        if closes is None and self._wait_for_more(after, final):
+            self._pos = match.start()
+            return False
+        if closes and self._cdata_depth == 1:
+            self._pos = after
+            self._mode = _FIELD
+            return True
+        self._cdata_depth = max(1, self._cdata_depth - 1)
+        self._parts.append((marker, True))
+        self._pos = after
+        return True
+
+
+def parse_response_stream(chunks) -> List[Dict[str, Any]]:
+    parser = StreamingResponseParser()
+    commands = []
+    for chunk in chunks:
+        commands.extend(parser.feed(chunk))
+    commands.extend(parser.close())
+    return commands
@@ -1,20 +1,30 @@
 import unittest
-from unittest.mock import patch, MagicMock, call
+from unittest.mock import patch, MagicMock, AsyncMock, call
+import os
+import threading
 from drd.api.main import (
     stream_dravid_api,
+    stream_dravid_commands,
     call_dravid_api,
     call_dravid_vision_api,
-    get_api_functions
+    call_dravid_api_with_pagination,
+    get_api_functions,
+    get_async_api_functions,
+    acall_dravid_api_with_pagination,
+    astream_dravid_api,
+    forget_response
 )
+from drd.api import telemetry
 
 
 class TestDravidAPI(unittest.TestCase):
 
     @patch('drd.api.main.get_api_functions')
-    @patch('drd.api.main.pretty_print_xml_stream')
+    @patch('drd.api.main.finish_xml_stream', return_value=[])
+    @patch('drd.api.main.pretty_print_xml_stream', return_value=[])
     @patch('drd.api.main.Loader')
     @patch('click.echo')
-    def test_stream_dravid_api(self, mock_echo, mock_loader, mock_pretty_print, mock_get_api_functions):
+    def test_stream_dravid_api(self, mock_echo, mock_loader, mock_pretty_print, mock_finish, mock_get_api_functions):
         mock_stream_response = MagicMock()
         mock_get_api_functions.return_value = (
             None, None, mock_stream_response)
@@ -28,8 +38,10 @@ class TestDravidAPI(unittest.TestCase):
         # Test when print_chunk is False
         result = stream_dravid_api("test query", print_chunk=False)
         self.assertEqual(result, "".join(xml_res))
-        mock_pretty_print.assert_has_calls(
-            [call(chunk, {'buffer': '', 'in_step': False}) for chunk in xml_res])
+        self.assertEqual([c.args[0] for c in mock_pretty_print.call_args_list], xml_res)
+        # Every chunk shares one parser state
+        self.assertEqual(len({id(c.args[1]) for c in mock_pretty_print.call_args_list}), 1)
+        mock_finish.assert_called_once()
         mock_echo.assert_not_called()
 
         # Reset mocks
@@ -48,6 +60,81 @@ class TestDravidAPI(unittest.TestCase):
                           instruction_prompt="Test prompt", print_chunk=False)
         mock_stream_response.assert_called_with("test query", "Test prompt")
 
+    @patch('drd.api.main.get_api_functions')
+    def test_stream_dravid_commands_yields_steps_while_streaming(self, mock_get_api_functions):
+        second_chunk_requested = threading.Event()
+
+        def stream_response(query, instruction_prompt):
+            yield "<response><steps><step><type>shell</type><command>ls</command></step>"
+            second_chunk_requested.set()
+            yield "<step><type>shell</type><command>pwd</command></step></steps></response>"
+        mock_get_api_functions.return_value = (None, None, stream_response)
+
+        telemetry.reset()
+
+        with telemetry.phase('generation'):
+            commands = stream_dravid_commands("test query")
+
+            self.assertEqual(next(commands), {'type': 'shell', 'command': 'ls'})
+            self.assertEqual(list(commands), [{'type': 'shell', 'command': 'pwd'}])
+        self.assertTrue(second_chunk_requested.is_set())
+        record = telemetry.get_records()[-1]
+        self.assertEqual(record['phase'], 'generation')
+        self.assertIsNotNone(record['ttft_ms'])
+
+    @patch('drd.api.main.get_api_functions')
+    def test_stream_dravid_commands_close_cancels_stream(self, mock_get_api_functions):
+        consumer_done = threading.Event()
+        stream_closed = threading.Event()
+
+        def stream_response(query, instruction_prompt):
+            try:
+                yield "<response><steps><step><type>shell</type><command>ls</command></step>"
+                consumer_done.wait(1)
+                yield "<step><type>shell</type><command>rm</command></step>"
+                yield "</steps></response>"
+            finally:
+                stream_closed.set()
+        mock_get_api_functions.return_value = (None, None, stream_response)
+
+        commands = stream_dravid_commands("test query")
+        self.assertEqual(next(commands)['command'], 'ls')
+        commands.close()
+        consumer_done.set()
+
+        self.assertTrue(stream_closed.wait(1))
+
+    @patch('drd.api.main.get_api_functions')
+    def test_stream_dravid_commands_reraises_stream_errors(self, mock_get_api_functions):
+        def stream_response(query, instruction_prompt):
+            raise ConnectionError("network down")
+            yield
+        mock_get_api_functions.return_value = (None, None, stream_response)
+
+        with self.assertRaises(ConnectionError):
+            list(stream_dravid_commands("test query"))
+
+    @patch('drd.api.main.get_api_functions')
+    @patch('drd.api.main.Loader')
+    @patch('click.echo')
+    def test_stream_dravid_api_reports_commands_as_they_close(self, mock_echo, mock_loader, mock_get_api_functions):
+        xml_res = [
+            "<response><explanation>Plan</explanation><steps><step><type>shell</type>",
+            "<command>npm install</command></step><step><type>file</type><operation>CREATE</operation>",
+            "<filename>a.txt</filename><content><![CDATA[hi]]></content></step></steps></response>"
+        ]
+        mock_get_api_functions.return_value = (None, None, MagicMock(return_value=xml_res))
+        seen = []
+
+        result = stream_dravid_api("test query", on_command=seen.append)
+
+        self.assertEqual(result, "".join(xml_res))
+        self.assertEqual(seen, [
+            {'type': 'explanation', 'content': 'Plan'},
+            {'type': 'shell', 'command': 'npm install'},
+            {'type': 'file', 'operation': 'CREATE', 'filename': 'a.txt', 'content': 'hi'}
+        ])
+
     @patch('drd.api.main.get_api_functions')
     @patch('drd.api.main.parse_dravid_response')
     def test_call_dravid_api(self, mock_parse_response, mock_get_api_functions):
@@ -65,6 +152,60 @@ class TestDravidAPI(unittest.TestCase):
         mock_parse_response.assert_called_once_with(
             "<response><step><type>shell</type><command>echo 'test'</command></step></response>")
 
+    @patch('drd.api.main.response_cache')
+    @patch('drd.api.main.get_api_functions')
+    def test_call_dravid_api_with_pagination_cache_hit(self, mock_get_api_functions, mock_cache):
+        mock_call_api = MagicMock()
+        mock_get_api_functions.return_value = (mock_call_api, None, None)
+        mock_cache.is_enabled.return_value = True
+        mock_cache.get.return_value = "<response>cached</response>"
+
+        telemetry.reset()
+
+        result = call_dravid_api_with_pagination("test query")
+
+        self.assertEqual(result, "<response>cached</response>")
+        mock_call_api.assert_not_called()
+        mock_cache.put.assert_not_called()
+        self.assertTrue(telemetry.get_records()[-1]['response_cache_hit'])
+
+    @patch('drd.api.main.response_cache')
+    @patch('drd.api.main.get_api_functions')
+    def test_call_dravid_api_with_pagination_cache_miss(self, mock_get_api_functions, mock_cache):
+        mock_call_api = MagicMock(return_value="<response>fresh</response>")
+        mock_get_api_functions.return_value = (mock_call_api, None, None)
+        mock_cache.is_enabled.return_value = True
+        mock_cache.get.return_value = None
+
+        result = call_dravid_api_with_pagination("test query")
+
+        self.assertEqual(result, "<response>fresh</response>")
+        mock_call_api.assert_called_once_with("test query", False, None)
+        mock_cache.put.assert_called_once_with(
+            mock_cache.make_key.return_value, "<response>fresh</response>")
+
+    @patch('drd.api.main.response_cache')
+    @patch('drd.api.main.get_api_functions')
+    def test_call_dravid_api_with_pagination_cache_disabled(self, mock_get_api_functions, mock_cache):
+        mock_call_api = MagicMock(return_value="<response>fresh</response>")
+        mock_get_api_functions.return_value = (mock_call_api, None, None)
+        mock_cache.is_enabled.return_value = False
+
+        call_dravid_api_with_pagination("test query")
+
+        mock_cache.get.assert_not_called()
+        mock_cache.put.assert_not_called()
+
+    @patch('drd.api.main.response_cache')
+    def test_forget_response_deletes_cached_entry(self, mock_cache):
+        mock_cache.is_enabled.return_value = True
+
+        forget_response("test query", "Test prompt")
+
+        mock_cache.make_key.assert_called_once_with(
+            'claude', unittest.mock.ANY, "Test prompt", "test query")
+        mock_cache.delete.assert_called_once_with(mock_cache.make_key.return_value)
+
     @patch('drd.api.main.get_api_functions')
     @patch('drd.api.main.parse_dravid_response')
     @patch('builtins.open', new_callable=unittest.mock.mock_open, read_data=b'test image data')
@@ -84,3 +225,37 @@ class TestDravidAPI(unittest.TestCase):
             "test query", "image.jpg", False, None)
         mock_parse_response.assert_called_once_with(
             "<response><step><type>shell</type><command>echo 'test'</command></step></response>")
+
+
+class TestAsyncDravidAPI(unittest.IsolatedAsyncioTestCase):
+
+    @patch.dict(os.environ, {"DRAVID_LLM": "unknown"})
+    def test_get_async_api_functions_unsupported(self):
+        with self.assertRaises(ValueError):
+            get_async_api_functions()
+
+    @patch('drd.api.main.response_cache.is_enabled', return_value=False)
+    @patch('drd.api.main.get_async_api_functions')
+    async def test_acall_dravid_api_with_pagination(self, mock_get_async_api_functions, mock_is_enabled):
+        mock_acall_api = AsyncMock(return_value="<response>ok</response>")
+        mock_get_async_api_functions.return_value = (mock_acall_api, None)
+
+        result = await acall_dravid_api_with_pagination("test query", instruction_prompt="Test prompt")
+
+        self.assertEqual(result, "<response>ok</response>")
+        mock_acall_api.assert_awaited_once_with("test query", False, "Test prompt")
+
+    @patch('drd.api.main.get_async_api_functions')
+    @patch('drd.api.main.pretty_print_xml_stream')
+    async def test_astream_dravid_api(self, mock_pretty_print, mock_get_async_api_functions):
+        xml_res = ["<response><explanation>hi</explanation>", "</response>"]
+
+        async def astream_response(query, instruction_prompt):
+            for chunk in xml_res:
+                yield chunk
+        mock_get_async_api_functions.return_value = (None, astream_response)
+
+        result = await astream_dravid_api("test query")
+
+        self.assertEqual(result, "".join(xml_res))
+        self.assertEqual(mock_pretty_print.call_count, 2)
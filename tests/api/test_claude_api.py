@@ -1,6 +1,7 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import os
+import datetime
 import xml.etree.ElementTree as ET
 from io import BytesIO
 
@@ -12,7 +13,11 @@ from drd.api.claude_api import (
     call_claude_api_with_pagination,
     call_claude_vision_api_with_pagination,
     stream_claude_response,
+    acall_claude_api_with_pagination,
+    astream_claude_response,
 )
+from drd.api.prompt_cache import CACHE_BREAK
+from drd.api import telemetry
 
 
 class TestApiUtils(unittest.TestCase):
@@ -37,7 +42,7 @@ class TestApiUtils(unittest.TestCase):
         self.assertEqual(headers['Content-Type'], 'application/json')
         self.assertEqual(headers['Anthropic-Version'], '2023-06-01')
 
-    @patch('requests.post')
+    @patch('drd.api.http_session.post')
     def test_make_api_call(self, mock_post):
         mock_response = MagicMock()
         mock_post.return_value = mock_response
@@ -50,6 +55,36 @@ class TestApiUtils(unittest.TestCase):
             'https://api.anthropic.com/v1/messages', json=data, headers=headers, stream=False)
         self.assertEqual(response, mock_response)
 
+    @patch('drd.api.claude_api.time.perf_counter', return_value=100.0)
+    @patch('drd.api.http_session.post')
+    def test_make_api_call_times_connect_by_response_headers(self, mock_post, mock_perf_counter):
+        mock_post.return_value = MagicMock(
+            status_code=200, headers={}, elapsed=datetime.timedelta(milliseconds=250))
+        telemetry.reset()
+
+        with telemetry.track_call('call', 'claude') as call:
+            call.started = 99.5
+            make_api_call({"messages": []}, {})
+
+        self.assertEqual(telemetry.get_records()[-1]['connect_ms'], 750.0)
+
+    @patch('drd.api.claude_api.get_rate_limiter')
+    @patch('drd.api.http_session.post')
+    def test_make_api_call_backs_off_on_429(self, mock_post, mock_get_rate_limiter):
+        limited = MagicMock(status_code=429, headers={'retry-after': '1'})
+        ok = MagicMock(status_code=200, headers={
+                       'anthropic-ratelimit-requests-remaining': '10'})
+        mock_post.side_effect = [limited, ok]
+        limiter = mock_get_rate_limiter.return_value
+
+        response = make_api_call({"messages": []}, {})
+
+        self.assertEqual(response, ok)
+        self.assertEqual(limiter.acquire.call_count, 2)
+        limiter.record_rate_limited.assert_called_once_with(limited.headers)
+        limiter.update_from_headers.assert_called_once_with(ok.headers)
+        limited.close.assert_called_once()
+
     def test_parse_response_valid_xml(self):
         xml_response = "<response><content>Test content</content></response>"
         parsed = parse_response(xml_response)
@@ -76,6 +111,22 @@ class TestApiUtils(unittest.TestCase):
         response = call_claude_api_with_pagination(self.query)
         self.assertEqual(response, "<response>Test response</response>")
 
+    @patch('drd.api.claude_api.get_api_key', return_value="test_api_key")
+    @patch('drd.api.claude_api.make_api_call')
+    def test_call_claude_api_marks_cacheable_prefix(self, mock_make_api_call, mock_get_api_key):
+        mock_make_api_call.return_value.json.return_value = {
+            'content': [{'text': "<response/>"}], 'stop_reason': 'end_turn'}
+
+        call_claude_api_with_pagination(
+            f"context{CACHE_BREAK}User query: q", instruction_prompt="instructions")
+
+        data = mock_make_api_call.call_args[0][0]
+        self.assertEqual(data['system'][0]['cache_control'], {'type': 'ephemeral'})
+        self.assertEqual(data['messages'][0]['content'], [
+            {'type': 'text', 'text': "context\n\n", 'cache_control': {'type': 'ephemeral'}},
+            {'type': 'text', 'text': "User query: q"}
+        ])
+
     @patch('drd.api.claude_api.get_api_key')
     @patch('drd.api.claude_api.make_api_call')
     @patch('drd.api.claude_api.convert_to_base64')
@@ -129,3 +180,101 @@ class TestApiUtils(unittest.TestCase):
 
         result = list(stream_claude_response(self.query))
         self.assertEqual(result, ["Test", " stream"])
+
+    @patch('drd.api.claude_api.get_api_key')
+    @patch('drd.api.claude_api.make_api_call')
+    def test_stream_claude_response_continues_truncated_response(self, mock_make_api_call, mock_get_api_key):
+        mock_get_api_key.return_value = self.api_key
+        first = MagicMock()
+        first.iter_lines.return_value = [
+            b'data: {"type": "content_block_delta", "delta": {"text": "<response>\\n  "}}',
+            b'data: {"type": "message_delta", "delta": {"stop_reason": "max_tokens"}}',
+            b'data: {"type": "message_stop"}'
+        ]
+        second = MagicMock()
+        second.iter_lines.return_value = [
+            b'data: {"type": "content_block_delta", "delta": {"text": "\\n  <step/>\\n</response>"}}',
+            b'data: {"type": "message_delta", "delta": {"stop_reason": "end_turn"}}',
+            b'data: {"type": "message_stop"}'
+        ]
+        mock_make_api_call.side_effect = [first, second]
+
+        result = ''.join(stream_claude_response(self.query))
+
+        self.assertEqual(result, "<response>\n  <step/>\n</response>")
+        messages = mock_make_api_call.call_args_list[1][0][0]['messages']
+        self.assertEqual(messages, [
+            {'role': 'user', 'content': self.query},
+            {'role': 'assistant', 'content': '<response>'}
+        ])
+
+
+def _stream_response(lines, status_code=200):
+    response = MagicMock(status_code=status_code, headers={})
+
+    async def aiter_lines():
+        for line in lines:
+            yield line
+    response.aiter_lines = aiter_lines
+    response.aclose = AsyncMock()
+    return response
+
+
+class TestAsyncClaudeApi(unittest.IsolatedAsyncioTestCase):
+
+    @patch('drd.api.claude_api.get_api_key', return_value="test_api_key")
+    @patch('drd.api.claude_api.amake_api_call', new_callable=AsyncMock)
+    async def test_acall_claude_api_with_pagination(self, mock_make_api_call, mock_get_api_key):
+        first = MagicMock()
+        first.json.return_value = {
+            'content': [{'text': "<response>Part one"}], 'stop_reason': 'max_tokens'}
+        second = MagicMock()
+        second.json.return_value = {
+            'content': [{'text': " part two</response>"}], 'stop_reason': 'end_turn'}
+        mock_make_api_call.side_effect = [first, second]
+
+        response = await acall_claude_api_with_pagination("Test query")
+
+        self.assertEqual(
+            response, "<response>Part one part two</response>")
+        self.assertEqual(mock_make_api_call.await_count, 2)
+        messages = mock_make_api_call.call_args_list[1][0][0]['messages']
+        self.assertEqual(messages[-1],
+                         {'role': 'assistant', 'content': "<response>Part one"})
+        self.assertEqual(len(messages), 2)
+
+    @patch('drd.api.claude_api.get_api_key', return_value="test_api_key")
+    @patch('drd.api.http_session.apost', new_callable=AsyncMock)
+    async def test_astream_claude_response(self, mock_apost, mock_get_api_key):
+        response = _stream_response([
+            'data: {"type": "content_block_delta", "delta": {"text": "Test"}}',
+            '',
+            'data: {"type": "content_block_delta", "delta": {"text": " stream"}}',
+            'data: {"type": "message_stop"}'
+        ])
+        mock_apost.return_value = response
+
+        result = [chunk async for chunk in astream_claude_response("Test query")]
+
+        self.assertEqual(result, ["Test", " stream"])
+        self.assertTrue(mock_apost.call_args[1]['json']['stream'])
+        self.assertTrue(mock_apost.call_args[1]['stream'])
+        response.aclose.assert_awaited_once()
+
+    @patch('drd.api.claude_api.get_rate_limiter')
+    @patch('drd.api.claude_api.get_api_key', return_value="test_api_key")
+    @patch('drd.api.http_session.apost', new_callable=AsyncMock)
+    async def test_astream_claude_response_retries_429(self, mock_apost, mock_get_api_key, mock_get_rate_limiter):
+        limited = _stream_response([], status_code=429)
+        ok = _stream_response(['data: {"type": "content_block_delta", "delta": {"text": "ok"}}'])
+        mock_apost.side_effect = [limited, ok]
+        limiter = mock_get_rate_limiter.return_value
+        limiter.aacquire = AsyncMock()
+
+        result = [chunk async for chunk in astream_claude_response("Test query")]
+
+        self.assertEqual(result, ["ok"])
+        self.assertEqual(limiter.aacquire.await_count, 2)
+        limiter.record_rate_limited.assert_called_once_with(limited.headers)
+        limited.aclose.assert_awaited_once()
+        ok.aclose.assert_awaited_once()
@@ -0,0 +1,110 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from drd.api.continuation import (
+    CONTINUE_PROMPT,
+    prefill_messages,
+    follow_up_messages,
+    trim_overlap,
+    stream_with_continuation,
+    astream_with_continuation,
+)
+
+
+def fake_opener(responses):
+    # Each response is (chunks, truncated); records the text each request resumed from
+    calls = []
+
+    def open_stream(previous, state):
+        calls.append(previous)
+        chunks, truncated = responses[len(calls) - 1]
+        for chunk in chunks:
+            yield chunk
+        state['truncated'] = truncated
+    return open_stream, calls
+
+
+class TestContinuation(unittest.TestCase):
+
+    def test_prefill_messages_strips_trailing_whitespace(self):
+        messages = [{'role': 'user', 'content': 'q'}]
+
+        result = prefill_messages(messages, "<response>\n  ")
+
+        self.assertEqual(result[-1], {'role': 'assistant', 'content': '<response>'})
+        self.assertEqual(len(messages), 1)
+
+    def test_follow_up_messages(self):
+        result = follow_up_messages([{'role': 'user', 'content': 'q'}], "partial")
+
+        self.assertEqual(result[1:], [
+            {'role': 'assistant', 'content': 'partial'},
+            {'role': 'user', 'content': CONTINUE_PROMPT}
+        ])
+
+    def test_trim_overlap_drops_repeated_text(self):
+        previous = "def main():\n    print('hello world')"
+        self.assertEqual(trim_overlap(previous, "print('hello world')\n"), "\n")
+
+    def test_trim_overlap_keeps_short_matches(self):
+        self.assertEqual(trim_overlap("<b>x</b>", "</b>more"), "</b>more")
+        self.assertEqual(trim_overlap("", "text"), "text")
+
+    def test_prefill_stream_continues_without_duplication(self):
+        open_stream, calls = fake_opener([
+            (["<response>", "\n  <step>"], True),
+            (["\n  </step>\n", "</response>\n"], False)
+        ])
+
+        result = list(stream_with_continuation(open_stream, prefill=True))
+
+        self.assertEqual(''.join(result),
+                         "<response>\n  <step>\n  </step>\n</response>\n")
+        self.assertEqual(calls, ["", "<response>\n  <step>"])
+
+    def test_follow_up_stream_skips_repeated_text(self):
+        open_stream, calls = fake_opener([
+            (["<content>first line of the file\n"], True),
+            (["first line of the file\n", "second line</content>"], False)
+        ])
+
+        result = ''.join(stream_with_continuation(open_stream))
+
+        self.assertEqual(result,
+                         "<content>first line of the file\nsecond line</content>")
+        self.assertEqual(len(calls), 2)
+
+    @patch('drd.api.continuation.print_warning')
+    @patch.dict(os.environ, {"DRAVID_MAX_CONTINUATIONS": "1"})
+    def test_stops_after_max_continuations(self, mock_print_warning):
+        open_stream, calls = fake_opener([(["a"], True), (["b"], True), (["c"], False)])
+
+        result = list(stream_with_continuation(open_stream, prefill=True))
+
+        self.assertEqual(result, ["a", "b"])
+        self.assertEqual(len(calls), 2)
+        mock_print_warning.assert_called_once()
+
+
+class TestAsyncContinuation(unittest.IsolatedAsyncioTestCase):
+
+    async def test_astream_with_continuation(self):
+        calls = []
+
+        async def open_stream(previous, state):
+            calls.append(previous)
+            if not previous:
+                yield "Part one "
+                state['truncated'] = True
+            else:
+                yield " part two"
+
+        result = [chunk async for chunk in astream_with_continuation(open_stream, prefill=True)]
+
+        self.assertEqual(result, ["Part one", " part two"])
+        self.assertEqual(calls, ["", "Part one"])
+
+
+if __name__ == '__main__':
+    unittest.main()
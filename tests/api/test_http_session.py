@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import threading
+
+from drd.api.http_session import (
+    get_adapter,
+    get_async_client,
+    aclose_async_client,
+    get_session,
+    get_timeout,
+    post,
+    reset_sessions,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT
+)
+
+
+class TestHttpSession(unittest.TestCase):
+
+    def setUp(self):
+        reset_sessions()
+
+    def tearDown(self):
+        reset_sessions()
+
+    def test_session_is_reused_within_thread(self):
+        self.assertIs(get_session(), get_session())
+
+    def test_threads_share_one_adapter(self):
+        sessions = []
+
+        def worker():
+            sessions.append(get_session())
+
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(set(id(s) for s in sessions)), 3)
+        adapters = set(id(s.get_adapter('https://')) for s in sessions)
+        self.assertEqual(adapters, {id(get_adapter())})
+
+    def test_default_pool_size(self):
+        self.assertEqual(get_adapter()._pool_maxsize, DEFAULT_POOL_SIZE)
+
+    @patch.dict(os.environ, {"DRAVID_HTTP_POOL_SIZE": "4", "DRAVID_HTTP_MAX_RETRIES": "7"})
+    def test_configured_pool_and_retries(self):
+        adapter = get_adapter()
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertEqual(adapter.max_retries.total, 7)
+
+    @patch.dict(os.environ, {"DRAVID_HTTP_READ_TIMEOUT": "not-a-number"})
+    def test_invalid_timeout_falls_back_to_default(self):
+        self.assertEqual(get_timeout(), (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT))
+
+    def test_reset_rebuilds_session(self):
+        session = get_session()
+        reset_sessions()
+        self.assertIsNot(get_session(), session)
+
+    @patch('drd.api.http_session.get_session')
+    def test_post_applies_default_timeout(self, mock_get_session):
+        mock_session = MagicMock()
+        mock_get_session.return_value = mock_session
+
+        post("https://example.com", json={"a": 1})
+
+        mock_session.post.assert_called_once_with(
+            "https://example.com", json={"a": 1}, timeout=get_timeout())
+
+    @patch('drd.api.http_session.get_session')
+    def test_post_keeps_explicit_timeout(self, mock_get_session):
+        mock_session = MagicMock()
+        mock_get_session.return_value = mock_session
+
+        post("https://example.com", timeout=5)
+
+        mock_session.post.assert_called_once_with(
+            "https://example.com", timeout=5)
+
+
+class TestAsyncHttpClient(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncTearDown(self):
+        await aclose_async_client()
+
+    async def test_async_client_is_reused_within_loop(self):
+        self.assertIs(get_async_client(), get_async_client())
+
+    async def test_closed_client_is_replaced(self):
+        client = get_async_client()
+        await aclose_async_client()
+        self.assertTrue(client.is_closed)
+        self.assertIsNot(get_async_client(), client)
+
+
+if __name__ == '__main__':
+    unittest.main()
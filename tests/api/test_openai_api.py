@@ -1,17 +1,21 @@
 import unittest
 import requests
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import os
+import asyncio
 from openai import OpenAI, AzureOpenAI
 
 from drd.api.openai_api import (
     get_env_variable,
     get_client,
+    get_async_client,
     get_model,
     parse_response,
     call_api_with_pagination,
     call_vision_api_with_pagination,
     stream_response,
+    acall_api_with_pagination,
+    astream_response,
     DEFAULT_MODEL
 )
 
@@ -38,6 +42,14 @@ class TestOpenAIApiUtils(unittest.TestCase):
         client = get_client()
         self.assertIsInstance(client, OpenAI)
         self.assertEqual(client.api_key, "test_key")
+        # 429s are retried by the rate limiter only
+        self.assertEqual(client.max_retries, 0)
+
+    @patch.dict(os.environ, {"DRAVID_LLM": "openai", "OPENAI_API_KEY": "test_key"})
+    def test_get_async_client_leaves_retries_to_rate_limiter(self):
+        async def make_client():
+            return get_async_client()
+        self.assertEqual(asyncio.run(make_client()).max_retries, 0)
 
     @patch.dict(os.environ, {
         "DRAVID_LLM": "azure",
@@ -104,13 +116,13 @@ class TestOpenAIApiUtils(unittest.TestCase):
         mock_response = MagicMock()
         mock_response.choices[0].message.content = "<response>Test response</response>"
         mock_response.choices[0].finish_reason = 'stop'
-        mock_client.chat.completions.create.return_value = mock_response
+        mock_client.chat.completions.with_raw_response.create.return_value.parse.return_value = mock_response
 
         response = call_api_with_pagination(self.query)
         self.assertEqual(response, "<response>Test response</response>")
 
-        mock_client.chat.completions.create.assert_called_once()
-        call_args = mock_client.chat.completions.create.call_args[1]
+        mock_client.chat.completions.with_raw_response.create.assert_called_once()
+        call_args = mock_client.chat.completions.with_raw_response.create.call_args[1]
         self.assertEqual(call_args['model'], DEFAULT_MODEL)
         self.assertEqual(call_args['messages'][1]['content'], self.query)
 
@@ -130,7 +142,7 @@ class TestOpenAIApiUtils(unittest.TestCase):
         mock_response = MagicMock()
         mock_response.choices[0].message.content = "<response>Test vision response</response>"
         mock_response.choices[0].finish_reason = 'stop'
-        mock_client.chat.completions.create.return_value = mock_response
+        mock_client.chat.completions.with_raw_response.create.return_value.parse.return_value = mock_response
 
         response = call_vision_api_with_pagination(self.query, self.image_path)
         self.assertEqual(response, "<response>Test vision response</response>")
@@ -138,8 +150,8 @@ class TestOpenAIApiUtils(unittest.TestCase):
         # Check if convert_to_base64 was called with the correct argument
         mock_convert_to_base64.assert_called_once_with(self.image_path)
 
-        mock_client.chat.completions.create.assert_called_once()
-        call_args = mock_client.chat.completions.create.call_args[1]
+        mock_client.chat.completions.with_raw_response.create.assert_called_once()
+        call_args = mock_client.chat.completions.with_raw_response.create.call_args[1]
         self.assertEqual(call_args['model'], DEFAULT_MODEL)
         self.assertEqual(call_args['messages'][1]
                          ['content'][0]['type'], 'text')
@@ -166,17 +178,43 @@ class TestOpenAIApiUtils(unittest.TestCase):
             MagicMock(choices=[MagicMock(delta=MagicMock(content=" stream"))]),
             MagicMock(choices=[MagicMock(delta=MagicMock(content=None))])
         ]
-        mock_client.chat.completions.create.return_value = mock_response
+        mock_client.chat.completions.with_raw_response.create.return_value.parse.return_value = mock_response
 
         result = list(stream_response(self.query))
         self.assertEqual(result, ["Test", " stream"])
 
-        mock_client.chat.completions.create.assert_called_once()
-        call_args = mock_client.chat.completions.create.call_args[1]
+        mock_client.chat.completions.with_raw_response.create.assert_called_once()
+        call_args = mock_client.chat.completions.with_raw_response.create.call_args[1]
         self.assertEqual(call_args['model'], DEFAULT_MODEL)
         self.assertEqual(call_args['messages'][1]['content'], self.query)
         self.assertTrue(call_args['stream'])
 
+    @patch('drd.api.openai_api.get_client')
+    @patch('drd.api.openai_api.get_model')
+    def test_stream_response_continues_on_length(self, mock_get_model, mock_get_client):
+        mock_client = MagicMock()
+        mock_get_client.return_value = mock_client
+        mock_get_model.return_value = DEFAULT_MODEL
+
+        def chunk(content, finish_reason=None):
+            return MagicMock(choices=[MagicMock(delta=MagicMock(content=content), finish_reason=finish_reason)])
+        first = MagicMock()
+        first.__iter__.return_value = [
+            chunk("<content>print('hello world')"), chunk(None, 'length')]
+        second = MagicMock()
+        second.__iter__.return_value = [
+            chunk("print('hello world')\n"), chunk("</content>"), chunk(None, 'stop')]
+        mock_client.chat.completions.with_raw_response.create.return_value.parse.side_effect = [
+            first, second]
+
+        result = ''.join(stream_response(self.query))
+
+        self.assertEqual(result, "<content>print('hello world')\n</content>")
+        call_args = mock_client.chat.completions.with_raw_response.create.call_args[1]
+        self.assertEqual(call_args['messages'][2],
+                         {"role": "assistant", "content": "<content>print('hello world')"})
+        self.assertEqual(call_args['messages'][3]['role'], "user")
+
     @patch.dict(os.environ, {"DRAVID_LLM": "ollama", "DRAVID_LLM_MODEL": "starcoder"})
     def test_get_client_ollama(self):
         client = get_client()
@@ -187,7 +225,7 @@ class TestOpenAIApiUtils(unittest.TestCase):
         model = get_model()
         self.assertEqual(model, "starcoder")
 
-    @patch('requests.post')
+    @patch('drd.api.http_session.post')
     @patch.dict(os.environ, {"DRAVID_LLM": "ollama", "DRAVID_LLM_MODEL": "starcoder"})
     def test_call_api_with_pagination_ollama(self, mock_post):
         mock_response = MagicMock()
@@ -213,7 +251,7 @@ class TestOpenAIApiUtils(unittest.TestCase):
         with self.assertRaises(NotImplementedError):
             call_vision_api_with_pagination(self.query, self.image_path)
 
-    @patch('requests.post')
+    @patch('drd.api.http_session.post')
     @patch.dict(os.environ, {"DRAVID_LLM": "ollama", "DRAVID_LLM_MODEL": "starcoder"})
     def test_stream_response_ollama(self, mock_post):
         mock_response = MagicMock()
@@ -238,7 +276,29 @@ class TestOpenAIApiUtils(unittest.TestCase):
             stream=True
         )
 
-    @patch('requests.post')
+    @patch('drd.api.http_session.post')
+    @patch.dict(os.environ, {"DRAVID_LLM": "ollama", "DRAVID_LLM_MODEL": "starcoder"})
+    def test_stream_response_ollama_continues_on_length(self, mock_post):
+        first = MagicMock()
+        first.iter_lines.return_value = [
+            b'{"response":"Part one"}',
+            b'{"done":true,"done_reason":"length","context":[1,2,3]}'
+        ]
+        second = MagicMock()
+        second.iter_lines.return_value = [
+            b'{"response":" part two"}',
+            b'{"done":true,"done_reason":"stop","context":[1,2,3,4]}'
+        ]
+        mock_post.side_effect = [first, second]
+
+        result = ''.join(stream_response(self.query))
+
+        self.assertEqual(result, "Part one part two")
+        continuation = mock_post.call_args_list[1][1]['json']
+        self.assertEqual(continuation['context'], [1, 2, 3])
+        self.assertNotEqual(continuation['prompt'], self.query)
+
+    @patch('drd.api.http_session.post')
     @patch.dict(os.environ, {"DRAVID_LLM": "ollama", "DRAVID_LLM_MODEL": "starcoder"})
     def test_call_api_with_pagination_ollama_error(self, mock_post):
         mock_post.side_effect = requests.RequestException("Ollama API error")
@@ -246,7 +306,7 @@ class TestOpenAIApiUtils(unittest.TestCase):
         with self.assertRaises(requests.RequestException):
             call_api_with_pagination(self.query)
 
-    @patch('requests.post')
+    @patch('drd.api.http_session.post')
     @patch.dict(os.environ, {"DRAVID_LLM": "ollama", "DRAVID_LLM_MODEL": "starcoder"})
     def test_stream_response_ollama_error(self, mock_post):
         mock_post.side_effect = requests.RequestException("Ollama API error")
@@ -255,5 +315,41 @@ class TestOpenAIApiUtils(unittest.TestCase):
             list(stream_response(self.query))
 
 
+class TestAsyncOpenAIApi(unittest.IsolatedAsyncioTestCase):
+
+    @patch('drd.api.openai_api.get_async_client')
+    @patch('drd.api.openai_api.get_model', return_value=DEFAULT_MODEL)
+    @patch.dict(os.environ, {"DRAVID_LLM": "openai"})
+    async def test_acall_api_with_pagination(self, mock_get_model, mock_get_async_client):
+        mock_client = MagicMock()
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "<response>Test response</response>"
+        mock_response.choices[0].finish_reason = 'stop'
+        raw_response = MagicMock()
+        raw_response.parse.return_value = mock_response
+        mock_client.chat.completions.with_raw_response.create = AsyncMock(
+            return_value=raw_response)
+        mock_get_async_client.return_value = mock_client
+
+        response = await acall_api_with_pagination("Test query")
+
+        self.assertEqual(response, "<response>Test response</response>")
+        mock_client.chat.completions.with_raw_response.create.assert_awaited_once()
+
+    @patch('drd.api.openai_api.astream_ollama_response')
+    @patch.dict(os.environ, {"DRAVID_LLM": "ollama", "DRAVID_LLM_MODEL": "starcoder"})
+    async def test_astream_response_ollama(self, mock_astream_ollama_response):
+        async def fake_stream(model, prompt, system_prompt):
+            yield "Test"
+            yield " stream"
+        mock_astream_ollama_response.side_effect = fake_stream
+
+        result = [chunk async for chunk in astream_response("Test query")]
+
+        self.assertEqual(result, ["Test", " stream"])
+        mock_astream_ollama_response.assert_called_once_with(
+            "starcoder", "Test query", "")
+
+
 if __name__ == '__main__':
     unittest.main()
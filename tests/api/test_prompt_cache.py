@@ -0,0 +1,66 @@
+import os
+import unittest
+from unittest.mock import patch, MagicMock
+
+from drd.api.prompt_cache import (
+    CACHE_BREAK,
+    strip_cache_break,
+    claude_system,
+    claude_user_content,
+    record_claude_usage,
+    record_openai_usage,
+    get_stats,
+    reset_stats,
+)
+
+
+class TestPromptCache(unittest.TestCase):
+
+    def setUp(self):
+        reset_stats()
+
+    def test_strip_cache_break(self):
+        self.assertEqual(strip_cache_break(
+            f"context{CACHE_BREAK}User query: q"), "context\n\nUser query: q")
+
+    def test_claude_system_marks_prompt_for_caching(self):
+        self.assertEqual(claude_system("instructions"), [
+            {'type': 'text', 'text': 'instructions', 'cache_control': {'type': 'ephemeral'}}])
+        self.assertEqual(claude_system(""), "")
+
+    def test_claude_user_content_splits_at_breaks(self):
+        blocks = claude_user_content(f"context{CACHE_BREAK}files{CACHE_BREAK}User query: q")
+
+        self.assertEqual([block['text'] for block in blocks],
+                         ["context\n\n", "files\n\n", "User query: q"])
+        self.assertEqual([('cache_control' in block) for block in blocks],
+                         [True, True, False])
+
+    def test_claude_user_content_limits_breakpoints(self):
+        blocks = claude_user_content(CACHE_BREAK.join("abcde"))
+
+        self.assertEqual([('cache_control' in block) for block in blocks],
+                         [False, True, True, True, False])
+
+    def test_claude_user_content_without_break(self):
+        self.assertEqual(claude_user_content("User query: q"), "User query: q")
+
+    @patch.dict(os.environ, {"DRAVID_PROMPT_CACHE": "0"})
+    def test_disabled(self):
+        self.assertEqual(claude_system("instructions"), "instructions")
+        self.assertEqual(claude_user_content(f"a{CACHE_BREAK}b"), "a\n\nb")
+
+    def test_record_usage(self):
+        record_claude_usage({'input_tokens': 10, 'cache_read_input_tokens': 1500,
+                             'cache_creation_input_tokens': 0})
+        usage = MagicMock(prompt_tokens=2000)
+        usage.prompt_tokens_details.cached_tokens = 1024
+        record_openai_usage(usage)
+        record_openai_usage(MagicMock())
+
+        self.assertEqual(get_stats(), {'input_tokens': 3510, 'cached_tokens': 2524,
+                                       'cache_write_tokens': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import unittest
+from unittest.mock import patch
+import os
+import time
+from datetime import datetime, timezone
+
+from drd.api.rate_limiter import (
+    AdaptiveRateLimiter,
+    TokenBucket,
+    parse_reset,
+    get_retry_after,
+    estimate_request_tokens,
+    get_rate_limiter,
+    reset_rate_limiters,
+    MAX_BACKOFF
+)
+
+
+class TestParseReset(unittest.TestCase):
+
+    def test_seconds(self):
+        self.assertEqual(parse_reset("12"), 12)
+        self.assertEqual(parse_reset("1.5"), 1.5)
+
+    def test_openai_durations(self):
+        self.assertEqual(parse_reset("6m0s"), 360)
+        self.assertAlmostEqual(parse_reset("20ms"), 0.02)
+        self.assertEqual(parse_reset("1h2m3s"), 3723)
+
+    def test_rfc3339_timestamp(self):
+        now = time.time()
+        reset_at = datetime.fromtimestamp(now + 30, tz=timezone.utc)
+        value = reset_at.strftime('%Y-%m-%dT%H:%M:%SZ')
+        self.assertAlmostEqual(parse_reset(value, now), 30, delta=1)
+
+    def test_http_date_in_past(self):
+        self.assertEqual(parse_reset("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+
+    def test_invalid(self):
+        self.assertIsNone(parse_reset("soon"))
+        self.assertIsNone(parse_reset(None))
+
+    def test_retry_after_ms_takes_precedence(self):
+        self.assertEqual(get_retry_after(
+            {'retry-after-ms': '250', 'retry-after': '10'}), 0.25)
+        self.assertEqual(get_retry_after({'retry-after': '10'}), 10)
+        self.assertIsNone(get_retry_after({}))
+
+
+class TestEstimateTokens(unittest.TestCase):
+
+    def test_counts_system_and_message_text(self):
+        data = {
+            'system': 'a' * 40,
+            'messages': [
+                {'role': 'user', 'content': 'b' * 40},
+                {'role': 'user', 'content': [
+                    {'type': 'image', 'source': {}},
+                    {'type': 'text', 'text': 'c' * 40}
+                ]}
+            ]
+        }
+        self.assertEqual(estimate_request_tokens(data), 31)
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_reserve_within_capacity(self):
+        bucket = TokenBucket(60)
+        now = bucket.updated
+        self.assertEqual(bucket.reserve(60, now), 0)
+
+    def test_reserve_beyond_capacity_waits_for_refill(self):
+        bucket = TokenBucket(60)  # one per second
+        now = bucket.updated
+        bucket.reserve(60, now)
+        self.assertAlmostEqual(bucket.reserve(2, now), 2)
+
+    def test_refill_is_capped(self):
+        bucket = TokenBucket(60)
+        now = bucket.updated
+        bucket.refill(now + 1000)
+        self.assertEqual(bucket.level, 60)
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+
+    def test_requests_per_minute(self):
+        limiter = AdaptiveRateLimiter(180)  # 3 per second
+        delays = [limiter.reserve() for _ in range(181)]
+        self.assertEqual(delays[179], 0)
+        self.assertAlmostEqual(delays[180], 1 / 3, places=2)
+
+    def test_tokens_per_minute(self):
+        limiter = AdaptiveRateLimiter(1000, tokens_per_minute=600)
+        self.assertEqual(limiter.reserve(600), 0)
+        self.assertAlmostEqual(limiter.reserve(10), 1, places=2)
+
+    def test_headers_adopt_provider_limits(self):
+        limiter = AdaptiveRateLimiter(50)
+        limiter.update_from_headers({
+            'anthropic-ratelimit-requests-limit': '4000',
+            'anthropic-ratelimit-tokens-limit': '400000'
+        })
+        self.assertEqual(limiter.requests.capacity, 4000)
+        self.assertEqual(limiter.tokens.capacity, 400000)
+
+    def test_remaining_caps_level(self):
+        limiter = AdaptiveRateLimiter(60)
+        limiter.update_from_headers({'x-ratelimit-remaining-requests': '0',
+                                     'x-ratelimit-reset-requests': '2s'})
+        self.assertGreater(limiter.reserve(), 1.5)
+
+    def test_rate_limited_uses_retry_after(self):
+        limiter = AdaptiveRateLimiter(1000)
+        delay = limiter.record_rate_limited({'retry-after': '3'})
+        self.assertEqual(delay, 3)
+        self.assertAlmostEqual(limiter.reserve(), 3, delta=0.1)
+
+    def test_rate_limited_backs_off_exponentially(self):
+        limiter = AdaptiveRateLimiter(1000)
+        delays = [limiter.record_rate_limited({}) for _ in range(8)]
+        self.assertEqual(delays[:3], [2, 4, 8])
+        self.assertEqual(delays[-1], MAX_BACKOFF)
+
+    def test_success_resets_backoff(self):
+        limiter = AdaptiveRateLimiter(1000)
+        limiter.record_rate_limited({})
+        limiter.record_rate_limited({})
+        limiter.update_from_headers({})
+        self.assertEqual(limiter.record_rate_limited({}), 2)
+
+    def test_ignores_non_string_headers(self):
+        limiter = AdaptiveRateLimiter(50)
+        limiter.update_from_headers({'x-ratelimit-limit-requests': object()})
+        self.assertEqual(limiter.requests.capacity, 50)
+
+
+class TestGetRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        reset_rate_limiters()
+
+    def tearDown(self):
+        reset_rate_limiters()
+
+    def test_shared_per_provider(self):
+        self.assertIs(get_rate_limiter('claude'), get_rate_limiter('claude'))
+        self.assertIsNot(get_rate_limiter('claude'), get_rate_limiter('openai'))
+
+    @patch.dict(os.environ, {"DRAVID_RATE_LIMIT_RPM": "500", "DRAVID_RATE_LIMIT_TPM": "80000"})
+    def test_configured_from_env(self):
+        limiter = get_rate_limiter('claude')
+        self.assertEqual(limiter.requests.capacity, 500)
+        self.assertEqual(limiter.tokens.capacity, 80000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+from unittest.mock import patch
+import os
+import json
+import time
+import tempfile
+import shutil
+
+from drd.api import response_cache
+from drd.api.response_cache import (
+    make_key,
+    get,
+    put,
+    prune,
+    clear,
+    get_stats,
+    reset_stats,
+    is_enabled,
+    set_enabled
+)
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {"DRAVID_CACHE_DIR": self.cache_dir})
+        self.env.start()
+        response_cache._size_estimate = None
+        reset_stats()
+
+    def tearDown(self):
+        self.env.stop()
+        set_enabled(True)
+        shutil.rmtree(self.cache_dir)
+
+    def test_make_key_depends_on_every_part(self):
+        base = make_key("claude", "model", "system", "query")
+        self.assertEqual(base, make_key("claude", "model", "system", "query"))
+        self.assertNotEqual(base, make_key("openai", "model", "system", "query"))
+        self.assertNotEqual(base, make_key("claude", "other", "system", "query"))
+        self.assertNotEqual(base, make_key("claude", "model", None, "query"))
+        self.assertNotEqual(base, make_key("claude", "model", "system", "other"))
+
+    def test_make_key_parts_do_not_run_together(self):
+        self.assertNotEqual(make_key("a", "b", "cd", "e"),
+                            make_key("a", "b", "c", "de"))
+
+    def test_put_then_get(self):
+        key = make_key("claude", "model", None, "query")
+        self.assertIsNone(get(key))
+        put(key, "<response>cached</response>")
+        self.assertEqual(get(key), "<response>cached</response>")
+        self.assertEqual(get_stats()['hits'], 1)
+        self.assertEqual(get_stats()['misses'], 1)
+        self.assertEqual(get_stats()['writes'], 1)
+
+    @patch.dict(os.environ, {"DRAVID_CACHE_TTL": "10"})
+    def test_expired_entry_is_a_miss(self):
+        key = make_key("claude", "model", None, "query")
+        put(key, "old")
+        path = response_cache._entry_path(key)
+        with open(path, 'w') as f:
+            json.dump({'created': time.time() - 20, 'response': 'old'}, f)
+
+        self.assertIsNone(get(key))
+        self.assertFalse(os.path.exists(path))
+
+    def test_corrupt_entry_is_a_miss(self):
+        key = make_key("claude", "model", None, "query")
+        put(key, "value")
+        with open(response_cache._entry_path(key), 'w') as f:
+            f.write("{not json")
+        self.assertIsNone(get(key))
+
+    def test_prune_evicts_oldest_over_size_limit(self):
+        keys = [make_key("claude", "model", None, f"q{i}") for i in range(3)]
+        for i, key in enumerate(keys):
+            put(key, "x" * 1000)
+            os.utime(response_cache._entry_path(key), (1000 + i, time.time() - 100 + i))
+
+        with patch.dict(os.environ, {"DRAVID_CACHE_MAX_SIZE_MB": str(2500 / (1024 * 1024))}):
+            prune()
+
+        self.assertFalse(os.path.exists(response_cache._entry_path(keys[0])))
+        self.assertTrue(os.path.exists(response_cache._entry_path(keys[2])))
+        self.assertGreaterEqual(get_stats()['evictions'], 1)
+
+    def test_delete(self):
+        key = make_key("claude", "model", None, "query")
+        put(key, "<response>truncated")
+        response_cache.delete(key)
+        self.assertIsNone(get(key))
+        self.assertEqual(response_cache._size_estimate, 0)
+        # Deleting a missing entry is a no-op
+        response_cache.delete(key)
+
+    def test_clear(self):
+        key = make_key("claude", "model", None, "query")
+        put(key, "value")
+        clear()
+        self.assertIsNone(get(key))
+
+    def test_disable(self):
+        self.assertTrue(is_enabled())
+        set_enabled(False)
+        self.assertFalse(is_enabled())
+
+    @patch.dict(os.environ, {"DRAVID_NO_CACHE": "1"})
+    def test_disable_from_env(self):
+        self.assertFalse(is_enabled())
+
+
+if __name__ == '__main__':
+    unittest.main()
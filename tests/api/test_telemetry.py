@@ -0,0 +1,89 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from drd.api import telemetry
+
+
+class TestTelemetry(unittest.TestCase):
+
+    def setUp(self):
+        telemetry.reset()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.telemetry_file = os.path.join(self.tmp_dir, 'calls.jsonl')
+
+    def tearDown(self):
+        telemetry.reset()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_track_call_records_hooks(self):
+        with telemetry.phase('generation'):
+            with telemetry.track_call('stream', 'claude', 'model') as call:
+                telemetry.mark_connected()
+                call.mark_first_token()
+                telemetry.add_retry()
+                telemetry.add_round()
+                telemetry.add_usage(100, 20, cached_tokens=80)
+
+        record = telemetry.get_records()[0]
+        self.assertEqual(record['phase'], 'generation')
+        self.assertEqual((record['rounds'], record['retries']), (1, 1))
+        self.assertEqual((record['input_tokens'], record['output_tokens'],
+                          record['cached_tokens']), (100, 20, 80))
+        self.assertIsNotNone(record['connect_ms'])
+        self.assertLessEqual(record['ttft_ms'], record['total_ms'])
+        self.assertIsNone(record['error'])
+
+    def test_mark_connected_at_headers_time(self):
+        with telemetry.track_call('call', 'claude') as call:
+            telemetry.mark_connected(call.started + 0.2)
+            telemetry.mark_connected()
+
+        self.assertEqual(telemetry.get_records()[0]['connect_ms'], 200.0)
+
+    def test_hooks_outside_call_are_ignored(self):
+        telemetry.add_round()
+        telemetry.add_usage(10, 10)
+        self.assertEqual(telemetry.get_records(), [])
+
+    def test_track_call_records_errors(self):
+        with self.assertRaises(ValueError):
+            with telemetry.track_call('call', 'openai'):
+                raise ValueError("boom")
+
+        self.assertEqual(telemetry.get_records()[0]['error'], 'ValueError')
+
+    def test_writes_json_lines(self):
+        with patch.dict(os.environ, {'DRAVID_TELEMETRY_FILE': self.telemetry_file}):
+            with telemetry.track_call('call', 'claude'):
+                pass
+            with telemetry.track_call('stream', 'claude'):
+                pass
+
+        with open(self.telemetry_file) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([line['operation'] for line in lines], ['call', 'stream'])
+
+    def test_summarize_by_phase(self):
+        records = [
+            {'phase': 'file_selection', 'total_ms': 500.0, 'input_tokens': 10,
+             'response_cache_hit': True},
+            {'phase': 'generation', 'total_ms': 9000.0, 'input_tokens': 100, 'retries': 1},
+            {'phase': 'generation', 'total_ms': 1000.0, 'input_tokens': 50},
+        ]
+
+        phases = telemetry.summarize(records)
+
+        self.assertEqual([totals['phase'] for totals in phases],
+                         ['generation', 'file_selection'])
+        self.assertEqual(phases[0]['calls'], 2)
+        self.assertEqual(phases[0]['total_ms'], 10000.0)
+        self.assertEqual(phases[0]['input_tokens'], 150)
+        self.assertEqual(phases[1]['response_cache_hits'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
+import os
 import asyncio
+import threading
 import unittest
-from unittest.mock import patch, MagicMock, call, mock_open
+from unittest.mock import patch, MagicMock, AsyncMock, call, mock_open
 import xml.etree.ElementTree as ET
 
 from drd.cli.query.dynamic_command_handler import (
@@ -80,7 +82,7 @@ class TestDynamicCommandHandler(unittest.TestCase):
         # cmd, self.metadata_manager, self.executor)
 
     @patch('drd.cli.query.dynamic_command_handler.generate_file_description')
-    async def test_update_file_metadata(self, mock_generate_description):
+    def test_update_file_metadata(self, mock_generate_description):
         cmd = {'filename': 'test.txt', 'content': 'Test content'}
         mock_file_info = {
             'path': 'test.txt',
@@ -90,9 +92,9 @@ class TestDynamicCommandHandler(unittest.TestCase):
             'imports': [],
             'xml_response': '<response><file_info></file_info></response>'
         }
-        self.metadata_manager.analyze_file.return_value = mock_file_info
+        self.metadata_manager.analyze_file = AsyncMock(return_value=mock_file_info)
 
-        await update_file_metadata(cmd, self.metadata_manager, self.executor)
+        update_file_metadata(cmd, self.metadata_manager, self.executor)
 
         self.metadata_manager.analyze_file.assert_called_once_with('test.txt')
         self.metadata_manager.update_file_metadata.assert_called_once_with(
@@ -268,3 +270,177 @@ class TestDynamicCommandHandler(unittest.TestCase):
         self.assertIn("Error executing command", output)
         self.assertIn("Unknown command type: unknown", output)
         mock_print_error.assert_called_once()
+
+    @patch('drd.cli.query.dynamic_command_handler.print_debug')
+    @patch('drd.cli.query.dynamic_command_handler.print_error')
+    def test_execute_commands_from_stream_stops_at_failure(self, mock_print_error, mock_print_debug):
+        pulled = []
+
+        def streamed_commands():
+            for cmd in [{'type': 'shell', 'command': 'ok'},
+                        {'type': 'shell', 'command': 'fails'},
+                        {'type': 'shell', 'command': 'never'}]:
+                pulled.append(cmd['command'])
+                yield cmd
+
+        def run_shell(cmd, executor):
+            if cmd['command'] == 'fails':
+                raise Exception("boom")
+            return "done"
+
+        with patch('drd.cli.query.dynamic_command_handler.handle_shell_command', side_effect=run_shell):
+            success, steps_completed, error, output = execute_commands(
+                streamed_commands(), self.executor, self.metadata_manager, debug=True)
+
+        self.assertFalse(success)
+        self.assertEqual(steps_completed, 2)
+        self.assertEqual(pulled, ['ok', 'fails'])
+        self.assertIn("Step 2: Error executing command", output)
+        mock_print_debug.assert_called_with("Completed step 1")
+
+
+@patch.dict(os.environ, {'DRAVID_PLAN_REVIEW': '1'})
+@patch('drd.cli.query.dynamic_command_handler.print_info')
+@patch('drd.cli.query.dynamic_command_handler.print_success')
+class TestPlanReviewExecution(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = MagicMock()
+        self.metadata_manager = MagicMock()
+        self.commands = [{'type': 'shell', 'command': 'npm install'},
+                         {'type': 'shell', 'command': 'npm test'},
+                         {'type': 'file', 'operation': 'DELETE', 'filename': 'old.js'}]
+
+    @patch('drd.cli.query.dynamic_command_handler.plan_review.review_plan', return_value={0, 2})
+    def test_only_reviewed_steps_run_without_further_prompts(self, mock_review, *_):
+        self.executor.perform_file_operation.return_value = True
+
+        success, steps_completed, _, output = execute_commands(
+            self.commands, self.executor, self.metadata_manager)
+
+        self.assertTrue(success)
+        self.assertEqual(steps_completed, 3)
+        mock_review.assert_called_once_with(self.commands, [0, 1, 2], self.executor)
+        self.executor.approved.assert_called_once()
+        self.executor.execute_shell_command.assert_called_once_with('npm install')
+        self.executor.perform_file_operation.assert_called_once()
+        self.assertIn("Step 2/3: Skipping this step", output)
+
+    @patch('drd.cli.query.dynamic_command_handler.plan_review.review_plan', return_value=None)
+    def test_cancelled_review_runs_nothing(self, mock_review, *_):
+        success, _, _, output = execute_commands(self.commands, self.executor, self.metadata_manager)
+
+        self.assertTrue(success)
+        self.executor.execute_shell_command.assert_not_called()
+        self.executor.perform_file_operation.assert_not_called()
+        self.assertIn("Step 3/3: Skipping this step", output)
+
+    @patch('drd.cli.query.dynamic_command_handler.plan_review.review_plan')
+    def test_review_can_be_turned_off_per_call(self, mock_review, *_):
+        execute_commands(self.commands[:1], self.executor, self.metadata_manager, review=False)
+        mock_review.assert_not_called()
+        self.executor.approved.assert_not_called()
+
+
+@patch.dict(os.environ, {'DRAVID_PARALLEL_STEPS': '4'})
+@patch('drd.cli.query.dynamic_command_handler.print_info')
+@patch('drd.cli.query.dynamic_command_handler.print_success')
+@patch('drd.cli.query.dynamic_command_handler.print_error')
+class TestParallelExecution(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = MagicMock()
+        self.executor.current_dir = '/project'
+        self.executor.is_safe_command.return_value = True
+        self.executor.is_safe_path.return_value = True
+        self.executor.is_allowed_command.return_value = False
+        self.metadata_manager = MagicMock()
+
+    @patch('drd.cli.query.plan_review.click.prompt', return_value='a')
+    def test_independent_files_run_concurrently_after_one_approval(self, mock_prompt, *_):
+        commands = [{'type': 'file', 'operation': 'CREATE', 'filename': f'f{i}.py', 'content': ''}
+                    for i in range(3)]
+        barrier = threading.Barrier(3, timeout=5)
+
+        def perform(operation, filename, content, force=False):
+            barrier.wait()
+            return True
+        self.executor.perform_file_operation.side_effect = perform
+        self.metadata_manager.analyze_file = AsyncMock(
+            side_effect=lambda filename: {'path': filename, 'type': 'python', 'summary': 's',
+                                          'exports': [], 'imports': []})
+
+        success, steps_completed, error, output = execute_commands(
+            commands, self.executor, self.metadata_manager)
+
+        self.assertTrue(success)
+        self.assertEqual(steps_completed, 3)
+        mock_prompt.assert_called_once()
+        self.executor.approved.assert_called_once()
+        # Metadata is recorded on this thread, in step order
+        self.assertEqual([c.args[0] for c in self.metadata_manager.update_file_metadata.call_args_list],
+                         ['f0.py', 'f1.py', 'f2.py'])
+        self.assertLess(output.index("Step 1/3"), output.index("Step 3/3"))
+
+    @patch('drd.cli.query.plan_review.click.prompt', return_value='n')
+    def test_declined_plan_skips_every_step(self, mock_prompt, *_):
+        commands = [{'type': 'shell', 'command': 'npm install'},
+                    {'type': 'file', 'operation': 'CREATE', 'filename': 'a.js', 'content': ''}]
+
+        success, _, _, output = execute_commands(commands, self.executor, self.metadata_manager)
+
+        self.assertTrue(success)
+        self.executor.execute_shell_command.assert_not_called()
+        self.executor.perform_file_operation.assert_not_called()
+        self.assertIn("Step 2/2: Skipping this step", output)
+
+    @patch('drd.cli.query.plan_review.click.prompt', return_value='a')
+    def test_failure_reports_first_failed_step_and_marks_completed(self, mock_prompt, *_):
+        commands = [{'type': 'file', 'operation': 'CREATE', 'filename': 'ok.py', 'content': ''},
+                    {'type': 'file', 'operation': 'CREATE', 'filename': 'bad.py', 'content': ''},
+                    {'type': 'file', 'operation': 'CREATE', 'filename': 'later.py', 'content': ''}]
+        self.executor.perform_file_operation.side_effect = \
+            lambda operation, filename, content, force=False: filename != 'bad.py'
+        self.metadata_manager.analyze_file = AsyncMock(return_value=None)
+
+        success, step_completed, error, output = execute_commands(
+            commands, self.executor, self.metadata_manager)
+
+        self.assertFalse(success)
+        self.assertEqual(step_completed, 2)
+        self.assertIn("bad.py", error)
+        self.assertTrue(commands[0].get('completed'))
+        self.assertFalse(commands[1].get('completed'))
+        # Started alongside the failed step, so it finished too
+        self.assertTrue(commands[2].get('completed'))
+
+        # Continuing after a fix does not run a completed step again
+        self.executor.perform_file_operation.reset_mock()
+        self.executor.perform_file_operation.side_effect = None
+        self.executor.perform_file_operation.return_value = True
+        success, _, _, output = execute_commands(
+            commands[step_completed:], self.executor, self.metadata_manager)
+        self.assertTrue(success)
+        self.executor.perform_file_operation.assert_not_called()
+
+    @patch('drd.cli.query.dynamic_command_handler.handle_metadata_operation', return_value="ok")
+    @patch('drd.cli.query.plan_review.click.prompt', return_value='a')
+    def test_barriers_run_on_calling_thread(self, mock_prompt, mock_metadata, *_):
+        threads = []
+        mock_metadata.side_effect = lambda cmd, manager: threads.append(threading.current_thread()) or "ok"
+        commands = [{'type': 'file', 'operation': 'UPDATE', 'filename': 'a.py', 'content': 'x'},
+                    {'type': 'metadata', 'operation': 'UPDATE_FILE', 'filename': 'a.py'}]
+        self.executor.perform_file_operation.return_value = True
+        self.metadata_manager.analyze_file = AsyncMock(return_value=None)
+
+        success, _, _, _ = execute_commands(commands, self.executor, self.metadata_manager)
+
+        self.assertTrue(success)
+        self.assertEqual(threads, [threading.current_thread()])
+
+    def test_streamed_steps_stay_sequential(self, *_):
+        steps = iter([{'type': 'explanation', 'content': 'hi'}])
+        with patch('drd.cli.query.dynamic_command_handler.execute_commands_in_parallel') as mock_parallel:
+            success, _, _, _ = execute_commands(steps, self.executor, self.metadata_manager)
+        self.assertTrue(success)
+        mock_parallel.assert_not_called()
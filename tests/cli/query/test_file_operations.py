@@ -16,13 +16,40 @@ class TestFileOperations(unittest.TestCase):
         query = "Update the main function"
         mock_call_api.return_value = "<response><files><file>main.py</file><file>utils.py</file></files></response>"
         mock_parse_response.return_value = ['main.py', 'utils.py']
+        metadata_manager = MagicMock()
+        metadata_manager.get_file_index.return_value.select_files.return_value = []
 
-        result = get_files_to_modify(query, self.project_context)
+        result = get_files_to_modify(
+            query, self.project_context, metadata_manager)
 
         mock_call_api.assert_called_once()
         mock_parse_response.assert_called_once_with(mock_call_api.return_value)
         self.assertEqual(result, ['main.py', 'utils.py'])
 
+    @patch('drd.cli.query.file_operations.call_dravid_api_with_pagination')
+    def test_get_files_to_modify_uses_local_index(self, mock_call_api):
+        metadata_manager = MagicMock()
+        metadata_manager.get_file_index.return_value.select_files.return_value = [
+            'src/checkout.py']
+
+        result = get_files_to_modify(
+            "fix checkout", self.project_context, metadata_manager)
+
+        self.assertEqual(result, ['src/checkout.py'])
+        mock_call_api.assert_not_called()
+
+    @patch.dict('os.environ', {'DRAVID_FILE_SELECTION_LLM_FALLBACK': '0'})
+    @patch('drd.cli.query.file_operations.call_dravid_api_with_pagination')
+    def test_get_files_to_modify_without_llm_fallback(self, mock_call_api):
+        metadata_manager = MagicMock()
+        metadata_manager.get_file_index.return_value.select_files.return_value = []
+
+        result = get_files_to_modify(
+            "something unrelated", self.project_context, metadata_manager)
+
+        self.assertEqual(result, [])
+        mock_call_api.assert_not_called()
+
     @patch('os.path.exists')
     @patch('drd.cli.query.file_operations.ProjectMetadataManager')
     @patch('drd.cli.query.file_operations.call_dravid_api_with_pagination')
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+from drd.cli.query.plan_review import parse_selection, preview_step, review_plan
+
+
+def shell_step(command):
+    return {'type': 'shell', 'command': command}
+
+
+def file_step(filename, operation='CREATE', content=''):
+    return {'type': 'file', 'operation': operation, 'filename': filename, 'content': content}
+
+
+@patch('drd.cli.query.plan_review.click.echo')
+@patch('drd.cli.query.plan_review.print_info')
+class TestPlanReview(unittest.TestCase):
+
+    def setUp(self):
+        self.project_dir = tempfile.mkdtemp()
+        self.executor = MagicMock()
+        self.executor.current_dir = self.project_dir
+        self.executor.is_safe_command.return_value = True
+        self.executor.is_safe_path.return_value = True
+        self.executor.is_allowed_command.return_value = False
+
+    def tearDown(self):
+        shutil.rmtree(self.project_dir)
+
+    @patch('drd.cli.query.plan_review.click.prompt', return_value='a')
+    def test_whole_plan_is_shown_and_approved_once(self, mock_prompt, mock_info, mock_echo):
+        commands = [{'type': 'explanation', 'content': 'hi'},
+                    shell_step('npm install'),
+                    file_step('a.js', content='x')]
+
+        approved = review_plan(commands, [0, 1, 2], self.executor)
+
+        self.assertEqual(approved, {0, 1, 2})
+        mock_prompt.assert_called_once()
+        lines = [c.args[0] for c in mock_info.call_args_list]
+        self.assertIn("2. Run: npm install", lines)
+        self.assertIn("3. Create file: a.js", lines)
+
+    @patch('drd.cli.query.plan_review.click.prompt', side_effect=['c', '9', '2-3'])
+    @patch('drd.cli.query.plan_review.print_warning')
+    def test_chosen_steps_only(self, mock_warning, mock_prompt, *_):
+        commands = [shell_step('ls'), shell_step('npm test'), file_step('a.js'), file_step('b.js')]
+
+        approved = review_plan(commands, [0, 1, 2, 3], self.executor)
+
+        self.assertEqual(approved, {1, 2})
+        mock_warning.assert_called_once()
+
+    @patch('drd.cli.query.plan_review.click.prompt', return_value='n')
+    def test_cancel(self, mock_prompt, *_):
+        self.assertIsNone(review_plan([shell_step('ls')], [0], self.executor))
+
+    @patch('drd.cli.query.plan_review.click.prompt')
+    def test_plan_of_allowed_commands_needs_no_review(self, mock_prompt, *_):
+        self.executor.is_allowed_command.return_value = True
+        approved = review_plan([shell_step('npm test'), shell_step('npm run lint')], [0, 1], self.executor)
+        self.assertEqual(approved, {0, 1})
+        mock_prompt.assert_not_called()
+
+    def test_update_previews_against_earlier_steps_of_the_plan(self, *_):
+        planned = {}
+        preview_step(file_step('a.py', content='one\ntwo\n'), self.project_dir, planned)
+        preview = preview_step(
+            file_step('a.py', 'UPDATE', 'r 1:ONE'),
+            self.project_dir, planned)
+        self.assertIn("ONE", preview)
+        self.assertEqual(planned[os.path.join(self.project_dir, 'a.py')], 'ONE\ntwo\n')
+
+        preview_step(file_step('a.py', 'DELETE'), self.project_dir, planned)
+        self.assertIsNone(preview_step(file_step('a.py', 'UPDATE', 'x'), self.project_dir, planned))
+
+    def test_parse_selection(self, *_):
+        self.assertEqual(parse_selection('1, 3-5', [1, 2, 3, 4, 5]), {1, 3, 4, 5})
+        self.assertEqual(parse_selection('', [1]), set())
+        for text in ['6', '3-1', 'x', '1-']:
+            with self.assertRaises(ValueError):
+                parse_selection(text, [1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,17 @@ import unittest
 from unittest.mock import patch, MagicMock, call
 import requests
 
-from drd.cli.query.main import execute_dravid_command
+from drd.cli.query.main import execute_dravid_command, construct_full_query, print_telemetry_summary
+from drd.api.prompt_cache import CACHE_BREAK
+from drd.utils.parser import parse_dravid_response
+
+
+def fake_stream(response):
+    def stream(query, include_context=False, instruction_prompt=None, print_chunk=False, on_command=None):
+        for command in parse_dravid_response(response):
+            on_command(command)
+        return response
+    return stream
 
 
 class TestExecuteDravidCommand(unittest.TestCase):
@@ -39,7 +49,7 @@ class TestExecuteDravidCommand(unittest.TestCase):
             'file_contents_to_load': ['file1.py', 'file2.py']
         }
 
-        mock_stream_api.return_value = """
+        mock_stream_api.side_effect = fake_stream("""
         <response>
             <steps>
                 <step>
@@ -54,7 +64,7 @@ class TestExecuteDravidCommand(unittest.TestCase):
                 </step>
             </steps>
         </response>
-        """
+        """)
         mock_execute_commands.return_value = (
             True, 2, None, "All commands executed successfully")
         mock_run_with_loader.side_effect = lambda f, *args, **kwargs: f()
@@ -89,7 +99,7 @@ class TestExecuteDravidCommand(unittest.TestCase):
             'new_files': [],
             'file_contents_to_load': ['file1.py', 'file2.py']
         }
-        mock_stream_api.return_value = """
+        mock_stream_api.side_effect = fake_stream("""
         <response>
             <explanation>Test explanation</explanation>
             <steps>
@@ -99,7 +109,7 @@ class TestExecuteDravidCommand(unittest.TestCase):
                 </step>
             </steps>
         </response>
-        """
+        """)
         mock_execute_commands.return_value = (
             False, 1, "Command failed", "Error output")
         mock_handle_error.return_value = True
@@ -171,5 +181,169 @@ class TestExecuteDravidCommand(unittest.TestCase):
             "An unexpected error occurred: API connection error")
 
 
+    @patch('drd.cli.query.main.Executor')
+    @patch('drd.cli.query.main.ProjectMetadataManager')
+    @patch('drd.cli.query.main.stream_dravid_commands')
+    @patch('drd.cli.query.main.execute_commands')
+    @patch('drd.cli.query.main.handle_error_with_dravid')
+    @patch('drd.cli.query.main.print_command')
+    @patch('drd.cli.query.main.print_error')
+    @patch('drd.cli.query.main.get_files_to_modify')
+    @patch('drd.cli.query.main.is_directory_empty')
+    @patch('drd.cli.query.main.run_with_loader')
+    def test_execute_dravid_command_pipelined(self, mock_run_with_loader, mock_is_directory_empty, mock_get_files,
+                                              mock_print_error, mock_print_command, mock_handle_error,
+                                              mock_execute_commands, mock_stream_commands,
+                                              mock_metadata_manager, mock_executor):
+        mock_executor.return_value = self.executor
+        mock_is_directory_empty.return_value = False
+        mock_metadata_manager.return_value = self.metadata_manager
+        self.metadata_manager.get_project_context.return_value = "Test project context"
+        mock_get_files.return_value = []
+        mock_run_with_loader.side_effect = lambda f, *args, **kwargs: f()
+        mock_handle_error.return_value = False
+        stream_closed = []
+
+        def stream_commands(*args, **kwargs):
+            try:
+                yield {'type': 'shell', 'command': 'npm install'}
+                yield {'type': 'shell', 'command': 'npm test'}
+            finally:
+                stream_closed.append(True)
+        mock_stream_commands.side_effect = stream_commands
+
+        def execute(commands, *args, **kwargs):
+            # The first step fails before the rest of the plan has been read
+            next(iter(commands))
+            return False, 1, "install failed", "Error output"
+        mock_execute_commands.side_effect = execute
+
+        execute_dravid_command(self.query, self.image_path,
+                               self.debug, self.instruction_prompt, pipeline=True)
+
+        self.assertEqual(stream_closed, [True])
+        # The rest of the plan is still read, for a fix to continue with
+        mock_print_command.assert_has_calls([
+            call({'type': 'shell', 'command': 'npm install'}),
+            call({'type': 'shell', 'command': 'npm test'})])
+        mock_print_error.assert_any_call("Failed to execute command at step 1.")
+        mock_handle_error.assert_called_once()
+        self.assertEqual(mock_handle_error.call_args[0][1], {
+                         'type': 'shell', 'command': 'npm install'})
+
+    @patch('drd.cli.query.main.Executor')
+    @patch('drd.cli.query.main.ProjectMetadataManager')
+    @patch('drd.cli.query.main.stream_dravid_commands')
+    @patch('drd.cli.query.main.execute_commands')
+    @patch('drd.cli.query.main.handle_error_with_dravid', return_value=True)
+    @patch('drd.cli.query.main.print_command')
+    @patch('drd.cli.query.main.get_files_to_modify', return_value=[])
+    @patch('drd.cli.query.main.construct_full_query', return_value="full query")
+    @patch('drd.cli.query.main.run_with_loader')
+    def test_pipelined_failure_continues_with_rest_of_plan_after_fix(
+            self, mock_run_with_loader, mock_construct, mock_get_files, mock_print_command, mock_handle_error,
+            mock_execute_commands, mock_stream_commands, mock_metadata_manager, mock_executor):
+        mock_executor.return_value = self.executor
+        mock_metadata_manager.return_value = self.metadata_manager
+        mock_run_with_loader.side_effect = lambda f, *args, **kwargs: f()
+        plan = [{'type': 'shell', 'command': 'npm install'},
+                {'type': 'shell', 'command': 'npm test'},
+                {'type': 'shell', 'command': 'npm run build'}]
+        mock_stream_commands.side_effect = lambda *args, **kwargs: (command for command in plan)
+        remaining = []
+
+        def execute(commands, *args, **kwargs):
+            if not remaining:
+                next(iter(commands))
+                remaining.append(None)
+                return False, 1, "install failed", "Error output"
+            remaining[:] = list(commands)
+            return True, len(remaining), None, "done"
+        mock_execute_commands.side_effect = execute
+
+        execute_dravid_command(self.query, self.image_path,
+                               self.debug, self.instruction_prompt, pipeline=True)
+
+        self.assertEqual(mock_execute_commands.call_count, 2)
+        self.assertEqual(remaining, plan[1:])
+
+    @patch('drd.cli.query.main.Executor')
+    @patch('drd.cli.query.main.ProjectMetadataManager')
+    @patch('drd.cli.query.main.stream_dravid_commands')
+    @patch('drd.cli.query.main.stream_dravid_api')
+    @patch('drd.cli.query.main.execute_commands')
+    @patch('drd.cli.query.main.get_files_to_modify', return_value=[])
+    @patch('drd.cli.query.main.construct_full_query', return_value="full query")
+    @patch('drd.cli.query.main.run_with_loader')
+    def test_review_waits_for_the_whole_plan(self, mock_run_with_loader, mock_construct, mock_get_files,
+                                             mock_execute_commands,
+                                             mock_stream_api, mock_stream_commands,
+                                             mock_metadata_manager, mock_executor):
+        mock_executor.return_value = self.executor
+        mock_metadata_manager.return_value = self.metadata_manager
+        mock_run_with_loader.side_effect = lambda f, *args, **kwargs: f()
+        mock_stream_api.side_effect = fake_stream("""
+        <response><steps><step><type>shell</type><command>npm test</command></step></steps></response>
+        """)
+        mock_execute_commands.return_value = (True, 1, None, "done")
+
+        execute_dravid_command(self.query, self.image_path, self.debug, self.instruction_prompt,
+                               pipeline=True, review=True)
+
+        mock_stream_commands.assert_not_called()
+        mock_execute_commands.assert_called_once()
+        self.assertTrue(mock_execute_commands.call_args.kwargs['review'])
+
+class TestConstructFullQuery(unittest.TestCase):
+
+    @patch('drd.cli.query.main.get_file_content', return_value="print('hi')")
+    @patch('drd.cli.query.main.fetch_project_guidelines', return_value="Use tabs")
+    @patch('drd.cli.query.main.is_directory_empty', return_value=False)
+    def test_static_sections_come_first(self, mock_is_empty, mock_guidelines, mock_get_content):
+        files_info = {'file_contents_to_load': ['app.py'], 'main_file': 'app.py'}
+
+        full_query = construct_full_query(
+            "Add a route", MagicMock(), '{"project_info":{}}', files_info, ['ref.py'])
+
+        sections = full_query.split(CACHE_BREAK)
+        self.assertEqual(sections[0], 'Project Guidelines:\nUse tabs\n\n{"project_info":{}}')
+        self.assertIn("Current content of app.py:\nprint('hi')", sections[1])
+        self.assertEqual(sections[2], "Reference files:\nReference file ref.py:\nprint('hi')")
+        self.assertEqual(sections[-1],
+                         "Current directory is not empty.\n\nUser query: Add a route")
+
+    @patch('drd.cli.query.main.is_directory_empty', return_value=True)
+    def test_empty_directory(self, mock_is_empty):
+        self.assertEqual(construct_full_query("Create an app", MagicMock(), None),
+                         "Current directory is empty.\n\nUser query: Create an app")
+
+
+class TestPrintTelemetrySummary(unittest.TestCase):
+
+    @patch('drd.cli.query.main.print_info')
+    @patch('drd.cli.query.main.telemetry.get_records')
+    def test_prints_slowest_phase_first(self, mock_get_records, mock_print_info):
+        mock_get_records.return_value = [
+            {'phase': 'file_selection', 'total_ms': 800.0, 'input_tokens': 900, 'output_tokens': 40},
+            {'phase': 'generation', 'total_ms': 12000.0, 'input_tokens': 5000,
+             'output_tokens': 2000, 'cached_tokens': 4000},
+        ]
+
+        print_telemetry_summary()
+
+        lines = [args[0][0] for args in mock_print_info.call_args_list]
+        self.assertEqual(lines, [
+            "LLM calls by phase:",
+            "generation: 1 call(s), 12.0s, 5000 in / 2000 out tokens, 4000 cached",
+            "file_selection: 1 call(s), 0.8s, 900 in / 40 out tokens",
+        ])
+
+    @patch('drd.cli.query.main.print_info')
+    @patch('drd.cli.query.main.telemetry.get_records', return_value=[])
+    def test_prints_nothing_without_calls(self, mock_get_records, mock_print_info):
+        print_telemetry_summary()
+        mock_print_info.assert_not_called()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,155 @@
+import time
+import threading
+import unittest
+
+from drd.cli.query.step_planner import (
+    plan_steps, shell_scope, split_shell_command, paths_overlap, describe_step, run_steps
+)
+
+CWD = '/project'
+
+
+def file_step(filename, operation='CREATE'):
+    return {'type': 'file', 'operation': operation, 'filename': filename, 'content': ''}
+
+
+def shell_step(command):
+    return {'type': 'shell', 'command': command}
+
+
+class TestPlanSteps(unittest.TestCase):
+
+    def test_unrelated_files_are_independent(self):
+        steps = [file_step(f'src/file_{i}.py') for i in range(5)]
+        dependencies, barriers = plan_steps(steps, CWD)
+        self.assertEqual(dependencies, [set()] * 5)
+        self.assertEqual(barriers, set())
+
+    def test_same_file_is_ordered(self):
+        steps = [file_step('app.py'), file_step('other.py'), file_step('./app.py', 'UPDATE')]
+        dependencies, _ = plan_steps(steps, CWD)
+        self.assertEqual(dependencies[2], {0})
+
+    def test_install_runs_beside_source_files(self):
+        steps = [shell_step('pip install flask'), file_step('app.py'), file_step('requirements.txt')]
+        dependencies, barriers = plan_steps(steps, CWD)
+        self.assertEqual(dependencies[1], set())
+        self.assertEqual(dependencies[2], {0})
+        self.assertEqual(barriers, set())
+
+    def test_install_waits_for_its_manifest(self):
+        steps = [file_step('package.json'), file_step('src/index.js'), shell_step('npm install')]
+        dependencies, _ = plan_steps(steps, CWD)
+        self.assertEqual(dependencies[2], {0})
+
+    def test_mkdir_orders_files_below_it(self):
+        steps = [shell_step('mkdir -p src/components'), file_step('src/components/Button.js'),
+                 file_step('README.txt')]
+        dependencies, _ = plan_steps(steps, CWD)
+        self.assertEqual(dependencies[1], {0})
+        self.assertEqual(dependencies[2], set())
+
+    def test_shell_steps_run_one_at_a_time(self):
+        steps = [shell_step('npm install react'), shell_step('pip install flask')]
+        dependencies, _ = plan_steps(steps, CWD)
+        self.assertEqual(dependencies[1], {0})
+
+    def test_unknown_commands_and_cd_are_barriers(self):
+        steps = [file_step('a.py'), shell_step('npm test'), file_step('b.py'),
+                 shell_step('cd app'), file_step('c.py')]
+        dependencies, barriers = plan_steps(steps, CWD)
+        self.assertEqual(barriers, {1, 3})
+        self.assertEqual(dependencies[1], {0})
+        self.assertEqual(dependencies[2], {1})
+        self.assertEqual(dependencies[4], {1, 3})
+
+    def test_explanations_never_wait(self):
+        steps = [{'type': 'explanation', 'content': 'hi'}, shell_step('make'),
+                 {'type': 'requires_restart', 'content': 'false'}]
+        dependencies, barriers = plan_steps(steps, CWD)
+        self.assertEqual(dependencies, [set(), set(), set()])
+        self.assertEqual(barriers, {1})
+
+    def test_metadata_steps_are_barriers(self):
+        steps = [file_step('a.py'), {'type': 'metadata', 'operation': 'UPDATE_FILE', 'filename': 'a.py'}]
+        _, barriers = plan_steps(steps, CWD)
+        self.assertEqual(barriers, {1})
+
+
+class TestShellScope(unittest.TestCase):
+
+    def test_split_shell_command(self):
+        self.assertEqual(split_shell_command('npm i && mkdir -p x; echo "a && b"'),
+                         [['npm', 'i'], ['mkdir', '-p', 'x'], ['echo', 'a && b']])
+        self.assertIsNone(split_shell_command('echo $(pwd)'))
+        self.assertIsNone(split_shell_command('echo "unterminated'))
+
+    def test_paths_of_compound_commands(self):
+        scope = shell_scope('mkdir -p src && touch src/a.py > log.txt', CWD)
+        self.assertFalse(scope.barrier)
+        self.assertEqual(scope.paths, {'src', 'src/a.py', 'log.txt'})
+
+    def test_env_prefix_is_skipped(self):
+        scope = shell_scope('PIP_NO_CACHE=1 pip install -r requirements.txt', CWD)
+        self.assertFalse(scope.barrier)
+        self.assertIn('requirements.txt', scope.paths)
+
+    def test_barriers(self):
+        for command in ('cd app', 'source venv/bin/activate', 'npm run build', 'python app.py',
+                        'mkdir x && npm test', 'echo `ls`', 'yarn build'):
+            self.assertTrue(shell_scope(command, CWD).barrier, command)
+        self.assertFalse(shell_scope('yarn', CWD).barrier)
+
+    def test_paths_overlap(self):
+        self.assertTrue(paths_overlap('src', 'src/a.py'))
+        self.assertTrue(paths_overlap('', 'anything'))
+        self.assertFalse(paths_overlap('src', 'srcs/a.py'))
+
+    def test_describe_step(self):
+        self.assertEqual(describe_step(shell_step('ls')), "Run: ls")
+        self.assertEqual(describe_step(file_step('a.py', 'UPDATE')), "Update file: a.py")
+
+
+class TestRunSteps(unittest.TestCase):
+
+    def test_runs_independent_steps_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+        results, errors = run_steps([set(), set(), set()], lambda index: barrier.wait() or index, 3)
+        self.assertEqual(results, {0: 0, 1: 1, 2: 2})
+        self.assertEqual(errors, {})
+
+    def test_respects_dependencies(self):
+        order = []
+
+        def run(index):
+            if index == 0:
+                time.sleep(0.1)
+            order.append(index)
+        run_steps([set(), {0}, set()], run, 3)
+        self.assertLess(order.index(0), order.index(1))
+        self.assertLess(order.index(2), order.index(0))
+
+    def test_inline_steps_run_alone_on_caller_thread(self):
+        threads = {}
+
+        def run(index):
+            threads[index] = threading.current_thread()
+        run_steps([set(), {0}, {1}], run, 3, inline={1})
+        self.assertIs(threads[1], threading.current_thread())
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    def test_stops_after_failure_but_finishes_earlier_steps(self):
+        def run(index):
+            if index == 1:
+                raise ValueError("boom")
+            if index == 0:
+                time.sleep(0.1)
+            return index
+        # 0 is slow, 1 fails at once, 2 waits for 0 and comes after the failure
+        results, errors = run_steps([set(), set(), {0}], run, 3)
+        self.assertEqual(results, {0: 0})
+        self.assertEqual(list(errors), [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
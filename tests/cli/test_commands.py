@@ -0,0 +1,63 @@
+import os
+import sys
+import unittest
+import subprocess
+from unittest.mock import patch
+
+import drd
+from drd.cli.commands import dravid_cli_logic, VERSION
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'src')
+
+
+def loaded_modules(code):
+    env = dict(os.environ, PYTHONPATH=SRC)
+    result = subprocess.run([sys.executable, '-c', code + "\nimport sys; print('\\n'.join(sys.modules))"],
+                            env=env, capture_output=True, text=True, check=True)
+    return set(result.stdout.split())
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_version_does_not_load_subsystems(self):
+        modules = loaded_modules(
+            "from drd.cli.main import dravid_cli\n"
+            "try:\n    dravid_cli(['--version'])\nexcept SystemExit:\n    pass")
+        for name in ('drd.api.main', 'drd.api.claude_api', 'openai', 'httpx', 'requests',
+                     'drd.cli.query', 'drd.cli.monitor', 'drd.metadata.project_metadata', 'asyncio'):
+            self.assertNotIn(name, modules)
+
+    def test_claude_provider_does_not_load_openai(self):
+        modules = loaded_modules(
+            "import os; os.environ['DRAVID_LLM'] = 'claude'\n"
+            "from drd.api.main import get_api_functions; get_api_functions()")
+        self.assertIn('drd.api.claude_api', modules)
+        self.assertNotIn('openai', modules)
+
+    def test_package_exports_resolve_on_access(self):
+        from drd.cli.main import dravid_cli
+        self.assertIs(drd.dravid_cli, dravid_cli)
+        with self.assertRaises(AttributeError):
+            drd.missing_name
+
+
+class TestDravidCliLogic(unittest.TestCase):
+
+    @patch('click.echo')
+    def test_version(self, mock_echo):
+        dravid_cli_logic(None, None, None, False, None, False, None, (), True)
+        mock_echo.assert_called_once_with(f"Dravid CLI version {VERSION}")
+
+    @patch('drd.cli.ask_handler.handle_ask_command')
+    def test_ask_loads_handler_on_use(self, mock_handle_ask):
+        dravid_cli_logic(None, None, None, False, None, False, "question", (), False)
+        mock_handle_ask.assert_called_once_with("question", (), False)
+
+    @patch('drd.cli.monitor.run_dev_server_with_monitoring')
+    def test_command_runs_monitor(self, mock_run):
+        dravid_cli_logic("npm start", None, None, False, None, False, None, (), False)
+        mock_run.assert_called_once_with("npm start")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import json
+from unittest.mock import patch
+
+from drd.metadata.context_builder import (
+    tokenize,
+    rank_key_files,
+    build_project_context,
+    get_context_token_budget,
+    DEFAULT_CONTEXT_TOKEN_BUDGET
+)
+
+
+class TestContextBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.metadata = {
+            "project_info": {"name": "shop", "version": "1.0.0"},
+            "environment": {"primary_language": "typescript"},
+            "directory_structure": {"src": ["components", "api"]},
+            "key_files": [
+                {"path": "src/components/Footer.tsx", "type": "typescript",
+                 "summary": "Site footer", "exports": ["fun:Footer"], "imports": []},
+                {"path": "src/api/checkout.ts", "type": "typescript",
+                 "summary": "Handles payment checkout", "exports": ["fun:createOrder"],
+                 "imports": ["src/api/cart"]},
+                {"path": "src/api/cart.ts", "type": "typescript",
+                 "summary": "Shopping cart state", "exports": ["fun:addToCart"], "imports": []},
+            ],
+            "external_dependencies": ["react@18.2.0"],
+            "dev_server": {"start_command": "npm run dev"}
+        }
+
+    def test_tokenize_splits_identifiers_and_paths(self):
+        self.assertEqual(tokenize("src/api/createOrder_total.ts"),
+                         {"src", "api", "create", "order", "total"})
+
+    def test_rank_key_files_by_relevance(self):
+        ranked = rank_key_files(
+            self.metadata["key_files"], "Fix the payment checkout order flow")
+        self.assertEqual(ranked[0]["path"], "src/api/checkout.ts")
+        # Ties keep their original order
+        self.assertEqual([f["path"] for f in ranked[1:]],
+                         ["src/components/Footer.tsx", "src/api/cart.ts"])
+
+    def test_rank_key_files_boosts_mentioned_filename(self):
+        ranked = rank_key_files(
+            self.metadata["key_files"], "update cart.ts to handle checkout")
+        self.assertEqual(ranked[0]["path"], "src/api/cart.ts")
+
+    def test_rank_key_files_without_query_keeps_order(self):
+        self.assertEqual(rank_key_files(self.metadata["key_files"], None),
+                         self.metadata["key_files"])
+
+    def test_build_project_context_is_compact(self):
+        context = build_project_context(self.metadata, token_budget=0)
+        self.assertNotIn("\n", context)
+        self.assertEqual(json.loads(context)["key_files"],
+                         self.metadata["key_files"])
+
+    def test_build_project_context_respects_budget(self):
+        base = {k: v for k, v in self.metadata.items() if k != "key_files"}
+        budget = len(json.dumps(base, separators=(',', ':'))) // 4 + 60
+        context = json.loads(build_project_context(
+            self.metadata, "checkout payment", token_budget=budget))
+
+        self.assertEqual([f["path"] for f in context["key_files"]],
+                         ["src/api/checkout.ts"])
+        self.assertEqual(context["omitted_key_files"], 2)
+        self.assertEqual(context["dev_server"], self.metadata["dev_server"])
+
+    def test_build_project_context_skips_entries_that_do_not_fit(self):
+        self.metadata["key_files"][1]["summary"] = "Handles payment checkout " * 40
+        base = {k: v for k, v in self.metadata.items() if k != "key_files"}
+        budget = len(json.dumps(base, separators=(',', ':'))) // 4 + 40
+        context = json.loads(build_project_context(
+            self.metadata, "checkout payment", token_budget=budget))
+
+        self.assertEqual([f["path"] for f in context["key_files"]], ["src/components/Footer.tsx"])
+        self.assertEqual(context["omitted_key_files"], 2)
+
+    def test_build_project_context_leaves_out_bookkeeping_fields(self):
+        for entry in self.metadata["key_files"]:
+            entry.update({"hash": "0" * 64, "mtime": 1700000000.0})
+        for budget in (0, 10000):
+            context = json.loads(build_project_context(self.metadata, token_budget=budget))
+            for entry in context["key_files"]:
+                self.assertNotIn("hash", entry)
+                self.assertNotIn("mtime", entry)
+        self.assertIn("hash", self.metadata["key_files"][0])
+
+    def test_build_project_context_keeps_file_order(self):
+        first = build_project_context(self.metadata, "checkout payment", token_budget=10000)
+        second = build_project_context(self.metadata, "footer links", token_budget=10000)
+
+        self.assertEqual(first, second)
+        self.assertEqual([f["path"] for f in json.loads(first)["key_files"]],
+                         [f["path"] for f in self.metadata["key_files"]])
+
+    @patch.dict('os.environ', {'DRAVID_CONTEXT_TOKENS': '1234'})
+    def test_get_context_token_budget_from_env(self):
+        self.assertEqual(get_context_token_budget(), 1234)
+
+    @patch.dict('os.environ', {'DRAVID_CONTEXT_TOKENS': 'lots'})
+    def test_get_context_token_budget_invalid(self):
+        self.assertEqual(get_context_token_budget(),
+                         DEFAULT_CONTEXT_TOKEN_BUDGET)
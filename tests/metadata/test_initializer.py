@@ -25,7 +25,7 @@ class TestProjectMetadataInitializer(unittest.TestCase):
 
     @patch('drd.metadata.initializer.get_ignore_patterns')
     @patch('drd.metadata.initializer.get_folder_structure')
-    @patch('drd.metadata.initializer.call_dravid_api_with_pagination')
+    @patch('drd.metadata.initializer.acall_dravid_api_with_pagination')
     @patch('drd.metadata.initializer.extract_and_parse_xml')
     @patch('drd.metadata.initializer.process_files')
     @patch('drd.metadata.initializer.ProjectMetadataManager')
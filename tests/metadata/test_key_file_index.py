@@ -0,0 +1,102 @@
+import json
+import unittest
+
+from drd.metadata.key_file_index import KeyFileIndex, export_symbols
+
+
+class TestKeyFileIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.key_files = [
+            {'path': 'app.py', 'type': 'python', 'exports': ['fun:main', 'class:App']},
+            {'path': 'util.js', 'type': 'javascript', 'exports': 'fun:format,var:VERSION'},
+            {'path': 'lib.py', 'type': 'python', 'exports': []},
+        ]
+        self.index = KeyFileIndex(self.key_files)
+
+    def test_lookups(self):
+        self.assertIs(self.index.get('app.py'), self.key_files[0])
+        self.assertIsNone(self.index.get('missing.py'))
+        self.assertIn('lib.py', self.index)
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual([e['path'] for e in self.index.find_by_type('python')], ['app.py', 'lib.py'])
+        self.assertEqual([e['path'] for e in self.index.find_by_export('App')], ['app.py'])
+        self.assertEqual([e['path'] for e in self.index.find_by_export('fun:format')], ['util.js'])
+        self.assertEqual(self.index.type_counts(), {'python': 2, 'javascript': 1})
+
+    def test_update_keeps_secondary_indexes_in_sync(self):
+        entry = self.index.update('lib.py', {'type': 'cython', 'exports': ['fun:fast']})
+
+        self.assertIs(entry, self.key_files[2])
+        self.assertEqual([e['path'] for e in self.index.find_by_type('python')], ['app.py'])
+        self.assertEqual(self.index.find_by_type('cython'), [entry])
+        self.assertEqual(self.index.find_by_export('fast'), [entry])
+
+    def test_update_appends_unknown_paths(self):
+        entry = self.index.update('new.py', {'type': 'python'})
+
+        self.assertEqual(entry, {'path': 'new.py', 'type': 'python'})
+        self.assertIs(self.key_files[-1], entry)
+        self.assertIs(self.index.get('new.py'), entry)
+
+    def test_remove(self):
+        removed = self.index.remove('app.py')
+
+        self.assertEqual(removed['path'], 'app.py')
+        self.assertEqual([e['path'] for e in self.key_files], ['util.js', 'lib.py'])
+        self.assertEqual(self.index.find_by_export('main'), [])
+        self.assertNotIn('python', [t for t, n in self.index.type_counts().items() if n > 1])
+        self.assertIsNone(self.index.remove('app.py'))
+
+    def test_remove_mixed_with_appends_keeps_positions(self):
+        for i in range(5):
+            self.index.update(f'gen{i}.py', {'type': 'python'})
+        for path in ('gen1.py', 'app.py', 'gen4.py', 'lib.py'):
+            self.index.remove(path)
+        self.index.update('last.py', {'type': 'python'})
+        self.index.remove('gen0.py')
+
+        self.assertEqual([e['path'] for e in self.key_files], ['util.js', 'gen2.py', 'gen3.py', 'last.py'])
+        self.assertEqual(len(self.index), 4)
+
+    def test_remove_does_not_compare_entries(self):
+        class Entry(dict):
+            def __eq__(self, other):
+                raise AssertionError("entries compared")
+            __hash__ = None
+        key_files = [Entry(path=f'f{i}.py', type='python') for i in range(100)]
+        index = KeyFileIndex(key_files)
+
+        index.remove('f99.py')
+        index.remove('f0.py')
+
+        self.assertEqual(len(key_files), 98)
+        self.assertEqual(key_files[0]['path'], 'f1.py')
+
+    def test_remove_after_reordering_in_place(self):
+        self.key_files.reverse()
+        self.index.remove('lib.py')
+        self.assertEqual([e['path'] for e in self.key_files], ['util.js', 'app.py'])
+        self.assertIsNone(self.index.get('lib.py'))
+
+    def test_sync_rebuilds_after_outside_changes(self):
+        self.key_files.append({'path': 'late.py', 'type': 'python'})
+        self.assertIsNotNone(self.index.sync(self.key_files).get('late.py'))
+
+        replacement = [{'path': 'only.py', 'type': 'python'}]
+        self.index.sync(replacement)
+        self.assertIsNone(self.index.get('app.py'))
+        self.assertIs(self.index.update('x.py', {}), replacement[-1])
+
+    def test_serialisation_is_unchanged(self):
+        before = json.dumps(self.key_files, indent=2)
+        self.index.update('app.py', {'type': 'python', 'exports': ['fun:main', 'class:App']})
+        self.assertEqual(json.dumps(self.key_files, indent=2), before)
+
+    def test_export_symbols(self):
+        self.assertEqual(export_symbols({'exports': ['fun:a', 'class: B', 'None', '']}), ['a', 'B'])
+        self.assertEqual(export_symbols({'exports': None}), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import os
+import json
+import shutil
+import tempfile
+import unittest.mock
+
+from drd.metadata.lexical_index import LexicalIndex, load_or_build_index, get_signature
+
+
+class TestLexicalIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.key_files = [
+            {"path": "src/components/Footer.tsx", "summary": "Site footer with links",
+             "exports": ["fun:Footer"], "imports": []},
+            {"path": "src/api/checkout.ts", "summary": "Handles payment checkout",
+             "exports": ["fun:createOrder"], "imports": ["src/api/cart"]},
+            {"path": "src/api/cart.ts", "summary": "Shopping cart state",
+             "exports": ["fun:addToCart"], "imports": []},
+        ]
+        self.tmp_dir = tempfile.mkdtemp()
+        self.index_file = os.path.join(self.tmp_dir, 'drd.index.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_search_ranks_best_match_first(self):
+        index = LexicalIndex.build(self.key_files)
+
+        results = index.search("fix the payment checkout")
+
+        self.assertEqual(results[0][0], "src/api/checkout.ts")
+        self.assertNotIn("src/components/Footer.tsx",
+                         [path for path, _ in results])
+
+    def test_search_matches_split_identifiers(self):
+        index = LexicalIndex.build(self.key_files)
+        self.assertEqual(index.search("addToCart")[0][0], "src/api/cart.ts")
+
+    def test_select_files_drops_weak_matches(self):
+        index = LexicalIndex.build(self.key_files)
+
+        files = index.select_files("update the footer links")
+
+        self.assertEqual(files, ["src/components/Footer.tsx"])
+
+    def test_select_files_no_match(self):
+        index = LexicalIndex.build(self.key_files)
+        self.assertEqual(index.select_files("database migrations"), [])
+
+    def test_save_and_load_round_trip(self):
+        index = LexicalIndex.build(self.key_files)
+        index.save(self.index_file)
+
+        loaded = LexicalIndex.load(self.index_file)
+
+        self.assertEqual(loaded.search("checkout"), index.search("checkout"))
+        self.assertEqual(loaded.signature, get_signature(self.key_files))
+
+    def test_load_or_build_index_uses_current_saved_index(self):
+        LexicalIndex.build(self.key_files).save(self.index_file)
+
+        with unittest.mock.patch.object(LexicalIndex, 'build') as mock_build:
+            index = load_or_build_index(self.key_files, self.index_file)
+
+        mock_build.assert_not_called()
+        self.assertEqual(index.search("checkout")[0][0], "src/api/checkout.ts")
+
+    def test_load_or_build_index_rebuilds_stale_index_in_memory(self):
+        LexicalIndex.build(self.key_files).save(self.index_file)
+        self.key_files.append({"path": "src/db/migrations.py", "summary": "Database migrations",
+                               "exports": [], "imports": []})
+
+        index = load_or_build_index(self.key_files, self.index_file)
+
+        self.assertEqual(index.select_files("database migrations"),
+                         ["src/db/migrations.py"])
+        with open(self.index_file) as f:
+            self.assertNotEqual(json.load(f)["signature"],
+                                get_signature(self.key_files))
+
+    def test_load_or_build_index_does_not_write_missing_index(self):
+        load_or_build_index(self.key_files, self.index_file)
+        self.assertFalse(os.path.exists(self.index_file))
+
+    def test_load_or_build_index_ignores_corrupt_file(self):
+        with open(self.index_file, 'w') as f:
+            f.write("{not json")
+
+        index = load_or_build_index(self.key_files, self.index_file)
+
+        self.assertEqual(index.search("checkout")[0][0], "src/api/checkout.ts")
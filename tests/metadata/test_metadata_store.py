@@ -0,0 +1,95 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from drd.metadata.metadata_store import MetadataStore, get_fingerprint
+
+
+class TestMetadataStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = MetadataStore(self.tmp_dir)
+        self.metadata = {
+            'project_info': {'name': 'demo'},
+            'key_files': [{'path': 'b.py', 'type': 'python'}, {'path': 'a.py', 'type': 'python'}],
+            'dev_server': {'start_command': ''}
+        }
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip_keeps_order(self):
+        self.store.replace_all(self.metadata)
+        self.store.set_state('json_fingerprint', 'fp')
+
+        loaded = self.store.load('fp')
+
+        self.assertEqual(loaded, self.metadata)
+        self.assertEqual(list(loaded), ['project_info', 'key_files', 'dev_server'])
+        with open(os.path.join(self.tmp_dir, '.drd', '.gitignore')) as f:
+            self.assertEqual(f.read(), "*\n")
+
+    def test_load_needs_matching_fingerprint(self):
+        self.assertIsNone(self.store.load('fp'))
+        self.store.replace_all(self.metadata)
+        self.store.set_state('json_fingerprint', 'fp')
+        self.assertIsNone(self.store.load('other'))
+
+    def test_put_file_updates_in_place_and_appends_new_paths(self):
+        self.store.replace_all(self.metadata)
+        self.store.put_file({'path': 'b.py', 'type': 'text'})
+        self.store.put_file({'path': 'c.py', 'type': 'python'})
+        self.store.delete_file('a.py')
+        self.store.set_state('json_fingerprint', 'fp')
+
+        self.assertEqual(self.store.get_file('b.py'), {'path': 'b.py', 'type': 'text'})
+        self.assertIsNone(self.store.get_file('a.py'))
+        self.assertEqual([f['path'] for f in self.store.load('fp')['key_files']], ['b.py', 'c.py'])
+
+    def test_put_section(self):
+        self.store.replace_all(self.metadata)
+        self.store.put_section('dev_server', {'start_command': 'npm start'})
+        self.store.put_section('external_dependencies', ['click'])
+        self.store.set_state('json_fingerprint', 'fp')
+
+        loaded = self.store.load('fp')
+
+        self.assertEqual(loaded['dev_server'], {'start_command': 'npm start'})
+        self.assertEqual(list(loaded)[-1], 'external_dependencies')
+
+    def test_failed_transaction_is_rolled_back(self):
+        self.store.replace_all(self.metadata)
+        with self.assertRaises(RuntimeError):
+            with self.store.transaction():
+                self.store.put_file({'path': 'new.py'})
+                with self.store.transaction():
+                    self.store.delete_file('a.py')
+                raise RuntimeError("crash")
+
+        self.assertIsNone(self.store.get_file('new.py'))
+        self.assertIsNotNone(self.store.get_file('a.py'))
+
+    def test_other_store_versions_are_discarded(self):
+        self.store.replace_all(self.metadata)
+        self.store.set_state('version', '0')
+        self.store.close()
+
+        store = MetadataStore(self.tmp_dir)
+        self.addCleanup(store.close)
+
+        self.assertIsNone(store.get_file('a.py'))
+
+    def test_get_fingerprint(self):
+        path = os.path.join(self.tmp_dir, 'drd.json')
+        self.assertIsNone(get_fingerprint(path))
+        with open(path, 'w') as f:
+            f.write('{}')
+        self.assertTrue(get_fingerprint(path).endswith(':2'))
+
+
+if __name__ == '__main__':
+    unittest.main()
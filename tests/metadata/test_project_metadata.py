@@ -1,8 +1,9 @@
 import unittest
-from unittest.mock import patch, mock_open, MagicMock
+from unittest.mock import patch, mock_open, MagicMock, AsyncMock
 import os
 import sys
 import json
+import asyncio
 from datetime import datetime
 
 # Assuming the project structure, adjust the import path as necessary
@@ -15,46 +16,55 @@ class TestProjectMetadataManager(unittest.TestCase):
         self.project_dir = '/fake/project/dir'
         self.manager = ProjectMetadataManager(self.project_dir)
 
-    @patch('os.walk')
-    def test_get_ignore_patterns(self, mock_walk):
-        mock_walk.return_value = [
-            ('/fake/project/dir', [], ['.gitignore']),
-            ('/fake/project/dir/subfolder', [], ['.gitignore'])
-        ]
-        mock_open_calls = [
-            mock_open(read_data="*.log\nnode_modules/\n").return_value,
-            mock_open(read_data="*.tmp\n").return_value
-        ]
-        with patch('builtins.open', side_effect=mock_open_calls):
-            patterns = self.manager.get_ignore_patterns()
+    def make_tree(self, files):
+        import tempfile
+        import shutil
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        for path, content in files.items():
+            full_path = os.path.join(tmp_dir, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'w') as f:
+                f.write(content)
+        return tmp_dir
+
+    def test_get_ignore_patterns(self):
+        tmp_dir = self.make_tree({
+            '.gitignore': "*.log\nnode_modules/\n",
+            'subfolder/.gitignore': "*.tmp\n"
+        })
+        with patch('os.walk') as mock_walk:
+            patterns = ProjectMetadataManager(tmp_dir).get_ignore_patterns()
 
-        self.assertIn('*.log', patterns)
-        self.assertIn('node_modules/', patterns)
-        self.assertIn('subfolder/*.tmp', patterns)
+        mock_walk.assert_not_called()
+        self.assertTrue(patterns.is_ignored('test.log'))
+        self.assertTrue(patterns.is_ignored('node_modules', True))
+        self.assertTrue(patterns.is_ignored('drd.index.json'))
+        self.assertFalse(patterns.is_ignored('main.py'))
 
     def test_should_ignore(self):
-        self.manager.ignore_patterns = [
-            '*.log', 'node_modules/', 'subfolder/*.tmp']
-        self.assertTrue(self.manager.should_ignore(
-            '/fake/project/dir/test.log'))
-        self.assertTrue(self.manager.should_ignore(
-            '/fake/project/dir/node_modules/package.json'))
-        self.assertTrue(self.manager.should_ignore(
-            '/fake/project/dir/node_modules/subfolder/file.js'))
-        self.assertTrue(self.manager.should_ignore(
-            '/fake/project/dir/subfolder/test.tmp'))
-        self.assertFalse(self.manager.should_ignore(
-            '/fake/project/dir/src/main.py'))
-        self.assertFalse(self.manager.should_ignore(
-            '/fake/project/dir/package.json'))
+        tmp_dir = self.make_tree({
+            '.gitignore': "*.log\nnode_modules/\n!keep.log\n"
+        })
+        manager = ProjectMetadataManager(tmp_dir)
+        self.assertTrue(manager.should_ignore(os.path.join(tmp_dir, 'test.log')))
+        self.assertTrue(manager.should_ignore(
+            os.path.join(tmp_dir, 'node_modules/package.json')))
+        self.assertTrue(manager.should_ignore(
+            os.path.join(tmp_dir, 'node_modules/subfolder/keep.log')))
+        self.assertTrue(manager.should_ignore('/outside/project/file.py'))
+        self.assertFalse(manager.should_ignore(os.path.join(tmp_dir, 'keep.log')))
+        self.assertFalse(manager.should_ignore(os.path.join(tmp_dir, 'src/main.py')))
 
-    @patch('os.walk')
-    def test_get_directory_structure(self, mock_walk):
-        mock_walk.return_value = [
-            ('/fake/project/dir', ['src'], ['README.md']),
-            ('/fake/project/dir/src', [], ['main.py', 'utils.py'])
-        ]
-        structure = self.manager.get_directory_structure(self.project_dir)
+    def test_get_directory_structure(self):
+        tmp_dir = self.make_tree({
+            'README.md': '',
+            'src/main.py': '',
+            'src/utils.py': '',
+            'node_modules/pkg/index.js': ''
+        })
+        manager = ProjectMetadataManager(tmp_dir)
+        structure = manager.get_directory_structure(tmp_dir)
         expected_structure = {
             'files': ['README.md'],
             'directories': ['src'],
@@ -64,13 +74,64 @@ class TestProjectMetadataManager(unittest.TestCase):
         }
         self.assertEqual(structure, expected_structure)
 
+    def test_build_metadata_reuses_scanned_tree(self):
+        tmp_dir = self.make_tree({'a.py': 'a = 1'})
+        manager = ProjectMetadataManager(tmp_dir)
+        manager.analyze_files = AsyncMock(return_value=[])
+        manager.get_directory_structure(tmp_dir)
+
+        with patch.object(manager.tree_snapshot, 'refresh') as mock_refresh:
+            asyncio.run(manager.build_metadata(MagicMock()))
+
+        mock_refresh.assert_not_called()
+        manager.analyze_files.assert_called_once_with(
+            [os.path.join(tmp_dir, 'a.py')], unittest.mock.ANY)
+
+    def test_file_index_in_empty_directory_writes_nothing(self):
+        tmp_dir = self.make_tree({})
+        manager = ProjectMetadataManager(tmp_dir)
+
+        self.assertEqual(manager.get_file_index().select_files("add a page"), [])
+        manager.save_file_index()
+
+        self.assertEqual(os.listdir(tmp_dir), [])
+
+    def test_key_file_lookups_use_the_path_index(self):
+        self.manager.metadata['key_files'] = [
+            {'path': 'a.py', 'type': 'python', 'exports': ['fun:run']},
+            {'path': 'b.js', 'type': 'javascript', 'exports': []},
+            {'path': 'c.py', 'type': 'python', 'exports': []}]
+        with patch.object(self.manager, 'record_change'):
+            self.manager.update_file_metadata('b.js', 'typescript', '', 'b', ['fun:build'])
+            self.manager.remove_file_metadata('c.py')
+            self.manager.update_file_metadata('d.py', 'python', '', 'd')
+
+        self.assertEqual([f['path'] for f in self.manager.metadata['key_files']],
+                         ['a.py', 'b.js', 'd.py'])
+        self.assertEqual(self.manager.get_file_metadata('b.js')['type'], 'typescript')
+        self.assertIsNone(self.manager.get_file_metadata('c.py'))
+        self.assertEqual([f['path'] for f in self.manager.find_files_by_type('python')],
+                         ['a.py', 'd.py'])
+        self.assertEqual([f['path'] for f in self.manager.find_files_by_export('build')], ['b.js'])
+
+        self.manager.update_languages()
+        self.assertEqual(self.manager.metadata['environment']['primary_language'], 'python')
+        self.assertEqual(self.manager.metadata['environment']['other_languages'], ['typescript'])
+
     def test_is_binary_file(self):
         self.assertTrue(self.manager.is_binary_file('test.exe'))
         self.assertTrue(self.manager.is_binary_file('image.png'))
         self.assertFalse(self.manager.is_binary_file('script.py'))
         self.assertFalse(self.manager.is_binary_file('config.json'))
 
-    @patch('src.drd.metadata.project_metadata.call_dravid_api_with_pagination')
+    def test_get_file_analysis_context_is_stable(self):
+        before = self.manager.get_file_analysis_context()
+        self.manager.metadata['project_info']['last_updated'] = datetime.now().isoformat()
+        self.manager.metadata['key_files'].append({'path': 'main.py'})
+        self.manager.metadata['environment']['other_languages'] = ['json']
+        self.assertEqual(before, self.manager.get_file_analysis_context())
+
+    @patch('src.drd.metadata.project_metadata.acall_dravid_api_with_pagination')
     @patch('builtins.open', new_callable=mock_open, read_data='print("Hello, World!")')
     async def test_analyze_file(self, mock_file, mock_api_call):
         mock_api_call.return_value = '''
@@ -88,6 +149,18 @@ class TestProjectMetadataManager(unittest.TestCase):
         self.assertEqual(file_info['type'], 'python')
         self.assertEqual(file_info['summary'], 'A simple Python script')
 
+    @patch('src.drd.metadata.project_metadata.forget_response')
+    @patch('src.drd.metadata.project_metadata.acall_dravid_api_with_pagination')
+    @patch('builtins.open', new_callable=mock_open, read_data='print("Hello, World!")')
+    def test_analyze_file_forgets_unparseable_response(self, mock_file, mock_api_call, mock_forget):
+        mock_api_call.return_value = '<response><metadata><type>python</type>'
+        self.manager.get_file_fingerprint = MagicMock(return_value=('hash', 1))
+
+        file_info = asyncio.run(self.manager.analyze_file('/fake/project/dir/script.py'))
+
+        self.assertEqual(file_info['type'], 'unknown')
+        mock_forget.assert_called_once_with(mock_api_call.call_args[0][0])
+
     @patch('src.drd.metadata.project_metadata.ProjectMetadataManager.analyze_file')
     @patch('os.walk')
     async def test_build_metadata(self, mock_walk, mock_analyze_file):
@@ -110,3 +183,262 @@ class TestProjectMetadataManager(unittest.TestCase):
         self.assertEqual(metadata['environment']['primary_language'], 'python')
         self.assertEqual(len(metadata['key_files']), 1)
         self.assertEqual(metadata['key_files'][0]['path'], 'main.py')
+
+
+class TestProjectMetadataRefresh(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        import tempfile
+        self.tmp_dir = tempfile.mkdtemp()
+        for name, content in [('a.py', 'a = 1'), ('b.py', 'b = 2'), ('c.py', 'c = 3')]:
+            with open(os.path.join(self.tmp_dir, name), 'w') as f:
+                f.write(content)
+        self.manager = ProjectMetadataManager(self.tmp_dir)
+        self.manager.batch_token_budget = 0
+        self.analyzed = []
+
+        async def fake_analyze(file_path):
+            rel_path = os.path.relpath(file_path, self.tmp_dir)
+            self.analyzed.append(rel_path)
+            file_hash, mtime = self.manager.get_file_fingerprint(file_path)
+            return {'path': rel_path, 'type': 'python', 'summary': f'summary of {rel_path}',
+                    'exports': [], 'imports': [], 'hash': file_hash, 'mtime': mtime}
+        self.manager.analyze_file = fake_analyze
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmp_dir)
+
+    async def test_build_metadata_does_not_duplicate_entries(self):
+        await self.manager.build_metadata(MagicMock())
+        await self.manager.build_metadata(MagicMock())
+        self.assertEqual(len(self.manager.metadata['key_files']), 3)
+
+    async def test_refresh_only_analyzes_new_and_changed_files(self):
+        await self.manager.build_metadata(MagicMock())
+        self.analyzed.clear()
+
+        with open(os.path.join(self.tmp_dir, 'b.py'), 'w') as f:
+            f.write('b = 20')
+        os.utime(os.path.join(self.tmp_dir, 'b.py'), (1, 1))
+        os.remove(os.path.join(self.tmp_dir, 'c.py'))
+        with open(os.path.join(self.tmp_dir, 'd.py'), 'w') as f:
+            f.write('d = 4')
+
+        changes = await self.manager.refresh_metadata(MagicMock())
+
+        self.assertEqual(sorted(self.analyzed), ['b.py', 'd.py'])
+        self.assertEqual(changes, {'added': ['d.py'], 'changed': ['b.py'], 'removed': ['c.py'],
+                                   'mtimes_updated': False})
+        paths = sorted(f['path'] for f in self.manager.metadata['key_files'])
+        self.assertEqual(paths, ['a.py', 'b.py', 'd.py'])
+
+    async def test_build_metadata_analyzes_files_concurrently(self):
+        in_flight = 0
+        peak = 0
+
+        async def slow_analyze(file_path):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.05)
+            in_flight -= 1
+            return {'path': os.path.relpath(file_path, self.tmp_dir), 'type': 'python',
+                    'summary': '', 'exports': [], 'imports': []}
+        self.manager.analyze_file = slow_analyze
+        loader = MagicMock()
+
+        metadata = await self.manager.build_metadata(loader)
+
+        self.assertEqual(peak, 3)
+        expected_order = [os.path.relpath(p, self.tmp_dir)
+                          for p in self.manager.iter_project_files()]
+        self.assertEqual([f['path'] for f in metadata['key_files']], expected_order)
+        self.assertEqual(loader.message, "Analyzing files (3/3)")
+
+    async def test_second_refresh_without_edits_changes_nothing(self):
+        await self.manager.build_metadata(MagicMock())
+        self.manager.save_metadata()
+        await self.manager.refresh_metadata(MagicMock())
+        self.manager.save_metadata()
+        self.analyzed.clear()
+
+        changes = await self.manager.refresh_metadata(MagicMock())
+
+        self.assertEqual(self.analyzed, [])
+        self.assertEqual(changes, {'added': [], 'changed': [], 'removed': [], 'mtimes_updated': False})
+
+    async def test_refresh_skips_touched_but_unmodified_files(self):
+        await self.manager.build_metadata(MagicMock())
+        self.analyzed.clear()
+        os.utime(os.path.join(self.tmp_dir, 'a.py'), (1, 1))
+
+        changes = await self.manager.refresh_metadata(MagicMock())
+
+        self.assertEqual(self.analyzed, [])
+        self.assertEqual(changes, {'added': [], 'changed': [], 'removed': [], 'mtimes_updated': True})
+        entry = next(f for f in self.manager.metadata['key_files'] if f['path'] == 'a.py')
+        self.assertEqual(entry['mtime'], 1)
+
+    @patch('src.drd.metadata.project_metadata.forget_response')
+    @patch('src.drd.metadata.project_metadata.acall_dravid_api_with_pagination')
+    async def test_build_metadata_batches_small_files(self, mock_api_call, mock_forget):
+        self.manager.batch_token_budget = 1000
+        mock_api_call.return_value = """
+        <response>
+          <metadata path="a.py">
+            <type>python</type><summary>Defines a</summary><exports>var:a</exports><imports>None</imports>
+          </metadata>
+          <metadata path="c.py">
+            <type>python</type><summary>Defines c</summary><exports>var:c</exports><imports>None</imports>
+          </metadata>
+        </response>
+        """
+        loader = MagicMock()
+
+        metadata = await self.manager.build_metadata(loader)
+
+        mock_api_call.assert_called_once()
+        # b.py was missing from the batch response, so it is analyzed on its own
+        self.assertEqual(self.analyzed, ['b.py'])
+        # so the incomplete batch response is not replayed from the cache
+        mock_forget.assert_called_once_with(mock_api_call.call_args[0][0])
+        entries = {f['path']: f for f in metadata['key_files']}
+        self.assertEqual(sorted(entries), ['a.py', 'b.py', 'c.py'])
+        self.assertEqual(entries['a.py']['summary'], 'Defines a')
+        self.assertEqual(entries['c.py']['exports'], ['var:c'])
+        self.assertEqual(entries['a.py']['hash'], self.manager.get_file_fingerprint(
+            os.path.join(self.tmp_dir, 'a.py'))[0])
+        self.assertEqual(loader.message, "Analyzing files (3/3)")
+
+
+class TestProjectMetadataStorage(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        import shutil
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.manager = ProjectMetadataManager(self.tmp_dir)
+        self.manager.metadata['key_files'] = [
+            {'path': 'a.py', 'type': 'python', 'summary': 'a', 'exports': [], 'imports': []}]
+        self.manager.save_metadata()
+
+    def tearDown(self):
+        if self.manager.store:
+            self.manager.store.close()
+
+    def read_json(self):
+        with open(self.manager.metadata_file) as f:
+            return json.load(f)
+
+    def reopen(self):
+        manager = ProjectMetadataManager(self.tmp_dir)
+        if manager.store:
+            self.addCleanup(manager.store.close)
+        return manager
+
+    def test_batch_exports_drd_json_once(self):
+        with patch.object(self.manager, 'save_file_index') as mock_index, \
+                patch('src.drd.metadata.project_metadata.json.dump', wraps=json.dump) as mock_dump:
+            with self.manager.batch():
+                for i in range(5):
+                    self.manager.update_file_metadata(f"f{i}.py", 'python', '', f"file {i}")
+                self.manager.add_external_dependency('click')
+                self.manager.remove_file_metadata('a.py')
+                self.assertNotIn('f0.py', [f['path'] for f in self.read_json()['key_files']])
+
+        self.assertEqual(mock_dump.call_count, 1)
+        mock_index.assert_called_once()
+        exported = self.read_json()
+        self.assertEqual([f['path'] for f in exported['key_files']],
+                         [f"f{i}.py" for i in range(5)])
+        self.assertEqual(exported['external_dependencies'], ['click'])
+
+    def test_single_change_is_exported_and_stored(self):
+        self.manager.update_file_metadata('b.py', 'python', '', 'b file')
+
+        self.assertIn('b.py', [f['path'] for f in self.read_json()['key_files']])
+        self.assertEqual(self.manager.store.get_file('b.py')['summary'], 'b file')
+        self.assertFalse(any(name.endswith('.tmp') for name in os.listdir(self.tmp_dir)))
+
+    def test_reload_reads_the_store_when_drd_json_is_unchanged(self):
+        self.manager.update_environment_info('python', [], 'click', '3.11')
+
+        with patch('src.drd.metadata.project_metadata.json.load') as mock_load:
+            manager = self.reopen()
+
+        mock_load.assert_not_called()
+        self.assertEqual(manager.metadata, self.read_json())
+
+    def test_edited_drd_json_is_imported_again(self):
+        data = self.read_json()
+        data['dev_server']['start_command'] = 'npm run dev'
+        with open(self.manager.metadata_file, 'w') as f:
+            json.dump(data, f, indent=4)
+
+        manager = self.reopen()
+        self.assertEqual(manager.metadata['dev_server']['start_command'], 'npm run dev')
+
+        manager.update_file_metadata('c.py', 'python', '', 'c file')
+        self.assertEqual(manager.store.get_file('a.py')['summary'], 'a')
+
+    def test_changes_survive_a_crash_before_export(self):
+        with patch.object(self.manager, 'export_metadata'):
+            self.manager.update_file_metadata('b.py', 'python', '', 'b file')
+
+        manager = self.reopen()
+
+        self.assertIn('b.py', [f['path'] for f in manager.metadata['key_files']])
+        self.assertNotIn('b.py', [f['path'] for f in self.read_json()['key_files']])
+
+    def test_failed_batch_is_rolled_back(self):
+        with self.assertRaises(RuntimeError):
+            with self.manager.batch():
+                self.manager.update_file_metadata('b.py', 'python', '', 'b file')
+                raise RuntimeError("interrupted")
+
+        self.assertIsNone(self.manager.store.get_file('b.py'))
+        self.assertNotIn('b.py', [f['path'] for f in self.read_json()['key_files']])
+        # b.py is still in memory, so the next change writes everything
+        self.assertFalse(self.manager.store_synced)
+        self.manager.update_file_metadata('c.py', 'python', '', 'c file')
+        self.assertEqual(self.manager.store.get_file('b.py')['summary'], 'b file')
+        self.assertIn('b.py', [f['path'] for f in self.read_json()['key_files']])
+
+    def test_batch_does_not_lock_the_store_while_open(self):
+        import sqlite3
+        with self.manager.batch():
+            self.manager.update_file_metadata('b.py', 'python', '', 'b file')
+            other = sqlite3.connect(self.manager.store.db_file, timeout=0)
+            try:
+                other.execute("BEGIN IMMEDIATE")
+                other.execute("ROLLBACK")
+            finally:
+                other.close()
+            self.assertIsNone(self.manager.store.get_file('b.py'))
+
+        self.assertEqual(self.manager.store.get_file('b.py')['summary'], 'b file')
+
+    @patch('src.drd.metadata.project_metadata.print_warning')
+    def test_unusable_store_falls_back_to_drd_json(self, mock_warning):
+        self.manager.store.close()
+        with open(self.manager.store.db_file, 'w') as f:
+            f.write("not a database")
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(self.manager.store.db_file + suffix):
+                os.remove(self.manager.store.db_file + suffix)
+
+        manager = ProjectMetadataManager(self.tmp_dir)
+        manager.update_file_metadata('b.py', 'python', '', 'b file')
+
+        self.assertIsNone(manager.store)
+        mock_warning.assert_called()
+        self.assertIn('b.py', [f['path'] for f in self.read_json()['key_files']])
+
+    @patch.dict(os.environ, {'DRAVID_METADATA_STORE': '0'})
+    def test_store_can_be_disabled(self):
+        manager = ProjectMetadataManager(self.tmp_dir)
+        self.assertIsNone(manager.store)
+        manager.update_file_metadata('b.py', 'python', '', 'b file')
+        self.assertIn('b.py', [f['path'] for f in self.read_json()['key_files']])
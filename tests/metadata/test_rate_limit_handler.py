@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import asyncio
 import time
 import logging
@@ -9,9 +9,9 @@ from drd.metadata.rate_limit_handler import (
     RateLimiter,
     process_single_file,
     process_files,
-    MAX_CONCURRENT_REQUESTS,
-    MAX_CALLS_PER_MINUTE,
-    RATE_LIMIT_PERIOD
+    process_file_batch,
+    plan_metadata_batches,
+    MAX_CONCURRENT_REQUESTS
 )
 
 logging.basicConfig(level=logging.DEBUG)
@@ -20,34 +20,34 @@ logger = logging.getLogger(__name__)
 
 class TestRateLimitHandler(unittest.IsolatedAsyncioTestCase):
 
-    async def test_rate_limiter(self):
-        limiter = RateLimiter(3, 1)  # 3 calls per 1 second
-        start_time = time.time()
-
-        acquire_times = []
-        for i in range(5):
-            await limiter.acquire()
-            current_time = time.time()
-            acquire_times.append(current_time - start_time)
-            logger.debug(
-                f"Acquire {i+1} at {current_time - start_time:.4f} seconds")
+    async def test_rate_limiter_bounds_concurrency(self):
+        limiter = RateLimiter(2)
+        in_flight = 0
+        peak = 0
 
-        end_time = time.time()
-        total_time = end_time - start_time
+        async def worker():
+            nonlocal in_flight, peak
+            async with limiter.semaphore:
+                in_flight += 1
+                peak = max(peak, in_flight)
+                await asyncio.sleep(0.01)
+                in_flight -= 1
 
-        logger.debug(f"Total time: {total_time:.4f} seconds")
-        logger.debug(f"Acquire times: {acquire_times}")
+        await asyncio.gather(*(worker() for _ in range(6)))
+        self.assertEqual(peak, 2)
 
-        # Check that the first 3 calls were almost instantaneous
-        self.assertLess(acquire_times[2] - acquire_times[0], 0.1)
+    def test_rate_limiter_semaphore_per_event_loop(self):
+        limiter = RateLimiter(1)
 
-        # Check that the 4th call was delayed
-        self.assertGreater(acquire_times[3] - acquire_times[2], 0.9)
+        async def get_semaphore():
+            async with limiter.semaphore:
+                return limiter.semaphore
 
-        # Check that the total time is at least 1 second (allowing some margin for error)
-        self.assertGreater(total_time, 0.9)
+        first = asyncio.run(get_semaphore())
+        second = asyncio.run(get_semaphore())
+        self.assertIsNot(first, second)
 
-    @patch('drd.metadata.rate_limit_handler.call_dravid_api_with_pagination')
+    @patch('drd.metadata.rate_limit_handler.acall_dravid_api_with_pagination', new_callable=AsyncMock)
     @patch('drd.metadata.rate_limit_handler.extract_and_parse_xml')
     async def test_process_single_file(self, mock_extract_xml, mock_call_api):
         mock_call_api.return_value = "<response><type>python</type><summary>A test file</summary><exports>test_function</exports><imports>os,sys</imports></response>"
@@ -58,10 +58,10 @@ class TestRateLimitHandler(unittest.IsolatedAsyncioTestCase):
 
         self.assertEqual(result, ("test.py", "python",
                          "A test file", "test_function", "os,sys"))
-        mock_call_api.assert_called_once()
+        mock_call_api.assert_awaited_once()
         mock_extract_xml.assert_called_once_with(mock_call_api.return_value)
 
-    @patch('drd.metadata.rate_limit_handler.call_dravid_api_with_pagination')
+    @patch('drd.metadata.rate_limit_handler.acall_dravid_api_with_pagination', new_callable=AsyncMock)
     @patch('drd.metadata.rate_limit_handler.extract_and_parse_xml')
     async def test_process_single_file_error(self, mock_extract_xml, mock_call_api):
         mock_call_api.side_effect = Exception("API Error")
@@ -110,3 +110,49 @@ class TestRateLimitHandler(unittest.IsolatedAsyncioTestCase):
         # (2 batches of 10 files, each taking 0.1 seconds)
         # Allow some margin for error
         self.assertLess(end_time - start_time, 0.3)
+
+    def test_plan_metadata_batches(self):
+        items = [('a', 10), ('b', 60), ('c', 30), ('d', 40), ('e', 30)]
+
+        batches, singles = plan_metadata_batches(items, 100)
+
+        # 'b' takes more than half the budget, 'e' is left alone in its batch
+        self.assertEqual(batches, [['a', 'c', 'd']])
+        self.assertEqual(sorted(singles), ['b', 'e'])
+
+    def test_plan_metadata_batches_disabled(self):
+        batches, singles = plan_metadata_batches([('a', 1), ('b', 1)], 0)
+        self.assertEqual(batches, [])
+        self.assertEqual(singles, ['a', 'b'])
+
+    def test_plan_metadata_batches_max_files(self):
+        batches, _ = plan_metadata_batches(
+            [(i, 1) for i in range(5)], 100, max_files=2)
+        self.assertEqual(batches, [[0, 1], [2, 3]])
+
+    @patch('drd.metadata.rate_limit_handler.acall_dravid_api_with_pagination', new_callable=AsyncMock)
+    async def test_process_file_batch(self, mock_call_api):
+        mock_call_api.return_value = """<response>
+        <metadata path="a.py"><type>python</type><summary>A</summary><exports>fun:a</exports><imports>None</imports></metadata>
+        <metadata path="b.py"><type>python</type><summary>B</summary><exports>None</exports><imports>a.py</imports></metadata>
+        </response>"""
+
+        results = await process_file_batch([("a.py", "def a(): pass"), ("b.py", "import a")], "Test project", {})
+
+        mock_call_api.assert_awaited_once()
+        self.assertEqual(results["a.py"], ("a.py", "python", "A", "fun:a", "None"))
+        self.assertEqual(results["b.py"], ("b.py", "python", "B", "None", "a.py"))
+
+    @patch('drd.metadata.rate_limit_handler.process_single_file')
+    @patch('drd.metadata.rate_limit_handler.process_file_batch')
+    async def test_process_files_batched_falls_back_for_missing_files(self, mock_batch, mock_single):
+        mock_batch.return_value = {"a.py": ("a.py", "python", "A", "", "")}
+        mock_single.return_value = ("b.py", "python", "B", "", "")
+
+        files = [("a.py", "a = 1"), ("b.py", "b = 2")]
+        results = await process_files(files, "Test project", {}, batch_token_budget=1000)
+
+        mock_batch.assert_called_once_with(files, "Test project", {})
+        mock_single.assert_called_once_with("b.py", "b = 2", "Test project", {})
+        self.assertEqual(results, [("a.py", "python", "A", "", ""),
+                                   ("b.py", "python", "B", "", "")])
@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from drd.metadata.refresher import refresh_project_metadata
+
+
+class TestProjectMetadataRefresher(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.project_dir = '/fake/project/dir'
+
+    @patch('drd.metadata.refresher.os.path.exists', return_value=False)
+    @patch('drd.metadata.refresher.ProjectMetadataManager')
+    @patch('drd.metadata.refresher.print_warning')
+    async def test_refresh_without_metadata_file(self, mock_print_warning, mock_manager, mock_exists):
+        result = await refresh_project_metadata(self.project_dir)
+
+        self.assertIsNone(result)
+        mock_print_warning.assert_called_once()
+        mock_manager.return_value.refresh_metadata.assert_not_called()
+
+    @patch('drd.metadata.refresher.os.path.exists', return_value=True)
+    @patch('drd.metadata.refresher.ProjectMetadataManager')
+    @patch('drd.metadata.refresher.Loader')
+    async def test_refresh_saves_changes(self, mock_loader, mock_manager, mock_exists):
+        manager = mock_manager.return_value
+        manager.refresh_metadata = AsyncMock(return_value={
+            'added': ['new.py'], 'changed': [], 'removed': ['old.py']})
+
+        changes = await refresh_project_metadata(self.project_dir)
+
+        self.assertEqual(changes['added'], ['new.py'])
+        manager.save_metadata.assert_called_once()
+        mock_loader.return_value.stop.assert_called_once()
+
+    @patch('drd.metadata.refresher.os.path.exists', return_value=True)
+    @patch('drd.metadata.refresher.ProjectMetadataManager')
+    @patch('drd.metadata.refresher.Loader')
+    async def test_refresh_without_changes_skips_save(self, mock_loader, mock_manager, mock_exists):
+        mock_manager.return_value.refresh_metadata = AsyncMock(return_value={
+            'added': [], 'changed': [], 'removed': []})
+
+        await refresh_project_metadata(self.project_dir)
+
+        mock_manager.return_value.save_metadata.assert_not_called()
+
+    @patch('drd.metadata.refresher.os.path.exists', return_value=True)
+    @patch('drd.metadata.refresher.ProjectMetadataManager')
+    @patch('drd.metadata.refresher.Loader')
+    @patch('drd.metadata.refresher.print_success')
+    async def test_refresh_saves_new_mtimes_of_touched_files(self, mock_print_success, mock_loader,
+                                                             mock_manager, mock_exists):
+        mock_manager.return_value.refresh_metadata = AsyncMock(return_value={
+            'added': [], 'changed': [], 'removed': [], 'mtimes_updated': True})
+
+        await refresh_project_metadata(self.project_dir)
+
+        mock_manager.return_value.save_metadata.assert_called_once()
+        mock_print_success.assert_called_once_with("Project metadata is already up to date.")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from drd.metadata.scanner import (
+    IgnoreMatcher,
+    parse_gitignore_lines,
+    load_ignore_matcher,
+    scan_directory
+)
+
+
+def matcher(*lines):
+    return IgnoreMatcher(parse_gitignore_lines(lines))
+
+
+class TestIgnoreMatcher(unittest.TestCase):
+
+    def test_unanchored_pattern_matches_at_any_depth(self):
+        m = matcher('*.log')
+        self.assertTrue(m.match('app.log'))
+        self.assertTrue(m.match('logs/deep/app.log'))
+        self.assertFalse(m.match('app.log.txt'))
+
+    def test_slash_anchors_pattern(self):
+        m = matcher('/todo.txt', 'docs/build')
+        self.assertTrue(m.match('todo.txt'))
+        self.assertFalse(m.match('src/todo.txt'))
+        self.assertTrue(m.match('docs/build', True))
+        self.assertFalse(m.match('src/docs/build', True))
+
+    def test_directory_only_rules(self):
+        m = matcher('cache/')
+        self.assertTrue(m.match('cache', True))
+        self.assertTrue(m.match('src/cache', True))
+        self.assertFalse(m.match('cache'))
+
+    def test_last_matching_rule_wins(self):
+        m = matcher('*.log', '!keep.log', 'logs/keep.log')
+        self.assertTrue(m.match('app.log'))
+        self.assertFalse(m.match('keep.log'))
+        self.assertFalse(m.match('src/keep.log'))
+        self.assertTrue(m.match('logs/keep.log'))
+
+    def test_double_star(self):
+        m = matcher('**/foo', 'a/**/b', 'out/**')
+        self.assertTrue(m.match('foo'))
+        self.assertTrue(m.match('x/y/foo', True))
+        self.assertTrue(m.match('a/b'))
+        self.assertTrue(m.match('a/x/y/b'))
+        self.assertTrue(m.match('out/file.js'))
+        self.assertFalse(m.match('out', True))
+
+    def test_wildcards_do_not_cross_directories(self):
+        m = matcher('src/*.py', 'file?.txt', 'img[0-9].png', 'x[!a].md')
+        self.assertTrue(m.match('src/main.py'))
+        self.assertFalse(m.match('src/pkg/main.py'))
+        self.assertTrue(m.match('file1.txt'))
+        self.assertFalse(m.match('file10.txt'))
+        self.assertTrue(m.match('img7.png'))
+        self.assertTrue(m.match('xb.md'))
+        self.assertFalse(m.match('xa.md'))
+
+    def test_comments_blank_lines_and_escapes(self):
+        rules = parse_gitignore_lines(['# comment', '', '   ', '\\#hash', '\\!bang', 'trail   '])
+        self.assertEqual([rule.pattern for rule in rules], ['\\#hash', '\\!bang', 'trail'])
+        m = IgnoreMatcher(rules)
+        self.assertTrue(m.match('#hash'))
+        self.assertTrue(m.match('!bang'))
+        self.assertTrue(m.match('trail'))
+
+    def test_is_ignored_checks_parent_directories(self):
+        m = matcher('build/', '!build/keep.txt')
+        self.assertTrue(m.is_ignored('build/keep.txt'))
+        self.assertFalse(m.is_ignored('src/keep.txt'))
+
+    def test_empty_matcher(self):
+        self.assertFalse(IgnoreMatcher([]).is_ignored('anything'))
+
+
+class TestScanDirectory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.write('.gitignore', "*.log\n!important.log\n/generated/\n")
+        self.write('README.md')
+        self.write('app.log')
+        self.write('important.log')
+        self.write('src/main.py')
+        self.write('src/generated/code.py')
+        self.write('generated/code.py')
+        self.write('node_modules/pkg/index.js')
+        self.write('pkg/.gitignore', "secret.txt\n")
+        self.write('pkg/secret.txt')
+        self.write('pkg/sub/secret.txt')
+        self.write('secret.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, path, content=''):
+        full_path = os.path.join(self.tmp_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w') as f:
+            f.write(content)
+
+    def test_scan_applies_gitignore_rules(self):
+        tree = scan_directory(self.tmp_dir)
+        self.assertEqual(sorted(tree.iter_files()), sorted([
+            '.gitignore', 'README.md', 'important.log', 'secret.txt',
+            os.path.join('pkg', '.gitignore'),
+            os.path.join('src', 'main.py'),
+            os.path.join('src', 'generated', 'code.py')
+        ]))
+
+    def test_ignored_directories_are_never_listed(self):
+        listed = []
+        real_scandir = os.scandir
+
+        def tracking_scandir(path):
+            listed.append(os.path.relpath(path, self.tmp_dir))
+            return real_scandir(path)
+        with patch('drd.metadata.scanner.os.scandir', side_effect=tracking_scandir):
+            scan_directory(self.tmp_dir)
+
+        self.assertNotIn('node_modules', listed)
+        self.assertNotIn('generated', listed)
+        self.assertIn(os.path.join('src', 'generated'), listed)
+
+    def test_parallel_scan_matches_sequential_scan(self):
+        sequential = scan_directory(self.tmp_dir, max_workers=1)
+        parallel = scan_directory(self.tmp_dir, max_workers=8)
+        self.assertEqual(list(sequential.iter_files()), list(parallel.iter_files()))
+        self.assertEqual(sequential.to_dict(), parallel.to_dict())
+
+    def test_extra_patterns_override_gitignore(self):
+        tree = scan_directory(self.tmp_dir, load_ignore_matcher(self.tmp_dir, ['/README.md']))
+        self.assertNotIn('README.md', tree.files)
+
+    def test_tree_views(self):
+        tree = scan_directory(self.tmp_dir)
+        structure = tree.to_dict()
+        self.assertEqual(structure['directories'], ['pkg', 'src'])
+        self.assertEqual(structure['src']['files'], ['main.py'])
+        self.assertEqual(structure['src']['generated'], {'files': ['code.py']})
+        self.assertEqual(tree.format_tree().splitlines()[:3], [
+            f"{os.path.basename(self.tmp_dir)}/", '    .gitignore', '    README.md'])
+
+
+if __name__ == '__main__':
+    unittest.main()
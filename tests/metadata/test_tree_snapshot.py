@@ -0,0 +1,156 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from drd.metadata import tree_snapshot
+from drd.metadata.tree_snapshot import FileTreeSnapshot
+
+
+class TestFileTreeSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.write('.gitignore', "*.log\n")
+        self.write('README.md')
+        self.write('src/main.py')
+        self.write('src/pkg/util.py')
+        self.write('docs/index.md')
+        # Nothing in these tests is modified within the same mtime tick
+        patcher = patch.object(tree_snapshot, 'RACY_WINDOW_NS', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tick = 1_000_000
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, path, content=''):
+        full_path = os.path.join(self.tmp_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w') as f:
+            f.write(content)
+
+    def touch_dir(self, path):
+        # Gives the directory an mtime the snapshot cannot have seen
+        self.tick += 1
+        full_path = os.path.join(self.tmp_dir, path)
+        os.utime(full_path, ns=(self.tick * 10**9, self.tick * 10**9))
+
+    def listed_dirs(self, snapshot):
+        listed = []
+        real_scan_dir = tree_snapshot.scan_dir
+
+        def tracking_scan_dir(root_dir, node, matcher):
+            listed.append(node.path)
+            return real_scan_dir(root_dir, node, matcher)
+        with patch('drd.metadata.tree_snapshot.scan_dir', side_effect=tracking_scan_dir), \
+                patch('drd.metadata.scanner.scan_dir', side_effect=tracking_scan_dir):
+            tree = snapshot.get_tree()
+        return tree, listed
+
+    def files(self, tree):
+        return sorted(tree.iter_files())
+
+    def test_first_scan_is_saved_under_the_project(self):
+        tree = FileTreeSnapshot(self.tmp_dir).get_tree()
+
+        snapshot_dir = os.path.join(self.tmp_dir, '.drd')
+        self.assertTrue(os.path.exists(os.path.join(snapshot_dir, 'tree.json')))
+        with open(os.path.join(snapshot_dir, '.gitignore')) as f:
+            self.assertEqual(f.read(), "*\n")
+        self.assertNotIn('.drd', [child.name for child in tree.dirs])
+        self.assertEqual(self.files(tree), sorted([
+            '.gitignore', 'README.md', os.path.join('docs', 'index.md'),
+            os.path.join('src', 'main.py'), os.path.join('src', 'pkg', 'util.py')]))
+
+    def test_unchanged_tree_is_loaded_without_listing(self):
+        first = FileTreeSnapshot(self.tmp_dir).get_tree()
+
+        tree, listed = self.listed_dirs(FileTreeSnapshot(self.tmp_dir))
+
+        self.assertEqual(listed, [])
+        self.assertEqual(self.files(tree), self.files(first))
+
+    def test_only_changed_directories_are_listed_again(self):
+        snapshot = FileTreeSnapshot(self.tmp_dir)
+        before = snapshot.get_tree()
+        self.write('src/pkg/new.py')
+        self.touch_dir('src/pkg')
+
+        tree, listed = self.listed_dirs(snapshot)
+
+        self.assertEqual(listed, [os.path.join('src', 'pkg')])
+        self.assertIn(os.path.join('src', 'pkg', 'new.py'), self.files(tree))
+        # Untouched subtrees are shared with the previous tree
+        self.assertIs(tree.dirs[0], before.dirs[0])
+
+    def test_new_and_removed_directories(self):
+        snapshot = FileTreeSnapshot(self.tmp_dir)
+        snapshot.get_tree()
+        self.write('src/api/routes.py')
+        shutil.rmtree(os.path.join(self.tmp_dir, 'docs'))
+        self.touch_dir('src')
+        self.touch_dir('')
+
+        tree = snapshot.get_tree()
+
+        self.assertIn(os.path.join('src', 'api', 'routes.py'), self.files(tree))
+        self.assertNotIn(os.path.join('docs', 'index.md'), self.files(tree))
+
+    def test_nested_gitignore_edit_rescans_its_subtree(self):
+        self.write('src/.gitignore', "")
+        snapshot = FileTreeSnapshot(self.tmp_dir)
+        snapshot.get_tree()
+        self.write('src/.gitignore', "pkg/\n")
+        os.utime(os.path.join(self.tmp_dir, 'src', '.gitignore'), ns=(5 * 10**9, 5 * 10**9))
+
+        tree = snapshot.get_tree()
+
+        self.assertNotIn(os.path.join('src', 'pkg', 'util.py'), self.files(tree))
+
+    def test_root_gitignore_change_invalidates_the_snapshot(self):
+        FileTreeSnapshot(self.tmp_dir).get_tree()
+        self.write('.gitignore', "docs/\n")
+
+        tree, listed = self.listed_dirs(FileTreeSnapshot(self.tmp_dir))
+
+        self.assertIn('', listed)
+        self.assertNotIn(os.path.join('docs', 'index.md'), self.files(tree))
+
+    def test_racy_directories_are_listed_again(self):
+        snapshot = FileTreeSnapshot(self.tmp_dir)
+        snapshot.get_tree()
+        with patch.object(tree_snapshot, 'RACY_WINDOW_NS', 10**18):
+            _, listed = self.listed_dirs(snapshot)
+        self.assertIn('', listed)
+
+    def test_refresh_without_changes_keeps_the_tree(self):
+        snapshot = FileTreeSnapshot(self.tmp_dir)
+        tree = snapshot.get_tree()
+        with patch.object(snapshot, 'save') as mock_save:
+            self.assertIs(snapshot.refresh(), tree)
+        mock_save.assert_not_called()
+
+    def test_corrupt_snapshot_is_ignored(self):
+        FileTreeSnapshot(self.tmp_dir).get_tree()
+        with open(os.path.join(self.tmp_dir, '.drd', 'tree.json'), 'w') as f:
+            f.write("{not json")
+
+        tree = FileTreeSnapshot(self.tmp_dir).get_tree()
+
+        self.assertIn('README.md', tree.files)
+        with open(os.path.join(self.tmp_dir, '.drd', 'tree.json')) as f:
+            self.assertEqual(json.load(f)['version'], tree_snapshot.SNAPSHOT_VERSION)
+
+    @patch.dict(os.environ, {'DRAVID_TREE_SNAPSHOT': '0'})
+    def test_persistence_can_be_disabled(self):
+        tree = FileTreeSnapshot(self.tmp_dir).get_tree()
+        self.assertIn('README.md', tree.files)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, '.drd')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import patch, MagicMock, mock_open
+from unittest.mock import patch, MagicMock, AsyncMock, mock_open
 import xml.etree.ElementTree as ET
 
 from drd.metadata.updater import update_metadata_with_dravid
@@ -137,5 +137,37 @@ class TestMetadataUpdater(unittest.TestCase):
         mock_print_success.assert_any_call("Metadata update completed.")
 
 
+    @patch('drd.metadata.updater.ProjectMetadataManager')
+    @patch('drd.metadata.updater.get_ignore_patterns', return_value=([], ""))
+    @patch('drd.metadata.updater.get_folder_structure', return_value="")
+    @patch('drd.metadata.updater.call_dravid_api_with_pagination')
+    @patch('drd.metadata.updater.find_file_with_dravid', side_effect=lambda path, *args: path)
+    def test_llm_calls_happen_before_the_batch(self, mock_find_file, mock_call_api,
+                                               mock_get_folder_structure, mock_get_ignore_patterns,
+                                               mock_metadata_manager):
+        mock_call_api.return_value = """
+        <response><files>
+            <file><path>a.py</path><action>update</action></file>
+            <file><path>old.py</path><action>remove</action></file>
+            <file><path>b.py</path><action>update</action></file>
+        </files></response>
+        """
+        events = []
+        manager = mock_metadata_manager.return_value
+
+        async def analyze_file(path):
+            events.append(('analyze', path))
+            return {'path': path, 'type': 'python', 'summary': path, 'exports': [], 'imports': []}
+        manager.analyze_file = AsyncMock(side_effect=analyze_file)
+        manager.batch.return_value.__enter__.side_effect = lambda: events.append(('batch',))
+        manager.update_file_metadata.side_effect = lambda path, *args: events.append(('update', path))
+        manager.remove_file_metadata.side_effect = lambda path: events.append(('remove', path))
+
+        update_metadata_with_dravid(self.meta_description, self.current_dir)
+
+        self.assertEqual(events, [('analyze', 'a.py'), ('analyze', 'b.py'), ('batch',),
+                                  ('remove', 'old.py'), ('update', 'a.py'), ('update', 'b.py')])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -131,3 +131,84 @@ r 4:    result = a * b
 """
         result = apply_changes(original_content, changes)
         self.assertEqual(result, expected_content)
+
+
+class TestLineEditEngine(unittest.TestCase):
+    def setUp(self):
+        self.original = "\n".join(f"line {i}" for i in range(1, 9))
+
+    def test_line_numbers_refer_to_the_original(self):
+        changes = """
+- 2:
+- 3:
++ 6:inserted
+r 7:seven
+"""
+        result = apply_changes(self.original, changes)
+        self.assertEqual(result.split("\n"), [
+            "line 1", "line 4", "line 5", "inserted", "line 6", "seven", "line 8"])
+
+    def test_additions_at_the_end_and_before_the_first_line(self):
+        result = apply_changes("a\nb", "+ 1:first\n+ 3:last\n+ 9:later")
+        self.assertEqual(result, "first\na\nb\nlast\nlater")
+
+    def test_identical_duplicates_are_harmless(self):
+        result = apply_changes(self.original, "- 2:\n- 2:\nr 3:x\nr 3:x")
+        self.assertEqual(result.split("\n")[:3], ["line 1", "x", "line 4"])
+
+    def test_overlapping_changes_are_rejected(self):
+        for changes in ("r 3:x\n- 3:", "r 3:x\nr 3:y", "- 9:", "r 0:x"):
+            with self.assertRaises(ValueError):
+                apply_changes(self.original, changes)
+
+    def test_hunks_are_placed_by_their_context(self):
+        original = "def a():\n    return 1\n\n\ndef b():\n    return 2\n"
+        # The header is off by two lines and the context lost its indentation
+        changes = """
+@@ -3,2 +3,2 @@
+ def b():
+-return 2
++    return 3
+"""
+        self.assertEqual(apply_changes(original, changes),
+                         "def a():\n    return 1\n\n\ndef b():\n    return 3\n")
+
+    def test_numbered_changes_and_several_hunks(self):
+        changes = """
+r 1:LINE 1
+@@ -3 @@
+ line 3
++after 3
+@@
+-line 7
+ line 8
+\\ No newline at end of file
+"""
+        result = apply_changes(self.original, changes)
+        self.assertEqual(result.split("\n"), [
+            "LINE 1", "line 2", "line 3", "after 3", "line 4", "line 5", "line 6", "line 8"])
+
+    def test_indented_hunks(self):
+        changes = """
+            @@ -2 @@
+             line 2
+            -line 3
+            +three
+        """
+        result = apply_changes(self.original, changes)
+        self.assertEqual(result.split("\n")[1:4], ["line 2", "three", "line 4"])
+
+    def test_hunk_that_does_not_match_is_rejected(self):
+        with self.assertRaises(ValueError):
+            apply_changes(self.original, "@@ -2 @@\n line 2\n-line 9")
+        with self.assertRaises(ValueError):
+            apply_changes(self.original, "@@\n+orphan")
+
+    def test_many_edits_on_a_large_file(self):
+        line_count = 200000
+        original = "\n".join(f"line {i}" for i in range(1, line_count + 1))
+        changes = "\n".join(f"r {i}:edited {i}\n+ {i + 1}:added {i}"
+                            for i in range(1, line_count, 20))
+        result = apply_changes(original, changes).split("\n")
+        self.assertEqual(len(result), line_count + len(range(1, line_count, 20)))
+        self.assertEqual(result[:3], ["edited 1", "added 1", "line 2"])
@@ -0,0 +1,52 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from drd.utils.command_allowlist import is_allowed_command, load_allowed_commands, get_config_file
+
+
+class TestCommandAllowlist(unittest.TestCase):
+
+    def setUp(self):
+        self.project_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.project_dir)
+
+    def write_config(self, text):
+        path = get_config_file(self.project_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def test_loads_patterns_from_project_config(self):
+        self.write_config(json.dumps({'allowed_commands': ['npm test', 'pytest*', '', 3]}))
+        self.assertEqual(load_allowed_commands(self.project_dir), ['npm test', 'pytest*'])
+
+    def test_missing_or_broken_config_allows_nothing(self):
+        self.assertEqual(load_allowed_commands(self.project_dir), [])
+        self.write_config('{not json')
+        self.assertEqual(load_allowed_commands(self.project_dir), [])
+        self.write_config(json.dumps({'allowed_commands': 'npm test'}))
+        self.assertEqual(load_allowed_commands(self.project_dir), [])
+
+    def test_matches_whole_command(self):
+        patterns = ['npm test', 'npm run *', 'git status']
+        self.assertTrue(is_allowed_command('npm test', patterns))
+        self.assertTrue(is_allowed_command('  npm   run build ', patterns))
+        self.assertFalse(is_allowed_command('npm test --watch', patterns))
+        self.assertFalse(is_allowed_command('npm install', patterns))
+        self.assertFalse(is_allowed_command('', patterns))
+
+    def test_never_matches_chained_commands(self):
+        patterns = ['npm run *', '*']
+        for command in ['npm run build && rm -r src', 'npm run a; curl x', 'npm run a | sh',
+                        'npm run a > /etc/hosts', 'npm run $(whoami)', 'npm run `id`',
+                        'npm run a &', 'npm run a\nrm x']:
+            self.assertFalse(is_allowed_command(command, patterns), command)
+
+
+if __name__ == '__main__':
+    unittest.main()
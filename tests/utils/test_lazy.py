@@ -0,0 +1,27 @@
+import sys
+import types
+import unittest
+
+from drd.utils.lazy import lazy_exports
+
+
+class TestLazyExports(unittest.TestCase):
+
+    def setUp(self):
+        self.module = types.ModuleType('drd_lazy_test')
+        sys.modules['drd_lazy_test'] = self.module
+        self.module.__getattr__ = lazy_exports('drd_lazy_test', {'join': 'os.path', 'dumps': 'json'})
+
+    def tearDown(self):
+        del sys.modules['drd_lazy_test']
+
+    def test_resolves_and_caches_on_module(self):
+        import os.path
+        self.assertIs(self.module.join, os.path.join)
+        self.assertIs(self.module.__dict__['join'], os.path.join)
+        self.assertNotIn('dumps', self.module.__dict__)
+
+    def test_unknown_name_raises_attribute_error(self):
+        with self.assertRaises(AttributeError) as cm:
+            self.module.missing
+        self.assertIn("'drd_lazy_test' has no attribute 'missing'", str(cm.exception))
@@ -7,7 +7,8 @@ from drd.utils.parser import (
     extract_and_parse_xml,
     parse_dravid_response,
     parse_file_list_response,
-    parse_find_file_response
+    parse_find_file_response,
+    parse_batch_metadata_response
 )
 
 
@@ -346,3 +347,26 @@ class TestDravidParser(unittest.TestCase):
         self.assertIn('- old_function()', result[1]['changes'])
         self.assertIn('+ new_function()', result[1]['changes'])
         self.assertIn('+ additional_line()', result[1]['changes'])
+
+    def test_parse_batch_metadata_response(self):
+        response = """
+        <response>
+          <metadata path="src/a.py">
+            <type>python</type>
+            <summary>First file</summary>
+          </metadata>
+          <metadata>
+            <type>python</type>
+          </metadata>
+          <metadata path="src/b.py">
+            <type>python</type>
+            <summary>Second file</summary>
+          </metadata>
+        </response>
+        """
+        result = parse_batch_metadata_response(response)
+        self.assertEqual(sorted(result), ['src/a.py', 'src/b.py'])
+        self.assertEqual(result['src/b.py'].find('summary').text, 'Second file')
+
+    def test_parse_batch_metadata_response_invalid(self):
+        self.assertEqual(parse_batch_metadata_response("not xml"), {})
@@ -0,0 +1,80 @@
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+from drd.utils.process_runner import run_command, CommandResult
+
+
+@unittest.skipUnless(os.name == 'posix', "uses a POSIX shell")
+class TestRunCommand(unittest.TestCase):
+
+    def test_captures_stdout_and_stderr(self):
+        result = run_command('echo out; echo err >&2; exit 3')
+        self.assertIsInstance(result, CommandResult)
+        self.assertEqual(result.returncode, 3)
+        self.assertEqual(result.stdout, 'out\n')
+        self.assertEqual(result.stderr, 'err\n')
+        self.assertFalse(result.timed_out)
+
+    def test_uses_cwd_and_env(self):
+        env = dict(os.environ, DRD_TEST_VALUE='42')
+        result = run_command('pwd; echo $DRD_TEST_VALUE', cwd='/', env=env)
+        self.assertEqual(result.stdout, '/\n42\n')
+
+    def test_streams_output_before_exit(self):
+        seen = []
+        started = time.monotonic()
+        run_command('echo first; sleep 0.5; echo second',
+                    on_output=lambda stream, text: seen.append((stream, text, time.monotonic() - started)))
+        self.assertEqual([text for _, text, _ in seen], ['first\n', 'second\n'])
+        self.assertLess(seen[0][2], 0.4)
+
+    def test_large_stderr_does_not_block(self):
+        # More than a pipe buffer on stderr while stdout stays quiet
+        command = 'python3 -c "import sys; sys.stderr.write(\'x\' * 1000000); print(\'done\')"'
+        result = run_command(command, timeout=10)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(len(result.stderr), 1000000)
+        self.assertEqual(result.stdout, 'done\n')
+
+    def test_fast_output_is_not_throttled(self):
+        started = time.monotonic()
+        result = run_command('for i in $(seq 1 2000); do echo line $i; done', timeout=10)
+        self.assertEqual(len(result.stdout.splitlines()), 2000)
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_timeout_kills_process_group(self):
+        started = time.monotonic()
+        result = run_command('sleep 30 & sleep 30; echo never', timeout=0.5)
+        self.assertTrue(result.timed_out)
+        self.assertNotIn('never', result.stdout)
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_timeout_while_output_keeps_coming(self):
+        result = run_command('while true; do echo tick; done', timeout=0.3)
+        self.assertTrue(result.timed_out)
+        self.assertIn('tick', result.stdout)
+
+    def test_background_child_does_not_hold_the_command(self):
+        started = time.monotonic()
+        result = run_command('(sleep 3 &) ; echo started', timeout=20)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout, 'started\n')
+        self.assertLess(time.monotonic() - started, 2)
+
+    def test_decodes_split_utf8(self):
+        result = run_command('printf "\\303"; sleep 0.1; printf "\\251\\n"')
+        self.assertEqual(result.stdout, 'é\n')
+
+    @patch('drd.utils.process_runner.kill_process_group')
+    @patch('drd.utils.process_runner._drain', side_effect=KeyboardInterrupt)
+    @patch('drd.utils.process_runner.start_process')
+    def test_interrupt_kills_process_group(self, mock_start, mock_drain, mock_kill):
+        with self.assertRaises(KeyboardInterrupt):
+            run_command('sleep 30')
+        mock_kill.assert_called_once_with(mock_start.return_value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import time
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from drd.utils.shell_session import ShellSession, find_shell, is_enabled, quote
+from drd.utils.step_executor import Executor
+
+
+@unittest.skipUnless(find_shell(), "needs a POSIX shell")
+class TestShellSession(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.realpath(self.tmp.name)
+        self.session = ShellSession(dict(os.environ))
+
+    def tearDown(self):
+        self.session.close()
+        self.tmp.cleanup()
+
+    def test_state_carries_over_between_commands(self):
+        self.session.run('export GREETING=hello; shout() { echo "$1!"; }', self.root)
+        result = self.session.run('shout $GREETING', self.root)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout, 'hello!\n')
+
+    def test_reuses_one_shell(self):
+        self.session.run('true', self.root)
+        pid = self.session.process.pid
+        self.session.run('true', self.root)
+        self.assertEqual(self.session.process.pid, pid)
+
+    def test_reports_exit_code_and_output(self):
+        result = self.session.run('echo out; echo err >&2; false', self.root)
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(result.stdout, 'out\n')
+        self.assertEqual(result.stderr, 'err\n')
+
+    def test_output_without_trailing_newline(self):
+        result = self.session.run("printf 'no newline'", self.root)
+        self.assertEqual(result.stdout, 'no newline')
+
+    def test_tracks_working_directory(self):
+        os.mkdir(os.path.join(self.root, 'app'))
+        self.session.run('cd app', self.root)
+        self.assertEqual(self.session.cwd, os.path.join(self.root, 'app'))
+        # The caller's directory wins for the next command
+        result = self.session.run('pwd', self.root)
+        self.assertEqual(result.stdout, self.root + '\n')
+
+    def test_source_and_quoting(self):
+        with open(os.path.join(self.root, 'env.sh'), 'w') as f:
+            f.write("export FROM_FILE='it''s'\n")
+        self.session.run('source env.sh', self.root)
+        result = self.session.run("echo \"$FROM_FILE\" 'single \"quoted\"'", self.root)
+        self.assertEqual(result.stdout, 'its single "quoted"\n')
+
+    def test_syntax_error_keeps_session(self):
+        result = self.session.run('echo "unterminated', self.root)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertEqual(self.session.run('echo ok', self.root).stdout, 'ok\n')
+
+    def test_exit_restarts_shell(self):
+        result = self.session.run('exit 4', self.root)
+        self.assertEqual(result.returncode, 4)
+        self.assertFalse(self.session.alive)
+        self.assertEqual(self.session.run('echo again', self.root).stdout, 'again\n')
+
+    def test_timeout_kills_and_restarts(self):
+        started = time.monotonic()
+        result = self.session.run('sleep 30', self.root, timeout=0.3)
+        self.assertTrue(result.timed_out)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(self.session.run('echo fresh', self.root).stdout, 'fresh\n')
+
+    def test_streams_output(self):
+        seen = []
+        self.session.run('echo one; sleep 0.2; echo two >&2', self.root,
+                         on_output=lambda stream, text: seen.append((stream, text)))
+        self.assertEqual(seen, [('stdout', 'one\n'), ('stderr', 'two\n')])
+
+    def test_marker_split_across_reads(self):
+        text = 'output ' + self.session.marker[:5]
+        self.assertEqual(self.session._partial_marker(text), 5)
+        self.assertEqual(self.session._partial_marker('plain output\n'), 0)
+
+    def test_quote(self):
+        self.assertEqual(quote("it's"), "'it'\\''s'")
+
+    @patch.dict(os.environ, {'DRAVID_PERSISTENT_SHELL': '1'})
+    def test_is_enabled(self):
+        self.assertTrue(is_enabled())
+
+
+@unittest.skipUnless(find_shell(), "needs a POSIX shell")
+class TestExecutorShellSession(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.realpath(self.tmp.name)
+        self.cwd = os.getcwd()
+        os.chdir(self.root)
+        self.executor = Executor(persistent_shell=True)
+
+    def tearDown(self):
+        self.executor.close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    @patch('click.confirm', return_value=True)
+    def test_cd_and_export_persist(self, mock_confirm):
+        os.mkdir('app')
+        self.executor.execute_shell_command('cd app && export MODE=dev')
+        self.assertEqual(self.executor.current_dir, os.path.join(self.root, 'app'))
+        self.assertEqual(os.getcwd(), os.path.join(self.root, 'app'))
+        self.assertEqual(self.executor.execute_shell_command('echo $MODE'), 'dev\n')
+
+    @patch('click.confirm', return_value=True)
+    def test_cd_outside_project_is_refused(self, mock_confirm):
+        self.executor.execute_shell_command('cd /')
+        self.assertEqual(self.executor.current_dir, self.root)
+        self.assertEqual(self.executor.execute_shell_command('pwd'), self.root + '\n')
+
+    @patch('click.confirm', return_value=True)
+    def test_failure_raises(self, mock_confirm):
+        with self.assertRaises(Exception) as context:
+            self.executor.execute_shell_command('echo bad >&2; exit 3')
+        self.assertIn("return code 3", str(context.exception))
+        self.assertIn("bad", str(context.exception))
+
+    @patch.dict(os.environ, {'DRAVID_PERSISTENT_SHELL': ''})
+    def test_disabled_by_default(self):
+        self.assertIsNone(Executor().shell_session)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,6 +8,7 @@ from io import StringIO
 # Update this import to match your actual module structure
 from drd.utils.step_executor import Executor
 from drd.utils.apply_file_changes import apply_changes
+from drd.utils.process_runner import CommandResult
 
 
 class TestExecutor(unittest.TestCase):
@@ -79,13 +80,9 @@ class TestExecutor(unittest.TestCase):
         result = self.executor.get_folder_structure()
         self.assertEqual(result, {'folder': {'file.txt': 'file'}})
 
-    @patch('subprocess.Popen')
-    def test_execute_shell_command(self, mock_popen):
-        mock_process = MagicMock()
-        mock_process.poll.side_effect = [None, 0]
-        mock_process.stdout.readline.return_value = 'output line'
-        mock_process.communicate.return_value = ('', '')
-        mock_popen.return_value = mock_process
+    @patch('drd.utils.step_executor.run_command')
+    def test_execute_shell_command(self, mock_run_command):
+        mock_run_command.return_value = CommandResult(0, 'output line', '')
 
         result = self.executor.execute_shell_command('ls')
         self.assertEqual(result, 'output line')
@@ -190,15 +187,11 @@ class TestExecutor(unittest.TestCase):
             'UPDATE', 'test.txt', 'content')
         self.assertFalse(result)
 
-    @patch('subprocess.Popen')
+    @patch('drd.utils.step_executor.run_command')
     @patch('click.confirm')
-    def test_execute_shell_command(self, mock_confirm, mock_popen):
+    def test_execute_shell_command(self, mock_confirm, mock_run_command):
         mock_confirm.return_value = True
-        mock_process = MagicMock()
-        mock_process.poll.side_effect = [None, 0]
-        mock_process.stdout.readline.return_value = 'output line'
-        mock_process.communicate.return_value = ('', '')
-        mock_popen.return_value = mock_process
+        mock_run_command.return_value = CommandResult(0, 'output line', '')
 
         result = self.executor.execute_shell_command('ls')
         self.assertEqual(result, 'output line')
@@ -219,26 +212,42 @@ class TestExecutor(unittest.TestCase):
         mock_chdir.assert_called_once_with('/fake/path/app')
         self.assertEqual(self.executor.current_dir, '/fake/path/app')
 
-    @patch('subprocess.Popen')
-    def test_execute_single_command(self, mock_popen):
-        mock_process = MagicMock()
-        mock_process.poll.side_effect = [None, 0]
-        mock_process.stdout.readline.return_value = 'output line'
-        mock_process.communicate.return_value = ('', '')
-        mock_popen.return_value = mock_process
+    @patch('drd.utils.step_executor.run_command')
+    def test_execute_single_command(self, mock_run_command):
+        mock_run_command.return_value = CommandResult(0, 'output line', '')
 
         result = self.executor._execute_single_command('echo "Hello"', 300)
         self.assertEqual(result, 'output line')
-        mock_popen.assert_called_once_with(
+        mock_run_command.assert_called_once_with(
             'echo "Hello"',
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
+            cwd=self.executor.current_dir,
             env=self.executor.env,
-            cwd=self.executor.current_dir
+            timeout=300,
+            on_output=self.executor._print_output
         )
 
+    def test_execute_single_command_streams_both_pipes(self):
+        with patch('click.echo') as mock_echo:
+            result = self.executor._execute_single_command('echo out; echo err >&2', 30)
+        self.assertEqual(result, 'out\n')
+        mock_echo.assert_any_call('out\n', nl=False, err=False)
+        mock_echo.assert_any_call('err\n', nl=False, err=True)
+
+    @patch('drd.utils.step_executor.run_command')
+    def test_execute_single_command_failure(self, mock_run_command):
+        mock_run_command.return_value = CommandResult(2, '', 'boom')
+        with self.assertRaises(Exception) as context:
+            self.executor._execute_single_command('false', 300)
+        self.assertIn("return code 2", str(context.exception))
+        self.assertIn("boom", str(context.exception))
+
+    @patch('drd.utils.step_executor.run_command')
+    def test_execute_single_command_timeout(self, mock_run_command):
+        mock_run_command.return_value = CommandResult(-15, '', '', timed_out=True)
+        with self.assertRaises(Exception) as context:
+            self.executor._execute_single_command('sleep 10', 1)
+        self.assertIn("timed out after 1 seconds", str(context.exception))
+
     @patch('click.confirm')
     @patch('os.chdir')
     @patch('os.path.abspath')
@@ -251,14 +260,10 @@ class TestExecutor(unittest.TestCase):
         self.assertEqual(self.executor.current_dir, '/fake/path/app')
 
     @patch('click.confirm')
-    @patch('subprocess.Popen')
-    def test_execute_shell_command_echo(self, mock_popen, mock_confirm):
+    @patch('drd.utils.step_executor.run_command')
+    def test_execute_shell_command_echo(self, mock_run_command, mock_confirm):
         mock_confirm.return_value = True
-        mock_process = MagicMock()
-        mock_process.poll.side_effect = [None, 0]
-        mock_process.stdout.readline.return_value = 'Hello, World!'
-        mock_process.communicate.return_value = ('', '')
-        mock_popen.return_value = mock_process
+        mock_run_command.return_value = CommandResult(0, 'Hello, World!', '')
 
         result = self.executor.execute_shell_command('echo "Hello, World!"')
         self.assertEqual(result, 'Hello, World!')
@@ -282,3 +287,27 @@ class TestExecutor(unittest.TestCase):
         self.executor.reset_directory()
         mock_chdir.assert_called_once_with(self.executor.initial_dir)
         self.assertEqual(self.executor.current_dir, self.executor.initial_dir)
+
+    @patch('drd.utils.step_executor.run_command')
+    @patch('click.confirm')
+    def test_approved_steps_do_not_ask_again(self, mock_confirm, mock_run_command):
+        mock_run_command.return_value = CommandResult(0, 'done', '')
+        with self.executor.approved():
+            result = self.executor.execute_shell_command('ls')
+        self.assertEqual(result, 'done')
+        mock_confirm.assert_not_called()
+        self.assertFalse(self.executor.preapproved)
+
+    @patch('drd.utils.step_executor.run_command')
+    @patch('click.confirm')
+    def test_allowed_commands_run_without_asking(self, mock_confirm, mock_run_command):
+        mock_run_command.return_value = CommandResult(0, 'ok', '')
+        self.executor.allowed_commands = ['npm test', 'npm run *']
+
+        self.assertEqual(self.executor.execute_shell_command('npm run lint'), 'ok')
+        mock_confirm.assert_not_called()
+
+        mock_confirm.return_value = False
+        result = self.executor.execute_shell_command('npm test && curl example.com')
+        mock_confirm.assert_called_once_with("Confirm execution")
+        self.assertEqual(result, 'Skipping this step...')
@@ -0,0 +1,95 @@
+import unittest
+
+from drd.utils.stream_parser import StreamingResponseParser, parse_response_stream
+from drd.utils.parser import parse_dravid_response
+
+
+RESPONSE = """Here is the plan:
+<response>
+  <explanation>Create the app &amp; install deps</explanation>
+  <steps>
+    <step>
+      <type>shell</type>
+      <command>npm install &amp;&amp; echo "a < b" > out.txt</command>
+    </step>
+    <step>
+      <type>file</type>
+      <operation>CREATE</operation>
+      <filename>config.xml</filename>
+      <content><![CDATA[
+<config>
+  <inner><![CDATA[nested]]></inner>
+  <value>done]]> here</value>
+</config>
+      ]]></content>
+    </step>
+  </steps>
+  <requires_restart>false</requires_restart>
+</response>
+"""
+
+EXPECTED = [
+    {'type': 'explanation', 'content': 'Create the app & install deps'},
+    {'type': 'shell', 'command': 'npm install && echo "a < b" > out.txt'},
+    {'type': 'file', 'operation': 'CREATE', 'filename': 'config.xml',
+     'content': '<config>\n  <inner><![CDATA[nested]]></inner>\n  <value>done]]> here</value>\n</config>'},
+    {'type': 'requires_restart', 'content': 'false'},
+]
+
+
+class TestStreamingResponseParser(unittest.TestCase):
+
+    def test_parse_whole_response(self):
+        self.assertEqual(parse_response_stream([RESPONSE]), EXPECTED)
+
+    def test_chunk_boundaries_do_not_matter(self):
+        for size in (1, 2, 3, 7, 64):
+            chunks = [RESPONSE[i:i + size]
+                      for i in range(0, len(RESPONSE), size)]
+            self.assertEqual(parse_response_stream(chunks), EXPECTED, size)
+
+    def test_step_is_emitted_when_it_closes(self):
+        parser = StreamingResponseParser()
+        head, tail = RESPONSE.split('<step>\n      <type>file</type>')
+
+        events = parser.feed(head)
+
+        self.assertEqual(events, EXPECTED[:2])
+        self.assertFalse(parser.in_step)
+        self.assertEqual(parser.feed('<step>\n      <type>file</type>' + tail) + parser.close(),
+                         EXPECTED[2:])
+
+    def test_incomplete_step_is_dropped(self):
+        truncated = RESPONSE[:RESPONSE.index('<filename>')]
+        self.assertEqual(parse_response_stream([truncated]), EXPECTED[:2])
+
+    def test_lenient_tags(self):
+        chunks = ["< response >", "<STEP><type>shell</type>",
+                  "<command>ls</command></ step\n>", "</response>"]
+        self.assertEqual(parse_response_stream(chunks),
+                         [{'type': 'shell', 'command': 'ls'}])
+
+    def test_unclosed_field_ends_at_enclosing_tag(self):
+        response = "<response><step><type>shell</type><command>ls</step></response>"
+        self.assertEqual(parse_response_stream([response]),
+                         [{'type': 'shell', 'command': 'ls'}])
+
+    def test_trailing_content_after_root(self):
+        parser = StreamingResponseParser()
+        parser.feed("<response><explanation>x</explanation></response> extra")
+        parser.close()
+        self.assertEqual(parser.trailing.strip(), "extra")
+
+    def test_large_content_in_small_chunks(self):
+        body = "line with <tags> and ]] brackets\n" * 5000
+        response = ("<response><steps><step><type>file</type><operation>CREATE</operation>"
+                    f"<filename>big.txt</filename><content><![CDATA[{body}]]></content>"
+                    "</step></steps></response>")
+        chunks = [response[i:i + 50] for i in range(0, len(response), 50)]
+
+        commands = parse_response_stream(chunks)
+
+        self.assertEqual(commands[0]['content'], body.strip())
+
+    def test_parse_dravid_response_without_xml(self):
+        self.assertEqual(parse_dravid_response("no xml here"), [])